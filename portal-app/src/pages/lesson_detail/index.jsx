@@ -112,32 +112,18 @@ export const LessonDetail = () => {
         if (loading || !user) return;
 
         const token = await user.getIdToken();
+        // expand=content resolves every sections[].contentIds unit in the same request
         const response = await axios.get(
-          `${process.env.REACT_APP_SERVER_ORIGIN_URL}/api/lesson/${lessonId}`,
+          `${process.env.REACT_APP_SERVER_ORIGIN_URL}/api/lesson/${lessonId}?expand=content`,
           {
             headers: { Authorization: `Bearer ${token}` },
           }
         );
-        const lessonData = response.data;
+        const { contentById, ...lessonData } = response.data;
         setLesson(lessonData);
 
-        const contentPromises = lessonData.sections.flatMap((section) =>
-          section.contentIds.map(async (contentId) => {
-            const contentResponse = await axios.get(
-              `${process.env.REACT_APP_SERVER_ORIGIN_URL}/api/unit/${contentId}`
-            );
-            return { contentId, ...contentResponse.data };
-          })
-        );
-
-        const contentData = await Promise.all(contentPromises);
-        const contentDetailsMap = contentData.reduce((acc, content) => {
-          // Key by the ID referenced in lesson.sections[].contentIds
-          acc[content.contentId] = content;
-          return acc;
-        }, {});
-
-        setContentDetails(contentDetailsMap);
+        // Keyed by the ID referenced in lesson.sections[].contentIds
+        setContentDetails(contentById || {});
 
         // Author ID can be stored under different keys depending on schema/version.
         const authorUid =
@@ -1,17 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { loadStripe } from '@stripe/stripe-js';
+import { Elements, CardElement, useStripe, useElements } from '@stripe/react-stripe-js';
 import useUserData from '../../hooks/useUserData';
 import BackButton from '../../components/BackButton';
 
-const PaymentPage = () => {
+// Initialize Stripe with your publishable key
+const stripePromise = loadStripe(process.env.REACT_APP_STRIPE_PUBLISHABLE_KEY || 'pk_test_51PYERERqWgqDVRD3kSuQgmgKNIWup77t7Rxsh2mqIsnDDRbCtjuiYh8DCvSO84i5R9FTOgBEzvvr21qHjMGTjvWn00Dwdt2QDv');
+
+const PaymentForm = () => {
     const navigate = useNavigate();
     const { user, loading } = useUserData();
-    const [cardInfo, setCardInfo] = useState({
-        cardNumber: '',
-        expiryDate: '',
-        cvv: '',
-        cardholderName: ''
-    });
+    const stripe = useStripe();
+    const elements = useElements();
+    const [cardholderName, setCardholderName] = useState('');
     const [isProcessing, setIsProcessing] = useState(false);
 
     // Redirect if user is not authenticated
@@ -21,23 +23,33 @@ const PaymentPage = () => {
         }
     }, [user, loading, navigate]);
 
-    const handleCardInfoChange = (e) => {
-        const { name, value } = e.target;
-        setCardInfo(prev => ({
-            ...prev,
-            [name]: value
-        }));
-    };
-
     const[planType] = useState('premium');
-    const [amount] = useState(9.99);             
     const [billingCycle] = useState('monthly');
 
     const handlePayment = async (e) => {
         e.preventDefault();
+
+        if (!stripe || !elements) {
+            console.error('Stripe not loaded');
+            return;
+        }
+
         setIsProcessing(true);
 
         try {
+            // Card details go to Stripe only; the server charges the payment method
+            const { error, paymentMethod } = await stripe.createPaymentMethod({
+                type: 'card',
+                card: elements.getElement(CardElement),
+                billing_details: { name: cardholderName }
+            });
+
+            if (error) {
+                console.error('Payment failed:', error);
+                alert('Payment failed: ' + error.message);
+                return;
+            }
+
             // Get the server URL from environment
             const serverUrl = process.env.REACT_APP_SERVER_ORIGIN_URL || 'http://localhost:3001';
             const token = await user.getIdToken();
@@ -51,8 +63,10 @@ const PaymentPage = () => {
                 },
                 body: JSON.stringify({
                     planType,
-                    amount,
-                    cardInfo,
+                    cardInfo: {
+                        paymentMethodId: paymentMethod.id,
+                        cardholderName
+                    },
                     billingCycle: billingCycle
                 })
             });
@@ -223,89 +237,27 @@ const PaymentPage = () => {
                             }}>
                                 Card Information
                             </label>
-                            <input
-                                type="text"
-                                name="cardNumber"
-                                placeholder="1234 1234 1234 1234"
-                                value={cardInfo.cardNumber}
-                                onChange={handleCardInfoChange}
-                                required
-                                style={{
-                                    width: '100%',
-                                    padding: '12px',
-                                    border: '2px solid #e1e5e9',
-                                    borderRadius: '6px',
-                                    fontSize: '1rem',
-                                    outline: 'none',
-                                    transition: 'border-color 0.2s'
-                                }}
-                                onFocus={(e) => e.target.style.borderColor = '#242B42'}
-                                onBlur={(e) => e.target.style.borderColor = '#e1e5e9'}
-                            />
-                        </div>
-
-                        <div style={{
-                            display: 'grid',
-                            gridTemplateColumns: '1fr 1fr',
-                            gap: '15px',
-                            marginBottom: '20px'
-                        }}>
-                            <div>
-                                <label style={{
-                                    display: 'block',
-                                    fontWeight: '600',
-                                    marginBottom: '8px',
-                                    color: '#333'
-                                }}>
-                                    MM / YY
-                                </label>
-                                <input
-                                    type="text"
-                                    name="expiryDate"
-                                    placeholder="MM / YY"
-                                    value={cardInfo.expiryDate}
-                                    onChange={handleCardInfoChange}
-                                    required
-                                    style={{
-                                        width: '100%',
-                                        padding: '12px',
-                                        border: '2px solid #e1e5e9',
-                                        borderRadius: '6px',
-                                        fontSize: '1rem',
-                                        outline: 'none',
-                                        transition: 'border-color 0.2s'
-                                    }}
-                                    onFocus={(e) => e.target.style.borderColor = '#242B42'}
-                                    onBlur={(e) => e.target.style.borderColor = '#e1e5e9'}
-                                />
-                            </div>
-                            <div>
-                                <label style={{
-                                    display: 'block',
-                                    fontWeight: '600',
-                                    marginBottom: '8px',
-                                    color: '#333'
-                                }}>
-                                    CVC
-                                </label>
-                                <input
-                                    type="text"
-                                    name="cvv"
-                                    placeholder="CVC"
-                                    value={cardInfo.cvv}
-                                    onChange={handleCardInfoChange}
-                                    required
-                                    style={{
-                                        width: '100%',
-                                        padding: '12px',
-                                        border: '2px solid #e1e5e9',
-                                        borderRadius: '6px',
-                                        fontSize: '1rem',
-                                        outline: 'none',
-                                        transition: 'border-color 0.2s'
+                            <div style={{
+                                border: '2px solid #e1e5e9',
+                                borderRadius: '6px',
+                                padding: '12px',
+                                background: '#fff'
+                            }}>
+                                <CardElement
+                                    options={{
+                                        style: {
+                                            base: {
+                                                fontSize: '16px',
+                                                color: '#424770',
+                                                '::placeholder': {
+                                                    color: '#aab7c4',
+                                                },
+                                            },
+                                            invalid: {
+                                                color: '#9e2146',
+                                            },
+                                        },
                                     }}
-                                    onFocus={(e) => e.target.style.borderColor = '#242B42'}
-                                    onBlur={(e) => e.target.style.borderColor = '#e1e5e9'}
                                 />
                             </div>
                         </div>
@@ -323,8 +275,8 @@ const PaymentPage = () => {
                                 type="text"
                                 name="cardholderName"
                                 placeholder="Full name on card"
-                                value={cardInfo.cardholderName}
-                                onChange={handleCardInfoChange}
+                                value={cardholderName}
+                                onChange={(e) => setCardholderName(e.target.value)}
                                 required
                                 style={{
                                     width: '100%',
@@ -342,7 +294,7 @@ const PaymentPage = () => {
 
                         <button
                             type="submit"
-                            disabled={isProcessing}
+                            disabled={isProcessing || !stripe || !elements}
                             style={{
                                 width: '100%',
                                 background: '#242B42',
@@ -352,17 +304,17 @@ const PaymentPage = () => {
                                 padding: '15px',
                                 fontSize: '1.1rem',
                                 fontWeight: '600',
-                                cursor: isProcessing ? 'not-allowed' : 'pointer',
-                                opacity: isProcessing ? 0.7 : 1,
+                                cursor: (isProcessing || !stripe || !elements) ? 'not-allowed' : 'pointer',
+                                opacity: (isProcessing || !stripe || !elements) ? 0.7 : 1,
                                 transition: 'all 0.2s'
                             }}
                             onMouseOver={(e) => {
-                                if (!isProcessing) {
+                                if (!isProcessing && stripe && elements) {
                                     e.target.style.background = '#1a1f35';
                                 }
                             }}
                             onMouseOut={(e) => {
-                                if (!isProcessing) {
+                                if (!isProcessing && stripe && elements) {
                                     e.target.style.background = '#242B42';
                                 }
                             }}
@@ -382,7 +334,7 @@ const PaymentPage = () => {
                             <span>🔒</span>
                             <span>SSL Secured</span>
                             <span>🔒</span>
-                            <span>Secure Payment</span>
+                            <span>Stripe Secured</span>
                         </div>
 
                         <p style={{
@@ -392,7 +344,7 @@ const PaymentPage = () => {
                             marginTop: '15px',
                             lineHeight: 1.4
                         }}>
-                            Your payment information is secure and encrypted. You can cancel anytime from your account settings.
+                            Your payment information is secure and encrypted by Stripe. You can cancel anytime from your account settings.
                         </p>
                     </form>
                 </div>
@@ -401,4 +353,12 @@ const PaymentPage = () => {
     );
 };
 
+const PaymentPage = () => {
+    return (
+        <Elements stripe={stripePromise}>
+            <PaymentForm />
+        </Elements>
+    );
+};
+
 export default PaymentPage;
\ No newline at end of file
@@ -34,6 +34,9 @@ source venv/bin/activate
 echo "📥 Installing test dependencies..."
 pip3 install -r tests/requirements.txt
 
+# Integration tests start their own server unless API_BASE_URL was set by the caller
+CALLER_API_BASE_URL="${API_BASE_URL:-}"
+
 # Check if server is running
 echo "🔍 Checking if API server is running..."
 # ANJ: API_URL="${API_BASE_URL:-http://localhost:3001/api}"
@@ -79,6 +82,11 @@ case "${1:-default}" in
         echo "⚡ Running tests in quick mode..."
         pytest tests/signup.py -x --tb=short
         ;;
+    "integration")
+        # Each pytest-xdist worker boots server/index.js in mock mode on its own port
+        echo "🔌 Running integration tests in parallel against mock mode servers..."
+        API_BASE_URL="$CALLER_API_BASE_URL" pytest tests -m integration -n "${PYTEST_WORKERS:-auto}"
+        ;;
     *)
         echo "🏃 Running standard test suite..."
         pytest tests/signup.py
@@ -94,6 +102,7 @@ echo "   ./run_tests.sh coverage     # Run with coverage report"
 echo "   ./run_tests.sh html         # Generate HTML test report"
 echo "   ./run_tests.sh verbose      # Verbose output with full tracebacks"
 echo "   ./run_tests.sh quick        # Stop on first failure"
+echo "   ./run_tests.sh integration  # Real HTTP tests, one mock server per worker (needs server npm install)"
 echo ""
 echo "🔧 Manual test commands:"
 echo "   pytest tests/signup.py -v                                    # Verbose output"
@@ -0,0 +1,53 @@
+const { db } = require("./config/firebaseConfig");
+const { resolveSchemaQualifier } = require("./utils/schemaQualifier");
+const { TABLE_CONTENT_USAGE, collectContentIds } = require("./services/contentUsageService");
+
+// Define the collections
+const SCHEMA_QUALIFIER = resolveSchemaQualifier();
+const TABLE_LESSON = SCHEMA_QUALIFIER + "lesson";
+
+console.log('backfillContentUsage tables are', TABLE_LESSON, TABLE_CONTENT_USAGE)
+
+// Firestore allows at most 500 writes per batch
+const BATCH_SIZE = 500;
+
+// One-off: rebuild contentUsage/{contentId} from every lesson's sections.
+// Safe to re-run; usage documents are overwritten and stale ones removed.
+async function backfillContentUsage() {
+  const lessonsSnapshot = await db.collection(TABLE_LESSON).get();
+
+  const usage = {};
+  lessonsSnapshot.forEach((doc) => {
+    const lesson = doc.data();
+    collectContentIds(lesson.sections).forEach((contentId) => {
+      usage[contentId] = usage[contentId] || {};
+      usage[contentId][doc.id] = lesson.title || "";
+    });
+  });
+
+  const existingSnapshot = await db.collection(TABLE_CONTENT_USAGE).get();
+  const staleRefs = existingSnapshot.docs
+    .filter((doc) => !usage[doc.id])
+    .map((doc) => doc.ref);
+
+  const updatedAt = new Date().toISOString();
+  const writes = [
+    ...Object.entries(usage).map(([contentId, lessons]) => (batch) =>
+      batch.set(db.collection(TABLE_CONTENT_USAGE).doc(contentId), { lessons, updatedAt })
+    ),
+    ...staleRefs.map((ref) => (batch) => batch.delete(ref)),
+  ];
+
+  for (let i = 0; i < writes.length; i += BATCH_SIZE) {
+    const batch = db.batch();
+    writes.slice(i, i + BATCH_SIZE).forEach((write) => write(batch));
+    await batch.commit();
+  }
+
+  console.log(
+    `Indexed ${Object.keys(usage).length} content units across ${lessonsSnapshot.size} lessons;`,
+    `removed ${staleRefs.length} stale usage documents.`
+  );
+}
+
+backfillContentUsage().catch(console.error);
@@ -1,4 +1,5 @@
 const admin = require("firebase-admin");
+const { instrumentFirestore } = require("../utils/firestoreMetrics");
 
 // Initialize Firebase Admin SDK
 let app;
@@ -29,7 +30,8 @@ if (!admin.apps.length) {
   app = admin.app();
 }
 
-const db = admin.firestore();
+// Counted in /metrics alongside databaseService reads and writes
+const db = instrumentFirestore(admin.firestore());
 const storage = admin.storage();
 
 module.exports = { admin, db, storage };
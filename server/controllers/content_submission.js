@@ -1,7 +1,9 @@
-const { db } = require("../config/firebaseConfig");
-const multer = require("multer");
-const { storage } = require("../config/firebaseConfig");
+const { databaseService } = require("../services/databaseService");
+const { getUnitIdAllocator } = require("../services/unitIdAllocator");
 const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { readRows } = require("../utils/rowStream");
+const { waitForDrain } = require("../utils/jsonStream");
+const { invalidateCatalog } = require("../services/catalogCache");
 
 // Define the collections
 const SCHEMA_QUALIFIER = resolveSchemaQualifier();
@@ -10,12 +12,22 @@ const TABLE_CONTENT = SCHEMA_QUALIFIER + "content";
 
 console.log('content_submission tables are', TABLE_CONTENT, TABLE_COUNTERS)
 
+const REQUIRED_UNIT_FIELDS = ["Title", "Category", "Type", "Level", "Duration", "Abstract", "fileUrl"];
+
+// Firestore allows at most 500 writes per batch
+const BULK_BATCH_SIZE = 500;
+const BULK_MAX_ROWS = parseInt(process.env.BULK_UNIT_MAX_ROWS) || 50000;
+
+function getMissingUnitFields(unit) {
+  return REQUIRED_UNIT_FIELDS.filter((field) => !unit[field]);
+}
+
 const createUnit = async (req, res) => {
   console.log("Received content upload request");
   try {
     const { Title, Category, Type, Level, Duration, isPublic, Abstract, fileUrl } =
       req.body;
-    if (!Title || !Category || !Type || !Level || !Duration || !Abstract || !fileUrl) {
+    if (getMissingUnitFields(req.body).length > 0) {
       console.error("Missing required fields");
       return res.status(400).send("Missing required fields");
     }
@@ -45,22 +57,9 @@ const createUnit = async (req, res) => {
   }
 };
 
-async function getNextUnitID() {
-  console.log("in getNextUnitID")
-  const counterRef = db.collection(TABLE_COUNTERS).doc("unitIdCounter");
-  
-
-  return db.runTransaction(async (transaction) => {
-    const counterDoc = await transaction.get(counterRef);
-    if (!counterDoc.exists) {
-      throw new Error("Counter document does not exist");
-    }
-
-    const lastNumber = counterDoc.data().lastNumber;
-    const newNumber = lastNumber + 1;
-    transaction.update(counterRef, { lastNumber: newNumber });
-    return `diya${newNumber}`;
-  });
+// IDs come from per-process blocks reserved on counters/unitIdCounter
+async function getNextUnitID(db) {
+  return getUnitIdAllocator(db).next();
 }
 
 async function saveContentToFirestore(
@@ -74,8 +73,10 @@ async function saveContentToFirestore(
   fileUrl,
   Author
 ) {
+  await databaseService.initialize();
+  const db = databaseService.getDb();
   const contentRef = db.collection(TABLE_CONTENT);
-  const newUnitID = await getNextUnitID();
+  const newUnitID = await getNextUnitID(db);
   console.log("after getNextUnitID")
   console.log("Generated UnitID:", newUnitID);
 
@@ -95,11 +96,178 @@ async function saveContentToFirestore(
   console.log("Document data to save:", data);
 
   const docRef = await contentRef.add(data);
+  invalidateCatalog("units");
   console.log("Document successfully saved to Firestore with ID:", docRef.id);
 
   return { id: docRef.id, ...data };
 }
 
+/**
+ * Work out the upload format from ?format= or the Content-Type header
+ */
+function getBulkFormat(req) {
+  const format = (req.query.format || "").toLowerCase();
+  if (format === "csv" || format === "ndjson") {
+    return format;
+  }
+
+  const contentType = (req.headers["content-type"] || "").toLowerCase();
+  if (contentType.startsWith("text/csv")) {
+    return "csv";
+  }
+  if (contentType.includes("ndjson") || contentType.includes("jsonlines")) {
+    return "ndjson";
+  }
+  return null;
+}
+
+// CSV cells are strings, so accept the usual spellings of true
+function toBoolean(value) {
+  if (typeof value === "string") {
+    return ["true", "1", "yes", "y"].includes(value.trim().toLowerCase());
+  }
+  return Boolean(value);
+}
+
+/**
+ * Bulk unit upload from an NDJSON or CSV request body
+ * Rows are validated like createUnit, then written in WriteBatch chunks of up
+ * to 500 with their UnitIDs reserved in one allocation per chunk. Results are
+ * streamed back as NDJSON, one line per input row in input order, followed by
+ * a final { summary } line. At most one chunk of rows is held in memory
+ */
+const bulkCreateUnits = async (req, res) => {
+  const Author = req.user ? req.user.uid : null;
+  if (!Author) {
+    return res.status(401).send("Unauthorized");
+  }
+
+  const format = getBulkFormat(req);
+  if (!format) {
+    return res.status(415).send("Send units as application/x-ndjson or text/csv");
+  }
+
+  let db;
+  let allocator;
+
+  const summary = { total: 0, created: 0, failed: 0 };
+  // Results for the current chunk, in input order; valid rows are completed on commit
+  let results = [];
+  let pending = [];
+
+  const writeLine = async (value) => {
+    if (!res.write(JSON.stringify(value) + "\n") && !res.destroyed) {
+      await waitForDrain(res);
+    }
+  };
+
+  const flush = async () => {
+    if (pending.length > 0) {
+      try {
+        const unitIds = await allocator.allocate(pending.length);
+        const LastModified = new Date().toISOString();
+        const batch = db.batch();
+
+        pending.forEach(({ result, unit }, index) => {
+          const docRef = db.collection(TABLE_CONTENT).doc();
+          result.id = docRef.id;
+          result.UnitID = unitIds[index];
+          batch.set(docRef, { UnitID: unitIds[index], ...unit, Author, LastModified });
+        });
+
+        await batch.commit();
+        invalidateCatalog("units");
+        pending.forEach(({ result }) => {
+          result.status = "created";
+        });
+        summary.created += pending.length;
+      } catch (error) {
+        console.error("Error committing bulk unit batch:", error);
+        pending.forEach(({ result }) => {
+          delete result.id;
+          delete result.UnitID;
+          result.status = "error";
+          result.error = "Batch write failed";
+        });
+        summary.failed += pending.length;
+      }
+    }
+
+    for (const result of results) {
+      await writeLine(result);
+    }
+    // Don't let response compression hold back progress for the chunk
+    if (res.flush) {
+      res.flush();
+    }
+    results = [];
+    pending = [];
+  };
+
+  try {
+    await databaseService.initialize();
+    db = databaseService.getDb();
+    allocator = getUnitIdAllocator(db);
+
+    res.status(200);
+    res.setHeader("Content-Type", "application/x-ndjson");
+
+    for await (const { line, row, error } of readRows(req, format)) {
+      if (res.destroyed) {
+        return;
+      }
+      if (summary.total >= BULK_MAX_ROWS) {
+        summary.truncated = true;
+        break;
+      }
+      summary.total++;
+
+      const missing = row ? getMissingUnitFields(row) : [];
+      if (error || missing.length > 0) {
+        results.push({
+          line,
+          status: "error",
+          error: error || `Missing required fields: ${missing.join(", ")}`
+        });
+        summary.failed++;
+        continue;
+      }
+
+      const unit = {
+        Title: row.Title,
+        Category: row.Category,
+        Type: row.Type,
+        Level: row.Level,
+        Duration: row.Duration,
+        isPublic: toBoolean(row.isPublic),
+        Abstract: row.Abstract,
+        fileUrl: row.fileUrl,
+      };
+      const result = { line, status: "pending" };
+      results.push(result);
+      pending.push({ result, unit });
+
+      if (results.length >= BULK_BATCH_SIZE) {
+        await flush();
+      }
+    }
+
+    await flush();
+    await writeLine({ summary });
+    res.end();
+  } catch (error) {
+    console.error("Error in bulk unit upload:", error);
+    if (!res.headersSent) {
+      return res.status(500).send("Bulk upload failed");
+    }
+    if (!res.destroyed) {
+      await writeLine({ error: "Bulk upload failed", summary });
+      res.end();
+    }
+  }
+};
+
 module.exports = {
   createUnit,
+  bulkCreateUnits,
 };
@@ -1,63 +1,104 @@
-const { db, storage } = require("../config/firebaseConfig");
+const { databaseService } = require("../services/databaseService");
 const PDFDocument = require("pdfkit");
 const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { parsePageParams, fetchPage } = require("../utils/pagination");
+const { LruCache } = require("../utils/lruCache");
+const { ZipStreamWriter } = require("../utils/zipStream");
+const { forEachWithConcurrency } = require("../utils/concurrency");
+const { writeJsonArray, documentToJson } = require("../utils/jsonStream");
+const { getModuleLessonIds } = require("../utils/moduleLessons");
+const {
+  collectContentIds,
+  readContentUsage,
+  writeLessonUsage,
+} = require("../services/contentUsageService");
+const {
+  DEFAULT_CONTENT_FIELDS,
+  parseExpand,
+  expandLessonContent,
+} = require("../services/hydrationService");
+const { parseFieldList, parseFieldsParam, selectFields, pickFields } = require("../utils/projection");
+const { sendCatalog, invalidateCatalog } = require("../services/catalogCache");
+const {
+  PUBLIC_CACHE_CONTROL,
+  PRIVATE_CACHE_CONTROL,
+  createDocumentEtag,
+  sendNotModified,
+  sendJsonWithEtag,
+} = require("../utils/httpCache");
 
 // Define the collections
 const SCHEMA_QUALIFIER = resolveSchemaQualifier();
 const TABLE_CONTENT = SCHEMA_QUALIFIER + "content";
 const TABLE_LESSON =  SCHEMA_QUALIFIER + "lesson"; 
 const TABLE_SECTIONS = SCHEMA_QUALIFIER + "sections";
+const TABLE_MODULE = SCHEMA_QUALIFIER + "module";
 
 console.log('lessonsController tables are', TABLE_CONTENT, TABLE_LESSON, TABLE_SECTIONS)
 
-// Get all public lessons
+// Get all public lessons (served from the catalog cache)
+// Pass ?limit=N (and the returned pageToken) to page through results from Firestore,
+// and ?fields=title,level to return only those fields
 const getAllLessons = async (req, res) => {
   try {
-    const lessonsSnapshot = await db.collection(TABLE_LESSON).get();
-    if (lessonsSnapshot.empty) {
-      res.status(200).json([]);
+    const fields = parseFieldsParam(req.query);
+    await databaseService.initialize();
+    const db = databaseService.getDb();
+    const page = parsePageParams(req.query);
+    const publicQuery = db.collection(TABLE_LESSON).where("isPublic", "==", true);
+
+    if (page) {
+      const { docs, nextPageToken } = await fetchPage(selectFields(publicQuery, fields), page);
+      res.status(200).json({
+        items: docs.map((doc) => ({ id: doc.id, ...doc.data() })),
+        nextPageToken,
+      });
       return;
     }
-    const publicLessons = [];
-    lessonsSnapshot.forEach((doc) => {
-      const lessonData = doc.data();
-      // only public and previous lessons
-      if (lessonData.isPublic) {
-        publicLessons.push({ id: doc.id, ...lessonData });
-      }
-    });
-    res.status(200).json(publicLessons);
+
+    await sendCatalog(req, res, "lessons", fields);
   } catch (error) {
     console.error("Error fetching lessons:", error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
-// Get all lessons for admin
+// Get all lessons for admin, serialized into the response as they are read
+// Pass ?fields= to read and return only those fields
 const getAllLessonsAdmin = async (req, res) => {
   try {
-    const lessonsSnapshot = await db.collection(TABLE_LESSON).get();
-    if (lessonsSnapshot.empty) {
-      res.status(200).json([]);
-      return;
-    }
-    const lessons = [];
-    lessonsSnapshot.forEach((doc) => {
-      const lessonData = doc.data();
-      lessons.push({ id: doc.id, ...lessonData });
-    });
-    res.status(200).json(lessons);
+    const fields = parseFieldsParam(req.query);
+    await databaseService.initialize();
+    const db = databaseService.getDb();
+    const lessonsQuery = selectFields(db.collection(TABLE_LESSON), fields);
+    await writeJsonArray(res, lessonsQuery.stream(), documentToJson);
   } catch (error) {
     console.error("Error fetching lessons:", error);
-    res.status(500).send(error.message);
+    if (res.headersSent) {
+      // Cut the connection so the client sees a failed read, not truncated JSON
+      return res.destroy(error);
+    }
+    res.removeHeader("Content-Type");
+    res.status(error.status || 500).send(error.message);
   }
 };
 
 
+// Pass ?expand=content to include the referenced units (contentById, missingContentIds),
+// and ?contentFields=Title,fileUrl to choose which unit fields are returned.
+// ?fields= limits the lesson's own fields.
+// Whole, unexpanded reads get an ETag from the lesson's version and can be
+// answered with a 304 before serializing; other reads are tagged by a body hash
 const getLessonById = async (req, res) => {
   const lessonId = req.params.lessonId;
 
   try {
+    const expand = parseExpand(req.query);
+    const fields = parseFieldsParam(req.query);
+    const contentFields = parseFieldList(req.query.contentFields, DEFAULT_CONTENT_FIELDS);
+
+    await databaseService.initialize();
+    const db = databaseService.getDb();
     const lessonRef = db.collection(TABLE_LESSON).doc(lessonId);
     const doc = await lessonRef.get();
 
@@ -65,10 +106,21 @@ const getLessonById = async (req, res) => {
       return res.status(404).json({ message: "Lesson not found." });
     }
 
-    res.status(200).json({ id: doc.id, ...doc.data() });
+    const cacheControl = doc.data().isPublic === false ? PRIVATE_CACHE_CONTROL : PUBLIC_CACHE_CONTROL;
+    const etag = expand.size === 0 && !fields ? createDocumentEtag("lesson", doc) : null;
+    if (sendNotModified(req, res, etag, cacheControl)) {
+      return;
+    }
+
+    const lesson = { id: doc.id, ...pickFields(doc.data(), fields) };
+    if (expand.has("content")) {
+      Object.assign(lesson, await expandLessonContent(db, TABLE_CONTENT, [doc.data()], contentFields));
+    }
+
+    sendJsonWithEtag(req, res, lesson, { etag, cacheControl });
   } catch (error) {
     console.error("Error fetching lesson:", error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
@@ -80,29 +132,35 @@ const getUserLessons = async (req, res) => {
       return res.status(401).send("Unauthorized");
     }
 
-    const lessonRef = await db.collection(TABLE_LESSON).get();
-    if (lessonRef.empty) {
-      return res.status(200).json([]);
+    await databaseService.initialize();
+    const db = databaseService.getDb();
+    const page = parsePageParams(req.query);
+    const ownedQuery = selectFields(
+      db.collection(TABLE_LESSON).where("authorId", "==", userId),
+      parseFieldsParam(req.query)
+    );
+
+    if (page) {
+      const { docs, nextPageToken } = await fetchPage(ownedQuery, page);
+      return res.status(200).json({
+        items: docs.map((doc) => ({ id: doc.id, ...doc.data() })),
+        nextPageToken,
+      });
     }
 
-    const userLessons = [];
-    lessonRef.forEach((doc) => {
-      const lessonData = doc.data();
-      // Fetch only private lessons owned by the user
-      if (lessonData.authorId === userId) {
-        userLessons.push({ id: doc.id, ...lessonData });
-      }
-    });
-
+    const lessonsSnapshot = await ownedQuery.get();
+    const userLessons = lessonsSnapshot.docs.map((doc) => ({ id: doc.id, ...doc.data() }));
     res.status(200).json(userLessons);
   } catch (error) {
     console.error("Error fetching user units:", error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
 const postLesson = async (req, res) => {
   try {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
     const formData = req.body;
 
     const authorId = req.user ? req.user.uid : null;
@@ -111,20 +169,28 @@ const postLesson = async (req, res) => {
       return res.status(401).json({ error: "Unauthorized" });
     }
     const lessonRef = db.collection(TABLE_LESSON).doc();
-
-    await lessonRef.set({
-      authorId: authorId,
-      title: formData.title,
-      category: formData.category,
-      type: formData.type,
-      level: formData.level,
-      objectives: formData.objectives,
-      duration: formData.duration,
-      sections: formData.sections,
-      description: formData.description,
-      isPublic: formData.isPublic,
-      createdAt: new Date().toISOString(),
+    const contentIds = collectContentIds(formData.sections);
+
+    // Create the lesson and register it in the content usage index atomically
+    await db.runTransaction(async (transaction) => {
+      const usage = await readContentUsage(transaction, db, contentIds);
+
+      transaction.set(lessonRef, {
+        authorId: authorId,
+        title: formData.title,
+        category: formData.category,
+        type: formData.type,
+        level: formData.level,
+        objectives: formData.objectives,
+        duration: formData.duration,
+        sections: formData.sections,
+        description: formData.description,
+        isPublic: formData.isPublic,
+        createdAt: new Date().toISOString(),
+      });
+      writeLessonUsage(transaction, usage, lessonRef.id, formData.title, contentIds);
     });
+    invalidateCatalog("lessons");
 
     res
       .status(201)
@@ -137,6 +203,8 @@ const postLesson = async (req, res) => {
 
 const updateLesson = async (req, res) => {
   try {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
     const lessonId = req.params.lessonId;
     const formData = req.body;
     const requesterId = req.user ? req.user.uid : null;
@@ -171,20 +239,33 @@ const updateLesson = async (req, res) => {
       return res.status(403).json({ error: "Forbidden" });
     }
 
-    const updateData = {
-      title: formData.title || lessonData.title,
-      category: formData.category || lessonData.category,
-      type: formData.type || lessonData.type,
-      level: formData.level || lessonData.level,
-      objectives: formData.objectives || lessonData.objectives,
-      duration: formData.duration || lessonData.duration,
-      sections: formData.sections || lessonData.sections,
-      description: formData.description || lessonData.description,
-      isPublic: typeof formData.isPublic === "boolean" ? formData.isPublic : lessonData.isPublic,
-      updatedAt: new Date().toISOString(),
-    };
-    
-    await lessonRef.update(updateData);
+    // Re-read the lesson inside the transaction so the usage index is diffed
+    // against the sections actually being replaced
+    await db.runTransaction(async (transaction) => {
+      const currentSnapshot = await transaction.get(lessonRef);
+      const currentData = currentSnapshot.exists ? currentSnapshot.data() : lessonData;
+
+      const updateData = {
+        title: formData.title || currentData.title,
+        category: formData.category || currentData.category,
+        type: formData.type || currentData.type,
+        level: formData.level || currentData.level,
+        objectives: formData.objectives || currentData.objectives,
+        duration: formData.duration || currentData.duration,
+        sections: formData.sections || currentData.sections,
+        description: formData.description || currentData.description,
+        isPublic: typeof formData.isPublic === "boolean" ? formData.isPublic : currentData.isPublic,
+        updatedAt: new Date().toISOString(),
+      };
+
+      const contentIds = collectContentIds(updateData.sections);
+      const affectedIds = [...new Set([...collectContentIds(currentData.sections), ...contentIds])];
+      const usage = await readContentUsage(transaction, db, affectedIds);
+
+      transaction.update(lessonRef, updateData);
+      writeLessonUsage(transaction, usage, lessonId, updateData.title, contentIds);
+    });
+    invalidateCatalog("lessons");
 
     res
       .status(200)
@@ -199,6 +280,8 @@ const deleteLessonById = async (req, res) => {
   const lessonId = req.params.lessonId;
 
   try {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
     const requesterId = req.user ? req.user.uid : null;
     if (!requesterId) {
       return res.status(401).json({ error: "Unauthorized" });
@@ -230,7 +313,16 @@ const deleteLessonById = async (req, res) => {
       return res.status(403).json({ error: "Forbidden" });
     }
 
-    await lessonRef.delete();
+    // Delete the lesson and drop it from the content usage index atomically
+    await db.runTransaction(async (transaction) => {
+      const currentSnapshot = await transaction.get(lessonRef);
+      const currentData = currentSnapshot.exists ? currentSnapshot.data() : lessonData;
+      const usage = await readContentUsage(transaction, db, collectContentIds(currentData.sections));
+
+      transaction.delete(lessonRef);
+      writeLessonUsage(transaction, usage, lessonId, currentData.title, []);
+    });
+    invalidateCatalog("lessons");
 
     res.status(200).json({ message: "Lesson deleted successfully." });
   } catch (error) {
@@ -239,10 +331,155 @@ const deleteLessonById = async (req, res) => {
   }
 };
 
+// Rendered PDFs keyed by lesson id + last write time, so edits miss the cache.
+// The TTL bounds how long a changed content link can be served stale.
+const pdfCache = new LruCache({
+  maxEntries: parseInt(process.env.PDF_CACHE_MAX_ENTRIES) || 100,
+  maxSize: parseInt(process.env.PDF_CACHE_MAX_BYTES) || 50 * 1024 * 1024,
+  ttlMs: parseInt(process.env.PDF_CACHE_TTL_MS) || 10 * 60 * 1000,
+  sizeOf: (buffer) => buffer.length,
+});
+
+const getPdfCacheStats = () => pdfCache.getStats();
+
+// Version string for a lesson: updatedAt/createdAt may be ISO strings or Timestamps
+const getLessonVersion = (lessonData) => {
+  const value = lessonData.updatedAt || lessonData.createdAt || "";
+  if (typeof value.toMillis === "function") return String(value.toMillis());
+  if (value instanceof Date) return String(value.getTime());
+  return String(value);
+};
+
+// Fetch every content document referenced by the lesson in one batched read
+const resolveLessonContent = async (db, lessonData) => {
+  const contentIds = collectContentIds(lessonData.sections);
+  if (contentIds.length === 0) {
+    return new Map();
+  }
+
+  const contentDocs = await db.getAll(
+    ...contentIds.map((contentId) => db.collection(TABLE_CONTENT).doc(contentId))
+  );
+  return new Map(
+    contentDocs
+      .filter((contentDoc) => contentDoc.exists)
+      .map((contentDoc) => [contentDoc.id, contentDoc.data()])
+  );
+};
+
+// Write a lesson into a PDFDocument; content must already be resolved
+const renderLessonPdf = (docPdf, lessonData, contentById) => {
+  docPdf
+    .fontSize(20)
+    .text(`Lesson: ${lessonData.title}`, { align: "center" });
+  docPdf.moveDown();
+  docPdf.fontSize(14).text(`Category: ${lessonData.category}`);
+  docPdf.text(`Level: ${lessonData.level}`);
+  docPdf.text(`Duration: ${lessonData.duration} minutes`);
+  docPdf.moveDown();
+
+  docPdf.text("Objectives:");
+  lessonData.objectives.forEach((objective, index) => {
+    docPdf.text(`${index + 1}. ${objective}`);
+  });
+  docPdf.moveDown();
+
+  docPdf.text("Description:");
+  docPdf.text(lessonData.description);
+  docPdf.moveDown();
+
+  if (lessonData.sections && lessonData.sections.length > 0) {
+    for (
+      let sectionIndex = 0;
+      sectionIndex < lessonData.sections.length;
+      sectionIndex++
+    ) {
+      const section = lessonData.sections[sectionIndex];
+      docPdf
+        .fontSize(12)
+        .fillColor("black")
+        .text(`Section ${sectionIndex + 1}`, { underline: true });
+      docPdf.moveDown();
+
+      if (section.intro) {
+        docPdf.fontSize(12).text(`Intro: ${section.intro}`);
+        docPdf.moveDown();
+      }
+
+      if (section.contentIds && section.contentIds.length > 0) {
+        let documentCount = 1;
+        for (let contentId of section.contentIds) {
+          const contentData = contentById.get(contentId);
+
+          if (contentData) {
+            const fileUrl = contentData.fileUrl;
+            docPdf
+              .fontSize(12)
+              .fillColor("black")
+              .text(`Document ${documentCount}: `, { continued: true });
+            docPdf.fontSize(12).fillColor("blue").text("Document link", {
+              link: fileUrl,
+              underline: true,
+            });
+
+            documentCount++;
+          } else {
+            docPdf
+              .fontSize(12)
+              .fillColor("black")
+              .text(`Content ID: ${contentId} not found.`);
+          }
+          docPdf.moveDown();
+        }
+      } else {
+        docPdf
+          .fontSize(12)
+          .fillColor("black")
+          .text("No content available for this section.");
+        docPdf.moveDown();
+      }
+    }
+  }
+};
+
+// Render a lesson to a complete PDF buffer, served from the PDF cache when possible.
+// Resolves to { pdfBuffer, cacheHit }
+const getLessonPdfBuffer = async (db, lessonId, lessonData) => {
+  const cacheKey = `${lessonId}:${getLessonVersion(lessonData)}`;
+  const cachedPdf = pdfCache.get(cacheKey);
+  if (cachedPdf) {
+    return { pdfBuffer: cachedPdf, cacheHit: true };
+  }
+
+  const contentById = await resolveLessonContent(db, lessonData);
+  const pdfBuffer = await new Promise((resolve, reject) => {
+    const docPdf = new PDFDocument();
+    const chunks = [];
+    docPdf.on("data", (chunk) => chunks.push(chunk));
+    docPdf.on("end", () => resolve(Buffer.concat(chunks)));
+    docPdf.on("error", reject);
+    renderLessonPdf(docPdf, lessonData, contentById);
+    docPdf.end();
+  });
+
+  pdfCache.set(cacheKey, pdfBuffer);
+  return { pdfBuffer, cacheHit: false };
+};
+
+// File-name-safe version of a title
+const toFileName = (title, fallback) =>
+  String(title || fallback)
+    .replace(/[^a-zA-Z0-9 _-]+/g, "")
+    .trim()
+    .replace(/\s+/g, "-")
+    .slice(0, 80) || fallback;
+
 const downloadPDF = async (req, res) => {
   const lessonId = req.params.lessonId;
 
   try {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
     const lessonRef = db.collection(TABLE_LESSON).doc(lessonId);
     const doc = await lessonRef.get();
 
@@ -250,93 +487,105 @@ const downloadPDF = async (req, res) => {
       return res.status(404).json({ message: "Lesson not found." });
     }
 
-    const lessonData = doc.data();
-
-    const docPdf = new PDFDocument();
+    const { pdfBuffer, cacheHit } = await getLessonPdfBuffer(db, lessonId, doc.data());
 
     res.setHeader("Content-disposition", "attachment; filename=lesson.pdf");
     res.setHeader("Content-type", "application/pdf");
+    res.setHeader("Content-Length", pdfBuffer.length);
+    res.setHeader("X-Cache", cacheHit ? "HIT" : "MISS");
+    res.end(pdfBuffer);
+  } catch (error) {
+    console.error("Error generating PDF:", error);
+    if (res.headersSent) {
+      return res.end();
+    }
+    res.status(500).json({ error: "Failed to generate PDF" });
+  }
+};
 
-    docPdf.pipe(res);
+const MAX_BUNDLE_LESSONS = 200;
+const BUNDLE_CONCURRENCY = parseInt(process.env.PDF_BUNDLE_CONCURRENCY) || 4;
 
-    docPdf
-      .fontSize(20)
-      .text(`Lesson: ${lessonData.title}`, { align: "center" });
-    docPdf.moveDown();
-    docPdf.fontSize(14).text(`Category: ${lessonData.categpry}`);
-    docPdf.text(`Level: ${lessonData.level}`);
-    docPdf.text(`Duration: ${lessonData.duration} minutes`);
-    docPdf.moveDown();
+// Download several lessons as one ZIP of PDFs
+// GET /lessons/bundle?moduleId=<id> or ?lessonIds=<id>,<id>,...
+// Lessons render on a bounded worker pool and each PDF is streamed into the
+// archive as soon as it is ready, so memory stays flat for large modules
+const downloadLessonBundle = async (req, res) => {
+  try {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
+    const { moduleId } = req.query;
+
+    let lessonIds;
+    let bundleName;
+    if (moduleId) {
+      const moduleDoc = await db.collection(TABLE_MODULE).doc(moduleId).get();
+      if (!moduleDoc.exists) {
+        return res.status(404).json({ message: "Module not found." });
+      }
+      lessonIds = getModuleLessonIds(moduleDoc.data());
+      bundleName = toFileName(moduleDoc.data().title, "module");
+    } else if (req.query.lessonIds) {
+      lessonIds = String(req.query.lessonIds).split(",").map((id) => id.trim());
+      bundleName = "lessons";
+    } else {
+      return res.status(400).json({ message: "moduleId or lessonIds is required." });
+    }
 
-    docPdf.text("Objectives:");
-    lessonData.objectives.forEach((objective, index) => {
-      docPdf.text(`${index + 1}. ${objective}`);
-    });
-    docPdf.moveDown();
-
-    docPdf.text("Description:");
-    docPdf.text(lessonData.description);
-    docPdf.moveDown();
-
-    if (lessonData.sections && lessonData.sections.length > 0) {
-      for (
-        let sectionIndex = 0;
-        sectionIndex < lessonData.sections.length;
-        sectionIndex++
-      ) {
-        const section = lessonData.sections[sectionIndex];
-        docPdf
-          .fontSize(12)
-          .fillColor("black")
-          .text(`Section ${sectionIndex + 1}`, { underline: true });
-        docPdf.moveDown();
+    lessonIds = [...new Set(lessonIds.filter(Boolean))];
+    if (lessonIds.length === 0) {
+      return res.status(400).json({ message: "No lessons to download." });
+    }
+    if (lessonIds.length > MAX_BUNDLE_LESSONS) {
+      return res
+        .status(400)
+        .json({ message: `A bundle can contain at most ${MAX_BUNDLE_LESSONS} lessons.` });
+    }
 
-        if (section.intro) {
-          docPdf.fontSize(12).text(`Intro: ${section.intro}`);
-          docPdf.moveDown();
-        }
+    // Lesson documents are small, so read them all in one batch up front;
+    // content resolution and rendering happen per lesson in the worker pool
+    const lessonDocs = await db.getAll(
+      ...lessonIds.map((lessonId) => db.collection(TABLE_LESSON).doc(lessonId))
+    );
+    const missingIds = lessonDocs.filter((doc) => !doc.exists).map((doc) => doc.id);
+    if (missingIds.length === lessonDocs.length) {
+      return res.status(404).json({ message: "Lessons not found." });
+    }
 
-        if (section.contentIds && section.contentIds.length > 0) {
-          let documentCount = 1;
-          for (let contentId of section.contentIds) {
-            const contentRef = db.collection(TABLE_CONTENT).doc(contentId);
-            const contentDoc = await contentRef.get();
-
-            if (contentDoc.exists) {
-              const contentData = contentDoc.data();
-              const fileUrl = contentData.fileUrl;
-              docPdf
-                .fontSize(12)
-                .fillColor("black")
-                .text(`Document ${documentCount}: `, { continued: true });
-              docPdf.fontSize(12).fillColor("blue").text("Document link", {
-                link: fileUrl,
-                underline: true,
-              });
-
-              documentCount++;
-            } else {
-              docPdf
-                .fontSize(12)
-                .fillColor("black")
-                .text(`Content ID: ${contentId} not found.`);
-            }
-            docPdf.moveDown();
-          }
-        } else {
-          docPdf
-            .fontSize(12)
-            .fillColor("black")
-            .text("No content available for this section.");
-          docPdf.moveDown();
-        }
+    res.setHeader("Content-disposition", `attachment; filename=${bundleName}.zip`);
+    res.setHeader("Content-type", "application/zip");
+
+    const zip = new ZipStreamWriter(res);
+    const numberWidth = String(lessonDocs.length).length;
+
+    await forEachWithConcurrency(lessonDocs, BUNDLE_CONCURRENCY, async (doc, index) => {
+      if (!doc.exists || res.destroyed) {
+        return;
       }
+      const lessonData = doc.data();
+      const { pdfBuffer } = await getLessonPdfBuffer(db, doc.id, lessonData);
+      const number = String(index + 1).padStart(numberWidth, "0");
+      await zip.addFile(`${number}-${toFileName(lessonData.title, doc.id)}.pdf`, pdfBuffer);
+    });
+
+    if (missingIds.length > 0) {
+      await zip.addFile(
+        "missing-lessons.txt",
+        Buffer.from(`These lessons could not be found:\n${missingIds.join("\n")}\n`)
+      );
     }
 
-    docPdf.end();
+    zip.finish();
+    res.end();
   } catch (error) {
-    console.error("Error generating PDF:", error);
-    res.status(500).json({ error: "Failed to generate PDF" });
+    console.error("Error generating lesson bundle:", error);
+    if (res.headersSent) {
+      // Cut the connection so the client sees a failed download, not a corrupt archive
+      return res.destroy(error);
+    }
+    res.removeHeader("Content-disposition");
+    res.removeHeader("Content-type");
+    res.status(500).json({ error: "Failed to generate lesson bundle" });
   }
 };
 
@@ -349,4 +598,6 @@ module.exports = {
   updateLesson,
   deleteLessonById,
   downloadPDF,
+  getPdfCacheStats,
+  downloadLessonBundle,
 };
@@ -1,39 +1,48 @@
 const { databaseService } = require('../services/databaseService');
 const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { getModuleLessonIds } = require("../utils/moduleLessons");
+const {
+  DEFAULT_CONTENT_FIELDS,
+  DEFAULT_LESSON_FIELDS,
+  parseExpand,
+  getDocumentsById,
+  expandLessonContent,
+} = require("../services/hydrationService");
+const { parseFieldList, parseFieldsParam, pickFields } = require("../utils/projection");
+const { sendCatalog, invalidateCatalog } = require("../services/catalogCache");
+const { createDocumentEtag, sendNotModified, sendJsonWithEtag } = require("../utils/httpCache");
 
 // Define the collections
 const SCHEMA_QUALIFIER = resolveSchemaQualifier();
 const TABLE_MODULE = SCHEMA_QUALIFIER + "module";
 const TABLE_LESSON = SCHEMA_QUALIFIER + "lesson";
+const TABLE_CONTENT = SCHEMA_QUALIFIER + "content";
 
 console.log('moduleController tables are', TABLE_MODULE, TABLE_LESSON);
 
-// Get all modules
+// Get all modules (served from the catalog cache); ?fields= limits the fields returned
 const getAllModules = async (req, res) => {
   try {
-    await databaseService.initialize();
-    const db = databaseService.getDb();
-    const modulesSnapshot = await db.collection(TABLE_MODULE).get();
-    if (modulesSnapshot.empty) {
-      return res.status(200).json([]);
-    }
-
-    const allModules = [];
-    modulesSnapshot.forEach(doc => {
-      const moduleData = doc.data();
-      allModules.push({ id: doc.id, ...moduleData });
-    });
-
-    res.status(200).json(allModules);
+    await sendCatalog(req, res, "modules", parseFieldsParam(req.query));
   } catch (error) {
     console.error('Error fetching modules:', error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
 // Get a specific module by ID
+// Pass ?expand=lessons to include its lessons in order (lessonDetails, missingLessonIds),
+// and ?expand=lessons,content to also resolve every lesson's units (contentById).
+// ?lessonFields= and ?contentFields= choose the fields returned for each, and
+// ?fields= the module's own fields.
+// Whole, unexpanded reads are tagged with the module's version, others by a body hash
 const getModuleById = async (req, res) => {
   try {
+    const expand = parseExpand(req.query);
+    const fields = parseFieldsParam(req.query);
+    const lessonFields = parseFieldList(req.query.lessonFields, DEFAULT_LESSON_FIELDS);
+    const contentFields = parseFieldList(req.query.contentFields, DEFAULT_CONTENT_FIELDS);
+
     await databaseService.initialize();
     const db = databaseService.getDb();
     const moduleId = req.params.id;
@@ -43,10 +52,37 @@ const getModuleById = async (req, res) => {
       return res.status(404).send('Module not found');
     }
 
-    res.status(200).json({ id: moduleDoc.id, ...moduleDoc.data() });
+    const etag = expand.size === 0 && !fields ? createDocumentEtag("module", moduleDoc) : null;
+    if (sendNotModified(req, res, etag)) {
+      return;
+    }
+
+    const moduleData = { id: moduleDoc.id, ...pickFields(moduleDoc.data(), fields) };
+    if (expand.has("lessons")) {
+      const expandContent = expand.has("content");
+      const lessonIds = getModuleLessonIds(moduleDoc.data());
+
+      // Sections are needed to find each lesson's units, even if not requested
+      const readFields = expandContent && !lessonFields.includes("sections")
+        ? [...lessonFields, "sections"]
+        : lessonFields;
+      const { byId, missing } = await getDocumentsById(db, TABLE_LESSON, lessonIds, readFields);
+      const lessons = lessonIds.filter((lessonId) => byId.has(lessonId)).map((lessonId) => byId.get(lessonId));
+
+      if (expandContent) {
+        Object.assign(moduleData, await expandLessonContent(db, TABLE_CONTENT, lessons, contentFields));
+      }
+
+      moduleData.lessonDetails = readFields === lessonFields
+        ? lessons
+        : lessons.map(({ sections, ...lesson }) => lesson);
+      moduleData.missingLessonIds = missing;
+    }
+
+    sendJsonWithEtag(req, res, moduleData, { etag });
   } catch (error) {
     console.error('Error fetching module:', error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
@@ -66,6 +102,7 @@ const createModule = async (req, res) => {
     };
 
     const moduleRef = await db.collection(TABLE_MODULE).add(newModule);
+    invalidateCatalog("modules");
     res.status(201).json({ id: moduleRef.id, ...newModule });
   } catch (error) {
     console.error("Error creating module:", error);
@@ -99,6 +136,7 @@ const editModule = async (req, res) => {
     };
 
     await moduleRef.update(updatedModule);
+    invalidateCatalog("modules");
     res.status(200).json({ id: moduleId, ...updatedModule });
   } catch (error) {
     console.error("Error updating module:", error);
@@ -120,6 +158,7 @@ const deleteModule = async (req, res) => {
     }
 
     await moduleRef.delete();
+    invalidateCatalog("modules");
     res.status(200).send("Module deleted successfully");
   } catch (error) {
     console.error("Error deleting module:", error);
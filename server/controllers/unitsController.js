@@ -1,5 +1,9 @@
 const { databaseService } = require('../services/databaseService');
 const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { parsePageParams, fetchPage, fetchMergedPage } = require("../utils/pagination");
+const { getLessonTitlesUsingContent, getDraftTitlesUsingContent } = require("../services/contentUsageService");
+const { sendCatalog, invalidateCatalog } = require("../services/catalogCache");
+const { parseFieldsParam, selectFields, pickFields } = require("../utils/projection");
 
 // Define the collections
 const SCHEMA_QUALIFIER = resolveSchemaQualifier();
@@ -8,7 +12,9 @@ const TABLE_LESSON =  SCHEMA_QUALIFIER + "lesson";
 
 console.log('unitsController tables are', TABLE_CONTENT, TABLE_LESSON)
 
-// Get all units
+// Get all public units (served from the catalog cache)
+// Pass ?limit=N (and the returned pageToken) to page through results from Firestore,
+// and ?fields=Title,Level to return only those fields
 const getAllUnits = async (req, res) => {
   // Add CORS headers
   // const allowOrigin = 'http://localhost:3000'  // origin we allow requests from
@@ -17,32 +23,32 @@ const getAllUnits = async (req, res) => {
   // res.setHeader('Access-Control-Allow-Headers', 'Content-Type'); // Add any other headers as needed
 
   try {
+    const fields = parseFieldsParam(req.query);
     await databaseService.initialize();
     const db = databaseService.getDb();
-    const unitsSnapshot = await db.collection(TABLE_CONTENT).get();
-    if (unitsSnapshot.empty) {
-      res.status(200).json([]);
+    const page = parsePageParams(req.query);
+    const publicQuery = selectFields(db.collection(TABLE_CONTENT).where('isPublic', '==', true), fields);
+
+    if (page) {
+      const { docs, nextPageToken } = await fetchPage(publicQuery, page);
+      res.status(200).json({
+        items: docs.map(doc => ({ id: doc.id, ...doc.data() })),
+        nextPageToken
+      });
       return;
     }
-    
-    const publicUnits = [];
-    unitsSnapshot.forEach(doc => {
-      const unitData = doc.data();
-        // only push public units
-        if (unitData.isPublic) {
-            publicUnits.push({ id: doc.id, ...unitData });
-        }
-    });
-    res.status(200).json(publicUnits);
+
+    await sendCatalog(req, res, 'units', fields);
   } catch (error) {
     console.error('Error fetching units:', error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
-// Get a specific unit by ID
+// Get a specific unit by ID (?fields= limits the fields returned)
 const getUnitById = async (req, res) => {
   try {
+    const fields = parseFieldsParam(req.query);
     await databaseService.initialize();
     const db = databaseService.getDb();
     const unitId = req.params.id;
@@ -51,13 +57,14 @@ const getUnitById = async (req, res) => {
       res.status(404).send('Unit not found');
       return;
     }
-    res.status(200).json({ id: unitDoc.id, ...unitDoc.data() });
+    res.status(200).json({ id: unitDoc.id, ...pickFields(unitDoc.data(), fields) });
   } catch (error) {
     console.error('Error fetching unit:', error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
+// Public units plus private units owned by the user, merged and deduplicated
 const getUserUnits = async (req, res) => {
   try {
     await databaseService.initialize();
@@ -67,24 +74,21 @@ const getUserUnits = async (req, res) => {
       return res.status(401).send("Unauthorized");
     }
 
-    const unitsSnapshot = await db.collection(TABLE_CONTENT).get();
-    if (unitsSnapshot.empty) {
-      return res.status(200).json([]);
-    }
-
-    const userUnits = [];
-    unitsSnapshot.forEach((doc) => {
-      const unitData = doc.data();
-      // Fetch public units and private units owned by the user
-      if (unitData.isPublic || unitData.Author === userId) {
-        userUnits.push({ id: doc.id, ...unitData });
-      }
-    });
+    const page = parsePageParams(req.query);
+    const fields = parseFieldsParam(req.query);
+    const { docs, nextPageToken } = await fetchMergedPage([
+      selectFields(db.collection(TABLE_CONTENT).where("isPublic", "==", true), fields),
+      selectFields(db.collection(TABLE_CONTENT).where("Author", "==", userId), fields),
+    ], page);
 
+    const userUnits = docs.map((doc) => ({ id: doc.id, ...doc.data() }));
+    if (page) {
+      return res.status(200).json({ items: userUnits, nextPageToken });
+    }
     res.status(200).json(userUnits);
   } catch (error) {
     console.error("Error fetching user units:", error);
-    res.status(500).send(error.message);
+    res.status(error.status || 500).send(error.message);
   }
 };
 
@@ -94,34 +98,45 @@ const deleteUnit = async (req, res) => {
     const db = databaseService.getDb();
     const unitId = req.params.id;
 
-    // Check if unit exists
-    const unitDoc = await db.collection(TABLE_CONTENT).doc(unitId).get();
-    if (!unitDoc.exists) {
-      return res.status(404).send('Unit not found');
-    }
+    const unitRef = db.collection(TABLE_CONTENT).doc(unitId);
+
+    // Check usage and delete in one transaction so a lesson that starts
+    // referencing the unit concurrently makes this delete retry
+    const result = await db.runTransaction(async (transaction) => {
+      // Check if unit exists
+      const unitDoc = await transaction.get(unitRef);
+      if (!unitDoc.exists) {
+        return { status: 404 };
+      }
 
-    // Check if unit is used in any lesson plans
-    const lessonsSnapshot = await db.collection(TABLE_LESSON).get();
-    const lessons = [];
-    lessonsSnapshot.forEach(doc => {
-      const lesson = doc.data();
-      if (lesson.sections) {
-        lesson.sections.forEach(section => {
-          if (section.contentIds && section.contentIds.includes(unitId)) {
-            lessons.push(lesson.title);
-          }
-        });
+      // Check if unit is used in any lesson plans (single read of the usage index)
+      // or in a draft, which the index doesn't cover
+      const lessons = [
+        ...(await getLessonTitlesUsingContent(transaction, db, unitId)),
+        ...(await getDraftTitlesUsingContent(transaction, db, unitId)),
+      ];
+      if (lessons.length > 0) {
+        return { status: 400, lessons };
       }
+
+      // Delete the unit
+      transaction.delete(unitRef);
+      return { status: 200 };
     });
+    if (result.status === 200) {
+      invalidateCatalog('units');
+    }
+
+    if (result.status === 404) {
+      return res.status(404).send('Unit not found');
+    }
 
-    if (lessons.length > 0) {
+    if (result.status === 400) {
       return res.status(400).send(
-        `Cannot delete unit as it is used in the following lesson plans: ${lessons.join(', ')}`
+        `Cannot delete unit as it is used in the following lesson plans: ${result.lessons.join(', ')}`
       );
     }
 
-    // Delete the unit
-    await db.collection(TABLE_CONTENT).doc(unitId).delete();
     res.status(200).send('Unit deleted successfully');
   } catch (error) {
     console.error('Error deleting unit:', error);
@@ -2,6 +2,7 @@
 
 const { db } = require("../config/firebaseConfig");
 const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { invalidateCatalog } = require("../services/catalogCache");
 
 // Define the collections
 const SCHEMA_QUALIFIER = resolveSchemaQualifier();
@@ -37,6 +38,7 @@ const updateUnitById = async (req, res) => {
     console.log("update Data is", updateData)
 
     await db.collection(TABLE_CONTENT).doc(id).update(updateData);
+    invalidateCatalog("units");
     res.status(200).send("Content updated successfully");
   } catch (error) {
     console.error("Error:", error);
@@ -19,8 +19,29 @@ const modulesRoutes = require("./routes/modules");
 const userRoutes = require("./routes/user");
 const subscriptionRoutes = require("./routes/subscription");
 const paymentRoutes = require("./routes/payment");
+const metricsRoutes = require("./routes/metrics");
 
 const app = express();
+
+// Per-route latency histograms and Firestore/cache counters, served on /metrics.
+// First, so the timings cover every other middleware
+const metricsEnabled = process.env.METRICS_ENABLED !== 'false';
+if (metricsEnabled) {
+  const { requestMetrics } = require('./middleware/requestMetrics');
+  app.use(requestMetrics());
+}
+
+// Opt-in per-request Firestore traces as JSON lines (FIRESTORE_TRACE, X-Firestore-Trace)
+const { isTracingAvailable } = require('./utils/firestoreTrace');
+if (isTracingAvailable()) {
+  const { firestoreTrace } = require('./middleware/firestoreTrace');
+  app.use(firestoreTrace());
+}
+
+// Negotiated brotli/gzip for JSON and text responses
+const { compression } = require('./middleware/compression');
+app.use(compression());
+
 // Stripe webhooks require the *raw* request body for signature verification.
 // We keep normal JSON parsing, but capture the raw bytes for the webhook route.
 app.use(
@@ -101,6 +122,9 @@ app.use("/api", modulesRoutes);
 app.use("/api/user", userRoutes);
 app.use("/api/subscription", subscriptionRoutes);
 app.use("/api/payment", paymentRoutes);
+if (metricsEnabled) {
+  app.use("/metrics", metricsRoutes);
+}
 
 app.get('/', (req, res) => {
   res.send('Welcome to the Curriculum Portal API');
@@ -115,7 +139,25 @@ app.use(notFoundHandler);
 // Global error handler (must be LAST middleware)
 app.use(globalErrorHandler);
 
+const { paymentLogWriter } = require('./services/paymentLogWriter');
+const { webhookQueue } = require('./services/webhookQueue');
+
 const PORT = process.env.PORT || 3001;
-app.listen(PORT, () => {
+const server = app.listen(PORT, () => {
   console.log(`Server is running on port ${PORT}`);
+  // Re-queue payment logs and webhook events left by earlier runs
+  paymentLogWriter.start();
+  webhookQueue.start();
 });
+
+// Stop taking requests, let queued webhook events finish (their handlers write
+// audit logs), then flush (or spill to disk) queued payment audit logs
+const shutdown = async (signal) => {
+  console.log(`${signal} received, shutting down`);
+  server.close();
+  await webhookQueue.close();
+  await paymentLogWriter.close();
+  process.exit(0);
+};
+process.once('SIGTERM', () => shutdown('SIGTERM'));
+process.once('SIGINT', () => shutdown('SIGINT'));
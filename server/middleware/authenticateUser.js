@@ -1,4 +1,5 @@
 const { databaseService } = require("../services/databaseService");
+const { verifyIdTokenCached } = require("../services/idTokenCache");
 const { sendAuthError } = require("../utils/responseHelpers");
 
 const authenticateUser = async (req, res, next) => {
@@ -12,7 +13,8 @@ const authenticateUser = async (req, res, next) => {
     await databaseService.initialize();
     const admin = databaseService.getAdmin();
 
-    const decodedToken = await admin.auth().verifyIdToken(token);
+    // Repeat requests with the same token reuse the earlier verification
+    const decodedToken = await verifyIdTokenCached(admin.auth(), token);
     req.user = decodedToken;
     next();
   } catch (error) {
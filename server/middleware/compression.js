@@ -0,0 +1,158 @@
+/**
+ * Response compression middleware
+ * Negotiates brotli or gzip from Accept-Encoding and compresses text and JSON
+ * responses on the fly, including streamed ones. res.write() returns false
+ * while either the compressor or the socket is full and 'drain' follows once
+ * both have room, so streaming handlers keep their backpressure. Responses
+ * are left alone when they are smaller than COMPRESSION_THRESHOLD_BYTES
+ * (default 1KB), already have a Content-Encoding (e.g. precompressed catalog
+ * bodies), are not a compressible type (PDFs, ZIPs), or say
+ * Cache-Control: no-transform. A compressed response's ETag gets the coding
+ * appended ("<tag>-gz", "<tag>-br"), and a 304 answering for a compressed
+ * copy repeats that form
+ */
+
+const {
+  COMPRESSION_THRESHOLD,
+  isCompressible,
+  negotiateEncoding,
+  createCompressStream,
+  varyOnAcceptEncoding
+} = require('../utils/compression');
+const { encodeEtag } = require('../utils/httpCache');
+
+function chunkLength(chunk, encoding) {
+  if (!chunk) return 0;
+  return Buffer.isBuffer(chunk) ? chunk.length : Buffer.byteLength(chunk, encoding);
+}
+
+function toBuffer(chunk, encoding) {
+  return Buffer.isBuffer(chunk) ? chunk : Buffer.from(chunk, encoding);
+}
+
+/**
+ * @param {Object} options - { threshold } in bytes
+ * @returns {Function} Express middleware
+ */
+function compression(options = {}) {
+  const threshold = options.threshold !== undefined ? options.threshold : COMPRESSION_THRESHOLD;
+
+  return function compressionMiddleware(req, res, next) {
+    const write = res.write;
+    const end = res.end;
+    let decided = false;
+    let stream = null;
+    let socketFull = false;
+    let writerWaiting = false;
+
+    // A handler told to wait by res.write() returning false while the socket
+    // has room is waiting on the compressor, and the socket will never emit
+    // 'drain' for it. Wake it once the compressor has room too
+    const wakeWriter = () => {
+      if (writerWaiting && !socketFull && !stream.writableNeedDrain) {
+        writerWaiting = false;
+        res.emit('drain');
+      }
+    };
+
+    // The client's copy is the compressed one if it revalidated with that ETag
+    const matchCachedCoding = () => {
+      const etag = res.getHeader('ETag');
+      const encoding = etag && negotiateEncoding(req.headers['accept-encoding']);
+      const encoded = encoding && encodeEtag(etag, encoding);
+      if (encoded && encoded !== String(etag) && String(req.headers['if-none-match'] || '').includes(encoded)) {
+        res.setHeader('ETag', encoded);
+      }
+    };
+
+    // Decide on the first write, while headers can still be changed.
+    // `length` is the full body size when the response is sent in one end()
+    const start = (length) => {
+      decided = true;
+      if (res.headersSent || req.method === 'HEAD') return;
+      if (res.statusCode === 304) {
+        matchCachedCoding();
+        return;
+      }
+      if (res.statusCode < 200 || res.statusCode === 204 || res.statusCode === 304) return;
+      if (res.getHeader('Content-Encoding')) return;
+      if (!isCompressible(res.getHeader('Content-Type'))) return;
+      if (/no-transform/i.test(String(res.getHeader('Cache-Control') || ''))) return;
+
+      varyOnAcceptEncoding(res);
+      const declaredLength = Number(res.getHeader('Content-Length'));
+      const knownLength = length !== undefined ? length : declaredLength;
+      if (Number.isFinite(knownLength) && knownLength < threshold) return;
+
+      const encoding = negotiateEncoding(req.headers['accept-encoding']);
+      if (!encoding) return;
+
+      res.setHeader('Content-Encoding', encoding);
+      res.removeHeader('Content-Length');
+      const etag = res.getHeader('ETag');
+      if (etag) res.setHeader('ETag', encodeEtag(etag, encoding));
+
+      stream = createCompressStream(encoding);
+      stream.on('data', (chunk) => {
+        if (write.call(res, chunk) === false) {
+          socketFull = true;
+          stream.pause();
+        }
+      });
+      // The socket has room again: let the compressor feed it
+      res.on('drain', () => {
+        socketFull = false;
+        writerWaiting = false;
+        stream.resume();
+      });
+      stream.on('drain', wakeWriter);
+      stream.on('end', () => end.call(res));
+      stream.on('error', (error) => res.destroy(error));
+      res.on('close', () => stream.destroy());
+    };
+
+    res.write = function compressedWrite(chunk, encoding, callback) {
+      if (!decided) start();
+      if (!stream) return write.call(res, chunk, encoding, callback);
+      if (typeof encoding === 'function') {
+        callback = encoding;
+        encoding = undefined;
+      }
+      const accepted = stream.write(toBuffer(chunk, encoding), callback) && !socketFull;
+      if (!accepted) writerWaiting = true;
+      return accepted;
+    };
+
+    res.end = function compressedEnd(chunk, encoding, callback) {
+      if (typeof chunk === 'function') {
+        callback = chunk;
+        chunk = undefined;
+      } else if (typeof encoding === 'function') {
+        callback = encoding;
+        encoding = undefined;
+      }
+
+      if (!decided) start(chunkLength(chunk, encoding));
+      if (!stream) return end.call(res, chunk, encoding, callback);
+
+      if (callback) res.once('finish', callback);
+      if (chunk) {
+        stream.end(toBuffer(chunk, encoding));
+      } else {
+        stream.end();
+      }
+      return res;
+    };
+
+    // Push buffered output to the client, e.g. between streamed NDJSON records
+    res.flush = function flush() {
+      if (stream) stream.flush();
+    };
+
+    next();
+  };
+}
+
+module.exports = {
+  compression
+};
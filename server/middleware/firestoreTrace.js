@@ -0,0 +1,52 @@
+/**
+ * Firestore tracing middleware (see utils/firestoreTrace.js)
+ * Attaches a trace to the request context of requests selected by
+ * FIRESTORE_TRACE or the X-Firestore-Trace header, counts the documents the
+ * response returns, and writes the trace once the response finishes. Mount
+ * it right after requestMetrics so it shares that request context
+ */
+
+const { requestContext, currentContext, createRequestContext } = require('../utils/requestContext');
+const {
+  FirestoreTrace,
+  shouldTrace,
+  countReturnedDocuments,
+  writeTrace
+} = require('../utils/firestoreTrace');
+
+/**
+ * @returns {Function} Express middleware
+ */
+function firestoreTrace() {
+  return (req, res, next) => {
+    if (!shouldTrace(req)) {
+      return next();
+    }
+
+    const existing = currentContext();
+    const context = existing || createRequestContext(req);
+    const trace = new FirestoreTrace();
+    context.trace = trace;
+
+    const json = res.json;
+    res.json = function tracedJson(body) {
+      trace.returned(this.statusCode < 400 ? countReturnedDocuments(body) : 0);
+      return json.call(this, body);
+    };
+
+    const finish = () => {
+      if (!trace.closed) {
+        writeTrace(trace.finish(req, res, context.route));
+      }
+    };
+    res.once('finish', finish);
+    res.once('close', finish);
+
+    if (existing) {
+      return next();
+    }
+    return requestContext.run(context, next);
+  };
+}
+
+module.exports = { firestoreTrace };
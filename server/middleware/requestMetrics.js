@@ -0,0 +1,45 @@
+/**
+ * Request metrics middleware
+ * Records a latency histogram per method, route pattern and status code, and
+ * runs the rest of the request inside a request context so Firestore reads
+ * and writes can be attributed to the route that issued them. Mount it first,
+ * so the timing covers every other middleware
+ */
+
+const { metrics } = require('../utils/metrics');
+const { requestContext, createRequestContext } = require('../utils/requestContext');
+
+const httpRequestDuration = metrics.histogram(
+  'http_request_duration_seconds',
+  'HTTP request latency by method, route pattern and status code',
+  ['method', 'route', 'status']
+);
+
+/**
+ * @returns {Function} Express middleware
+ */
+function requestMetrics() {
+  return (req, res, next) => {
+    const started = process.hrtime.bigint();
+    const context = createRequestContext(req);
+    let recorded = false;
+
+    const record = () => {
+      if (recorded) return;
+      recorded = true;
+      const seconds = Number(process.hrtime.bigint() - started) / 1e9;
+      httpRequestDuration.observe({
+        method: req.method,
+        route: context.route,
+        // 'close' without 'finish': the client went away before the response was sent
+        status: res.writableFinished ? res.statusCode : 'aborted'
+      }, seconds);
+    };
+    res.once('finish', record);
+    res.once('close', record);
+
+    requestContext.run(context, next);
+  };
+}
+
+module.exports = { requestMetrics, httpRequestDuration };
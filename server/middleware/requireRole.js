@@ -3,7 +3,7 @@
  * Checks if the authenticated user has the required role(s)
  */
 
-const { databaseService } = require("../services/databaseService");
+const { getUserProfile } = require("../services/userProfileCache");
 const { sendAuthorizationError, sendNotFoundError, handleDatabaseError } = require("../utils/responseHelpers");
 
 const SCHEMA_QUALIFIER = `${process.env.DATABASE_SCHEMA_QUALIFIER}`;
@@ -27,18 +27,14 @@ function requireRole(requiredRoles) {
 
       const userId = req.user.uid;
 
-      // Initialize database service if needed
-      await databaseService.initialize();
+      // Get user profile with fallback collections (cached per uid)
+      const profile = await getUserProfile(userId, TABLE_USERS, req);
 
-      // Get user document with fallback collections
-      const { snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
-
-      if (!userSnap.exists) {
+      if (!profile) {
         return sendNotFoundError(res, "User profile");
       }
 
-      const userData = userSnap.data();
-      const userRole = userData.role || 'teacherDefault'; // Default role
+      const { role: userRole, data: userData } = profile;
 
       // Check if user has required role
       if (!allowedRoles.includes(userRole)) {
@@ -85,21 +81,16 @@ const requireValidUser = async (req, res, next) => {
 
     const userId = req.user.uid;
 
-    // Initialize database service if needed
-    await databaseService.initialize();
-
-    // Use the database service's getUserDocument method
-    const { snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
+    // Get user profile with fallback collections (cached per uid)
+    const profile = await getUserProfile(userId, TABLE_USERS, req);
 
-    if (!userSnap.exists) {
+    if (!profile) {
       return sendNotFoundError(res, "User profile");
     }
 
-    const userData = userSnap.data();
-
     // Attach user data to request
-    req.userData = userData;
-    req.userRole = userData.role || 'teacherDefault';
+    req.userData = profile.data;
+    req.userRole = profile.role;
 
     next();
   } catch (error) {
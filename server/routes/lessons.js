@@ -8,6 +8,7 @@ const { postLesson } = require("../controllers/lessonsController");
 const { updateLesson } = require("../controllers/lessonsController");
 const { downloadPDF } = require("../controllers/lessonsController");
 const { deleteLessonById } = require("../controllers/lessonsController");
+const { downloadLessonBundle } = require("../controllers/lessonsController");
 const authenticateUser = require("../middleware/authenticateUser");
 
 const router = express.Router();
@@ -17,6 +18,7 @@ router.get("/lessons", getAllLessons);
 router.get("/lessons/admin", getAllLessonsAdmin);
 router.get("/lesson/myLessons", authenticateUser, getUserLessons);
 router.get("/lesson/:lessonId", getLessonById);
+router.get("/lessons/bundle", downloadLessonBundle);
 router.get("/lessons/:lessonId/download", downloadPDF);
 router.post("/lesson", authenticateUser, postLesson);
 router.put("/lesson/:lessonId", authenticateUser, updateLesson);
@@ -0,0 +1,100 @@
+const crypto = require("crypto");
+const express = require("express");
+const { databaseService } = require("../services/databaseService");
+const { getUserProfileCacheStats } = require("../services/userProfileCache");
+const { getIdTokenCacheStats } = require("../services/idTokenCache");
+const { getCatalogCacheStats } = require("../services/catalogCache");
+const { paymentLogWriter } = require("../services/paymentLogWriter");
+const { webhookQueue } = require("../services/webhookQueue");
+const { getPdfCacheStats } = require("../controllers/lessonsController");
+const { metrics } = require("../utils/metrics");
+
+const router = express.Router();
+
+// Bearer token for scrapers. Without one /metrics is open, except in
+// production, where it refuses every request until METRICS_TOKEN is set
+const METRICS_TOKEN = process.env.METRICS_TOKEN || "";
+const TOKEN_REQUIRED = process.env.NODE_ENV === "production";
+
+if (TOKEN_REQUIRED && !METRICS_TOKEN) {
+  console.warn("METRICS_TOKEN is not set; /metrics will answer 401 to every request");
+}
+
+function cacheStats() {
+  const caches = {
+    profiles: getUserProfileCacheStats(),
+    id_tokens: getIdTokenCacheStats(),
+    pdf: getPdfCacheStats()
+  };
+  if (databaseService.isInitialized) {
+    const { userLocations, userCounts } = databaseService.getCacheStats();
+    caches.user_locations = userLocations;
+    caches.user_counts = userCounts;
+  }
+  for (const [name, stats] of Object.entries(getCatalogCacheStats())) {
+    caches[`catalog_${name}`] = { ...stats, entries: stats.items };
+  }
+  return Object.entries(caches);
+}
+
+metrics.addCollector(() => {
+  const caches = cacheStats();
+  const family = (name, help, type, pick) => ({
+    name,
+    help,
+    type,
+    samples: caches.map(([cache, stats]) => ({ labels: { cache }, value: pick(stats) }))
+  });
+
+  return [
+    family("cache_hits_total", "Cache lookups that found an entry", "counter", (stats) => stats.hits),
+    family("cache_misses_total", "Cache lookups that missed", "counter", (stats) => stats.misses),
+    family("cache_hit_ratio", "Hits / lookups since startup", "gauge", (stats) => stats.hitRate),
+    family("cache_entries", "Entries currently cached", "gauge", (stats) => stats.entries)
+  ];
+});
+
+metrics.addCollector(() => [
+  {
+    name: "payment_log_queue_depth",
+    help: "Payment audit log entries waiting to be written",
+    samples: [{ value: paymentLogWriter.getStats().queueDepth }]
+  },
+  {
+    name: "webhook_queue_depth",
+    help: "Stripe webhook events waiting to be processed",
+    samples: [{ value: webhookQueue.getStats().queueDepth }]
+  }
+]);
+
+// In mock mode the emulator knows how many documents each query really scanned
+metrics.addCollector(() => {
+  if (!databaseService.isInitialized || !databaseService.isMockMode()) {
+    return [];
+  }
+  const stats = databaseService.getDb().getStats();
+  return [
+    { name: "firestore_emulator_full_scans_total", help: "Emulator queries served without an index", type: "counter", samples: [{ value: stats.fullScans }] },
+    { name: "firestore_emulator_documents_scanned_total", help: "Documents the emulator examined to answer queries", type: "counter", samples: [{ value: stats.documentsScanned }] }
+  ];
+});
+
+function isAuthorized(req) {
+  if (!METRICS_TOKEN) {
+    return !TOKEN_REQUIRED;
+  }
+  const expected = Buffer.from(`Bearer ${METRICS_TOKEN}`);
+  const actual = Buffer.from(req.headers.authorization || "");
+  return actual.length === expected.length && crypto.timingSafeEqual(actual, expected);
+}
+
+// Prometheus text exposition format
+router.get("/", (req, res) => {
+  if (!isAuthorized(req)) {
+    return res.status(401).type("text/plain").send("Unauthorized\n");
+  }
+  res.set("Cache-Control", "no-store");
+  res.type("text/plain; version=0.0.4").send(metrics.render());
+});
+
+module.exports = router;
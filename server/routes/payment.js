@@ -1,6 +1,10 @@
 const express = require("express");
 const authenticateUser = require("../middleware/authenticateUser");
 const { databaseService } = require("../services/databaseService");
+const { invalidateUserProfile } = require("../services/userProfileCache");
+const { paymentLogWriter } = require("../services/paymentLogWriter");
+const { webhookQueue } = require("../services/webhookQueue");
+const { getPlanPriceCents } = require("../utils/planPrices");
 
 const router = express.Router();
 
@@ -59,8 +63,9 @@ router.post("/create-payment-intent", authenticateUser, requireStripe, async (re
         const userId = req.user.uid;
         const { planType } = req.body;
 
-        // Accept both premium variants
-        if (!planType || !['premium', 'premiumYearly'].includes(planType)) {
+        // Only plans with a server-side price can be paid for (premium variants)
+        const amount = getPlanPriceCents(planType);
+        if (amount === null) {
             return res.status(400).json({ message: "Invalid plan type" });
         }
 
@@ -77,9 +82,6 @@ router.post("/create-payment-intent", authenticateUser, requireStripe, async (re
 
         const userData = userSnap.data();
 
-        // Set amount based on plan type
-        const amount = planType === 'premiumYearly' ? 10000 : 999; // $100.00 or $9.99 in cents
-
         // Create payment intent with Stripe
         const paymentIntent = await stripe.paymentIntents.create({
             amount: amount,
@@ -96,12 +98,11 @@ router.post("/create-payment-intent", authenticateUser, requireStripe, async (re
         });
 
         // Log payment intent creation
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'payment_intent_created',
             fromPlan: userData.subscriptionType || 'basic',
             toPlan: planType,
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'payment_intent_created',
             paymentIntentId: paymentIntent.id,
             amount: amount,
@@ -119,13 +120,9 @@ router.post("/create-payment-intent", authenticateUser, requireStripe, async (re
 
         // Log the error
         if (req.user?.uid) {
-            await databaseService.initialize();
-            const db = databaseService.getDb();
-            const admin = databaseService.getAdmin();
-            await db.collection(TABLE_PAYMENT_LOGS).add({
+            paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
                 userId: req.user.uid,
                 action: 'payment_intent_error',
-                timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
                 status: 'error',
                 error: error.message
             });
@@ -213,7 +210,9 @@ router.post("/create-embedded-checkout-session", authenticateUser, requireStripe
       const userId = req.user.uid;
       const { planType } = req.body;
   
-      if (!planType || !["premium", "premiumYearly"].includes(planType)) {
+      // Amount in cents from the shared price table
+      const amount = getPlanPriceCents(planType);
+      if (amount === null) {
         return res.status(400).json({ message: "Invalid plan type" });
       }
   
@@ -225,9 +224,6 @@ router.post("/create-embedded-checkout-session", authenticateUser, requireStripe
   
       const userData = userSnap.data();
   
-      // Amounts in cents (your existing logic)
-      const amount = planType === "premiumYearly" ? 10000 : 999;
-  
       // IMPORTANT for embedded Checkout:
       // - ui_mode: "embedded"
       // - use return_url (NOT success_url/cancel_url)
@@ -322,14 +318,14 @@ router.post("/confirm-payment", authenticateUser, requireStripe, async (req, res
             lastUpdated: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             role: (targetPlan === 'premium' || targetPlan === 'premiumYearly') ? 'teacherPlus' : (targetPlan === 'enterprise' ? 'teacherEnterprise' : userData.role)
         });
+        invalidateUserProfile(userId);
 
         // Log successful payment
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'payment_confirmed',
             fromPlan: paymentIntent.metadata.upgradeFrom,
             toPlan: targetPlan,
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'completed',
             paymentIntentId: paymentIntentId,
             amount: paymentIntent.amount,
@@ -347,13 +343,9 @@ router.post("/confirm-payment", authenticateUser, requireStripe, async (req, res
         console.error("Error confirming payment:", error);
 
         // Log the error
-        await databaseService.initialize();
-        const db = databaseService.getDb();
-        const admin = databaseService.getAdmin();
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId: req.user.uid,
             action: 'payment_confirmation_error',
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'error',
             paymentIntentId: req.body.paymentIntentId,
             error: error.message
@@ -363,6 +355,62 @@ router.post("/confirm-payment", authenticateUser, requireStripe, async (req, res
     }
 });
 
+// Stripe webhook event handlers. They run from the webhook queue, after the
+// event has been acknowledged and claimed, so each event.id is handled once
+webhookQueue
+    .register('payment_intent.succeeded', async (event) => {
+        const paymentIntent = event.data.object;
+        console.log('PaymentIntent succeeded:', paymentIntent.id);
+
+        // Log webhook event
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
+            action: 'webhook_payment_succeeded',
+            status: 'webhook_received',
+            eventId: event.id,
+            paymentIntentId: paymentIntent.id,
+            userId: paymentIntent.metadata.userId || null,
+            amount: paymentIntent.amount,
+            currency: paymentIntent.currency
+        });
+    })
+    .register('payment_intent.payment_failed', async (event) => {
+        const failedPayment = event.data.object;
+        console.log('PaymentIntent failed:', failedPayment.id);
+
+        // Log failed payment
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
+            action: 'webhook_payment_failed',
+            status: 'payment_failed',
+            eventId: event.id,
+            paymentIntentId: failedPayment.id,
+            userId: failedPayment.metadata.userId || null,
+            error: failedPayment.last_payment_error?.message || 'Payment failed'
+        });
+    })
+    .register('checkout.session.completed', async (event) => {
+        const session = event.data.object;
+
+        // Only handle module purchases
+        if (session?.metadata?.purchaseType !== "module") return;
+
+        const userId = session.metadata.userId || null;
+        const moduleId = session.metadata.moduleId || null;
+
+        console.log("Checkout session completed (module):", session.id, { userId, moduleId });
+
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
+            action: "webhook_checkout_session_completed",
+            status: "completed",
+            eventId: event.id,
+            checkoutSessionId: session.id,
+            paymentIntentId: session.payment_intent || null,
+            userId,
+            moduleId,
+            amount_total: session.amount_total || null,
+            currency: session.currency || null,
+        });
+    });
+
 // Stripe webhook handler
 // IMPORTANT: this must use the raw request body for signature verification.
 // In `server/index.js` we capture it as `req.rawBody`.
@@ -387,74 +435,15 @@ router.post("/webhook", async (req, res) => {
         return res.status(400).send(`Webhook Error: ${err.message}`);
     }
 
-    await databaseService.initialize();
-    const db = databaseService.getDb();
-    const admin = databaseService.getAdmin();
-
-    // Handle the event
-    switch (event.type) {
-        case 'payment_intent.succeeded':
-            const paymentIntent = event.data.object;
-            console.log('PaymentIntent succeeded:', paymentIntent.id);
-
-            // Log webhook event
-            await db.collection(TABLE_PAYMENT_LOGS).add({
-                action: 'webhook_payment_succeeded',
-                timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
-                status: 'webhook_received',
-                paymentIntentId: paymentIntent.id,
-                userId: paymentIntent.metadata.userId || null,
-                amount: paymentIntent.amount,
-                currency: paymentIntent.currency
-            });
-            break;
-
-        case 'payment_intent.payment_failed':
-            const failedPayment = event.data.object;
-            console.log('PaymentIntent failed:', failedPayment.id);
-
-            // Log failed payment
-            await db.collection(TABLE_PAYMENT_LOGS).add({
-                action: 'webhook_payment_failed',
-                timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
-                status: 'payment_failed',
-                paymentIntentId: failedPayment.id,
-                userId: failedPayment.metadata.userId || null,
-                error: failedPayment.last_payment_error?.message || 'Payment failed'
-            });
-            break;
-
-            case "checkout.session.completed": {
-                const session = event.data.object;
-              
-                // Only handle module purchases
-                if (session?.metadata?.purchaseType !== "module") break;
-              
-                const userId = session.metadata.userId || null;
-                const moduleId = session.metadata.moduleId || null;
-              
-                console.log("Checkout session completed (module):", session.id, { userId, moduleId });
-              
-                await db.collection(TABLE_PAYMENT_LOGS).add({
-                  action: "webhook_checkout_session_completed",
-                  timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
-                  status: "completed",
-                  checkoutSessionId: session.id,
-                  paymentIntentId: session.payment_intent || null,
-                  userId,
-                  moduleId,
-                  amount_total: session.amount_total || null,
-                  currency: session.currency || null,
-                });
-              
-                break;
-            }
-              
-            default:
-            console.log(`Unhandled event type ${event.type}`);
+    // Acknowledge once queued; handlers run in the background so slow
+    // Firestore writes can't push Stripe into timeouts and redeliveries
+    const { accepted, duplicate } = webhookQueue.enqueue(event);
+    if (!accepted) {
+        // Stripe redelivers on non-2xx responses
+        return res.status(503).send("Webhook queue is full");
     }
 
-    res.json({ received: true });
+    res.json({ received: true, duplicate });
 });
 
 // Get payment history for user
@@ -476,7 +465,15 @@ router.get("/history", authenticateUser, async (req, res) => {
             timestamp: doc.data().timestamp?.toDate()
         }));
 
-        return res.status(200).json(history);
+        // Include entries still waiting in the log writer's queue, newest first
+        const queued = paymentLogWriter
+            .getQueuedEntries(TABLE_PAYMENT_LOGS, (entry) => entry.userId === userId)
+            .reverse();
+        const persistedIds = new Set(history.map((entry) => entry.id));
+
+        return res.status(200).json(
+            [...queued.filter((entry) => !persistedIds.has(entry.id)), ...history].slice(0, 20)
+        );
 
     } catch (error) {
         console.error("Error fetching payment history:", error);
@@ -1,6 +1,10 @@
 const express = require("express");
 const authenticateUser = require("../middleware/authenticateUser");
 const { databaseService } = require("../services/databaseService");
+const { invalidateUserProfile } = require("../services/userProfileCache");
+const { paymentLogWriter } = require("../services/paymentLogWriter");
+const { getPaymentProcessor } = require("../services/paymentProcessor");
+const { getPlanPriceCents } = require("../utils/planPrices");
 
 const router = express.Router();
 
@@ -23,21 +27,8 @@ router.get("/status", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -76,24 +67,8 @@ router.post("/initiate-upgrade", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-        let collectionName = "teachers";
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-            collectionName = "students";
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-            collectionName = TABLE_USERS;
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -103,12 +78,11 @@ router.post("/initiate-upgrade", authenticateUser, async (req, res) => {
         const currentPlan = userData.subscriptionType || 'basic';
 
         // Log the upgrade attempt
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'upgrade_initiated',
             fromPlan: currentPlan,
             toPlan: targetPlan,
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'initiated',
             userEmail: userData.email
         });
@@ -152,24 +126,8 @@ router.post("/complete-upgrade", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-        let collectionName = "teachers";
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-            collectionName = "students";
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-            collectionName = TABLE_USERS;
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -202,14 +160,14 @@ router.post("/complete-upgrade", authenticateUser, async (req, res) => {
         }
 
         await userRef.update(updateData);
+        invalidateUserProfile(userId);
 
         // Log the successful upgrade
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'upgrade_completed',
             fromPlan: currentPlan,
             toPlan: targetPlan,
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'completed',
             paymentIntentId: paymentIntentId || null,
             upgradeSessionId: upgradeSessionId || null,
@@ -238,21 +196,8 @@ router.post("/enterprise-contact", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -273,12 +218,11 @@ router.post("/enterprise-contact", authenticateUser, async (req, res) => {
         });
 
         // Log the contact request
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'enterprise_contact_requested',
             fromPlan: userData.subscriptionType || 'basic',
             toPlan: 'enterprise',
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'contact_requested',
             userEmail: userData.email
         });
@@ -301,21 +245,8 @@ router.get("/admin/logs", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists || userSnap.data().role !== "admin") {
             return res.status(403).json({ message: "Access denied. Admin only." });
@@ -332,7 +263,13 @@ router.get("/admin/logs", authenticateUser, async (req, res) => {
             timestamp: doc.data().timestamp?.toDate()
         }));
 
-        return res.status(200).json(logs);
+        // Include entries still waiting in the log writer's queue, newest first
+        const queued = paymentLogWriter.getQueuedEntries(TABLE_PAYMENT_LOGS).reverse();
+        const persistedIds = new Set(logs.map((entry) => entry.id));
+
+        return res.status(200).json(
+            [...queued.filter((entry) => !persistedIds.has(entry.id)), ...logs].slice(0, 100)
+        );
 
     } catch (error) {
         console.error("Error fetching admin logs:", error);
@@ -340,6 +277,24 @@ router.get("/admin/logs", authenticateUser, async (req, res) => {
     }
 });
 
+// Admin endpoint for payment log writer queue depth and flush latency
+router.get("/admin/log-writer", authenticateUser, async (req, res) => {
+    try {
+        await databaseService.initialize();
+        const { snap: userSnap } = await databaseService.getUserDocument(req.user.uid, TABLE_USERS);
+
+        if (!userSnap.exists || userSnap.data().role !== "admin") {
+            return res.status(403).json({ message: "Access denied. Admin only." });
+        }
+
+        return res.status(200).json(paymentLogWriter.getStats());
+
+    } catch (error) {
+        console.error("Error fetching log writer stats:", error);
+        res.status(500).json({ message: "Internal server error" });
+    }
+});
+
 // Cancel subscription endpoint
 router.post("/cancel", authenticateUser, async (req, res) => {
     try {
@@ -350,24 +305,8 @@ router.post("/cancel", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-        let collectionName = "teachers";
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-            collectionName = "students";
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-            collectionName = TABLE_USERS;
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -410,14 +349,14 @@ router.post("/cancel", authenticateUser, async (req, res) => {
         };
 
         await userRef.update(updateData);
+        invalidateUserProfile(userId);
 
         // Log the cancellation
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'subscription_cancelled',
             fromPlan: currentPlan,
             toPlan: 'basic',
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'cancelled',
             reason: reason || null,
             feedback: feedback || null,
@@ -445,21 +384,8 @@ router.post("/reactivate", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -482,12 +408,12 @@ router.post("/reactivate", authenticateUser, async (req, res) => {
         };
 
         await userRef.update(updateData);
+        invalidateUserProfile(userId);
 
         // Log the reactivation
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'subscription_reactivated',
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'reactivated',
             userEmail: userData.email
         });
@@ -507,7 +433,7 @@ router.post("/reactivate", authenticateUser, async (req, res) => {
 router.post("/process-payment", authenticateUser, async (req, res) => {
     try {
         const userId = req.user.uid;
-        const { planType, amount, cardInfo, billingCycle } = req.body;
+        const { planType, cardInfo, billingCycle } = req.body;
 
         // Validate plan type
         const validPlans = ['premium', 'premiumYearly', 'enterprise'];
@@ -515,8 +441,16 @@ router.post("/process-payment", authenticateUser, async (req, res) => {
             return res.status(400).json({ message: "Invalid plan type" });
         }
 
+        // Charge the server-side price; `amount` from the client is never used.
+        // Plans without one (enterprise) go through /enterprise-contact
+        const amountCents = getPlanPriceCents(planType);
+        if (amountCents === null) {
+            return res.status(400).json({ message: `The ${planType} plan can't be paid for directly; please contact us` });
+        }
+        const amount = amountCents / 100;
+
         // Validate required fields
-        if (!amount || !cardInfo) {
+        if (!cardInfo) {
             return res.status(400).json({ message: "Missing required payment information" });
         }
 
@@ -524,24 +458,8 @@ router.post("/process-payment", authenticateUser, async (req, res) => {
         const db = databaseService.getDb();
         const admin = databaseService.getAdmin();
 
-        // Check in teachers collection first
-        let userRef = db.collection("teachers").doc(userId);
-        let userSnap = await userRef.get();
-        let collectionName = "teachers";
-
-        if (!userSnap.exists) {
-            // Then check students collection
-            userRef = db.collection("students").doc(userId);
-            userSnap = await userRef.get();
-            collectionName = "students";
-        }
-
-        if (!userSnap.exists) {
-            // Finally check unified users collection
-            userRef = db.collection(TABLE_USERS).doc(userId);
-            userSnap = await userRef.get();
-            collectionName = TABLE_USERS;
-        }
+        // Resolve teachers -> students -> users in a single round trip
+        const { ref: userRef, snap: userSnap } = await databaseService.getUserDocument(userId, TABLE_USERS);
 
         if (!userSnap.exists) {
             return res.status(404).json({ message: "User not found" });
@@ -550,11 +468,32 @@ router.post("/process-payment", authenticateUser, async (req, res) => {
         const userData = userSnap.data();
         const currentPlan = userData.subscriptionType || 'basic';
 
-        // For demo purposes, we'll simulate a successful payment
-        // In a real implementation, you would integrate with Stripe or another payment processor
-
-        // Simulate payment processing delay
-        await new Promise(resolve => setTimeout(resolve, 1000));
+        // Charge through the configured processor (local simulator unless
+        // PAYMENT_PROCESSOR=stripe)
+        let payment;
+        try {
+            payment = await getPaymentProcessor().charge({
+                amount: amountCents,
+                currency: 'usd',
+                paymentMethodId: cardInfo.paymentMethodId,
+                metadata: { userId, planType, upgradeFrom: currentPlan }
+            });
+        } catch (error) {
+            if (!error.status) throw error;
+
+            paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
+                userId,
+                action: 'payment_failed',
+                fromPlan: currentPlan,
+                toPlan: planType,
+                status: 'failed',
+                amount: amount,
+                error: error.message,
+                errorCode: error.code,
+                userEmail: userData.email
+            });
+            return res.status(error.status).json({ message: error.message, code: error.code });
+        }
 
         // Update user subscription
         const updateData = {
@@ -576,23 +515,23 @@ router.post("/process-payment", authenticateUser, async (req, res) => {
                 endDate.setMonth(endDate.getMonth() + 1);
             }
             updateData.subscriptionEndDate = admin.firestore?.Timestamp?.fromDate?.(endDate) || endDate;
-            // In a real implementation, store the actual payment intent ID
-            updateData.paymentReference = `demo_payment_${Date.now()}`;
+            updateData.paymentReference = payment.id;
         }
 
         await userRef.update(updateData);
+        invalidateUserProfile(userId);
 
         // Log the payment
-        await db.collection(TABLE_PAYMENT_LOGS).add({
+        paymentLogWriter.log(TABLE_PAYMENT_LOGS, {
             userId,
             action: 'payment_processed',
             fromPlan: currentPlan,
             toPlan: planType,
-            timestamp: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
             status: 'completed',
             amount: amount,
             billingCycle: billingCycle || 'month',
-            paymentMethod: 'demo_card',
+            paymentMethod: payment.method,
+            paymentReference: payment.id,
             userEmail: userData.email
         });
 
@@ -1,6 +1,6 @@
 const express = require("express");
 const { getAllUnits, getUnitById, getUserUnits, deleteUnit } = require("../controllers/unitsController");
-const { createUnit } = require("../controllers/content_submission");
+const { createUnit, bulkCreateUnits } = require("../controllers/content_submission");
 const { updateUnitById } = require("../controllers/update_submission");
 const authenticateUser = require("../middleware/authenticateUser");
 
@@ -13,6 +13,7 @@ router.get("/units", getAllUnits);
 router.get("/unit/:id", getUnitById);
 router.get("/units/user", authenticateUser, getUserUnits);
 router.post("/unit", authenticateUser, upload, createUnit); // Apply middleware here
+router.post("/units/bulk", authenticateUser, bulkCreateUnits); // NDJSON or CSV body, streamed NDJSON results
 router.post("/update/:id", upload, updateUnitById);
 router.delete("/unit/:id", authenticateUser, deleteUnit);
 
@@ -2,6 +2,11 @@ const express = require("express");
 const authenticateUser = require("../middleware/authenticateUser");
 const { requireAdmin, requireValidUser } = require("../middleware/requireRole");
 const { databaseService } = require("../services/databaseService");
+const { invalidateUserProfile, getUserProfileCacheStats } = require("../services/userProfileCache");
+const { getIdTokenCacheStats } = require("../services/idTokenCache");
+const { getCatalogCacheStats } = require("../services/catalogCache");
+const { parseFieldsParam, pickFields } = require("../utils/projection");
+const { parsePageLimit } = require("../utils/pagination");
 const {
   sendSuccess,
   sendError,
@@ -45,52 +50,86 @@ router.get("/me", authenticateUser, asyncHandler(async (req, res) => {
 
 // Get all users (admin only) - MUST come before /:userId route
 router.get("/users", authenticateUser, requireAdmin, asyncHandler(async (req, res) => {
+  // Optional projection, e.g. ?fields=email,role
+  let fields;
+  try {
+    fields = parseFieldsParam(req.query);
+  } catch (error) {
+    return sendValidationError(res, error.message, [
+      { field: 'fields', message: 'Fields must be a comma separated list of field names' }
+    ]);
+  }
+
   // Initialize database service if needed
   await databaseService.initialize();
 
   try {
-    // Get pagination parameters
-    const page = parseInt(req.query.page) || 1;
-    const limit = Math.min(parseInt(req.query.limit) || 20, 100); // Max 100 users per request
+    // Get pagination parameters (keyset: pass back pagination.nextPageToken)
+    const limit = parsePageLimit(req.query.limit, 20, 100); // 1 to 100 users per request
+    const pageToken = req.query.pageToken || null;
     const role = req.query.role;
 
     const result = await databaseService.getAllUsers(TABLE_USERS, {
-      page,
       limit,
+      pageToken,
       role,
       orderBy: 'createdAt',
-      orderDirection: 'desc'
+      orderDirection: 'desc',
+      fields
     });
 
     const users = result.users.map((doc) => {
       const userData = doc.data();
       // Remove sensitive fields from response
       const { subscriptionStartDate, createdAt, updatedAt, ...safeUserData } = userData;
-      return {
+      const user = {
         id: doc.id,
         ...safeUserData,
         createdAt: createdAt?.toDate?.()?.toISOString(),
         updatedAt: updatedAt?.toDate?.()?.toISOString()
       };
+      // createdAt is always read for the page token; drop it unless requested
+      return fields ? pickFields(user, ['id', ...fields]) : user;
     });
 
     return sendSuccess(res, {
       users,
       pagination: {
-        currentPage: result.currentPage,
         totalPages: result.totalPages,
         totalUsers: result.totalUsers,
         usersPerPage: limit,
+        nextPageToken: result.nextPageToken,
         hasNextPage: result.hasNextPage,
         hasPreviousPage: result.hasPreviousPage
       }
-    }, `Retrieved ${users.length} users (page ${page} of ${result.totalPages})`);
+    }, `Retrieved ${users.length} of ${result.totalUsers} users`);
 
   } catch (error) {
+    if (error.status === 400) {
+      return sendValidationError(res, error.message, [
+        { field: 'pageToken', message: 'Page token is malformed or expired' }
+      ]);
+    }
     return handleDatabaseError(res, error, "Fetching users list");
   }
 }));
 
+// Profile and ID token cache hit/miss counters (admin only) - MUST come before /:userId route
+router.get("/cache/stats", authenticateUser, requireAdmin, asyncHandler(async (req, res) => {
+  const stats = {
+    profiles: getUserProfileCacheStats(),
+    idTokens: getIdTokenCacheStats(),
+    catalog: getCatalogCacheStats()
+  };
+
+  // In mock mode, also report how often tokens were actually verified
+  if (databaseService.isMockMode()) {
+    stats.mockAuth = databaseService.getAdmin().auth().getStats();
+  }
+
+  return sendSuccess(res, stats, "User cache statistics");
+}));
+
 // Get user details with userId
 router.get("/:userId", asyncHandler(async (req, res) => {
   const { userId } = req.params;
@@ -107,6 +146,15 @@ router.get("/:userId", asyncHandler(async (req, res) => {
       { field: 'userId', message: 'User ID contains invalid characters' }
     ]);
   }
+
+  let fields;
+  try {
+    fields = parseFieldsParam(req.query);
+  } catch (error) {
+    return sendValidationError(res, error.message, [
+      { field: 'fields', message: 'Fields must be a comma separated list of field names' }
+    ]);
+  }
 /*
   // Try to fetch user
   const user = await userService.getUserById(userId);
@@ -132,7 +180,7 @@ router.get("/:userId", asyncHandler(async (req, res) => {
       return sendNotFoundError(res, "User");
     }
 
-    const userData = { id: userId, ...userSnap.data() };
+    const userData = { id: userId, ...pickFields(userSnap.data(), fields) };
     return sendSuccess(res, userData, "User details retrieved successfully");
 
   } catch (error) {
@@ -218,6 +266,7 @@ router.post("/register", authenticateUser, asyncHandler(async (req, res) => {
     };
 
     await userRef.set(newUser);
+    invalidateUserProfile(userId);
 
     return sendSuccess(res, {
       id: userId,
@@ -298,6 +347,7 @@ router.put("/update", authenticateUser, asyncHandler(async (req, res) => {
     updateData.updatedAt = admin.firestore?.FieldValue?.serverTimestamp?.() || new Date();
 
     await userRef.update(updateData);
+    invalidateUserProfile(userId);
 
     return sendSuccess(res, {
       id: userId,
@@ -378,6 +428,7 @@ router.put("/updateRole", authenticateUser, requireAdmin, asyncHandler(async (re
       roleUpdatedAt: admin.firestore?.FieldValue?.serverTimestamp?.() || new Date(),
       roleUpdatedBy: req.user.uid
     });
+    invalidateUserProfile(userId);
 
     return sendSuccess(res, {
       userId,
@@ -0,0 +1,282 @@
+/**
+ * Catalog Cache - in-process read-through cache of the public catalog
+ * GET /api/modules, /api/lessons and /api/units return whole collections that
+ * change rarely, so each is kept in memory together with its serialized JSON.
+ *
+ * Freshness:
+ * - Write handlers call invalidateCatalog() after committing, so an instance
+ *   always sees its own writes.
+ * - A Firestore onSnapshot listener on each catalog query keeps the cache in
+ *   sync with writes made by other instances (CATALOG_CACHE_LISTEN=false
+ *   turns it off; it is never used with the mock database).
+ * - Without a healthy listener, entries expire after CATALOG_CACHE_TTL_MS
+ *   (default 5 minutes).
+ *
+ * Each entry's ETag is a hash of its JSON, so every instance serving the same
+ * catalog answers If-None-Match the same way; compressed copies send it with
+ * the coding appended ("<hash>-br", "<hash>-gz"). Brotli and gzip copies of the
+ * JSON are made on first request and kept with the entry, as are projected
+ * views for ?fields= (up to CATALOG_CACHE_MAX_VIEWS field lists per catalog).
+ */
+
+const { databaseService } = require("./databaseService");
+const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+const { createEtag, encodeEtag, sendNotModified } = require("../utils/httpCache");
+const { pickFields } = require("../utils/projection");
+const { noteDocumentsReturned } = require("../utils/firestoreTrace");
+const {
+  COMPRESSION_THRESHOLD,
+  negotiateEncoding,
+  compressSync,
+  varyOnAcceptEncoding,
+} = require("../utils/compression");
+
+const SCHEMA_QUALIFIER = resolveSchemaQualifier();
+const TABLE_MODULE = SCHEMA_QUALIFIER + "module";
+const TABLE_LESSON = SCHEMA_QUALIFIER + "lesson";
+const TABLE_CONTENT = SCHEMA_QUALIFIER + "content";
+
+const CATALOG_TTL_MS = parseInt(process.env.CATALOG_CACHE_TTL_MS) || 5 * 60 * 1000;
+const LISTEN_ENABLED = process.env.CATALOG_CACHE_LISTEN !== "false";
+const MAX_VIEWS = parseInt(process.env.CATALOG_CACHE_MAX_VIEWS) || 20;
+
+// Query behind each catalog; these must match what the list endpoints return
+const CATALOG_QUERIES = {
+  modules: (db) => db.collection(TABLE_MODULE),
+  lessons: (db) => db.collection(TABLE_LESSON).where("isPublic", "==", true),
+  units: (db) => db.collection(TABLE_CONTENT).where("isPublic", "==", true),
+};
+
+class CatalogCache {
+  constructor(queries, options = {}) {
+    this.ttlMs = options.ttlMs || CATALOG_TTL_MS;
+    this.listen = options.listen !== undefined ? options.listen : LISTEN_ENABLED;
+
+    this.catalogs = new Map();
+    for (const [name, query] of Object.entries(queries)) {
+      this.catalogs.set(name, {
+        query,
+        entry: null,
+        // Bumped on invalidation so a load that started earlier is not stored
+        generation: 0,
+        pendingLoad: null,
+        unsubscribe: null,
+        hits: 0,
+        misses: 0,
+        loads: 0,
+        snapshots: 0,
+        invalidations: 0,
+      });
+    }
+  }
+
+  getCatalog(name) {
+    const catalog = this.catalogs.get(name);
+    if (!catalog) {
+      throw new Error(`Unknown catalog: ${name}`);
+    }
+    return catalog;
+  }
+
+  /**
+   * Get a catalog, loading it from Firestore on a miss
+   * @param {string} name - "modules", "lessons" or "units"
+   * @param {Array<string>|null} fields - Fields to keep in each item (id is always kept)
+   * @returns {Promise<Object>} { items, body, etag, hit, encode } where body is the
+   *   items as JSON and encode(encoding) returns it compressed
+   */
+  async get(name, fields = null) {
+    const catalog = this.getCatalog(name);
+    const entry = catalog.entry;
+
+    if (entry && (catalog.unsubscribe || entry.expiresAt > Date.now())) {
+      catalog.hits++;
+      return { ...this.view(entry, fields), hit: true };
+    }
+
+    catalog.misses++;
+    // Concurrent misses share one load, unless it started before an invalidation
+    if (!catalog.pendingLoad || catalog.pendingLoad.generation !== catalog.generation) {
+      const pendingLoad = this.load(catalog).finally(() => {
+        if (catalog.pendingLoad === pendingLoad) {
+          catalog.pendingLoad = null;
+        }
+      });
+      pendingLoad.generation = catalog.generation;
+      catalog.pendingLoad = pendingLoad;
+    }
+    const loaded = await catalog.pendingLoad;
+    return { ...this.view(loaded, fields), hit: false };
+  }
+
+  /**
+   * The entry as a whole, or projected to `fields`; projections are built
+   * once per field list and kept until the entry is replaced
+   */
+  view(entry, fields) {
+    const key = fields ? fields.join(",") : "";
+    let view = entry.views.get(key);
+    if (!view) {
+      view = this.createView(entry.items.map((item) => pickFields(item, ["id", ...fields])));
+      if (entry.views.size > MAX_VIEWS) {
+        // The first key after the whole-catalog view is the oldest projection
+        entry.views.delete([...entry.views.keys()][1]);
+      }
+      entry.views.set(key, view);
+    }
+
+    return {
+      items: view.items,
+      body: view.body,
+      etag: view.etag,
+      encode: (encoding) => {
+        if (!view.encoded.has(encoding)) {
+          view.encoded.set(encoding, compressSync(view.body, encoding));
+        }
+        return view.encoded.get(encoding);
+      },
+    };
+  }
+
+  createView(items) {
+    const body = JSON.stringify(items);
+    return { items, body, etag: createEtag(body), encoded: new Map() };
+  }
+
+  async load(catalog) {
+    await databaseService.initialize();
+    const db = databaseService.getDb();
+    const generation = catalog.generation;
+
+    const snapshot = await catalog.query(db).get();
+    catalog.loads++;
+    const entry = this.createEntry(snapshot.docs);
+    if (generation === catalog.generation) {
+      catalog.entry = entry;
+    }
+
+    if (this.listen && !catalog.unsubscribe && !databaseService.isMockMode()) {
+      this.startListener(catalog, db);
+    }
+    return entry;
+  }
+
+  createEntry(docs) {
+    const items = docs.map((doc) => ({ id: doc.id, ...doc.data() }));
+    return {
+      items,
+      views: new Map([["", this.createView(items)]]),
+      loadedAt: Date.now(),
+      expiresAt: Date.now() + this.ttlMs,
+    };
+  }
+
+  /**
+   * Replace the entry on every snapshot. If the listener fails, fall back to
+   * TTL expiry; the next load will try to listen again
+   */
+  startListener(catalog, db) {
+    const query = catalog.query(db);
+    if (typeof query.onSnapshot !== "function") {
+      return;
+    }
+
+    catalog.unsubscribe = query.onSnapshot(
+      (snapshot) => {
+        catalog.snapshots++;
+        catalog.entry = this.createEntry(snapshot.docs);
+      },
+      (error) => {
+        console.warn("Catalog cache listener failed, falling back to TTL:", error.message);
+        catalog.unsubscribe = null;
+      }
+    );
+  }
+
+  /**
+   * Drop a cached catalog after a write. The listener, if any, stays attached
+   * @param {string} name - "modules", "lessons" or "units"
+   */
+  invalidate(name) {
+    const catalog = this.getCatalog(name);
+    catalog.generation++;
+    catalog.invalidations++;
+    catalog.entry = null;
+  }
+
+  /**
+   * Detach listeners and drop every entry (for shutdown and tests)
+   */
+  close() {
+    for (const catalog of this.catalogs.values()) {
+      if (catalog.unsubscribe) {
+        catalog.unsubscribe();
+        catalog.unsubscribe = null;
+      }
+      catalog.generation++;
+      catalog.entry = null;
+    }
+  }
+
+  getStats() {
+    const stats = {};
+    for (const [name, catalog] of this.catalogs) {
+      const lookups = catalog.hits + catalog.misses;
+      stats[name] = {
+        items: catalog.entry ? catalog.entry.items.length : 0,
+        ageMs: catalog.entry ? Date.now() - catalog.entry.loadedAt : null,
+        listening: Boolean(catalog.unsubscribe),
+        hits: catalog.hits,
+        misses: catalog.misses,
+        hitRate: lookups === 0 ? 0 : catalog.hits / lookups,
+        loads: catalog.loads,
+        snapshots: catalog.snapshots,
+        invalidations: catalog.invalidations,
+      };
+    }
+    return stats;
+  }
+}
+
+const catalogCache = new CatalogCache(CATALOG_QUERIES);
+
+/**
+ * Send a cached catalog as JSON with an X-Cache: HIT or MISS header,
+ * or a 304 if the client's If-None-Match is current. The body is sent
+ * precompressed when the client accepts brotli or gzip
+ * @param {Array<string>|null} fields - Fields to keep in each item
+ */
+async function sendCatalog(req, res, name, fields = null) {
+  const { items, body, etag, hit, encode } = await catalogCache.get(name, fields);
+  res.setHeader("X-Cache", hit ? "HIT" : "MISS");
+  noteDocumentsReturned(items.length);
+  varyOnAcceptEncoding(res);
+  const encoding = body.length >= COMPRESSION_THRESHOLD ? negotiateEncoding(req.headers["accept-encoding"]) : null;
+  if (sendNotModified(req, res, encoding ? encodeEtag(etag, encoding) : etag)) {
+    return;
+  }
+
+  res.status(200).type("json");
+  if (encoding) {
+    res.setHeader("Content-Encoding", encoding);
+    res.send(encode(encoding));
+    return;
+  }
+  res.send(body);
+}
+
+function invalidateCatalog(name) {
+  catalogCache.invalidate(name);
+}
+
+function getCatalogCacheStats() {
+  return catalogCache.getStats();
+}
+
+module.exports = {
+  CatalogCache,
+  catalogCache,
+  sendCatalog,
+  invalidateCatalog,
+  getCatalogCacheStats,
+};
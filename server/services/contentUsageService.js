@@ -0,0 +1,124 @@
+/**
+ * Content Usage Service - reverse index from content units to lessons
+ * Each `contentUsage/{contentId}` document holds a `lessons` map of
+ * lessonId -> lesson title for every lesson whose sections reference the unit.
+ * Lesson writes keep it current inside their transaction, so checking whether a
+ * unit is in use is a single document read.
+ * Lesson drafts are saved by the portal straight to Firestore and never reach
+ * the index; getDraftTitlesUsingContent checks them directly
+ */
+
+const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+
+const SCHEMA_QUALIFIER = resolveSchemaQualifier();
+const TABLE_CONTENT_USAGE = SCHEMA_QUALIFIER + "contentUsage";
+const TABLE_LESSON = SCHEMA_QUALIFIER + "lesson";
+
+/**
+ * Collect the distinct content IDs referenced by a lesson's sections
+ * @param {Array} sections - Lesson sections, each with an optional contentIds array
+ * @returns {Array<string>} Distinct content IDs in first-seen order
+ */
+function collectContentIds(sections) {
+  const contentIds = new Set();
+  (Array.isArray(sections) ? sections : []).forEach((section) => {
+    (section && Array.isArray(section.contentIds) ? section.contentIds : []).forEach((contentId) => {
+      if (contentId) {
+        contentIds.add(contentId);
+      }
+    });
+  });
+  return [...contentIds];
+}
+
+/**
+ * Read the usage documents for the given content IDs within a transaction
+ * Must be called before any transaction writes (Firestore requires reads first)
+ * @param {Object} transaction - Firestore Transaction
+ * @param {Object} db - Firestore instance
+ * @param {Array<string>} contentIds - Content IDs to read
+ * @returns {Promise<Map>} contentId -> { ref, lessons }
+ */
+async function readContentUsage(transaction, db, contentIds) {
+  const usage = new Map();
+  if (contentIds.length === 0) {
+    return usage;
+  }
+
+  const refs = contentIds.map((contentId) => db.collection(TABLE_CONTENT_USAGE).doc(contentId));
+  const snapshots = await transaction.getAll(...refs);
+  snapshots.forEach((snap, index) => {
+    usage.set(contentIds[index], {
+      ref: refs[index],
+      lessons: snap.exists ? { ...(snap.data().lessons || {}) } : {},
+    });
+  });
+  return usage;
+}
+
+/**
+ * Record which of the read usage documents reference the lesson
+ * Units in `contentIds` get the lesson added (or its title refreshed); every
+ * other unit in `usage` has the lesson removed, and empty entries are deleted
+ * @param {Object} transaction - Firestore Transaction
+ * @param {Map} usage - Result of readContentUsage
+ * @param {string} lessonId - Lesson document ID
+ * @param {string} title - Current lesson title
+ * @param {Array<string>} contentIds - Content IDs the lesson now references
+ */
+function writeLessonUsage(transaction, usage, lessonId, title, contentIds) {
+  const referenced = new Set(contentIds);
+
+  usage.forEach(({ ref, lessons }, contentId) => {
+    if (referenced.has(contentId)) {
+      lessons[lessonId] = title || "";
+    } else {
+      delete lessons[lessonId];
+    }
+
+    if (Object.keys(lessons).length === 0) {
+      transaction.delete(ref);
+    } else {
+      transaction.set(ref, { lessons, updatedAt: new Date().toISOString() });
+    }
+  });
+}
+
+/**
+ * Get the titles of lessons that reference a content unit
+ * @param {Object} reader - Firestore Transaction or anything with get(ref)
+ * @param {Object} db - Firestore instance
+ * @param {string} contentId - Content document ID
+ * @returns {Promise<Array<string>>} Titles of referencing lessons
+ */
+async function getLessonTitlesUsingContent(reader, db, contentId) {
+  const snap = await reader.get(db.collection(TABLE_CONTENT_USAGE).doc(contentId));
+  return snap.exists ? Object.values(snap.data().lessons || {}) : [];
+}
+
+/**
+ * Get the titles of lesson drafts that reference a content unit
+ * Drafts have sections[].contentIds only, which no query can match, so every
+ * draft's sections are read and checked here
+ * @param {Object} reader - Firestore Transaction or anything with get(query)
+ * @param {Object} db - Firestore instance
+ * @param {string} contentId - Content document ID
+ * @returns {Promise<Array<string>>} Titles of referencing drafts
+ */
+async function getDraftTitlesUsingContent(reader, db, contentId) {
+  const drafts = await reader.get(
+    db.collection(TABLE_LESSON).where("isDraft", "==", true).select("title", "sections")
+  );
+  return drafts.docs
+    .filter((doc) => collectContentIds(doc.get("sections")).includes(contentId))
+    .map((doc) => `${doc.get("title") || "Untitled"} (draft)`);
+}
+
+module.exports = {
+  TABLE_CONTENT_USAGE,
+  collectContentIds,
+  readContentUsage,
+  writeLessonUsage,
+  getLessonTitlesUsingContent,
+  getDraftTitlesUsingContent,
+};
@@ -4,6 +4,17 @@
  */
 
 const { handleFirebaseError } = require('../middleware/errorHandler');
+const { instrumentFirestore } = require('../utils/firestoreMetrics');
+const { LruCache } = require('../utils/lruCache');
+const { metrics } = require('../utils/metrics');
+const { DOCUMENT_ID_FIELD, decodePageToken, fetchPage } = require('../utils/pagination');
+const { selectFields } = require('../utils/projection');
+
+const operationDuration = metrics.histogram(
+  'database_service_operation_duration_seconds',
+  'DatabaseService operation latency by operation and outcome',
+  ['operation', 'outcome']
+);
 
 /**
  * Database Service Class
@@ -14,7 +25,18 @@ class DatabaseService {
     this.admin = null;
     this.db = null;
     this.isInitialized = false;
+    this.initializing = null;
     this.isMocked = false;
+    // uid -> 'teachers' | 'students' | 'users'
+    this.userLocations = new LruCache({
+      maxEntries: parseInt(process.env.USER_LOCATION_CACHE_MAX_ENTRIES) || 10000,
+      ttlMs: parseInt(process.env.USER_LOCATION_CACHE_TTL_MS) || 10 * 60 * 1000
+    });
+    // `${table}:${role}` -> Promise<number>
+    this.userCounts = new LruCache({
+      maxEntries: 50,
+      ttlMs: parseInt(process.env.USER_COUNT_CACHE_TTL_MS) || 5 * 60 * 1000
+    });
   }
 
   /**
@@ -24,7 +46,16 @@ class DatabaseService {
     if (this.isInitialized) {
       return;
     }
+    // Concurrent callers share one initialization (loading a mock dataset can take seconds)
+    if (!this.initializing) {
+      this.initializing = this.connect().finally(() => {
+        this.initializing = null;
+      });
+    }
+    await this.initializing;
+  }
 
+  async connect() {
     const env = process.env.NODE_ENV || 'development';
     const enableMockMode = process.env.ENABLE_MOCK_FIREBASE === 'true' ||
                           env === 'test' ||
@@ -38,6 +69,8 @@ class DatabaseService {
       await this.initializeRealFirebase();
     }
 
+    // Per-collection read/write counts and latency for /metrics
+    this.db = instrumentFirestore(this.db);
     this.isInitialized = true;
   }
 
@@ -95,12 +128,19 @@ class DatabaseService {
    * Initialize mock Firebase for development/testing
    */
   async initializeMockFirebase() {
-    const { createMockFirebaseAdmin } = require('../utils/firebaseMock');
+    const { createMockFirebaseAdmin, loadMockDataset } = require('../utils/firebaseMock');
 
     this.admin = createMockFirebaseAdmin();
     this.db = this.admin.firestore();
     this.isMocked = true;
 
+    // Scale testing: serve a generated dataset (python -m tests.datasets)
+    if (process.env.MOCK_FIRESTORE_DATASET) {
+      const started = Date.now();
+      const counts = await loadMockDataset(process.env.MOCK_FIRESTORE_DATASET);
+      console.log(`📦 Loaded mock dataset in ${Date.now() - started}ms:`, counts);
+    }
+
     console.log('✅ Mock Firebase initialized successfully');
   }
 
@@ -124,16 +164,15 @@ class DatabaseService {
 
     // For mock mode, return mock admin with proper FieldValue
     if (this.isMocked) {
+      const mockAdmin = this.admin;
       return {
-        ...this.admin,
+        ...mockAdmin,
+        // Spreading drops prototype methods, so keep auth() reachable
+        auth: () => mockAdmin.auth(),
         firestore: {
-          FieldValue: {
-            serverTimestamp: () => new Date(),
-            delete: () => null,
-            increment: (n) => n,
-            arrayUnion: (...elements) => elements,
-            arrayRemove: (...elements) => elements
-          }
+          FieldValue: mockAdmin.firestore.FieldValue,
+          FieldPath: mockAdmin.firestore.FieldPath,
+          Timestamp: mockAdmin.firestore.Timestamp
         }
       };
     }
@@ -153,17 +192,26 @@ class DatabaseService {
    * Wraps database operations with proper error handling
    */
   async safeOperation(operation, operationName = 'Database operation') {
+    const started = process.hrtime.bigint();
+    let outcome = 'error';
     try {
-      return await operation();
+      const result = await operation();
+      outcome = 'success';
+      return result;
     } catch (error) {
       const standardError = handleFirebaseError(error, operationName);
       throw standardError;
+    } finally {
+      operationDuration.observe({ operation: operationName, outcome }, Number(process.hrtime.bigint() - started) / 1e9);
     }
   }
 
   /**
    * Get user document with fallback collections
-   * Implements the hierarchical lookup pattern: teachers -> students -> users
+   * Implements the hierarchical lookup pattern: teachers -> students -> users.
+   * All three refs are fetched in one getAll round trip and picked by precedence;
+   * the collection a uid was found in is remembered so later lookups are a
+   * single read (falling back to the full lookup if the document has moved)
    */
   async getUserDocument(userId, tableUsers) {
     if (!this.isInitialized) {
@@ -172,34 +220,49 @@ class DatabaseService {
 
     return await this.safeOperation(async () => {
       const db = this.getDb();
+      const collectionNames = { teachers: "teachers", students: "students", users: tableUsers };
 
-      // Check teachers collection first
-      let userRef = db.collection("teachers").doc(userId);
-      let userSnap = await userRef.get();
+      const knownCollection = this.userLocations.get(userId);
+      if (knownCollection) {
+        const userRef = db.collection(collectionNames[knownCollection]).doc(userId);
+        const userSnap = await userRef.get();
 
-      if (userSnap.exists) {
-        return { ref: userRef, snap: userSnap, collection: 'teachers' };
+        if (userSnap.exists) {
+          return { ref: userRef, snap: userSnap, collection: knownCollection };
+        }
+        this.forgetUserLocation(userId);
       }
 
-      // Check students collection
-      userRef = db.collection("students").doc(userId);
-      userSnap = await userRef.get();
+      const collections = Object.keys(collectionNames);
+      const refs = collections.map((collection) => db.collection(collectionNames[collection]).doc(userId));
+      const snaps = await db.getAll(...refs);
 
-      if (userSnap.exists) {
-        return { ref: userRef, snap: userSnap, collection: 'students' };
+      const index = snaps.findIndex((snap) => snap.exists);
+      if (index === -1) {
+        // Not found: hand back the unified users ref, as callers may create it
+        return { ref: refs[2], snap: snaps[2], collection: 'users' };
       }
 
-      // Check unified users collection
-      userRef = db.collection(tableUsers).doc(userId);
-      userSnap = await userRef.get();
-
-      return { ref: userRef, snap: userSnap, collection: 'users' };
+      this.userLocations.set(userId, collections[index]);
+      return { ref: refs[index], snap: snaps[index], collection: collections[index] };
 
     }, 'Getting user document');
   }
 
   /**
-   * Get all users with pagination
+   * Forget where a user document lives, e.g. after it was created or moved
+   */
+  forgetUserLocation(userId) {
+    this.userLocations.delete(userId);
+  }
+
+  /**
+   * Get all users with keyset (cursor) pagination
+   * Pages are ordered by (orderBy, document ID) and continued with an opaque
+   * pageToken, so each page reads only `limit + 1` documents. The total count
+   * comes from getUserCount, which is cached rather than run per page.
+   * `fields` limits the fields read with select(). Filtering by role uses the
+   * (role, createdAt desc) composite index in portal-app/firestore.indexes.json
    */
   async getAllUsers(tableUsers, options = {}) {
     if (!this.isInitialized) {
@@ -207,50 +270,77 @@ class DatabaseService {
     }
 
     const {
-      page = 1,
       limit = 20,
+      pageToken = null,
       role = null,
       orderBy = 'createdAt',
-      orderDirection = 'desc'
+      orderDirection = 'desc',
+      fields = null
     } = options;
 
+    // Decode before touching the database so a bad token is a 400, not a 500
+    const cursor = pageToken ? decodePageToken(pageToken) : null;
+
     return await this.safeOperation(async () => {
       const db = this.getDb();
-      const offset = (page - 1) * limit;
-
-      // Get total count
-      let countQuery = db.collection(tableUsers);
-      if (role) {
-        countQuery = countQuery.where('role', '==', role);
-      }
-
-      const totalSnapshot = await countQuery.count().get();
-      const totalUsers = totalSnapshot.data().count;
-
-      // Get paginated users
-      let query = db.collection(tableUsers)
-        .orderBy(orderBy, orderDirection)
-        .offset(offset)
-        .limit(limit);
 
+      let query = db.collection(tableUsers);
       if (role) {
         query = query.where('role', '==', role);
       }
 
-      const usersSnapshot = await query.get();
+      const [totalUsers, page] = await Promise.all([
+        this.getUserCount(tableUsers, role),
+        // The orderBy field is always read: the next page token is built from it
+        fetchPage(selectFields(query, fields, [orderBy]), { limit, cursor }, [orderBy, DOCUMENT_ID_FIELD], {
+          direction: orderDirection,
+          Timestamp: this.admin.firestore.Timestamp
+        })
+      ]);
 
       return {
-        users: usersSnapshot.docs,
+        users: page.docs,
         totalUsers,
-        currentPage: page,
         totalPages: Math.ceil(totalUsers / limit),
-        hasNextPage: page < Math.ceil(totalUsers / limit),
-        hasPreviousPage: page > 1
+        nextPageToken: page.nextPageToken,
+        hasNextPage: Boolean(page.nextPageToken),
+        hasPreviousPage: Boolean(cursor)
       };
 
     }, 'Getting all users');
   }
 
+  /**
+   * Count users (optionally by role), cached for USER_COUNT_CACHE_TTL_MS
+   * (default 5 minutes) and dropped by invalidateUserCounts on user writes.
+   * Concurrent callers share one in-flight count aggregation
+   */
+  async getUserCount(tableUsers, role = null) {
+    const key = `${tableUsers}:${role || '*'}`;
+
+    let pending = this.userCounts.get(key);
+    if (!pending) {
+      let query = this.getDb().collection(tableUsers);
+      if (role) {
+        query = query.where('role', '==', role);
+      }
+
+      pending = query.count().get().then((snapshot) => snapshot.data().count);
+      this.userCounts.set(key, pending);
+      // Do not keep a failed count around
+      pending.catch(() => this.userCounts.delete(key));
+    }
+
+    return pending;
+  }
+
+  /**
+   * Drop cached user counts after a user is created, deleted or changes role
+   */
+  invalidateUserCounts() {
+    this.userCounts.clear();
+  }
+
   /**
    * Create or update user document
    */
@@ -272,6 +362,7 @@ class DatabaseService {
       };
 
       await userRef.set(dataWithTimestamp);
+      this.invalidateUserCounts();
       return userRef;
 
     }, 'Setting user document');
@@ -297,11 +388,24 @@ class DatabaseService {
       };
 
       await userRef.update(dataWithTimestamp);
+      if (updateData.role !== undefined) {
+        this.invalidateUserCounts();
+      }
       return userRef;
 
     }, 'Updating user document');
   }
 
+  /**
+   * Hit/miss counters of the user location and user count caches
+   */
+  getCacheStats() {
+    return {
+      userLocations: this.userLocations.getStats(),
+      userCounts: this.userCounts.getStats()
+    };
+  }
+
   /**
    * Get environment info
    */
@@ -0,0 +1,86 @@
+/**
+ * Hydration Service - resolve the documents a lesson or module references
+ * Expanded reads return a lesson with its content units, or a module with its
+ * lessons, using one batched getAll per level instead of a request per
+ * reference. A field mask limits each referenced document to the fields the
+ * client needs
+ */
+
+const { collectContentIds } = require("./contentUsageService");
+
+// Fields returned for each expanded content unit unless ?contentFields= is given
+const DEFAULT_CONTENT_FIELDS = [
+  "UnitID", "Title", "title", "Category", "Type", "Level", "Duration", "Abstract", "fileUrl", "isPublic", "Author",
+];
+
+// Fields returned for each expanded lesson unless ?lessonFields= is given
+const DEFAULT_LESSON_FIELDS = [
+  "title", "description", "category", "type", "level", "duration", "isPublic", "authorId", "image",
+];
+
+/**
+ * Parse ?expand=a,b into a Set of names
+ */
+function parseExpand(query = {}) {
+  return new Set(
+    String(query.expand || "")
+      .split(",")
+      .map((name) => name.trim())
+      .filter(Boolean)
+  );
+}
+
+/**
+ * Read documents by ID with a single getAll and an optional field mask
+ * @param {Object} db - Firestore instance
+ * @param {string} collection - Collection name
+ * @param {Array<string>} ids - Document IDs (duplicates are read once)
+ * @param {Array<string>|null} fields - Fields to read, or null for whole documents
+ * @returns {Promise<Object>} { byId: Map id -> { id, ...data }, missing: Array<string> }
+ */
+async function getDocumentsById(db, collection, ids, fields = null) {
+  const uniqueIds = [...new Set(ids)];
+  const byId = new Map();
+  if (uniqueIds.length === 0) {
+    return { byId, missing: [] };
+  }
+
+  const refs = uniqueIds.map((id) => db.collection(collection).doc(id));
+  const snapshots = fields ? await db.getAll(...refs, { fieldMask: fields }) : await db.getAll(...refs);
+
+  const missing = [];
+  snapshots.forEach((snap, index) => {
+    if (snap.exists) {
+      byId.set(snap.id, { id: snap.id, ...snap.data() });
+    } else {
+      missing.push(uniqueIds[index]);
+    }
+  });
+  return { byId, missing };
+}
+
+/**
+ * Resolve the content units referenced by one or more lessons' sections
+ * @param {Object} db - Firestore instance
+ * @param {string} contentCollection - Content collection name
+ * @param {Array<Object>} lessons - Lesson data objects (with sections)
+ * @param {Array<string>} fields - Content fields to return
+ * @returns {Promise<Object>} { contentById: { id: {...} }, missingContentIds }
+ */
+async function expandLessonContent(db, contentCollection, lessons, fields) {
+  const contentIds = lessons.flatMap((lesson) => collectContentIds(lesson.sections));
+  const { byId, missing } = await getDocumentsById(db, contentCollection, contentIds, fields);
+
+  return {
+    contentById: Object.fromEntries(byId),
+    missingContentIds: missing,
+  };
+}
+
+module.exports = {
+  DEFAULT_CONTENT_FIELDS,
+  DEFAULT_LESSON_FIELDS,
+  parseExpand,
+  getDocumentsById,
+  expandLessonContent,
+};
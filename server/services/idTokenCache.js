@@ -0,0 +1,70 @@
+/**
+ * ID Token Cache - per-process cache of verified Firebase ID tokens
+ * Browsers resend the same token for up to an hour, so verified claims are kept
+ * keyed by a SHA-256 of the token. Entries never outlive the token's `exp` claim.
+ * With AUTH_CHECK_REVOKED=true, tokens are verified with the revocation check and
+ * re-verified at least every AUTH_REVOCATION_CHECK_INTERVAL_MS (default 5 minutes)
+ */
+
+const crypto = require("crypto");
+const { LruCache } = require("../utils/lruCache");
+
+const tokenCache = new LruCache({
+  maxEntries: parseInt(process.env.AUTH_TOKEN_CACHE_MAX_ENTRIES) || 5000
+});
+
+const checkRevoked = process.env.AUTH_CHECK_REVOKED === 'true';
+const revocationCheckIntervalMs = parseInt(process.env.AUTH_REVOCATION_CHECK_INTERVAL_MS) || 5 * 60 * 1000;
+
+function hashToken(token) {
+  return crypto.createHash("sha256").update(token).digest("hex");
+}
+
+/**
+ * Verify an ID token, reusing a previous verification while the token is valid
+ * Failed verifications are never cached
+ * @param {Object} auth - Firebase Auth instance (admin.auth())
+ * @param {string} token - Raw ID token from the Authorization header
+ * @returns {Promise<Object>} Decoded token claims
+ */
+async function verifyIdTokenCached(auth, token) {
+  const key = hashToken(token);
+
+  const cached = tokenCache.get(key);
+  if (cached) {
+    return { ...cached };
+  }
+
+  const decodedToken = await auth.verifyIdToken(token, checkRevoked);
+
+  // Expire with the token itself; tokens without an exp claim are not cached
+  let ttlMs = decodedToken.exp ? decodedToken.exp * 1000 - Date.now() : 0;
+  if (checkRevoked) {
+    ttlMs = Math.min(ttlMs, revocationCheckIntervalMs);
+  }
+  if (ttlMs > 0) {
+    tokenCache.set(key, decodedToken, ttlMs);
+  }
+
+  return { ...decodedToken };
+}
+
+/**
+ * Hit/miss counters for the token cache
+ */
+function getIdTokenCacheStats() {
+  return { ...tokenCache.getStats(), checkRevoked };
+}
+
+/**
+ * Drop every cached token, e.g. after revoking a user's refresh tokens
+ */
+function clearIdTokenCache() {
+  tokenCache.clear();
+}
+
+module.exports = {
+  verifyIdTokenCached,
+  getIdTokenCacheStats,
+  clearIdTokenCache
+};
@@ -0,0 +1,679 @@
+/**
+ * Payment Log Writer - asynchronous, batched audit log sink for payment_logs
+ * Routes call log() and respond without waiting for Firestore. Entries are
+ * queued in memory and committed in WriteBatch groups of up to
+ * PAYMENT_LOG_BATCH_SIZE (default 100) as soon as a batch is full, or every
+ * PAYMENT_LOG_FLUSH_INTERVAL_MS (default 1000).
+ *
+ * Durability:
+ * - log() appends each entry to an append-only NDJSON journal before queuing
+ *   it, and a marker line records each batch that commits, so the journal
+ *   holds every entry not yet in Firestore. Appends go through a write stream
+ *   and never block the event loop; journal files are split into segments of
+ *   PAYMENT_LOG_JOURNAL_SEGMENT_BYTES (default 1MB), and a segment is deleted
+ *   once everything in it has committed, so trimming never rewrites a file.
+ * - The journal is per process ("payment-log-journal.<pid>.ndjson.<n>" in
+ *   os.tmpdir()); a new process replays its own leftovers and claims those of
+ *   processes that are no longer running (see utils/instanceFiles.js).
+ *   PAYMENT_LOG_SPILL_FILE sets the journal path instead; only one process
+ *   may use it, and it is replayed by the next process given the same path.
+ * - Document IDs are assigned when an entry is queued, so a batch that is
+ *   retried (or replayed from the journal) overwrites rather than duplicates.
+ *   The same holds for committed entries replayed because their marker had
+ *   not reached disk.
+ * - When more than PAYMENT_LOG_MAX_QUEUE entries are waiting (Firestore slow
+ *   or failing), the overflow is kept only in the journal and read back once
+ *   flushes succeed again.
+ * - close() flushes what it can within a deadline; the rest stays journaled.
+ *
+ * Loss window: journal writes are buffered for a few milliseconds before they
+ * reach the file and are not fsynced, so the journal survives the process
+ * crashing, running out of memory or being killed, except for entries logged
+ * in the last moments before it, and not the machine going down. It only
+ * helps if its disk outlives the process: on App Engine standard, /tmp is
+ * instance memory, so an instance that dies without running close() loses its
+ * uncommitted entries (about one flush interval's worth while Firestore keeps
+ * up). Point PAYMENT_LOG_SPILL_FILE at persistent disk where there is one.
+ *
+ * Timestamps are the time the entry was queued, not the commit time.
+ */
+
+const fs = require("fs");
+const path = require("path");
+const crypto = require("crypto");
+const { databaseService } = require("./databaseService");
+const { requestContext } = require("../utils/requestContext");
+const { instanceFilePath, findOrphanedFiles, claimFile } = require("../utils/instanceFiles");
+
+// Firestore allows at most 500 writes per batch
+const MAX_BATCH_SIZE = 500;
+const DEFAULT_BATCH_SIZE = Math.min(parseInt(process.env.PAYMENT_LOG_BATCH_SIZE) || 100, MAX_BATCH_SIZE);
+const DEFAULT_FLUSH_INTERVAL_MS = parseInt(process.env.PAYMENT_LOG_FLUSH_INTERVAL_MS) || 1000;
+const DEFAULT_MAX_QUEUE = parseInt(process.env.PAYMENT_LOG_MAX_QUEUE) || 5000;
+const JOURNAL_PREFIX = "payment-log-journal";
+const DEFAULT_SEGMENT_BYTES = parseInt(process.env.PAYMENT_LOG_JOURNAL_SEGMENT_BYTES) || 1024 * 1024;
+const DEFAULT_CLOSE_TIMEOUT_MS = 5000;
+
+function generateId() {
+  // Same shape as Firestore auto IDs: 20 alphanumeric characters
+  const chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789";
+  const bytes = crypto.randomBytes(20);
+  let id = "";
+  for (const byte of bytes) {
+    id += chars[byte % chars.length];
+  }
+  return id;
+}
+
+function serializeEntry(entry) {
+  return JSON.stringify({
+    id: entry.id,
+    collection: entry.collection,
+    data: { ...entry.data, timestamp: entry.data.timestamp.toISOString() },
+  });
+}
+
+function parseEntry(line) {
+  const entry = JSON.parse(line);
+  entry.data.timestamp = new Date(entry.data.timestamp);
+  return entry;
+}
+
+/**
+ * Append-only journal of uncommitted entries, kept in numbered segment files
+ * "<basePath>.<n>". Entries are appended through a write stream, and a
+ * { committed: [ids] } marker line follows each committed batch; nothing is
+ * ever rewritten. A segment is closed once it reaches segmentBytes (or holds
+ * nothing uncommitted) and deleted once every entry in it has committed
+ */
+class PaymentLogJournal {
+  /**
+   * @param {string} basePath - Segment files are named "<basePath>.<n>"
+   * @param {Object} options - { segmentBytes, claimOrphans, onError }
+   */
+  constructor(basePath, options = {}) {
+    this.basePath = basePath;
+    this.segmentBytes = options.segmentBytes || DEFAULT_SEGMENT_BYTES;
+    this.claimOrphans = Boolean(options.claimOrphans);
+    this.onError = options.onError || (() => {});
+    // seq -> { path, bytes, pending: Set of entry IDs, stream, loaded }
+    this.segments = new Map();
+    // Uncommitted entry ID -> seq, in the order the entries were logged
+    this.entrySegments = new Map();
+    this.active = null;
+    this.nextSeq = 0;
+    this.opened = false;
+    // Deletions in progress, for close() to wait on
+    this.removals = new Set();
+  }
+
+  segmentPath(seq) {
+    return `${this.basePath}.${seq}`;
+  }
+
+  addSegment(seq, loaded) {
+    const segment = { path: this.segmentPath(seq), bytes: 0, pending: new Set(), stream: null, loaded };
+    this.segments.set(seq, segment);
+    return segment;
+  }
+
+  /**
+   * Find segments left by earlier processes, claiming those of dead processes
+   * when the journal uses the per-process default path. Runs once, before the
+   * first append, so new segments never reuse a number
+   */
+  open() {
+    if (this.opened) return;
+    this.opened = true;
+
+    const directory = path.dirname(this.basePath);
+    const prefix = `${path.basename(this.basePath)}.`;
+    let names = [];
+    try {
+      names = fs.readdirSync(directory);
+    } catch (error) {
+      this.onError(error);
+    }
+    names
+      .filter((name) => name.startsWith(prefix) && /^\d+$/.test(name.slice(prefix.length)))
+      .map((name) => Number(name.slice(prefix.length)))
+      .sort((a, b) => a - b)
+      .forEach((seq) => {
+        this.addSegment(seq, false);
+        this.nextSeq = Math.max(this.nextSeq, seq + 1);
+      });
+
+    if (this.claimOrphans) {
+      findOrphanedFiles(JOURNAL_PREFIX).forEach((orphan) => {
+        const seq = this.nextSeq;
+        if (claimFile(orphan.path, this.segmentPath(seq))) {
+          this.addSegment(seq, false);
+          this.nextSeq++;
+        }
+      });
+    }
+  }
+
+  get pendingCount() {
+    return this.entrySegments.size;
+  }
+
+  /**
+   * Uncommitted entry IDs, oldest first
+   */
+  pendingIds() {
+    return [...this.entrySegments.keys()];
+  }
+
+  activeSegment() {
+    if (this.active === null) {
+      this.active = this.nextSeq++;
+      const segment = this.addSegment(this.active, true);
+      segment.stream = fs.createWriteStream(segment.path, { flags: "a" });
+      segment.stream.on("error", this.onError);
+    }
+    return this.segments.get(this.active);
+  }
+
+  track(entries, seq) {
+    const segment = this.segments.get(seq);
+    entries.forEach((entry) => {
+      segment.pending.add(entry.id);
+      this.entrySegments.set(entry.id, seq);
+    });
+  }
+
+  /**
+   * Append entries; the write completes in the background
+   */
+  append(entries) {
+    this.open();
+    const segment = this.activeSegment();
+    const text = entries.map(serializeEntry).join("\n") + "\n";
+    segment.stream.write(text);
+    segment.bytes += Buffer.byteLength(text);
+    this.track(entries, this.active);
+    if (segment.bytes >= this.segmentBytes) {
+      this.rotate();
+    }
+  }
+
+  /**
+   * Append entries synchronously to a segment of their own; for after close()
+   */
+  appendSync(entries) {
+    this.open();
+    const seq = this.nextSeq++;
+    this.addSegment(seq, true);
+    fs.appendFileSync(this.segmentPath(seq), entries.map(serializeEntry).join("\n") + "\n");
+    this.track(entries, seq);
+  }
+
+  /**
+   * Record that entries are in Firestore, and delete segments with nothing
+   * left uncommitted
+   */
+  commit(entries) {
+    const ids = entries.map((entry) => entry.id).filter((id) => this.entrySegments.has(id));
+    if (ids.length === 0) return;
+
+    if (this.active !== null) {
+      const segment = this.segments.get(this.active);
+      const marker = JSON.stringify({ committed: ids }) + "\n";
+      segment.stream.write(marker);
+      segment.bytes += Buffer.byteLength(marker);
+    }
+
+    const touched = new Set();
+    ids.forEach((id) => {
+      const seq = this.entrySegments.get(id);
+      this.entrySegments.delete(id);
+      const segment = this.segments.get(seq);
+      if (segment) {
+        segment.pending.delete(id);
+        touched.add(seq);
+      }
+    });
+    if (this.active !== null) {
+      touched.add(this.active);
+    }
+    touched.forEach((seq) => {
+      const segment = this.segments.get(seq);
+      if (segment && segment.loaded && segment.pending.size === 0) {
+        this.removeSegment(seq);
+      }
+    });
+  }
+
+  rotate() {
+    const seq = this.active;
+    this.active = null;
+    const segment = this.segments.get(seq);
+    if (segment.pending.size === 0) {
+      this.removeSegment(seq);
+    } else {
+      segment.stream.end();
+      segment.stream = null;
+    }
+  }
+
+  /**
+   * @returns {Promise<void>} Resolves once the file is deleted
+   */
+  removeSegment(seq) {
+    const segment = this.segments.get(seq);
+    this.segments.delete(seq);
+    if (this.active === seq) {
+      this.active = null;
+    }
+    const unlink = () => fs.promises.unlink(segment.path).catch((error) => {
+      if (error.code !== "ENOENT") this.onError(error);
+    });
+    const stream = segment.stream;
+    segment.stream = null;
+    const removal = (stream ? new Promise((resolve) => stream.end(resolve)).then(unlink) : unlink())
+      .finally(() => this.removals.delete(removal));
+    this.removals.add(removal);
+    return removal;
+  }
+
+  async readSegment(segment) {
+    try {
+      return (await fs.promises.readFile(segment.path, "utf8")).split("\n").filter(Boolean);
+    } catch (error) {
+      if (error.code !== "ENOENT") this.onError(error);
+      return [];
+    }
+  }
+
+  /**
+   * Read the segments found by open() and return their uncommitted entries,
+   * oldest first; segments with none left are deleted
+   */
+  async load() {
+    this.open();
+    const unloaded = [...this.segments.entries()].filter(([, segment]) => !segment.loaded);
+    const committed = new Set();
+    const found = [];
+
+    for (const [seq, segment] of unloaded) {
+      (await this.readSegment(segment)).forEach((line) => {
+        try {
+          const record = JSON.parse(line);
+          if (Array.isArray(record.committed)) {
+            record.committed.forEach((id) => committed.add(id));
+          } else {
+            found.push({ seq, line });
+          }
+        } catch (error) {
+          console.error("Skipping unreadable payment log journal line");
+        }
+      });
+      segment.loaded = true;
+    }
+
+    const entries = [];
+    found.forEach(({ seq, line }) => {
+      const entry = parseEntry(line);
+      if (committed.has(entry.id) || this.entrySegments.has(entry.id)) return;
+      this.track([entry], seq);
+      entries.push(entry);
+    });
+    unloaded.forEach(([seq, segment]) => {
+      if (segment.pending.size === 0) {
+        this.removeSegment(seq);
+      }
+    });
+    return entries;
+  }
+
+  /**
+   * Read uncommitted entries back from their segments, in the order of `ids`
+   */
+  async readEntries(ids) {
+    const wanted = new Set(ids);
+    const seqs = new Set(ids.map((id) => this.entrySegments.get(id)));
+    const byId = new Map();
+    for (const seq of seqs) {
+      const segment = this.segments.get(seq);
+      if (!segment) continue;
+      (await this.readSegment(segment)).forEach((line) => {
+        if (!line.startsWith('{"id":')) return;
+        try {
+          const entry = parseEntry(line);
+          if (wanted.has(entry.id)) byId.set(entry.id, entry);
+        } catch (error) {
+          console.error("Skipping unreadable payment log journal line");
+        }
+      });
+    }
+    return ids.map((id) => byId.get(id)).filter(Boolean);
+  }
+
+  /**
+   * Finish writing the active segment and deleting committed ones
+   */
+  async close() {
+    if (this.active !== null) {
+      const seq = this.active;
+      const segment = this.segments.get(seq);
+      if (segment.pending.size === 0) {
+        this.removeSegment(seq);
+      } else {
+        this.active = null;
+        await new Promise((resolve) => segment.stream.end(resolve));
+        segment.stream = null;
+      }
+    }
+    await Promise.all(this.removals);
+  }
+}
+
+class PaymentLogWriter {
+  /**
+   * @param {Object} options - { batchSize, flushIntervalMs, maxQueue, spillFile, segmentBytes, getDb }
+   */
+  constructor(options = {}) {
+    this.batchSize = Math.min(options.batchSize || DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE);
+    this.flushIntervalMs = options.flushIntervalMs || DEFAULT_FLUSH_INTERVAL_MS;
+    this.maxQueue = options.maxQueue || DEFAULT_MAX_QUEUE;
+    const spillFile = options.spillFile || process.env.PAYMENT_LOG_SPILL_FILE;
+    this.spillFile = spillFile || instanceFilePath(JOURNAL_PREFIX);
+    this.journal = new PaymentLogJournal(this.spillFile, {
+      segmentBytes: options.segmentBytes,
+      // Only the per-process default path can tell whose files are orphaned
+      claimOrphans: !spillFile,
+      onError: (error) => {
+        console.error("Payment log journal error:", error.message);
+        this.stats.lastError = error.message;
+      },
+    });
+    this.getDb = options.getDb || (async () => {
+      await databaseService.initialize();
+      return databaseService.getDb();
+    });
+
+    this.queue = [];
+    // Batch being committed; replay skips it while it is still in memory
+    this.inFlight = [];
+    this.timer = null;
+    this.pendingFlush = null;
+    this.closed = false;
+    this.checkedJournal = false;
+    // Entries beyond maxQueue that are only in the journal
+    this.overflowed = false;
+
+    this.stats = {
+      queued: 0,
+      written: 0,
+      flushes: 0,
+      failedFlushes: 0,
+      spilled: 0,
+      replayed: 0,
+      lastFlushMs: null,
+      maxFlushMs: 0,
+      totalFlushMs: 0,
+      lastError: null,
+    };
+  }
+
+  /**
+   * Queue an audit entry; never waits for Firestore
+   * @param {string} collection - Payment logs collection name
+   * @param {Object} data - Log fields; `timestamp` defaults to now
+   * @returns {string} ID the document will be written under
+   */
+  log(collection, data) {
+    const entry = {
+      id: generateId(),
+      collection,
+      // Firestore rejects undefined values, and one bad entry would fail its whole batch
+      data: Object.fromEntries(Object.entries(data).filter(([, value]) => value !== undefined)),
+    };
+    entry.data.timestamp = data.timestamp instanceof Date ? data.timestamp : new Date();
+    this.stats.queued++;
+
+    if (this.closed) {
+      // After shutdown there is no flush left to run; the journal has it
+      this.appendToJournal([entry], true);
+      return entry.id;
+    }
+    this.appendToJournal([entry]);
+
+    this.queue.push(entry);
+    this.dropOverflow();
+
+    if (this.queue.length >= this.batchSize) {
+      this.flush();
+    } else {
+      this.startTimer();
+    }
+    return entry.id;
+  }
+
+  startTimer() {
+    if (!this.timer && !this.closed) {
+      // Flushes are background work, not part of the request that queued the first entry
+      this.timer = requestContext.exit(() => setInterval(() => this.flush(), this.flushIntervalMs));
+      // Don't keep the process alive just to flush logs
+      this.timer.unref();
+    }
+  }
+
+  /**
+   * Replay a journal left by an earlier process; call once at startup
+   */
+  start() {
+    this.flush();
+    return this;
+  }
+
+  /**
+   * Commit queued entries in batches until the queue is empty or a commit
+   * fails. Concurrent callers share the flush in progress
+   * @returns {Promise<void>}
+   */
+  flush() {
+    if (!this.pendingFlush) {
+      this.pendingFlush = requestContext.exit(() => this.drain()).finally(() => {
+        this.pendingFlush = null;
+      });
+    }
+    return this.pendingFlush;
+  }
+
+  async drain() {
+    if (!this.checkedJournal) {
+      this.checkedJournal = true;
+      await this.replayJournal();
+    }
+
+    while (this.queue.length > 0) {
+      const batchEntries = this.queue.splice(0, this.batchSize);
+      this.inFlight = batchEntries;
+      const startedAt = Date.now();
+      try {
+        const db = await this.getDb();
+        const batch = db.batch();
+        batchEntries.forEach(({ id, collection, data }) => {
+          batch.set(db.collection(collection).doc(id), data);
+        });
+        await batch.commit();
+      } catch (error) {
+        // Put the batch back in order and retry on the next interval
+        console.error("Payment log flush failed:", error.message);
+        this.stats.failedFlushes++;
+        this.stats.lastError = error.message;
+        this.inFlight = [];
+        if (this.closed) {
+          // Still in the journal for the next process
+          return;
+        }
+        this.queue.unshift(...batchEntries);
+        this.dropOverflow();
+        return;
+      }
+
+      const elapsed = Date.now() - startedAt;
+      this.inFlight = [];
+      this.journal.commit(batchEntries);
+      this.stats.flushes++;
+      this.stats.written += batchEntries.length;
+      this.stats.lastFlushMs = elapsed;
+      this.stats.totalFlushMs += elapsed;
+      this.stats.maxFlushMs = Math.max(this.stats.maxFlushMs, elapsed);
+
+      // Firestore is keeping up again, so bring back the overflow
+      if (this.queue.length === 0 && this.overflowed) {
+        await this.replayOverflow();
+      }
+    }
+
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  }
+
+  /**
+   * Keep at most maxQueue entries in memory; the rest wait in the journal
+   */
+  dropOverflow() {
+    if (this.queue.length > this.maxQueue) {
+      this.stats.spilled += this.queue.splice(this.maxQueue).length;
+      this.overflowed = true;
+    }
+  }
+
+  /**
+   * Append entries to the journal: through its write stream normally, or
+   * synchronously once closed, when nothing is left to finish the stream
+   */
+  appendToJournal(entries, sync = false) {
+    try {
+      if (sync) {
+        this.journal.appendSync(entries);
+      } else {
+        this.journal.append(entries);
+      }
+    } catch (error) {
+      console.error(`Failed to journal ${entries.length} payment log entries:`, error.message);
+      this.stats.lastError = error.message;
+    }
+  }
+
+  // Journaled entries that are in neither the queue nor the batch in flight
+  updateOverflowed() {
+    this.overflowed = this.journal.pendingCount > this.queue.length + this.inFlight.length;
+  }
+
+  queueReplayed(entries) {
+    const room = Math.max(this.maxQueue - this.queue.length, 0);
+    this.queue.push(...entries.slice(0, room));
+    this.stats.replayed += Math.min(entries.length, room);
+    this.updateOverflowed();
+    if (this.queue.length > 0) {
+      this.startTimer();
+    }
+  }
+
+  /**
+   * Queue entries left uncommitted by an earlier process, up to the queue
+   * limit; the rest are overflow
+   */
+  async replayJournal() {
+    try {
+      this.queueReplayed(await this.journal.load());
+    } catch (error) {
+      console.error("Failed to read payment log journal:", error.message);
+      this.stats.lastError = error.message;
+    }
+  }
+
+  /**
+   * Read overflow back from the journal, oldest first, up to the queue limit
+   */
+  async replayOverflow() {
+    const held = new Set([...this.queue, ...this.inFlight].map((entry) => entry.id));
+    const room = Math.max(this.maxQueue - this.queue.length, 0);
+    const ids = this.journal.pendingIds().filter((id) => !held.has(id)).slice(0, room);
+    try {
+      this.queueReplayed(await this.journal.readEntries(ids));
+    } catch (error) {
+      console.error("Failed to read payment log journal:", error.message);
+      this.stats.lastError = error.message;
+    }
+  }
+
+  /**
+   * Entries not yet committed, for reads that should see recent logs
+   * @param {string} collection - Payment logs collection name
+   * @param {Function} predicate - Filter on the entry's data
+   * @returns {Array<Object>} { id, ...data }, oldest first
+   */
+  getQueuedEntries(collection, predicate = () => true) {
+    return this.queue
+      .filter((entry) => entry.collection === collection && predicate(entry.data))
+      .map((entry) => ({ id: entry.id, ...entry.data }));
+  }
+
+  /**
+   * Flush for up to `timeoutMs`; whatever is left, including a batch still
+   * being committed (its fixed IDs make a double write harmless), stays in
+   * the journal. Later log() calls only write to the journal
+   */
+  async close(timeoutMs = DEFAULT_CLOSE_TIMEOUT_MS) {
+    this.closed = true;
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+
+    let timeout;
+    await Promise.race([
+      (async () => {
+        // Keep flushing until empty; a failed flush returns with entries left
+        while (this.queue.length > 0) {
+          const before = this.queue.length;
+          await this.flush();
+          if (this.queue.length >= before) break;
+        }
+      })(),
+      new Promise((resolve) => {
+        timeout = setTimeout(resolve, timeoutMs);
+      }),
+    ]);
+    clearTimeout(timeout);
+
+    const left = this.inFlight.length + this.queue.splice(0).length;
+    await this.journal.close();
+    if (left > 0 || this.overflowed) {
+      console.error(`Shutting down with uncommitted payment log entries; they stay in ${this.spillFile}`);
+    }
+  }
+
+  getStats() {
+    return {
+      queueDepth: this.queue.length,
+      queued: this.stats.queued,
+      written: this.stats.written,
+      flushes: this.stats.flushes,
+      failedFlushes: this.stats.failedFlushes,
+      spilled: this.stats.spilled,
+      replayed: this.stats.replayed,
+      journaled: this.journal.pendingCount,
+      flushInProgress: Boolean(this.pendingFlush),
+      lastFlushMs: this.stats.lastFlushMs,
+      avgFlushMs: this.stats.flushes === 0 ? null : this.stats.totalFlushMs / this.stats.flushes,
+      maxFlushMs: this.stats.maxFlushMs,
+      lastError: this.stats.lastError,
+    };
+  }
+}
+
+const paymentLogWriter = new PaymentLogWriter();
+
+module.exports = {
+  PaymentLogWriter,
+  paymentLogWriter,
+};
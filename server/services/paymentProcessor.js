@@ -0,0 +1,155 @@
+/**
+ * Payment Processor - charges behind /subscription/process-payment
+ * Processors implement `charge({ amount, currency, paymentMethodId, metadata })`
+ * and resolve to { id, status, method }, or reject with an Error carrying
+ * `status` 402 (declined) or 502 (processor unavailable).
+ *
+ * PAYMENT_PROCESSOR selects the implementation:
+ * - "simulator" (default): no network; latency and failures are configurable
+ *   so the upgrade flow can be load tested and run in CI
+ * - "stripe": confirms a PaymentIntent for the client's Stripe payment method.
+ *   The client creates it with Stripe Elements and sends its ID as
+ *   cardInfo.paymentMethodId (portal-app PaymentPage); raw card details are
+ *   rejected
+ *
+ * Simulator settings:
+ * - PAYMENT_SIMULATOR_LATENCY: "fixed:<ms>" (default "fixed:0"),
+ *   "uniform:<min>-<max>", "normal:<mean>,<stddev>" or
+ *   "lognormal:<median>,<sigma>" (long tail, like real processors)
+ * - PAYMENT_SIMULATOR_DECLINE_RATE: fraction of charges declined (default 0)
+ * - PAYMENT_SIMULATOR_ERROR_RATE: fraction failing as processor errors (default 0)
+ * - PAYMENT_SIMULATOR_SEED: makes the latency and failure sequence repeatable
+ */
+
+const crypto = require("crypto");
+const { createRandom, parseLatencySpec, sleep } = require("../utils/latency");
+
+function paymentError(message, status, code) {
+  const error = new Error(message);
+  error.status = status;
+  error.code = code;
+  return error;
+}
+
+class SimulatedPaymentProcessor {
+  /**
+   * @param {Object} options - { latency, declineRate, errorRate, seed }
+   */
+  constructor(options = {}) {
+    this.name = "simulator";
+    this.random = createRandom(options.seed);
+    this.sampleLatency = parseLatencySpec(options.latency, this.random);
+    this.declineRate = options.declineRate || 0;
+    this.errorRate = options.errorRate || 0;
+  }
+
+  async charge({ amount, currency = "usd" }) {
+    await sleep(this.sampleLatency());
+
+    const roll = this.random();
+    if (roll < this.errorRate) {
+      throw paymentError("Payment processor unavailable", 502, "processor_error");
+    }
+    if (roll < this.errorRate + this.declineRate) {
+      throw paymentError("Your card was declined", 402, "card_declined");
+    }
+
+    return {
+      id: `sim_${crypto.randomBytes(12).toString("hex")}`,
+      status: "succeeded",
+      method: "simulated_card",
+      amount,
+      currency,
+    };
+  }
+}
+
+class StripePaymentProcessor {
+  /**
+   * @param {Object} stripe - Stripe client
+   */
+  constructor(stripe) {
+    this.name = "stripe";
+    this.stripe = stripe;
+  }
+
+  async charge({ amount, currency = "usd", paymentMethodId, metadata = {} }) {
+    if (!paymentMethodId) {
+      throw paymentError("cardInfo.paymentMethodId is required", 400, "missing_payment_method");
+    }
+
+    let paymentIntent;
+    try {
+      paymentIntent = await this.stripe.paymentIntents.create({
+        amount,
+        currency,
+        payment_method: paymentMethodId,
+        confirm: true,
+        automatic_payment_methods: { enabled: true, allow_redirects: "never" },
+        metadata,
+      });
+    } catch (error) {
+      if (error.type === "StripeCardError") {
+        throw paymentError(error.message, 402, error.code || "card_declined");
+      }
+      throw paymentError("Payment processor unavailable", 502, "processor_error");
+    }
+
+    if (paymentIntent.status !== "succeeded") {
+      throw paymentError(`Payment ${paymentIntent.status.replace(/_/g, " ")}`, 402, paymentIntent.status);
+    }
+    return {
+      id: paymentIntent.id,
+      status: paymentIntent.status,
+      method: "stripe",
+      amount,
+      currency,
+    };
+  }
+}
+
+/**
+ * Build the processor selected by PAYMENT_PROCESSOR
+ */
+function createPaymentProcessor(env = process.env) {
+  if (env.PAYMENT_PROCESSOR === "stripe") {
+    if (!env.STRIPE_SECRET_KEY) {
+      throw new Error("PAYMENT_PROCESSOR=stripe requires STRIPE_SECRET_KEY");
+    }
+    return new StripePaymentProcessor(require("stripe")(env.STRIPE_SECRET_KEY));
+  }
+
+  return new SimulatedPaymentProcessor({
+    latency: env.PAYMENT_SIMULATOR_LATENCY,
+    declineRate: parseFloat(env.PAYMENT_SIMULATOR_DECLINE_RATE) || 0,
+    errorRate: parseFloat(env.PAYMENT_SIMULATOR_ERROR_RATE) || 0,
+    seed: env.PAYMENT_SIMULATOR_SEED,
+  });
+}
+
+let paymentProcessor = null;
+
+/**
+ * Processor used by the routes, created on first use
+ */
+function getPaymentProcessor() {
+  if (!paymentProcessor) {
+    paymentProcessor = createPaymentProcessor();
+  }
+  return paymentProcessor;
+}
+
+/**
+ * Swap the processor, e.g. for a simulator with different settings in a benchmark
+ */
+function setPaymentProcessor(processor) {
+  paymentProcessor = processor;
+}
+
+module.exports = {
+  SimulatedPaymentProcessor,
+  StripePaymentProcessor,
+  createPaymentProcessor,
+  getPaymentProcessor,
+  setPaymentProcessor,
+};
@@ -0,0 +1,198 @@
+/**
+ * Unit ID Allocator - hands out `diyaN` unit IDs from blocks reserved in Firestore
+ * Instead of a transaction on counters/unitIdCounter for every upload, each
+ * process reserves UNIT_ID_BLOCK_SIZE numbers (default 100) at a time and
+ * serves them from memory. IDs stay unique across processes; numbers left in
+ * a block when a process exits are skipped, so the sequence may have gaps.
+ *
+ * Sharded fallback: with UNIT_ID_COUNTER_SHARDS > 0, or when the main counter
+ * transaction fails on contention, blocks come from shard documents
+ * (`unitIdCounter-shard-N`, fields { next, end }) that each own a larger range
+ * carved from the main counter, so the main document is touched only when a
+ * shard's range runs out
+ */
+
+const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+
+const SCHEMA_QUALIFIER = resolveSchemaQualifier();
+const TABLE_COUNTERS = SCHEMA_QUALIFIER + "counters";
+const COUNTER_DOC = "unitIdCounter";
+const UNIT_ID_PREFIX = "diya";
+
+const DEFAULT_BLOCK_SIZE = parseInt(process.env.UNIT_ID_BLOCK_SIZE) || 100;
+const DEFAULT_SHARD_COUNT = parseInt(process.env.UNIT_ID_COUNTER_SHARDS) || 0;
+// Shards used when the main counter is contended and no shard count is configured
+const FALLBACK_SHARD_COUNT = 4;
+
+function formatUnitId(number) {
+  return `${UNIT_ID_PREFIX}${number}`;
+}
+
+function isContentionError(error) {
+  // gRPC ABORTED (10) is what Firestore reports once transaction retries are exhausted
+  return error.code === 10 || error.code === 'aborted' || /ABORTED|contention/i.test(error.message || '');
+}
+
+class UnitIdAllocator {
+  /**
+   * @param {Object} db - Firestore instance
+   * @param {Object} options - { blockSize, shardCount, counterCollection }
+   */
+  constructor(db, options = {}) {
+    this.db = db;
+    this.blockSize = options.blockSize || DEFAULT_BLOCK_SIZE;
+    this.shardCount = options.shardCount !== undefined ? options.shardCount : DEFAULT_SHARD_COUNT;
+    this.shardRangeSize = this.blockSize * 10;
+    this.counterCollection = options.counterCollection || TABLE_COUNTERS;
+
+    // Current in-memory block, inclusive; empty when nextNumber > endNumber
+    this.nextNumber = 1;
+    this.endNumber = 0;
+    this.pendingRefill = null;
+  }
+
+  /**
+   * Get the next unit ID, e.g. "diya42"
+   */
+  async next() {
+    const [unitId] = await this.allocate(1);
+    return unitId;
+  }
+
+  /**
+   * Get `count` unit IDs. Uses what is left of the current block, and
+   * reserves any remainder larger than a block in a single transaction
+   * @param {number} count - Number of IDs needed
+   * @returns {Promise<Array<string>>} Unit IDs
+   */
+  async allocate(count) {
+    const numbers = [];
+
+    while (numbers.length < count) {
+      if (this.nextNumber <= this.endNumber) {
+        numbers.push(this.nextNumber++);
+        continue;
+      }
+
+      const needed = count - numbers.length;
+      if (needed > this.blockSize) {
+        const [start, end] = await this.reserve(needed);
+        for (let number = start; number <= end; number++) {
+          numbers.push(number);
+        }
+      } else {
+        await this.refillBlock();
+      }
+    }
+
+    return numbers.map(formatUnitId);
+  }
+
+  /**
+   * Reserve a new block; concurrent callers share one reservation
+   */
+  refillBlock() {
+    if (!this.pendingRefill) {
+      this.pendingRefill = this.reserve(this.blockSize)
+        .then(([start, end]) => {
+          this.nextNumber = start;
+          this.endNumber = end;
+        })
+        .finally(() => {
+          this.pendingRefill = null;
+        });
+    }
+    return this.pendingRefill;
+  }
+
+  /**
+   * Reserve `size` consecutive numbers
+   * @returns {Promise<Array<number>>} [start, end], inclusive
+   */
+  async reserve(size) {
+    if (this.shardCount > 0) {
+      return this.reserveFromShard(size, this.shardCount);
+    }
+
+    try {
+      return await this.reserveFromCounter(size);
+    } catch (error) {
+      if (!isContentionError(error)) {
+        throw error;
+      }
+      console.warn(`Unit ID counter contended, reserving from shards: ${error.message}`);
+      return this.reserveFromShard(size, FALLBACK_SHARD_COUNT);
+    }
+  }
+
+  /**
+   * Take numbers straight from counters/unitIdCounter
+   */
+  reserveFromCounter(size) {
+    const counterRef = this.db.collection(this.counterCollection).doc(COUNTER_DOC);
+
+    return this.db.runTransaction(async (transaction) => {
+      const counterDoc = await transaction.get(counterRef);
+      if (!counterDoc.exists) {
+        throw new Error("Counter document does not exist");
+      }
+
+      const lastNumber = counterDoc.data().lastNumber;
+      transaction.update(counterRef, { lastNumber: lastNumber + size });
+      return [lastNumber + 1, lastNumber + size];
+    });
+  }
+
+  /**
+   * Take numbers from a random shard, refilling its range from the main
+   * counter (in the same transaction) when it runs out
+   */
+  reserveFromShard(size, shardCount) {
+    const shard = Math.floor(Math.random() * shardCount);
+    const counters = this.db.collection(this.counterCollection);
+    const shardRef = counters.doc(`${COUNTER_DOC}-shard-${shard}`);
+    const counterRef = counters.doc(COUNTER_DOC);
+
+    return this.db.runTransaction(async (transaction) => {
+      const shardDoc = await transaction.get(shardRef);
+      let { next, end } = shardDoc.exists ? shardDoc.data() : { next: 1, end: 0 };
+
+      // Only read (and lock) the main counter when this shard's range is used up
+      if (next + size - 1 > end) {
+        const counterDoc = await transaction.get(counterRef);
+        if (!counterDoc.exists) {
+          throw new Error("Counter document does not exist");
+        }
+        const lastNumber = counterDoc.data().lastNumber;
+        const rangeSize = Math.max(this.shardRangeSize, size);
+        transaction.update(counterRef, { lastNumber: lastNumber + rangeSize });
+        next = lastNumber + 1;
+        end = lastNumber + rangeSize;
+      }
+
+      transaction.set(shardRef, { next: next + size, end });
+      return [next, next + size - 1];
+    });
+  }
+}
+
+// One allocator per Firestore instance, shared by every caller in the process
+const allocators = new WeakMap();
+
+/**
+ * Get the process-wide allocator for a Firestore instance
+ * @param {Object} db - Firestore instance
+ * @returns {UnitIdAllocator}
+ */
+function getUnitIdAllocator(db) {
+  if (!allocators.has(db)) {
+    allocators.set(db, new UnitIdAllocator(db));
+  }
+  return allocators.get(db);
+}
+
+module.exports = {
+  UnitIdAllocator,
+  getUnitIdAllocator,
+  formatUnitId
+};
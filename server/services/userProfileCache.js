@@ -0,0 +1,81 @@
+/**
+ * User Profile Cache - per-process TTL/LRU cache of user profile lookups
+ * Role checks run on every authorised request; caching { role, collection, data }
+ * per uid saves the teachers -> students -> users lookup on repeat calls.
+ * Routes that write a profile must call invalidateUserProfile(uid); the TTL
+ * bounds staleness for writes made elsewhere (other instances, the portal)
+ */
+
+const { databaseService } = require("./databaseService");
+const { LruCache } = require("../utils/lruCache");
+
+const profileCache = new LruCache({
+  maxEntries: parseInt(process.env.USER_PROFILE_CACHE_MAX_ENTRIES) || 1000,
+  ttlMs: parseInt(process.env.USER_PROFILE_CACHE_TTL_MS) || 60 * 1000
+});
+
+/**
+ * Get a user's profile, from the request, the cache, or the database
+ * Missing profiles are not cached so a freshly registered user is seen at once
+ * @param {string} userId - Firebase uid
+ * @param {string} tableUsers - Unified users collection name
+ * @param {Object} req - Optional Express request; the profile is memoised on it
+ * @returns {Promise<Object|null>} { role, collection, data } or null if not found
+ */
+async function getUserProfile(userId, tableUsers, req = null) {
+  if (req && req.userProfile && req.userProfile.uid === userId) {
+    return req.userProfile.profile;
+  }
+
+  let profile = profileCache.get(userId);
+  if (!profile) {
+    await databaseService.initialize();
+    const { snap, collection } = await databaseService.getUserDocument(userId, tableUsers);
+
+    if (snap.exists) {
+      const data = snap.data();
+      profile = {
+        role: data.role || 'teacherDefault', // Default role
+        collection,
+        data
+      };
+      profileCache.set(userId, profile);
+    } else {
+      profile = null;
+    }
+  }
+
+  // Hand out a copy so request handlers cannot mutate the cached profile
+  const result = profile && { ...profile, data: { ...profile.data } };
+  if (req) {
+    req.userProfile = { uid: userId, profile: result };
+  }
+  return result;
+}
+
+/**
+ * Drop a cached profile after it has been written
+ * Also forgets the user's collection and the cached user counts, since a
+ * write may create the user or change their role
+ * @param {string} userId - Firebase uid
+ */
+function invalidateUserProfile(userId) {
+  if (userId) {
+    profileCache.delete(userId);
+    databaseService.forgetUserLocation(userId);
+    databaseService.invalidateUserCounts();
+  }
+}
+
+/**
+ * Hit/miss counters for the profile cache
+ */
+function getUserProfileCacheStats() {
+  return profileCache.getStats();
+}
+
+module.exports = {
+  getUserProfile,
+  invalidateUserProfile,
+  getUserProfileCacheStats
+};
@@ -0,0 +1,158 @@
+/**
+ * Webhook Event Store - idempotency records for Stripe webhook events
+ * One document per event.id in `webhook_events`. A worker claims an event in
+ * a transaction before running its handler, so redeliveries (and the same
+ * event arriving at two instances) are processed once:
+ * - processed: never claimed again
+ * - processing: claimed by a worker; claimable again only once its lease
+ *   (WEBHOOK_LEASE_MS, default 5 minutes) runs out, e.g. after a crash
+ * - failed: handler gave up; claimable again
+ * - abandoned: failed too many times to be recovered automatically
+ *
+ * The claim stores the event itself (as a JSON string, so its nesting doesn't
+ * count against Firestore's limits or create index entries), so failed events
+ * and events whose worker died can be re-queued by listRecoverable() without
+ * Stripe redelivering them.
+ *
+ * Recently processed IDs are also kept in memory so duplicates can be
+ * answered without a Firestore read.
+ */
+
+const { databaseService } = require("./databaseService");
+const { LruCache } = require("../utils/lruCache");
+const { resolveSchemaQualifier } = require("../utils/schemaQualifier");
+
+const SCHEMA_QUALIFIER = resolveSchemaQualifier();
+const TABLE_WEBHOOK_EVENTS = SCHEMA_QUALIFIER + "webhook_events";
+
+const DEFAULT_LEASE_MS = parseInt(process.env.WEBHOOK_LEASE_MS) || 5 * 60 * 1000;
+const DEFAULT_RECENT_SIZE = parseInt(process.env.WEBHOOK_RECENT_EVENTS) || 10000;
+const DEFAULT_RECOVERY_LIMIT = 500;
+
+function toMillis(value) {
+  if (!value) return 0;
+  if (typeof value.toMillis === "function") return value.toMillis();
+  return new Date(value).getTime();
+}
+
+class WebhookEventStore {
+  /**
+   * @param {Object} options - { getDb, collection, leaseMs, recentSize }
+   */
+  constructor(options = {}) {
+    this.collection = options.collection || TABLE_WEBHOOK_EVENTS;
+    this.leaseMs = options.leaseMs || DEFAULT_LEASE_MS;
+    this.getDb = options.getDb || (async () => {
+      await databaseService.initialize();
+      return databaseService.getDb();
+    });
+    this.recent = new LruCache({ maxEntries: options.recentSize || DEFAULT_RECENT_SIZE });
+  }
+
+  /**
+   * Whether this process has already processed the event
+   */
+  isKnownProcessed(eventId) {
+    return this.recent.has(eventId);
+  }
+
+  /**
+   * Claim an event for processing
+   * @param {Object} event - Verified Stripe event
+   * @returns {Promise<boolean>} false when it is processed or held by another worker
+   */
+  async claim(event) {
+    if (this.isKnownProcessed(event.id)) {
+      return false;
+    }
+
+    const db = await this.getDb();
+    const ref = db.collection(this.collection).doc(event.id);
+
+    return db.runTransaction(async (transaction) => {
+      const snap = await transaction.get(ref);
+      const record = snap.exists ? snap.data() : null;
+      const now = Date.now();
+
+      if (record && record.status === "processed") {
+        this.recent.set(event.id, true);
+        return false;
+      }
+      if (record && record.status === "processing" && toMillis(record.leaseExpiresAt) > now) {
+        return false;
+      }
+
+      transaction.set(ref, {
+        type: event.type,
+        payload: JSON.stringify(event),
+        status: "processing",
+        attempts: ((record && record.attempts) || 0) + 1,
+        receivedAt: (record && record.receivedAt) || new Date(now),
+        leaseExpiresAt: new Date(now + this.leaseMs),
+      });
+      return true;
+    });
+  }
+
+  async markProcessed(eventId) {
+    const db = await this.getDb();
+    await db.collection(this.collection).doc(eventId).update({
+      status: "processed",
+      processedAt: new Date(),
+      leaseExpiresAt: null,
+    });
+    this.recent.set(eventId, true);
+  }
+
+  async markFailed(eventId, error) {
+    const db = await this.getDb();
+    await db.collection(this.collection).doc(eventId).update({
+      status: "failed",
+      error: error.message,
+      failedAt: new Date(),
+      leaseExpiresAt: null,
+    });
+  }
+
+  async markAbandoned(eventId) {
+    const db = await this.getDb();
+    await db.collection(this.collection).doc(eventId).update({
+      status: "abandoned",
+      abandonedAt: new Date(),
+    });
+  }
+
+  /**
+   * Events to run again: failed ones, and ones whose worker's lease ran out
+   * (crashed or killed mid-handler)
+   * @param {number} limit - Most records to read
+   * @returns {Promise<Array<Object>>} { event, attempts }
+   */
+  async listRecoverable(limit = DEFAULT_RECOVERY_LIMIT) {
+    const db = await this.getDb();
+    const snapshot = await db.collection(this.collection)
+      .where("status", "in", ["failed", "processing"])
+      .limit(limit)
+      .get();
+    const now = Date.now();
+
+    const recoverable = [];
+    snapshot.docs.forEach((doc) => {
+      const record = doc.data();
+      if (!record.payload || (record.status === "processing" && toMillis(record.leaseExpiresAt) > now)) {
+        return;
+      }
+      try {
+        recoverable.push({ event: JSON.parse(record.payload), attempts: record.attempts || 0 });
+      } catch (error) {
+        console.error(`Skipping webhook event ${doc.id} with an unreadable payload`);
+      }
+    });
+    return recoverable;
+  }
+}
+
+module.exports = {
+  WebhookEventStore,
+  TABLE_WEBHOOK_EVENTS,
+};
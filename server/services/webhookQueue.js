@@ -0,0 +1,397 @@
+/**
+ * Webhook Queue - processes verified Stripe events off the request path
+ * The webhook route verifies the signature, enqueues the event and answers
+ * 200 straight away; handlers run here with at most WEBHOOK_CONCURRENCY
+ * (default 4) events in flight. Each event is claimed in the idempotency
+ * store first, so a redelivered event.id runs its handler once.
+ *
+ * Once the route has answered 200, Stripe never sends the event again, so
+ * nothing here may drop it:
+ * - Claims and status updates that fail are retried with exponential
+ *   backoff, up to WEBHOOK_MAX_ATTEMPTS (default 5) attempts.
+ * - A handler that keeps failing is marked failed in the event store, which
+ *   holds the event since its claim.
+ * - An event that can't be claimed or marked failed, and any event still
+ *   queued when close() gives up waiting, is appended to an NDJSON spill file.
+ *   The file is per process ("webhook-event-spill.<pid>.ndjson" in
+ *   os.tmpdir()) unless WEBHOOK_SPILL_FILE sets one.
+ * - start() replays the spill file, and with the default path also the spill
+ *   files of processes that are no longer running, then re-queues failed events and events
+ *   whose worker's lease ran out; it repeats every
+ *   WEBHOOK_RECOVERY_INTERVAL_MS (default 5 minutes). An event that has been
+ *   claimed WEBHOOK_MAX_CLAIMS (default 3) times is marked abandoned and left
+ *   for a person to look at.
+ * Handlers can run more than once for an event (a worker dying after the
+ * handler but before recording it, or an unrecordable success), so they
+ * should be idempotent. An event is lost only if the process is killed
+ * between answering 200 and claiming it; Stripe keeps it for 30 days.
+ *
+ * When WEBHOOK_MAX_QUEUE events are waiting, enqueue() refuses new ones and
+ * the route answers 503, which makes Stripe redeliver later instead of the
+ * process buffering without bound.
+ */
+
+const fs = require("fs");
+const { WebhookEventStore } = require("./webhookEventStore");
+const { requestContext } = require("../utils/requestContext");
+const { instanceFilePath, findOrphanedFiles, claimFile } = require("../utils/instanceFiles");
+
+const DEFAULT_CONCURRENCY = parseInt(process.env.WEBHOOK_CONCURRENCY) || 4;
+const DEFAULT_MAX_ATTEMPTS = parseInt(process.env.WEBHOOK_MAX_ATTEMPTS) || 5;
+const DEFAULT_RETRY_DELAY_MS = parseInt(process.env.WEBHOOK_RETRY_DELAY_MS) || 1000;
+const DEFAULT_MAX_QUEUE = parseInt(process.env.WEBHOOK_MAX_QUEUE) || 1000;
+const DEFAULT_MAX_CLAIMS = parseInt(process.env.WEBHOOK_MAX_CLAIMS) || 3;
+const DEFAULT_RECOVERY_INTERVAL_MS = parseInt(process.env.WEBHOOK_RECOVERY_INTERVAL_MS) || 5 * 60 * 1000;
+const SPILL_PREFIX = "webhook-event-spill";
+const DEFAULT_CLOSE_TIMEOUT_MS = 5000;
+
+function delay(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+class WebhookQueue {
+  /**
+   * @param {Object} options - { store, concurrency, maxAttempts, retryDelayMs, maxQueue,
+   *   maxClaims, recoveryIntervalMs, spillFile }
+   */
+  constructor(options = {}) {
+    this.store = options.store || new WebhookEventStore();
+    this.concurrency = options.concurrency || DEFAULT_CONCURRENCY;
+    this.maxAttempts = options.maxAttempts || DEFAULT_MAX_ATTEMPTS;
+    this.retryDelayMs = options.retryDelayMs !== undefined ? options.retryDelayMs : DEFAULT_RETRY_DELAY_MS;
+    this.maxQueue = options.maxQueue || DEFAULT_MAX_QUEUE;
+    this.maxClaims = options.maxClaims || DEFAULT_MAX_CLAIMS;
+    this.recoveryIntervalMs = options.recoveryIntervalMs || DEFAULT_RECOVERY_INTERVAL_MS;
+    const spillFile = options.spillFile || process.env.WEBHOOK_SPILL_FILE;
+    this.spillFile = spillFile || instanceFilePath(SPILL_PREFIX);
+    // Only the per-process default path can tell whose files are orphaned
+    this.claimOrphans = !spillFile;
+
+    this.handlers = new Map();
+    this.queue = [];
+    // Event IDs queued or being processed, for answering redeliveries in memory
+    this.pendingIds = new Set();
+    // Events being processed that the store does not hold yet (not claimed)
+    this.unclaimed = new Map();
+    this.active = 0;
+    this.closed = false;
+    this.idleWaiters = [];
+    this.recoveryTimer = null;
+    this.pendingRecovery = null;
+
+    this.stats = {
+      received: 0,
+      duplicates: 0,
+      rejected: 0,
+      processed: 0,
+      skipped: 0,
+      retries: 0,
+      failed: 0,
+      spilled: 0,
+      recovered: 0,
+      abandoned: 0,
+      lastError: null,
+    };
+  }
+
+  /**
+   * Register the handler for an event type
+   * @param {string} type - e.g. "payment_intent.succeeded"
+   * @param {Function} handler - async (event) => void
+   */
+  register(type, handler) {
+    this.handlers.set(type, handler);
+    return this;
+  }
+
+  /**
+   * Queue a verified event; never waits for Firestore
+   * @param {Object} event - Stripe event
+   * @returns {Object} { accepted, duplicate }; accepted is false when the
+   *   queue is full or closed and the sender should retry later
+   */
+  enqueue(event) {
+    this.stats.received++;
+
+    if (this.pendingIds.has(event.id) || this.store.isKnownProcessed(event.id)) {
+      this.stats.duplicates++;
+      return { accepted: true, duplicate: true };
+    }
+    if (this.closed || this.queue.length >= this.maxQueue) {
+      this.stats.rejected++;
+      return { accepted: false, duplicate: false };
+    }
+
+    this.pendingIds.add(event.id);
+    this.queue.push(event);
+    this.pump();
+    return { accepted: true, duplicate: false };
+  }
+
+  pump() {
+    while (this.active < this.concurrency && this.queue.length > 0) {
+      const event = this.queue.shift();
+      this.active++;
+      // Processing outlives the webhook request, so it runs outside its context
+      requestContext.exit(() => this.process(event)).finally(() => {
+        this.active--;
+        this.pendingIds.delete(event.id);
+        this.pump();
+        if (this.active === 0 && this.queue.length === 0) {
+          this.idleWaiters.splice(0).forEach((resolve) => resolve());
+        }
+      });
+    }
+  }
+
+  async process(event) {
+    this.unclaimed.set(event.id, event);
+    let claimed;
+    try {
+      claimed = await this.withRetries(() => this.store.claim(event));
+    } catch (error) {
+      // Without a claim the handler can't run safely; keep the event for replay
+      console.error(`Failed to claim webhook event ${event.id}:`, error.message);
+      this.stats.failed++;
+      this.spill([event]);
+      return;
+    } finally {
+      this.unclaimed.delete(event.id);
+    }
+    if (!claimed) {
+      this.stats.duplicates++;
+      return;
+    }
+
+    const handler = this.handlers.get(event.type);
+    if (!handler) {
+      console.log(`Unhandled event type ${event.type}`);
+      this.stats.skipped++;
+      await this.settle(event, () => this.store.markProcessed(event.id));
+      return;
+    }
+
+    for (let attempt = 1; attempt <= this.maxAttempts; attempt++) {
+      try {
+        await handler(event);
+        this.stats.processed++;
+        // Unrecorded, it stays "processing" and runs again once its lease expires
+        await this.settle(event, () => this.store.markProcessed(event.id));
+        return;
+      } catch (error) {
+        this.stats.lastError = error.message;
+        if (attempt === this.maxAttempts) {
+          console.error(`Webhook event ${event.id} (${event.type}) failed after ${attempt} attempts:`, error.message);
+          this.stats.failed++;
+          // The store keeps failed events for recover(); if it can't be told, keep the event on disk
+          const recorded = await this.settle(event, () => this.store.markFailed(event.id, error));
+          if (!recorded) {
+            this.spill([event]);
+          }
+          return;
+        }
+        this.stats.retries++;
+        await delay(this.retryDelayMs * 2 ** (attempt - 1));
+      }
+    }
+  }
+
+  /**
+   * Run `operation` up to maxAttempts times with exponential backoff
+   */
+  async withRetries(operation) {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        return await operation();
+      } catch (error) {
+        this.stats.lastError = error.message;
+        if (attempt >= this.maxAttempts) {
+          throw error;
+        }
+        this.stats.retries++;
+        await delay(this.retryDelayMs * 2 ** (attempt - 1));
+      }
+    }
+  }
+
+  /**
+   * Record an event's outcome in the store
+   * @returns {Promise<boolean>} whether it was recorded
+   */
+  async settle(event, update) {
+    try {
+      await this.withRetries(update);
+      return true;
+    } catch (error) {
+      console.error(`Failed to record webhook event ${event.id}:`, error.message);
+      return false;
+    }
+  }
+
+  /**
+   * Append events to the spill file; synchronous so a shutdown can rely on it
+   */
+  spill(events) {
+    if (events.length === 0) return;
+    try {
+      fs.appendFileSync(this.spillFile, events.map((event) => JSON.stringify(event)).join("\n") + "\n");
+      this.stats.spilled += events.length;
+    } catch (error) {
+      // Last resort: the IDs can still be replayed from the Stripe dashboard
+      console.error(`Failed to spill webhook events ${events.map((event) => event.id).join(", ")}:`, error.message);
+      this.stats.lastError = error.message;
+    }
+  }
+
+  /**
+   * Queue the events in the spill file and in those of dead processes; what
+   * doesn't fit is written back to this process's file
+   */
+  replaySpillFile() {
+    if (this.claimOrphans) {
+      findOrphanedFiles(SPILL_PREFIX).forEach((orphan) => {
+        // Under this process's name, so it is claimed again if we die first
+        const claimed = `${this.spillFile}.${orphan.pid}${orphan.suffix}`;
+        if (claimFile(orphan.path, claimed)) {
+          this.replayFile(claimed);
+        }
+      });
+    }
+    this.replayFile(this.spillFile);
+  }
+
+  replayFile(file) {
+    if (!fs.existsSync(file)) return;
+
+    let lines;
+    try {
+      lines = fs.readFileSync(file, "utf8").split("\n").filter(Boolean);
+      fs.unlinkSync(file);
+    } catch (error) {
+      console.error("Failed to read webhook spill file:", error.message);
+      return;
+    }
+
+    const rejected = [];
+    lines.forEach((line) => {
+      let event;
+      try {
+        event = JSON.parse(line);
+      } catch (error) {
+        console.error("Skipping unreadable webhook spill line");
+        return;
+      }
+      if (this.enqueue(event).accepted) {
+        this.stats.recovered++;
+      } else {
+        rejected.push(event);
+      }
+    });
+    this.spill(rejected);
+  }
+
+  /**
+   * Queue spilled events, then failed events and events whose worker died
+   * from the store. Concurrent callers share the run in progress
+   * @returns {Promise<void>}
+   */
+  recover() {
+    if (!this.pendingRecovery) {
+      this.pendingRecovery = requestContext.exit(() => this.recoverEvents()).finally(() => {
+        this.pendingRecovery = null;
+      });
+    }
+    return this.pendingRecovery;
+  }
+
+  async recoverEvents() {
+    if (this.closed) return;
+    this.replaySpillFile();
+
+    let recoverable;
+    try {
+      recoverable = await this.store.listRecoverable();
+    } catch (error) {
+      console.error("Failed to list recoverable webhook events:", error.message);
+      this.stats.lastError = error.message;
+      return;
+    }
+
+    for (const { event, attempts } of recoverable) {
+      if (attempts >= this.maxClaims) {
+        console.error(`Webhook event ${event.id} (${event.type}) abandoned after ${attempts} claims`);
+        if (await this.settle(event, () => this.store.markAbandoned(event.id))) {
+          this.stats.abandoned++;
+        }
+      } else if (this.enqueue(event).accepted) {
+        this.stats.recovered++;
+      }
+    }
+  }
+
+  /**
+   * Recover now and every recoveryIntervalMs; call once the server is listening
+   */
+  start() {
+    this.recover();
+    if (!this.recoveryTimer) {
+      this.recoveryTimer = requestContext.exit(() => setInterval(() => this.recover(), this.recoveryIntervalMs));
+      this.recoveryTimer.unref();
+    }
+    return this;
+  }
+
+  /**
+   * Resolve once nothing is queued or running
+   */
+  onIdle() {
+    if (this.active === 0 && this.queue.length === 0) {
+      return Promise.resolve();
+    }
+    return new Promise((resolve) => this.idleWaiters.push(resolve));
+  }
+
+  /**
+   * Stop accepting events and wait up to `timeoutMs` for queued ones.
+   * Events still queued or not yet claimed after that are spilled to disk
+   * for the next start(); claimed ones are already in the store
+   */
+  async close(timeoutMs = DEFAULT_CLOSE_TIMEOUT_MS) {
+    this.closed = true;
+    if (this.recoveryTimer) {
+      clearInterval(this.recoveryTimer);
+      this.recoveryTimer = null;
+    }
+
+    let timeout;
+    await Promise.race([
+      this.onIdle(),
+      new Promise((resolve) => {
+        timeout = setTimeout(resolve, timeoutMs);
+      }),
+    ]);
+    clearTimeout(timeout);
+
+    const unprocessed = [...this.unclaimed.values(), ...this.queue.splice(0)];
+    if (unprocessed.length > 0) {
+      console.error(`Shutting down with ${unprocessed.length} unprocessed webhook events; spilling them to ${this.spillFile}`);
+      this.spill(unprocessed);
+    }
+  }
+
+  getStats() {
+    return {
+      queueDepth: this.queue.length,
+      active: this.active,
+      concurrency: this.concurrency,
+      ...this.stats,
+    };
+  }
+}
+
+const webhookQueue = new WebhookQueue();
+
+module.exports = {
+  WebhookQueue,
+  webhookQueue,
+};
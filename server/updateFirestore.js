@@ -1,5 +1,6 @@
 const admin = require('firebase-admin');
 const { db } = require("./config/firebaseConfig");
+const { UnitIdAllocator } = require("./services/unitIdAllocator");
 
 // Define the collections
 const SCHEMA_QUALIFIER = `${process.env.DATABASE_SCHEMA_QUALIFIER}`;
@@ -16,28 +17,17 @@ if (!admin.apps.length) {
   });
 }
 
-async function getNextUnitID() {
-  const counterRef = db.collection(TABLE_COUNTERS).doc("unitIdCounter");
-
-  return db.runTransaction(async (transaction) => {
-    const counterDoc = await transaction.get(counterRef);
-    if (!counterDoc.exists) {
-      throw new Error("Counter document does not exist");
-    }
-
-    const lastNumber = counterDoc.data().lastNumber;
-    const newNumber = lastNumber + 1;
-    transaction.update(counterRef, { lastNumber: newNumber });
-    return `diya${newNumber}`;
-  });
-}
-
 async function updateDocuments() {
   const contentRef = db.collection(TABLE_CONTENT)
   const snapshot = await contentRef.get();
 
   const batch = db.batch();
 
+  // Reserve every missing UnitID up front rather than one transaction per document
+  const missingIdCount = snapshot.docs.filter((doc) => !doc.data().UnitID).length;
+  const allocator = new UnitIdAllocator(db, { counterCollection: TABLE_COUNTERS });
+  const newUnitIDs = await allocator.allocate(missingIdCount);
+
   for (const doc of snapshot.docs) {
     const data = doc.data();
 
@@ -45,8 +35,7 @@ async function updateDocuments() {
 
     // Update UnitID if it doesn't exist
     if (!data.UnitID) {
-      const newUnitID = await getNextUnitID();
-      updates.UnitID = newUnitID;
+      updates.UnitID = newUnitIDs.shift();
     }
 
     // Update Author if it doesn't exist
@@ -0,0 +1,97 @@
+/**
+ * Content-coding helpers shared by the compression middleware and the
+ * catalog cache (which keeps compressed copies of its cached bodies)
+ */
+
+const zlib = require('zlib');
+
+// Brotli's default quality (11) is meant for static assets; 4 compresses
+// JSON about as well as gzip -6 at a fraction of the CPU
+const BROTLI_QUALITY = parseInt(process.env.COMPRESSION_BROTLI_QUALITY) || 4;
+const COMPRESSION_THRESHOLD = parseInt(process.env.COMPRESSION_THRESHOLD_BYTES) || 1024;
+
+const COMPRESSIBLE_TYPE = /^\s*(text\/|application\/(json|x-ndjson|javascript|xml)|[^;]*\+(json|xml))/i;
+
+// Preferred first when the client weights them equally
+const SUPPORTED_ENCODINGS = ['br', 'gzip'];
+
+function isCompressible(contentType) {
+  return Boolean(contentType) && COMPRESSIBLE_TYPE.test(String(contentType));
+}
+
+/**
+ * Pick a content coding from an Accept-Encoding header
+ * @param {string} acceptEncoding - e.g. "gzip, deflate, br;q=0.9"
+ * @returns {string|null} "br", "gzip", or null for identity
+ */
+function negotiateEncoding(acceptEncoding) {
+  if (!acceptEncoding) {
+    return null;
+  }
+
+  const weights = new Map();
+  for (const part of String(acceptEncoding).split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';');
+    if (!name) continue;
+    const qParam = params.map((param) => param.trim()).find((param) => param.startsWith('q='));
+    const q = qParam ? parseFloat(qParam.slice(2)) : 1;
+    weights.set(name, Number.isNaN(q) ? 0 : q);
+  }
+
+  let best = null;
+  let bestWeight = 0;
+  for (const encoding of SUPPORTED_ENCODINGS) {
+    const weight = weights.has(encoding) ? weights.get(encoding) : (weights.get('*') || 0);
+    if (weight > bestWeight) {
+      best = encoding;
+      bestWeight = weight;
+    }
+  }
+  return best;
+}
+
+function brotliOptions(size) {
+  const params = { [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY };
+  if (size) {
+    params[zlib.constants.BROTLI_PARAM_SIZE_HINT] = size;
+  }
+  return { params };
+}
+
+/**
+ * Transform stream for a content coding
+ */
+function createCompressStream(encoding) {
+  return encoding === 'br' ? zlib.createBrotliCompress(brotliOptions()) : zlib.createGzip();
+}
+
+/**
+ * Compress a complete body
+ */
+function compressSync(body, encoding) {
+  const buffer = Buffer.isBuffer(body) ? body : Buffer.from(body);
+  return encoding === 'br'
+    ? zlib.brotliCompressSync(buffer, brotliOptions(buffer.length))
+    : zlib.gzipSync(buffer);
+}
+
+/**
+ * Add Accept-Encoding to the Vary header without duplicating it
+ */
+function varyOnAcceptEncoding(res) {
+  const vary = res.getHeader('Vary');
+  if (!vary) {
+    res.setHeader('Vary', 'Accept-Encoding');
+  } else if (vary !== '*' && !/(^|,)\s*accept-encoding\s*(,|$)/i.test(String(vary))) {
+    res.setHeader('Vary', `${vary}, Accept-Encoding`);
+  }
+}
+
+module.exports = {
+  COMPRESSION_THRESHOLD,
+  isCompressible,
+  negotiateEncoding,
+  createCompressStream,
+  compressSync,
+  varyOnAcceptEncoding
+};
@@ -0,0 +1,38 @@
+/**
+ * Concurrency helpers for fan-out work (batched reads, rendering, imports)
+ */
+
+/**
+ * Run `worker` over every item with at most `concurrency` calls in flight
+ * Workers pull the next item as soon as they finish, so slow items do not
+ * hold up a whole batch. Rejects with the first worker error after the
+ * in-flight calls settle
+ * @param {Array} items - Items to process
+ * @param {number} concurrency - Maximum simultaneous worker calls
+ * @param {Function} worker - async (item, index) => void
+ * @returns {Promise<void>}
+ */
+async function forEachWithConcurrency(items, concurrency, worker) {
+  let nextIndex = 0;
+  let firstError = null;
+
+  const runWorker = async () => {
+    while (nextIndex < items.length && !firstError) {
+      const index = nextIndex++;
+      try {
+        await worker(items[index], index);
+      } catch (error) {
+        firstError = firstError || error;
+      }
+    }
+  };
+
+  const workerCount = Math.max(1, Math.min(concurrency, items.length));
+  await Promise.all(Array.from({ length: workerCount }, runWorker));
+
+  if (firstError) {
+    throw firstError;
+  }
+}
+
+module.exports = { forEachWithConcurrency };
@@ -0,0 +1,108 @@
+/**
+ * Dataset Loader - bulk imports a generated dataset into the Firestore emulator
+ * Datasets come from `python -m tests.datasets generate`: a directory of
+ * <collection>.ndjson files (one {"id", "data"} document per line) and a
+ * manifest.json. Files are streamed line by line and imported in chunks, so
+ * large datasets don't need to fit in memory as JSON text.
+ *
+ * Besides the documents themselves, the loader keeps derived data consistent:
+ * the contentUsage index is rebuilt from the lessons, and the UnitID counter
+ * is moved past the highest imported UnitID.
+ */
+
+const fs = require("fs");
+const path = require("path");
+const readline = require("readline");
+
+const IMPORT_CHUNK_SIZE = 5000;
+const TIMESTAMP_KEY = "$timestamp";
+const UNIT_ID_PATTERN = /^diya(\d+)$/;
+
+// Dataset values are JSON; {"$timestamp": "<ISO>"} marks a Firestore Timestamp
+function decodeValue(value) {
+  if (Array.isArray(value)) {
+    return value.map(decodeValue);
+  }
+  if (value !== null && typeof value === "object") {
+    const keys = Object.keys(value);
+    if (keys.length === 1 && keys[0] === TIMESTAMP_KEY) {
+      return new Date(value[TIMESTAMP_KEY]);
+    }
+    const decoded = {};
+    keys.forEach((key) => {
+      decoded[key] = decodeValue(value[key]);
+    });
+    return decoded;
+  }
+  return value;
+}
+
+async function* readDocuments(file) {
+  const lines = readline.createInterface({ input: fs.createReadStream(file, "utf8"), crlfDelay: Infinity });
+  for await (const line of lines) {
+    if (line.trim()) {
+      const { id, data } = JSON.parse(line);
+      yield [id, decodeValue(data)];
+    }
+  }
+}
+
+/**
+ * Import a dataset directory into a DocumentStore
+ * @param {Object} store - DocumentStore from firestoreEmulator.js
+ * @param {string} directory - Dataset directory containing manifest.json
+ * @param {Object} options - { qualifier }: prefix for collection names
+ * @returns {Promise<Object>} Documents imported per collection
+ */
+async function loadDataset(store, directory, options = {}) {
+  const qualifier = options.qualifier || "";
+  const manifest = JSON.parse(fs.readFileSync(path.join(directory, "manifest.json"), "utf8"));
+  const counts = {};
+  const contentUsage = {};
+  let highestUnitNumber = 0;
+
+  for (const collection of Object.keys(manifest.collections)) {
+    let chunk = [];
+    counts[collection] = 0;
+
+    for await (const [id, data] of readDocuments(path.join(directory, `${collection}.ndjson`))) {
+      if (collection === "lesson") {
+        (data.sections || []).forEach((section) => {
+          (section.contentIds || []).forEach((contentId) => {
+            contentUsage[contentId] = contentUsage[contentId] || { lessons: {} };
+            contentUsage[contentId].lessons[id] = data.title || "";
+          });
+        });
+      }
+      if (collection === "content") {
+        const match = UNIT_ID_PATTERN.exec(data.UnitID || "");
+        if (match) {
+          highestUnitNumber = Math.max(highestUnitNumber, Number(match[1]));
+        }
+      }
+
+      chunk.push([id, data]);
+      if (chunk.length === IMPORT_CHUNK_SIZE) {
+        counts[collection] += store.importDocuments(qualifier + collection, chunk);
+        chunk = [];
+      }
+    }
+    counts[collection] += store.importDocuments(qualifier + collection, chunk);
+  }
+
+  if (Object.keys(contentUsage).length > 0) {
+    store.importDocuments(qualifier + "contentUsage", Object.entries(contentUsage));
+  }
+
+  const counter = store.getRecord(qualifier + "counters", "unitIdCounter");
+  const lastNumber = counter ? counter.data.lastNumber || 0 : 0;
+  if (highestUnitNumber > lastNumber) {
+    store.importDocuments(qualifier + "counters", [["unitIdCounter", { lastNumber: highestUnitNumber }]]);
+  }
+
+  return counts;
+}
+
+module.exports = {
+  loadDataset,
+};
@@ -1,8 +1,14 @@
 /**
  * Firebase Mock Service for Development and Testing
- * Provides mock implementations of Firebase Admin SDK functionality
+ * Provides mock implementations of Firebase Admin SDK functionality: Auth is
+ * mocked here, Firestore is the in-memory emulator in firestoreEmulator.js
+ * seeded with the data below
  */
 
+const { resolveSchemaQualifier } = require('./schemaQualifier');
+const { Firestore, DocumentStore, FieldValue, FieldPath, Timestamp } = require('./firestoreEmulator');
+const { loadDataset } = require('./datasetLoader');
+
 /**
  * Mock user data for testing
  */
@@ -55,268 +61,322 @@ const mockUsers = {
 };
 
 /**
- * Mock DocumentSnapshot class
+ * Mock lesson plans for testing
+ * Public lessons are authored by the admin/premium users, private ones by the test user
  */
-class MockDocumentSnapshot {
-  constructor(id, data, exists = true) {
-    this.id = id;
-    this._data = data;
-    this._exists = exists;
-  }
-
-  get exists() {
-    return this._exists;
-  }
-
-  data() {
-    return this._exists ? this._data : null;
-  }
-
-  toDate() {
-    return this._data instanceof Date ? this._data : new Date();
+const mockLessons = {
+  'lesson-001': {
+    authorId: 'admin-user-123',
+    title: 'Introduction to Data Science',
+    category: 'Data Science',
+    type: 'Lesson Plan',
+    level: 'Basic',
+    objectives: ['Define data science', 'Explore a dataset'],
+    duration: 45,
+    sections: [
+      { intro: 'Warm up with a short reading.', contentIds: ['unit-001'] },
+      { intro: 'Chart the class survey.', contentIds: ['unit-001', 'unit-003'] }
+    ],
+    description: 'A first look at collecting and exploring data.',
+    isPublic: true,
+    createdAt: '2024-01-05T00:00:00.000Z'
+  },
+  'lesson-002': {
+    authorId: 'admin-user-123',
+    title: 'Forces and Motion',
+    category: 'Physics',
+    type: 'Lesson Plan',
+    level: 'Intermediate',
+    objectives: ["Apply Newton's laws"],
+    duration: 60,
+    sections: [
+      { intro: 'Measure a rolling ball.', contentIds: ['unit-002'] }
+    ],
+    description: "Hands-on experiments with Newton's laws.",
+    isPublic: true,
+    createdAt: '2024-01-12T00:00:00.000Z'
+  },
+  'lesson-003': {
+    authorId: 'premium-user-123',
+    title: 'Testing Your First Program',
+    category: 'Software Testing',
+    type: 'Lesson Plan',
+    level: 'Basic',
+    objectives: ['Write a unit test'],
+    duration: 30,
+    sections: [],
+    description: 'Why and how we test software.',
+    isPublic: true,
+    createdAt: '2024-02-03T00:00:00.000Z'
+  },
+  'lesson-004': {
+    authorId: 'premium-user-123',
+    title: 'Version Control Basics',
+    category: 'Software Engineering',
+    type: 'Lesson Plan',
+    level: 'Basic',
+    objectives: ['Commit and branch with git'],
+    duration: 50,
+    sections: [],
+    description: 'Tracking changes with git.',
+    isPublic: true,
+    createdAt: '2024-02-20T00:00:00.000Z'
+  },
+  'lesson-005': {
+    authorId: 'premium-user-123',
+    title: 'Charts That Tell a Story',
+    category: 'Data Science',
+    type: 'Lesson Plan',
+    level: 'Advanced',
+    objectives: ['Choose the right chart'],
+    duration: 40,
+    sections: [],
+    description: 'Visualising data for an audience.',
+    isPublic: true,
+    createdAt: '2024-03-01T00:00:00.000Z'
+  },
+  'lesson-006': {
+    authorId: 'test-user-123',
+    title: 'My Draft Lesson',
+    category: 'Physics',
+    type: 'Lesson Plan',
+    level: 'Basic',
+    objectives: ['Draft objective'],
+    duration: 20,
+    sections: [
+      { intro: 'Draft section.', contentIds: ['unit-004', 'unit-005'] }
+    ],
+    description: 'Work in progress.',
+    isPublic: false,
+    createdAt: '2024-03-10T00:00:00.000Z'
+  },
+  'lesson-007': {
+    authorId: 'test-user-123',
+    title: 'Another Private Lesson',
+    category: 'Data Science',
+    type: 'Lesson Plan',
+    level: 'Intermediate',
+    objectives: ['Private objective'],
+    duration: 25,
+    sections: [],
+    description: 'Only visible to its author.',
+    isPublic: false,
+    createdAt: '2024-03-15T00:00:00.000Z'
   }
-}
+};
 
 /**
- * Mock QuerySnapshot class
+ * Mock content units for testing
  */
-class MockQuerySnapshot {
-  constructor(docs) {
-    this.docs = docs;
-  }
-
-  get size() {
-    return this.docs.length;
-  }
-
-  forEach(callback) {
-    this.docs.forEach(callback);
+const mockUnits = {
+  'unit-001': {
+    UnitID: 'diya1',
+    Title: 'What Is Data?',
+    Category: 'Data Science',
+    Type: 'Reading',
+    Level: 'Basic',
+    Duration: 15,
+    isPublic: true,
+    Abstract: 'Short reading on kinds of data.',
+    fileUrl: 'https://example.com/units/what-is-data.pdf',
+    Author: 'admin-user-123',
+    LastModified: '2024-01-02T00:00:00.000Z'
+  },
+  'unit-002': {
+    UnitID: 'diya2',
+    Title: 'Measuring Motion',
+    Category: 'Physics',
+    Type: 'Activity',
+    Level: 'Intermediate',
+    Duration: 30,
+    isPublic: true,
+    Abstract: 'Timing a rolling ball.',
+    fileUrl: 'https://example.com/units/measuring-motion.pdf',
+    Author: 'admin-user-123',
+    LastModified: '2024-01-10T00:00:00.000Z'
+  },
+  'unit-003': {
+    UnitID: 'diya3',
+    Title: 'Unit Testing Walkthrough',
+    Category: 'Software Testing',
+    Type: 'Video',
+    Level: 'Basic',
+    Duration: 12,
+    isPublic: true,
+    Abstract: 'Screencast writing a first test.',
+    fileUrl: 'https://example.com/units/unit-testing.mp4',
+    Author: 'premium-user-123',
+    LastModified: '2024-02-01T00:00:00.000Z'
+  },
+  'unit-004': {
+    UnitID: 'diya4',
+    Title: 'Git Cheat Sheet',
+    Category: 'Software Engineering',
+    Type: 'Reading',
+    Level: 'Basic',
+    Duration: 5,
+    isPublic: true,
+    Abstract: 'The ten git commands you need.',
+    fileUrl: 'https://example.com/units/git-cheat-sheet.pdf',
+    Author: 'test-user-123',
+    LastModified: '2024-02-18T00:00:00.000Z'
+  },
+  'unit-005': {
+    UnitID: 'diya5',
+    Title: 'Draft Worksheet',
+    Category: 'Physics',
+    Type: 'Worksheet',
+    Level: 'Basic',
+    Duration: 20,
+    isPublic: false,
+    Abstract: 'Unfinished worksheet.',
+    fileUrl: 'https://example.com/units/draft-worksheet.pdf',
+    Author: 'test-user-123',
+    LastModified: '2024-03-09T00:00:00.000Z'
+  },
+  'unit-006': {
+    UnitID: 'diya6',
+    Title: 'Premium Private Notes',
+    Category: 'Data Science',
+    Type: 'Reading',
+    Level: 'Advanced',
+    Duration: 10,
+    isPublic: false,
+    Abstract: 'Notes only the premium user can see.',
+    fileUrl: 'https://example.com/units/premium-notes.pdf',
+    Author: 'premium-user-123',
+    LastModified: '2024-03-12T00:00:00.000Z'
   }
-}
+};
 
 /**
- * Mock DocumentReference class
+ * Mock modules for testing (both lessonPlans shapes used in production)
  */
-class MockDocumentReference {
-  constructor(collectionName, docId) {
-    this.collectionName = collectionName;
-    this.docId = docId;
-  }
-
-  async get() {
-    // Simulate network delay
-    await new Promise(resolve => setTimeout(resolve, 10));
-
-    const userData = mockUsers[this.docId];
-    if (userData) {
-      return new MockDocumentSnapshot(this.docId, userData, true);
-    } else {
-      return new MockDocumentSnapshot(this.docId, null, false);
-    }
-  }
-
-  async set(data) {
-    // Simulate network delay
-    await new Promise(resolve => setTimeout(resolve, 10));
-
-    // Add timestamps
-    const timestamp = new Date();
-    const userData = {
-      ...data,
-      createdAt: timestamp,
-      updatedAt: timestamp
-    };
-
-    mockUsers[this.docId] = userData;
-    return { writeTime: timestamp };
-  }
-
-  async update(data) {
-    // Simulate network delay
-    await new Promise(resolve => setTimeout(resolve, 10));
-
-    if (!mockUsers[this.docId]) {
-      throw new Error('Document not found');
-    }
-
-    // Update existing user data
-    mockUsers[this.docId] = {
-      ...mockUsers[this.docId],
-      ...data,
-      updatedAt: new Date()
-    };
-
-    return { writeTime: new Date() };
-  }
-
-  async delete() {
-    // Simulate network delay
-    await new Promise(resolve => setTimeout(resolve, 10));
-
-    delete mockUsers[this.docId];
-    return { writeTime: new Date() };
+const mockModules = {
+  'module-001': {
+    title: 'Data Science Foundations',
+    description: 'Start here to learn how to work with data.',
+    tags: ['Data Science'],
+    lessonPlans: { 0: 'lesson-001', 1: 'lesson-005' },
+    image: 'module1'
+  },
+  'module-002': {
+    title: 'Engineering Practices',
+    description: 'Testing and version control for new programmers.',
+    tags: ['Software Engineering', 'Software Testing'],
+    lessonPlans: ['lesson-003', 'lesson-004', 'lesson-002'],
+    image: 'module2'
   }
-}
+};
 
 /**
- * Mock Query class
+ * Seed data for non-user collections, keyed by unqualified collection name
  */
-class MockQuery {
-  constructor(collectionName) {
-    this.collectionName = collectionName;
-    this._limit = null;
-    this._offset = 0;
-    this._orderBy = null;
-    this._where = [];
-  }
-
-  limit(count) {
-    this._limit = count;
-    return this;
-  }
-
-  offset(count) {
-    this._offset = count;
-    return this;
-  }
-
-  orderBy(field, direction = 'asc') {
-    this._orderBy = { field, direction };
-    return this;
-  }
-
-  where(field, operator, value) {
-    this._where.push({ field, operator, value });
-    return this;
-  }
-
-  async get() {
-    // Simulate network delay
-    await new Promise(resolve => setTimeout(resolve, 20));
-
-    let users = Object.entries(mockUsers).map(([id, data]) =>
-      new MockDocumentSnapshot(id, data, true)
-    );
-
-    // Apply where filters
-    this._where.forEach(filter => {
-      users = users.filter(doc => {
-        const docData = doc.data();
-        const fieldValue = docData[filter.field];
-
-        switch (filter.operator) {
-          case '==':
-            return fieldValue === filter.value;
-          case '!=':
-            return fieldValue !== filter.value;
-          case '>':
-            return fieldValue > filter.value;
-          case '>=':
-            return fieldValue >= filter.value;
-          case '<':
-            return fieldValue < filter.value;
-          case '<=':
-            return fieldValue <= filter.value;
-          default:
-            return true;
-        }
-      });
-    });
-
-    // Apply ordering
-    if (this._orderBy) {
-      users.sort((a, b) => {
-        const aValue = a.data()[this._orderBy.field];
-        const bValue = b.data()[this._orderBy.field];
-
-        if (this._orderBy.direction === 'desc') {
-          return bValue > aValue ? 1 : -1;
-        } else {
-          return aValue > bValue ? 1 : -1;
-        }
-      });
-    }
-
-    // Apply pagination
-    if (this._offset > 0) {
-      users = users.slice(this._offset);
-    }
-    if (this._limit) {
-      users = users.slice(0, this._limit);
-    }
+const mockSeedCollections = {
+  lesson: mockLessons,
+  content: mockUnits,
+  module: mockModules,
+  // Last UnitID handed out (seed units are diya1..diya6)
+  counters: { unitIdCounter: { lastNumber: 6 } }
+};
 
-    return new MockQuerySnapshot(users);
-  }
+// Stored collection shared by every user profile collection
+const USERS_COLLECTION = 'users';
 
-  async count() {
-    const snapshot = await this.get();
-    return {
-      data() {
-        return { count: snapshot.size };
-      }
-    };
-  }
+/**
+ * User profile collections (teachers, students and the unified users table)
+ * all resolve to one shared collection
+ */
+function isUserCollection(collectionName) {
+  return collectionName === 'teachers' ||
+    collectionName === 'students' ||
+    collectionName.endsWith('users');
 }
 
 /**
- * Mock Collection Reference class
+ * Documents behind every mock Firestore instance. Undefined fields are
+ * dropped like the old mock did; FIRESTORE_EMULATOR_IGNORE_UNDEFINED=false
+ * rejects them as production Firestore does
  */
-class MockCollectionReference extends MockQuery {
-  constructor(collectionName) {
-    super(collectionName);
-  }
-
-  doc(docId) {
-    return new MockDocumentReference(this.collectionName, docId);
-  }
-}
+const mockStore = new DocumentStore({
+  collectionAlias: (collectionName) => (isUserCollection(collectionName) ? USERS_COLLECTION : collectionName),
+  ignoreUndefinedProperties: process.env.FIRESTORE_EMULATOR_IGNORE_UNDEFINED !== 'false'
+});
 
 /**
- * Mock Firestore class
+ * Load the seed data into the store using the active schema qualifier
  */
-class MockFirestore {
-  collection(collectionName) {
-    return new MockCollectionReference(collectionName);
-  }
+function seedMockCollections() {
+  const schemaQualifier = resolveSchemaQualifier();
+  mockStore.clear();
+  mockStore.importDocuments(USERS_COLLECTION, Object.entries(mockUsers));
+  Object.entries(mockSeedCollections).forEach(([name, docs]) => {
+    mockStore.importDocuments(schemaQualifier + name, Object.entries(docs));
+  });
 
-  // Mock FieldValue for server timestamps
-  static get FieldValue() {
-    return {
-      serverTimestamp: () => new Date(),
-      delete: () => null,
-      increment: (n) => n,
-      arrayUnion: (...elements) => elements,
-      arrayRemove: (...elements) => elements
-    };
-  }
+  // Build the content -> lessons usage index the same way the backfill script does
+  const contentUsage = {};
+  Object.entries(mockLessons).forEach(([lessonId, lesson]) => {
+    lesson.sections.forEach(section => {
+      (section.contentIds || []).forEach(contentId => {
+        contentUsage[contentId] = contentUsage[contentId] || { lessons: {} };
+        contentUsage[contentId].lessons[lessonId] = lesson.title;
+      });
+    });
+  });
+  mockStore.importDocuments(schemaQualifier + 'contentUsage', Object.entries(contentUsage));
 }
 
+seedMockCollections();
+
 /**
  * Mock Firebase Auth class
  */
 class MockAuth {
-  async verifyIdToken(token) {
+  constructor() {
+    // Call counters so tests can assert how often tokens were really verified
+    this.verifyIdTokenCalls = 0;
+    this.revocationChecks = 0;
+  }
+
+  async verifyIdToken(token, checkRevoked = false) {
+    this.verifyIdTokenCalls++;
+    if (checkRevoked) {
+      this.revocationChecks++;
+    }
+
     // Simulate network delay
     await new Promise(resolve => setTimeout(resolve, 10));
 
+    // Mock tokens are valid for an hour from verification, like real ID tokens
+    const iat = Math.floor(Date.now() / 1000);
+    const claims = { iat, exp: iat + 3600, email_verified: true };
+
     // Mock token verification
     if (token === 'valid-admin-token') {
       return {
         uid: 'admin-user-123',
         email: 'admin@example.com',
-        email_verified: true
+        ...claims
       };
     } else if (token === 'valid-user-token') {
       return {
         uid: 'test-user-123',
         email: 'test@example.com',
-        email_verified: true
+        ...claims
       };
     } else if (token === 'valid-premium-token') {
       return {
         uid: 'premium-user-123',
         email: 'premium@example.com',
-        email_verified: true
+        ...claims
+      };
+    } else if (token === 'valid-new-user-token') {
+      // Signed in but not registered yet: has no profile document
+      return {
+        uid: 'new-user-123',
+        email: 'new@example.com',
+        ...claims
       };
     } else {
       const error = new Error('Invalid token');
@@ -325,11 +385,22 @@ class MockAuth {
     }
   }
 
+  /**
+   * Verification counters (useful for asserting token cache hit rates)
+   */
+  getStats() {
+    return {
+      verifyIdTokenCalls: this.verifyIdTokenCalls,
+      revocationChecks: this.revocationChecks
+    };
+  }
+
   async getUser(uid) {
     // Simulate network delay
     await new Promise(resolve => setTimeout(resolve, 10));
 
-    const userData = mockUsers[uid];
+    const record = mockStore.getRecord(USERS_COLLECTION, uid);
+    const userData = record ? record.data : null;
     if (userData) {
       return {
         uid,
@@ -350,7 +421,7 @@ class MockAuth {
  */
 class MockFirebaseAdmin {
   constructor() {
-    this._firestore = new MockFirestore();
+    this._firestore = new Firestore({ store: mockStore });
     this._auth = new MockAuth();
   }
 
@@ -361,12 +432,6 @@ class MockFirebaseAdmin {
   auth() {
     return this._auth;
   }
-
-  static get firestore() {
-    return {
-      FieldValue: MockFirestore.FieldValue
-    };
-  }
 }
 
 /**
@@ -375,8 +440,10 @@ class MockFirebaseAdmin {
 function createMockFirebaseAdmin() {
   const mockAdmin = new MockFirebaseAdmin();
 
-  // Add static firestore property that matches real Firebase Admin SDK
-  mockAdmin.firestore.FieldValue = MockFirestore.FieldValue;
+  // Add the static firestore namespace that matches real Firebase Admin SDK
+  mockAdmin.firestore.FieldValue = FieldValue;
+  mockAdmin.firestore.FieldPath = FieldPath;
+  mockAdmin.firestore.Timestamp = Timestamp;
 
   return mockAdmin;
 }
@@ -385,29 +452,33 @@ function createMockFirebaseAdmin() {
  * Reset mock data (useful for testing)
  */
 function resetMockData() {
-  Object.keys(mockUsers).forEach(key => {
-    if (!['test-user-123', 'admin-user-123', 'premium-user-123'].includes(key)) {
-      delete mockUsers[key];
-    }
-  });
+  seedMockCollections();
+}
+
+/**
+ * Import a generated dataset (python -m tests.datasets generate) on top of
+ * the seed data, under the active schema qualifier
+ * @param {string} directory - Dataset directory
+ * @returns {Promise<Object>} Documents imported per collection
+ */
+function loadMockDataset(directory) {
+  return loadDataset(mockStore, directory, { qualifier: resolveSchemaQualifier() });
 }
 
 /**
  * Add mock user data (useful for testing)
  */
 function addMockUser(userId, userData) {
-  mockUsers[userId] = {
-    ...userData,
-    createdAt: new Date(),
-    updatedAt: new Date()
-  };
+  const now = new Date();
+  mockStore.importDocuments(USERS_COLLECTION, [[userId, { ...userData, createdAt: now, updatedAt: now }]]);
 }
 
 module.exports = {
   createMockFirebaseAdmin,
   resetMockData,
+  loadMockDataset,
   addMockUser,
-  MockFirestore,
   MockAuth,
-  mockUsers
-};
\ No newline at end of file
+  mockUsers,
+  mockStore
+};
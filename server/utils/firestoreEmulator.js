@@ -0,0 +1,1576 @@
+/**
+ * In-memory Firestore emulator behind mock mode (ENABLE_MOCK_FIREBASE=true)
+ * Implements the part of the Admin SDK the server uses, with production
+ * semantics where they affect correctness or performance:
+ * - documents live in per-collection maps, stored the way Firestore stores
+ *   them: Dates become Timestamps and FieldValue sentinels are applied at
+ *   commit time; `undefined` values are rejected unless the store is created
+ *   with ignoreUndefinedProperties, as with the SDK setting
+ * - where/orderBy/cursors are answered from sorted single-field indexes,
+ *   built on first use and kept up to date on writes, so a limit() query over
+ *   a 100k-document collection walks about `limit` index entries instead of
+ *   sorting the collection
+ * - values compare with Firestore's cross-type ordering, and documents
+ *   missing a filtered or ordered field are left out
+ * - WriteBatch commits are atomic; transactions are optimistic and retried
+ *   on conflict, failing with ABORTED after MAX_TRANSACTION_ATTEMPTS
+ * - every RPC (document read or write, query, getAll, commit, count) waits on
+ *   a latency model: FIRESTORE_EMULATOR_LATENCY (a utils/latency.js spec,
+ *   default "fixed:10") plus FIRESTORE_EMULATOR_LATENCY_PER_DOC_MS for each
+ *   document returned
+ *
+ * Read/write/scan counters are available from Firestore#getStats().
+ */
+
+const { Readable } = require('stream');
+const { createRandom, parseLatencySpec, sleep } = require('./latency');
+const { pickFields } = require('./projection');
+
+const DOCUMENT_ID_FIELD = '__name__';
+const MAX_BATCH_WRITES = 500;
+const MAX_DISJUNCTION_VALUES = 30;
+const MAX_TRANSACTION_ATTEMPTS = 5;
+// Base of the jittered exponential backoff between transaction attempts
+const TRANSACTION_BACKOFF_MS = 20;
+// Streams pay the per-document latency in chunks of this many documents
+const STREAM_CHUNK_SIZE = 100;
+
+const DEFAULT_LATENCY = process.env.FIRESTORE_EMULATOR_LATENCY || 'fixed:10';
+const DEFAULT_PER_DOCUMENT_MS = parseFloat(process.env.FIRESTORE_EMULATOR_LATENCY_PER_DOC_MS) || 0;
+
+// gRPC status codes, as set on SDK errors
+const STATUS = {
+  INVALID_ARGUMENT: 3,
+  NOT_FOUND: 5,
+  ALREADY_EXISTS: 6,
+  ABORTED: 10
+};
+
+const OPERATORS = ['<', '<=', '==', '!=', '>=', '>', 'in', 'not-in', 'array-contains', 'array-contains-any'];
+const RANGE_OPERATORS = ['<', '<=', '>', '>='];
+
+function firestoreError(status, message) {
+  const name = Object.keys(STATUS).find((key) => STATUS[key] === status);
+  const error = new Error(`${status} ${name}: ${message}`);
+  error.code = status;
+  return error;
+}
+
+/**
+ * Firestore Timestamp: seconds and nanoseconds since the epoch
+ */
+class Timestamp {
+  constructor(seconds, nanoseconds) {
+    this._seconds = seconds;
+    this._nanoseconds = nanoseconds;
+  }
+
+  static now() {
+    return Timestamp.fromMillis(Date.now());
+  }
+
+  static fromDate(date) {
+    return Timestamp.fromMillis(date.getTime());
+  }
+
+  static fromMillis(millis) {
+    const seconds = Math.floor(millis / 1000);
+    const nanoseconds = Math.min(Math.round((millis - seconds * 1000) * 1e6), 999999999);
+    return new Timestamp(seconds, nanoseconds);
+  }
+
+  get seconds() {
+    return this._seconds;
+  }
+
+  get nanoseconds() {
+    return this._nanoseconds;
+  }
+
+  toDate() {
+    return new Date(this.toMillis());
+  }
+
+  toMillis() {
+    return this._seconds * 1000 + Math.floor(this._nanoseconds / 1e6);
+  }
+
+  isEqual(other) {
+    return other instanceof Timestamp &&
+      other._seconds === this._seconds &&
+      other._nanoseconds === this._nanoseconds;
+  }
+
+  // Zero-padded like the SDK's, so Timestamps also compare with < and >
+  valueOf() {
+    const seconds = String(this._seconds + 62135596800).padStart(12, '0');
+    return `${seconds}.${String(this._nanoseconds).padStart(9, '0')}`;
+  }
+}
+
+/**
+ * Sentinel written in place of a value and resolved at commit time
+ */
+class FieldTransform {
+  constructor(kind, operand) {
+    this.kind = kind;
+    this.operand = operand;
+  }
+
+  isEqual(other) {
+    return other instanceof FieldTransform && other.kind === this.kind;
+  }
+}
+
+const FieldValue = {
+  serverTimestamp: () => new FieldTransform('serverTimestamp'),
+  delete: () => new FieldTransform('delete'),
+  increment: (n) => new FieldTransform('increment', n),
+  arrayUnion: (...elements) => new FieldTransform('arrayUnion', elements),
+  arrayRemove: (...elements) => new FieldTransform('arrayRemove', elements)
+};
+
+const FieldPath = {
+  documentId: () => DOCUMENT_ID_FIELD
+};
+
+function isPlainMap(value) {
+  return value !== null &&
+    typeof value === 'object' &&
+    !Array.isArray(value) &&
+    !(value instanceof Timestamp) &&
+    !(value instanceof Date) &&
+    !(value instanceof FieldTransform) &&
+    !(value instanceof DocumentReference) &&
+    !Buffer.isBuffer(value);
+}
+
+/**
+ * Rank of a value's type in Firestore's ordering:
+ * null < booleans < numbers < timestamps < strings < bytes < references < arrays < maps
+ */
+function typeOrder(value) {
+  if (value === null || value === undefined) return 0;
+  if (typeof value === 'boolean') return 1;
+  if (typeof value === 'number') return 2;
+  if (value instanceof Timestamp) return 3;
+  if (typeof value === 'string') return 4;
+  if (Buffer.isBuffer(value)) return 5;
+  if (value instanceof DocumentReference) return 6;
+  if (Array.isArray(value)) return 8;
+  return 9;
+}
+
+function compareNumbers(a, b) {
+  // NaN sorts before every other number
+  if (Number.isNaN(a)) return Number.isNaN(b) ? 0 : -1;
+  if (Number.isNaN(b)) return 1;
+  return a < b ? -1 : a > b ? 1 : 0;
+}
+
+function compareStrings(a, b) {
+  return a < b ? -1 : a > b ? 1 : 0;
+}
+
+/**
+ * Compare two stored values the way Firestore orders them
+ */
+function compareValues(a, b) {
+  const leftType = typeOrder(a);
+  const rightType = typeOrder(b);
+  if (leftType !== rightType) {
+    return leftType < rightType ? -1 : 1;
+  }
+
+  switch (leftType) {
+    case 0:
+      return 0;
+    case 1:
+    case 2:
+      return compareNumbers(Number(a), Number(b));
+    case 3:
+      return compareNumbers(a._seconds, b._seconds) || compareNumbers(a._nanoseconds, b._nanoseconds);
+    case 4:
+      return compareStrings(a, b);
+    case 5:
+      return Buffer.compare(a, b);
+    case 6:
+      return compareStrings(a.path, b.path);
+    case 8: {
+      const length = Math.min(a.length, b.length);
+      for (let i = 0; i < length; i++) {
+        const result = compareValues(a[i], b[i]);
+        if (result !== 0) return result;
+      }
+      return compareNumbers(a.length, b.length);
+    }
+    default: {
+      const leftKeys = Object.keys(a).sort();
+      const rightKeys = Object.keys(b).sort();
+      const length = Math.min(leftKeys.length, rightKeys.length);
+      for (let i = 0; i < length; i++) {
+        const result = compareStrings(leftKeys[i], rightKeys[i]) || compareValues(a[leftKeys[i]], b[rightKeys[i]]);
+        if (result !== 0) return result;
+      }
+      return compareNumbers(leftKeys.length, rightKeys.length);
+    }
+  }
+}
+
+/**
+ * Read a (possibly dotted) field from stored document data
+ */
+function getField(data, field) {
+  if (!field.includes('.')) {
+    return data[field];
+  }
+  let value = data;
+  for (const key of field.split('.')) {
+    if (!isPlainMap(value)) return undefined;
+    value = value[key];
+  }
+  return value;
+}
+
+function cloneValue(value) {
+  if (Array.isArray(value)) {
+    return value.map(cloneValue);
+  }
+  if (Buffer.isBuffer(value)) {
+    return Buffer.from(value);
+  }
+  if (isPlainMap(value)) {
+    const copy = {};
+    for (const key of Object.keys(value)) {
+      copy[key] = cloneValue(value[key]);
+    }
+    return copy;
+  }
+  // Timestamps and references are immutable
+  return value;
+}
+
+/**
+ * Convert a client value to its stored form
+ * @param {*} value - Value from set()/update()/where()
+ * @param {string} path - Field path, for error messages
+ * @param {Object} context - { ignoreUndefinedProperties }
+ */
+function encodeValue(value, path, context) {
+  if (value === undefined) {
+    throw firestoreError(
+      STATUS.INVALID_ARGUMENT,
+      `Cannot use "undefined" as a Firestore value (found in field "${path}"). ` +
+      'If you want to ignore undefined values, enable `ignoreUndefinedProperties`.'
+    );
+  }
+  if (value instanceof Date) {
+    return Timestamp.fromDate(value);
+  }
+  if (value instanceof FieldTransform) {
+    throw firestoreError(STATUS.INVALID_ARGUMENT, `FieldValue.${value.kind}() cannot be used inside of an array (found in field "${path}").`);
+  }
+  if (Array.isArray(value)) {
+    return value.map((item) => encodeValue(item, path, context));
+  }
+  if (Buffer.isBuffer(value)) {
+    return Buffer.from(value);
+  }
+  if (isPlainMap(value)) {
+    const encoded = {};
+    for (const [key, item] of Object.entries(value)) {
+      if (item === undefined && context.ignoreUndefinedProperties) continue;
+      encoded[key] = encodeValue(item, `${path}.${key}`, context);
+    }
+    return encoded;
+  }
+  return value;
+}
+
+function applyTransform(target, key, transform, path, context, allowDelete) {
+  const current = target[key];
+  switch (transform.kind) {
+    case 'delete':
+      if (!allowDelete) {
+        throw firestoreError(
+          STATUS.INVALID_ARGUMENT,
+          `FieldValue.delete() must appear at the top-level and can only be used in update() or set() with {merge:true} (found in field "${path}").`
+        );
+      }
+      delete target[key];
+      break;
+    case 'serverTimestamp':
+      target[key] = context.commitTime;
+      break;
+    case 'increment':
+      target[key] = (typeof current === 'number' ? current : 0) + transform.operand;
+      break;
+    case 'arrayUnion': {
+      const merged = Array.isArray(current) ? [...current] : [];
+      transform.operand.forEach((element) => {
+        const encoded = encodeValue(element, path, context);
+        if (!merged.some((existing) => compareValues(existing, encoded) === 0)) {
+          merged.push(encoded);
+        }
+      });
+      target[key] = merged;
+      break;
+    }
+    case 'arrayRemove': {
+      const removed = transform.operand.map((element) => encodeValue(element, path, context));
+      target[key] = Array.isArray(current)
+        ? current.filter((existing) => !removed.some((element) => compareValues(existing, element) === 0))
+        : [];
+      break;
+    }
+    default:
+      throw firestoreError(STATUS.INVALID_ARGUMENT, `Unknown field transform "${transform.kind}"`);
+  }
+}
+
+/**
+ * Write the fields of a set() into `target`. Stored maps are never mutated:
+ * maps along a changed path are copied first
+ */
+function applyMap(target, fields, prefix, context, merge) {
+  for (const [key, value] of Object.entries(fields)) {
+    const path = prefix ? `${prefix}.${key}` : key;
+    if (value === undefined && context.ignoreUndefinedProperties) continue;
+
+    if (value instanceof FieldTransform) {
+      applyTransform(target, key, value, path, context, merge);
+    } else if (isPlainMap(value)) {
+      const base = merge && isPlainMap(target[key]) ? { ...target[key] } : {};
+      target[key] = applyMap(base, value, path, context, merge);
+    } else {
+      target[key] = encodeValue(value, path, context);
+    }
+  }
+  return target;
+}
+
+/**
+ * Apply update() fields, whose keys are dotted field paths
+ */
+function applyUpdate(data, fields, context) {
+  const root = { ...data };
+  for (const [fieldPath, value] of Object.entries(fields)) {
+    if (value === undefined && context.ignoreUndefinedProperties) continue;
+
+    const keys = fieldPath.split('.');
+    let parent = root;
+    for (const key of keys.slice(0, -1)) {
+      parent[key] = isPlainMap(parent[key]) ? { ...parent[key] } : {};
+      parent = parent[key];
+    }
+
+    const last = keys[keys.length - 1];
+    if (value instanceof FieldTransform) {
+      applyTransform(parent, last, value, fieldPath, context, true);
+    } else if (isPlainMap(value)) {
+      parent[last] = applyMap({}, value, fieldPath, context, false);
+    } else {
+      parent[last] = encodeValue(value, fieldPath, context);
+    }
+  }
+  return root;
+}
+
+/**
+ * update() takes either a map of field paths or alternating paths and values
+ */
+function normalizeUpdateFields(dataOrField, moreFieldsAndValues) {
+  if (typeof dataOrField !== 'string') {
+    return dataOrField;
+  }
+  const fields = { [dataOrField]: moreFieldsAndValues[0] };
+  for (let i = 1; i < moreFieldsAndValues.length; i += 2) {
+    fields[moreFieldsAndValues[i]] = moreFieldsAndValues[i + 1];
+  }
+  return fields;
+}
+
+function assertDocumentData(data) {
+  if (!isPlainMap(data)) {
+    throw firestoreError(
+      STATUS.INVALID_ARGUMENT,
+      'Value for argument "data" is not a valid Firestore document. Input is not a plain JavaScript object.'
+    );
+  }
+}
+
+// Sentinels for index searches that bound every document ID with a given value
+const MIN_ID = Symbol('minId');
+const MAX_ID = Symbol('maxId');
+
+/**
+ * Single-field index: parallel arrays of (value, document ID) pairs sorted by
+ * value, then ID. Documents without the field are not indexed, which is also
+ * why Firestore leaves them out of queries ordered or filtered on it
+ */
+class SortedIndex {
+  constructor(field) {
+    this.field = field;
+    this.values = [];
+    this.ids = [];
+  }
+
+  static build(field, docs) {
+    const entries = [];
+    for (const [id, record] of docs) {
+      const value = indexValue(field, id, record);
+      if (value !== undefined) {
+        entries.push([value, id]);
+      }
+    }
+    entries.sort((a, b) => compareValues(a[0], b[0]) || compareStrings(a[1], b[1]));
+
+    const index = new SortedIndex(field);
+    index.values = entries.map((entry) => entry[0]);
+    index.ids = entries.map((entry) => entry[1]);
+    return index;
+  }
+
+  get size() {
+    return this.ids.length;
+  }
+
+  _compareAt(position, value, id) {
+    const result = compareValues(this.values[position], value);
+    if (result !== 0) return result;
+    if (id === MIN_ID) return 1;
+    if (id === MAX_ID) return -1;
+    return compareStrings(this.ids[position], id);
+  }
+
+  // First position whose entry is >= (value, id)
+  lowerBound(value, id = MIN_ID) {
+    let low = 0;
+    let high = this.ids.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (this._compareAt(mid, value, id) < 0) low = mid + 1;
+      else high = mid;
+    }
+    return low;
+  }
+
+  // First position whose entry is > (value, id)
+  upperBound(value, id = MAX_ID) {
+    let low = 0;
+    let high = this.ids.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (this._compareAt(mid, value, id) <= 0) low = mid + 1;
+      else high = mid;
+    }
+    return low;
+  }
+
+  // Positions [start, end) holding values of one type, for range filters
+  typeRange(rank) {
+    let low = 0;
+    let high = this.ids.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (typeOrder(this.values[mid]) < rank) low = mid + 1;
+      else high = mid;
+    }
+    const start = low;
+    high = this.ids.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (typeOrder(this.values[mid]) <= rank) low = mid + 1;
+      else high = mid;
+    }
+    return [start, low];
+  }
+
+  insert(value, id) {
+    const position = this.lowerBound(value, id);
+    this.values.splice(position, 0, value);
+    this.ids.splice(position, 0, id);
+  }
+
+  remove(value, id) {
+    const position = this.lowerBound(value, id);
+    if (this.ids[position] === id) {
+      this.values.splice(position, 1);
+      this.ids.splice(position, 1);
+    }
+  }
+}
+
+function indexValue(field, id, record) {
+  return field === DOCUMENT_ID_FIELD ? id : getField(record.data, field);
+}
+
+/**
+ * Documents of one collection plus the indexes built over them so far
+ */
+class CollectionStore {
+  constructor(name) {
+    this.name = name;
+    this.docs = new Map();
+    this.indexes = new Map();
+  }
+
+  getIndex(field) {
+    let index = this.indexes.get(field);
+    if (!index) {
+      index = SortedIndex.build(field, this.docs);
+      this.indexes.set(field, index);
+    }
+    return index;
+  }
+
+  write(id, record) {
+    const previous = this.docs.get(id);
+    for (const [field, index] of this.indexes) {
+      const before = previous ? indexValue(field, id, previous) : undefined;
+      const after = record ? indexValue(field, id, record) : undefined;
+      if (before !== undefined && after !== undefined && compareValues(before, after) === 0) continue;
+      if (before !== undefined) index.remove(before, id);
+      if (after !== undefined) index.insert(after, id);
+    }
+
+    if (record) {
+      this.docs.set(id, record);
+    } else {
+      this.docs.delete(id);
+    }
+  }
+}
+
+function createStats() {
+  return {
+    roundTrips: 0,
+    reads: 0,
+    writes: 0,
+    deletes: 0,
+    queries: 0,
+    indexedQueries: 0,
+    fullScans: 0,
+    documentsScanned: 0,
+    transactions: 0,
+    transactionRetries: 0
+  };
+}
+
+/**
+ * All collections of one emulated database. Several Firestore instances
+ * may share a store (e.g. one per mock Firebase app)
+ */
+class DocumentStore {
+  /**
+   * @param {Object} options - { collectionAlias, ignoreUndefinedProperties }
+   *   collectionAlias maps a collection path to the one actually stored
+   */
+  constructor(options = {}) {
+    this.collectionAlias = options.collectionAlias || ((path) => path);
+    this.ignoreUndefinedProperties = Boolean(options.ignoreUndefinedProperties);
+    this.collections = new Map();
+    this.version = 0;
+    this.lastCommitMillis = 0;
+    this.stats = createStats();
+  }
+
+  collection(path) {
+    const name = this.collectionAlias(path);
+    let store = this.collections.get(name);
+    if (!store) {
+      store = new CollectionStore(name);
+      this.collections.set(name, store);
+    }
+    return store;
+  }
+
+  getRecord(collectionPath, id) {
+    return this.collection(collectionPath).docs.get(id) || null;
+  }
+
+  // Commit times are unique and increasing, so updateTime works as a version
+  nextCommitTime() {
+    this.lastCommitMillis = Math.max(Date.now(), this.lastCommitMillis + 1);
+    return Timestamp.fromMillis(this.lastCommitMillis);
+  }
+
+  /**
+   * Validate and apply writes atomically: either all of them land or none
+   * @param {Array<Object>} writes - { type, ref, data, options }
+   * @param {Map} readVersions - Transaction reads that must be unchanged
+   * @returns {Array<Object>} WriteResults
+   */
+  commit(writes, readVersions = null) {
+    if (readVersions) {
+      for (const { collectionPath, id, version } of readVersions.values()) {
+        const record = this.getRecord(collectionPath, id);
+        if ((record ? record.version : 0) !== version) {
+          throw firestoreError(STATUS.ABORTED, 'Too much contention on these documents. Please try again.');
+        }
+      }
+    }
+
+    const commitTime = this.nextCommitTime();
+    const context = { commitTime, ignoreUndefinedProperties: this.ignoreUndefinedProperties };
+    const staged = new Map();
+
+    for (const { type, ref, data, options } of writes) {
+      const store = this.collection(ref._collectionPath);
+      const key = `${store.name}/${ref.id}`;
+      const existing = staged.has(key) ? staged.get(key).record : store.docs.get(ref.id) || null;
+
+      let newData;
+      if (type === 'delete') {
+        staged.set(key, { store, id: ref.id, record: null });
+        continue;
+      } else if (type === 'create') {
+        if (existing) {
+          throw firestoreError(STATUS.ALREADY_EXISTS, `Document already exists: ${ref.path}`);
+        }
+        newData = applyMap({}, data, '', context, false);
+      } else if (type === 'update') {
+        if (!existing) {
+          throw firestoreError(STATUS.NOT_FOUND, `No document to update: ${ref.path}`);
+        }
+        newData = applyUpdate(existing.data, data, context);
+      } else if (options && options.merge) {
+        newData = applyMap({ ...(existing ? existing.data : {}) }, data, '', context, true);
+      } else {
+        newData = applyMap({}, data, '', context, false);
+      }
+
+      staged.set(key, {
+        store,
+        id: ref.id,
+        record: {
+          data: newData,
+          createTime: existing ? existing.createTime : commitTime,
+          updateTime: commitTime,
+          version: ++this.version
+        }
+      });
+    }
+
+    for (const { store, id, record } of staged.values()) {
+      store.write(id, record);
+    }
+    writes.forEach(({ type }) => {
+      if (type === 'delete') this.stats.deletes++;
+      else this.stats.writes++;
+    });
+    return writes.map(() => ({ writeTime: commitTime }));
+  }
+
+  /**
+   * Load documents directly, without latency, write semantics or stats.
+   * Indexes of the collection are dropped and rebuilt on next use, which is
+   * much faster than maintaining them entry by entry during a bulk load
+   * @param {string} collectionPath - Collection to load into
+   * @param {Iterable} documents - [id, data] pairs or { id, ...data } objects
+   * @returns {number} Documents loaded
+   */
+  importDocuments(collectionPath, documents) {
+    const store = this.collection(collectionPath);
+    const commitTime = this.nextCommitTime();
+    const context = { commitTime, ignoreUndefinedProperties: true };
+
+    let count = 0;
+    for (const document of documents) {
+      const [id, data] = Array.isArray(document)
+        ? document
+        : [document.id, (({ id: _id, ...rest }) => rest)(document)];
+      const existing = store.docs.get(id);
+      store.docs.set(id, {
+        data: applyMap({}, data, '', context, false),
+        createTime: existing ? existing.createTime : commitTime,
+        updateTime: commitTime,
+        version: ++this.version
+      });
+      count++;
+    }
+    store.indexes.clear();
+    return count;
+  }
+
+  clear() {
+    this.collections.clear();
+  }
+}
+
+/**
+ * DocumentSnapshot and QueryDocumentSnapshot
+ */
+class DocumentSnapshot {
+  constructor(ref, record, readTime, fields = null) {
+    this.ref = ref;
+    this._record = record;
+    this._fields = fields;
+    this.readTime = readTime;
+  }
+
+  get id() {
+    return this.ref.id;
+  }
+
+  get exists() {
+    return this._record !== null;
+  }
+
+  get createTime() {
+    return this._record ? this._record.createTime : undefined;
+  }
+
+  get updateTime() {
+    return this._record ? this._record.updateTime : undefined;
+  }
+
+  data() {
+    if (!this._record) {
+      return undefined;
+    }
+    const data = this._fields ? pickFields(this._record.data, this._fields) : this._record.data;
+    return cloneValue(data);
+  }
+
+  get(field) {
+    if (!this._record) {
+      return undefined;
+    }
+    if (field === DOCUMENT_ID_FIELD) {
+      return this.id;
+    }
+    if (this._fields && !this._fields.some((selected) => field === selected || field.startsWith(`${selected}.`))) {
+      return undefined;
+    }
+    return cloneValue(getField(this._record.data, field));
+  }
+
+  isEqual(other) {
+    return other instanceof DocumentSnapshot &&
+      other.ref.isEqual(this.ref) &&
+      other._record === this._record;
+  }
+}
+
+class QuerySnapshot {
+  constructor(query, docs, readTime) {
+    this.query = query;
+    this.docs = docs;
+    this.readTime = readTime;
+  }
+
+  get size() {
+    return this.docs.length;
+  }
+
+  get empty() {
+    return this.docs.length === 0;
+  }
+
+  forEach(callback, thisArg) {
+    this.docs.forEach(callback, thisArg);
+  }
+}
+
+class DocumentReference {
+  constructor(firestore, collectionPath, id) {
+    this._firestore = firestore;
+    this._collectionPath = collectionPath;
+    this.id = id;
+  }
+
+  get path() {
+    return `${this._collectionPath}/${this.id}`;
+  }
+
+  get parent() {
+    return new CollectionReference(this._firestore, this._collectionPath);
+  }
+
+  get firestore() {
+    return this._firestore;
+  }
+
+  collection(collectionPath) {
+    return new CollectionReference(this._firestore, `${this.path}/${collectionPath}`);
+  }
+
+  async get() {
+    await this._firestore._roundTrip();
+    return this._firestore._readDocument(this);
+  }
+
+  async create(data) {
+    assertDocumentData(data);
+    const [result] = await this._firestore._commit([{ type: 'create', ref: this, data }]);
+    return result;
+  }
+
+  async set(data, options = {}) {
+    assertDocumentData(data);
+    const [result] = await this._firestore._commit([{ type: 'set', ref: this, data, options }]);
+    return result;
+  }
+
+  async update(dataOrField, ...moreFieldsAndValues) {
+    const data = normalizeUpdateFields(dataOrField, moreFieldsAndValues);
+    assertDocumentData(data);
+    const [result] = await this._firestore._commit([{ type: 'update', ref: this, data }]);
+    return result;
+  }
+
+  async delete() {
+    const [result] = await this._firestore._commit([{ type: 'delete', ref: this }]);
+    return result;
+  }
+
+  isEqual(other) {
+    return other instanceof DocumentReference && other.path === this.path;
+  }
+}
+
+function normalizeCursorValue(value, field) {
+  if (field === DOCUMENT_ID_FIELD && value instanceof DocumentReference) {
+    return value.id;
+  }
+  return value instanceof Date ? Timestamp.fromDate(value) : value;
+}
+
+/**
+ * Query. Every builder method returns a new query, as in the SDK
+ */
+class Query {
+  constructor(firestore, collectionPath) {
+    this._firestore = firestore;
+    this._collectionPath = collectionPath;
+    this._where = [];
+    this._orderBy = [];
+    this._limit = null;
+    this._offset = 0;
+    this._select = null;
+    this._start = null;
+    this._end = null;
+  }
+
+  get firestore() {
+    return this._firestore;
+  }
+
+  _clone(changes) {
+    const query = new Query(this._firestore, this._collectionPath);
+    Object.assign(query, {
+      _where: this._where,
+      _orderBy: this._orderBy,
+      _limit: this._limit,
+      _offset: this._offset,
+      _select: this._select,
+      _start: this._start,
+      _end: this._end
+    }, changes);
+    return query;
+  }
+
+  where(field, operator, value) {
+    if (!OPERATORS.includes(operator)) {
+      throw firestoreError(STATUS.INVALID_ARGUMENT, `Invalid query operator "${operator}"`);
+    }
+    if (['in', 'not-in', 'array-contains-any'].includes(operator)) {
+      if (!Array.isArray(value) || value.length === 0 || value.length > MAX_DISJUNCTION_VALUES) {
+        throw firestoreError(
+          STATUS.INVALID_ARGUMENT,
+          `'${operator}' filters require a non-empty array of at most ${MAX_DISJUNCTION_VALUES} values`
+        );
+      }
+    }
+
+    const context = { ignoreUndefinedProperties: false };
+    const encode = (item) => (field === DOCUMENT_ID_FIELD && item instanceof DocumentReference
+      ? item.id
+      : encodeValue(item, field, context));
+    const encoded = Array.isArray(value) && ['in', 'not-in', 'array-contains-any'].includes(operator)
+      ? value.map(encode)
+      : encode(value);
+
+    return this._clone({ _where: [...this._where, { field, operator, value: encoded }] });
+  }
+
+  orderBy(field, direction = 'asc') {
+    if (direction !== 'asc' && direction !== 'desc') {
+      throw firestoreError(STATUS.INVALID_ARGUMENT, `Invalid order direction "${direction}"`);
+    }
+    if (this._start || this._end) {
+      throw firestoreError(STATUS.INVALID_ARGUMENT, 'Cannot specify an orderBy() constraint after calling startAt(), startAfter(), endBefore() or endAt().');
+    }
+    return this._clone({ _orderBy: [...this._orderBy, { field, direction }] });
+  }
+
+  limit(count) {
+    return this._clone({ _limit: count });
+  }
+
+  offset(count) {
+    return this._clone({ _offset: count });
+  }
+
+  /**
+   * Field projection: snapshots only carry the listed fields (filters and
+   * ordering still see the whole document). select() with no fields returns
+   * document IDs only
+   */
+  select(...fields) {
+    return this._clone({ _select: fields.filter((field) => field !== DOCUMENT_ID_FIELD) });
+  }
+
+  _cursor(values, inclusive) {
+    // Either raw values for the order fields or a document snapshot
+    const orderFields = this._orderFields();
+    const cursorValues = values.length === 1 && values[0] instanceof DocumentSnapshot
+      ? orderFields.map(({ field }) => values[0].get(field))
+      : values.map((value, index) => normalizeCursorValue(value, (orderFields[index] || {}).field));
+    if (cursorValues.length > orderFields.length) {
+      throw firestoreError(STATUS.INVALID_ARGUMENT, 'Too many cursor values specified. The specified values must match the orderBy() constraints of the query.');
+    }
+    return { values: cursorValues, inclusive };
+  }
+
+  startAt(...values) {
+    return this._clone({ _start: this._cursor(values, true) });
+  }
+
+  startAfter(...values) {
+    return this._clone({ _start: this._cursor(values, false) });
+  }
+
+  endAt(...values) {
+    return this._clone({ _end: this._cursor(values, true) });
+  }
+
+  endBefore(...values) {
+    return this._clone({ _end: this._cursor(values, false) });
+  }
+
+  /**
+   * Order fields with the implicit document ID tiebreaker Firestore appends
+   */
+  _orderFields() {
+    const fields = [...this._orderBy];
+    if (!fields.some(({ field }) => field === DOCUMENT_ID_FIELD)) {
+      const lastDirection = fields.length ? fields[fields.length - 1].direction : 'asc';
+      fields.push({ field: DOCUMENT_ID_FIELD, direction: lastDirection });
+    }
+    return fields;
+  }
+
+  _matches(id, record) {
+    for (const { field, operator, value } of this._where) {
+      if (!matchesFilter(indexValue(field, id, record), operator, value)) {
+        return false;
+      }
+    }
+    for (const { field } of this._orderBy) {
+      if (field !== DOCUMENT_ID_FIELD && getField(record.data, field) === undefined) {
+        return false;
+      }
+    }
+    return true;
+  }
+
+  _compareToCursor(id, record, cursorValues, orderFields) {
+    for (let i = 0; i < cursorValues.length; i++) {
+      const { field, direction } = orderFields[i];
+      const result = compareValues(indexValue(field, id, record), cursorValues[i]);
+      if (result !== 0) {
+        return direction === 'desc' ? -result : result;
+      }
+    }
+    return 0;
+  }
+
+  _withinCursors(id, record, orderFields) {
+    if (this._start) {
+      const result = this._compareToCursor(id, record, this._start.values, orderFields);
+      if (this._start.inclusive ? result < 0 : result <= 0) return false;
+    }
+    if (this._end) {
+      const result = this._compareToCursor(id, record, this._end.values, orderFields);
+      if (this._end.inclusive ? result > 0 : result >= 0) return false;
+    }
+    return true;
+  }
+
+  /**
+   * Index positions [start, end) holding the documents a filter can match,
+   * or null when the filter can't be answered from a single-field index
+   */
+  _filterRange(index, operator, value) {
+    if (operator === '==') {
+      return [index.lowerBound(value), index.upperBound(value)];
+    }
+    if (!RANGE_OPERATORS.includes(operator)) {
+      return null;
+    }
+    // Range filters only match values of the same type
+    let [start, end] = index.typeRange(typeOrder(value));
+    if (operator === '>') start = Math.max(start, index.upperBound(value));
+    if (operator === '>=') start = Math.max(start, index.lowerBound(value));
+    if (operator === '<') end = Math.min(end, index.lowerBound(value));
+    if (operator === '<=') end = Math.min(end, index.upperBound(value));
+    return [start, Math.max(start, end)];
+  }
+
+  /**
+   * Candidate document IDs for one filter, from its field's index
+   * @returns {Object|null} { count, ids() }
+   */
+  _filterCandidates(collection, { field, operator, value }) {
+    if (field === DOCUMENT_ID_FIELD && operator === '==') {
+      return { count: 1, ids: () => [value] };
+    }
+    if (field === DOCUMENT_ID_FIELD && operator === 'in') {
+      return { count: value.length, ids: () => [...new Set(value)] };
+    }
+
+    if (operator === 'in') {
+      const index = collection.getIndex(field);
+      const ranges = [...new Set(value)].map((item) => this._filterRange(index, '==', item));
+      return {
+        count: ranges.reduce((total, [start, end]) => total + end - start, 0),
+        ids: function* () {
+          for (const [start, end] of ranges) {
+            for (let i = start; i < end; i++) yield index.ids[i];
+          }
+        }
+      };
+    }
+
+    if (operator !== '==' && !RANGE_OPERATORS.includes(operator)) {
+      return null;
+    }
+    const index = collection.getIndex(field);
+    const [start, end] = this._filterRange(index, operator, value);
+    return {
+      count: end - start,
+      ids: function* () {
+        for (let i = start; i < end; i++) yield index.ids[i];
+      }
+    };
+  }
+
+  /**
+   * Walk the index of the first order field in query order, narrowed by
+   * filters on that field and by the start cursor. Possible when the query
+   * orders by one field plus the document ID tiebreaker in the same direction
+   * @returns {Object|null} { count, ids() }
+   */
+  _orderedScan(collection, orderFields) {
+    const [first, second] = orderFields;
+    if (orderFields.length > 2 || (second && (second.field !== DOCUMENT_ID_FIELD || second.direction !== first.direction))) {
+      return null;
+    }
+
+    const index = collection.getIndex(first.field);
+    let start = 0;
+    let end = index.size;
+    for (const { field, operator, value } of this._where) {
+      if (field !== first.field) continue;
+      const range = this._filterRange(index, operator, value);
+      if (range) {
+        start = Math.max(start, range[0]);
+        end = Math.min(end, range[1]);
+      }
+    }
+
+    if (this._start) {
+      const [value, id] = this._start.values;
+      const cursorId = first.field === DOCUMENT_ID_FIELD || id === undefined ? undefined : id;
+      if (first.direction === 'asc') {
+        const position = this._start.inclusive
+          ? index.lowerBound(value, cursorId === undefined ? MIN_ID : cursorId)
+          : index.upperBound(value, cursorId === undefined ? MAX_ID : cursorId);
+        start = Math.max(start, position);
+      } else {
+        const position = this._start.inclusive
+          ? index.upperBound(value, cursorId === undefined ? MAX_ID : cursorId)
+          : index.lowerBound(value, cursorId === undefined ? MIN_ID : cursorId);
+        end = Math.min(end, position);
+      }
+    }
+
+    const descending = first.direction === 'desc';
+    return {
+      count: Math.max(0, end - start),
+      ids: function* () {
+        if (descending) {
+          for (let i = end - 1; i >= start; i--) yield index.ids[i];
+        } else {
+          for (let i = start; i < end; i++) yield index.ids[i];
+        }
+      }
+    };
+  }
+
+  /**
+   * Pick how to produce candidate IDs: walk an order index (stops early once
+   * `limit` documents match), read a filter's index range and sort it, or
+   * scan the whole collection
+   */
+  _plan(collection, orderFields) {
+    let best = null;
+    for (const filter of this._where) {
+      const candidates = this._filterCandidates(collection, filter);
+      if (candidates && (!best || candidates.count < best.count)) {
+        best = candidates;
+      }
+    }
+
+    const ordered = this._orderedScan(collection, orderFields);
+    if (ordered) {
+      const wanted = this._limit !== null ? this._offset + this._limit : Infinity;
+      // Entries walked before `wanted` matches, if matches are spread evenly
+      const selectivity = best ? best.count / Math.max(collection.docs.size, 1) : 1;
+      const expectedScan = selectivity > 0 ? Math.min(ordered.count, wanted / selectivity) : ordered.count;
+      if (!best || expectedScan <= best.count) {
+        return { ordered: true, indexed: true, ids: ordered.ids() };
+      }
+    }
+    if (best) {
+      return { ordered: false, indexed: true, ids: best.ids() };
+    }
+    return { ordered: false, indexed: false, ids: collection.docs.keys() };
+  }
+
+  /**
+   * Run the query against the store
+   * @returns {Array<Array>} [id, record] pairs in query order
+   */
+  _execute() {
+    const store = this._firestore._store;
+    const collection = store.collection(this._collectionPath);
+    const orderFields = this._orderFields();
+    const plan = this._plan(collection, orderFields);
+    const wanted = this._limit !== null ? this._offset + this._limit : Infinity;
+
+    store.stats.queries++;
+    if (plan.indexed) store.stats.indexedQueries++;
+    else store.stats.fullScans++;
+
+    let results = [];
+    let scanned = 0;
+    for (const id of plan.ids) {
+      scanned++;
+      const record = collection.docs.get(id);
+      if (!record || !this._matches(id, record) || !this._withinCursors(id, record, orderFields)) {
+        continue;
+      }
+      results.push([id, record]);
+      if (plan.ordered && results.length >= wanted) break;
+    }
+    store.stats.documentsScanned += scanned;
+
+    if (!plan.ordered) {
+      results.sort(([leftId, left], [rightId, right]) => {
+        for (const { field, direction } of orderFields) {
+          const result = compareValues(indexValue(field, leftId, left), indexValue(field, rightId, right));
+          if (result !== 0) return direction === 'desc' ? -result : result;
+        }
+        return 0;
+      });
+    }
+
+    if (this._offset > 0 || this._limit !== null) {
+      results = results.slice(this._offset, wanted === Infinity ? undefined : wanted);
+    }
+    return results;
+  }
+
+  _snapshot(id, record, readTime) {
+    const ref = new DocumentReference(this._firestore, this._collectionPath, id);
+    return new DocumentSnapshot(ref, record, readTime, this._select);
+  }
+
+  _run() {
+    const readTime = Timestamp.now();
+    const docs = this._execute().map(([id, record]) => this._snapshot(id, record, readTime));
+    this._firestore._store.stats.reads += Math.max(docs.length, 1);
+    return new QuerySnapshot(this, docs, readTime);
+  }
+
+  async get() {
+    await this._firestore._roundTrip();
+    const snapshot = this._run();
+    await this._firestore._transfer(snapshot.size);
+    return snapshot;
+  }
+
+  /**
+   * Readable stream of document snapshots, like the SDK's Query.stream()
+   */
+  stream() {
+    const query = this;
+    const firestore = this._firestore;
+    return Readable.from((async function* () {
+      await firestore._roundTrip();
+      const readTime = Timestamp.now();
+      const results = query._execute();
+      firestore._store.stats.reads += Math.max(results.length, 1);
+      for (let i = 0; i < results.length; i++) {
+        if (i % STREAM_CHUNK_SIZE === 0) {
+          await firestore._transfer(Math.min(STREAM_CHUNK_SIZE, results.length - i));
+        }
+        yield query._snapshot(results[i][0], results[i][1], readTime);
+      }
+    })());
+  }
+
+  /**
+   * Count aggregation (count().get()); billed one read per 1000 matches
+   */
+  count() {
+    const query = this;
+    return {
+      query,
+      async get() {
+        await query._firestore._roundTrip();
+        const count = query._execute().length;
+        query._firestore._store.stats.reads += Math.max(1, Math.ceil(count / 1000));
+        return {
+          readTime: Timestamp.now(),
+          data() {
+            return { count };
+          }
+        };
+      }
+    };
+  }
+}
+
+function matchesFilter(fieldValue, operator, value) {
+  if (fieldValue === undefined) {
+    return false;
+  }
+  switch (operator) {
+    case '==':
+      return compareValues(fieldValue, value) === 0;
+    case '!=':
+      return fieldValue !== null && compareValues(fieldValue, value) !== 0;
+    case '<':
+      return typeOrder(fieldValue) === typeOrder(value) && compareValues(fieldValue, value) < 0;
+    case '<=':
+      return typeOrder(fieldValue) === typeOrder(value) && compareValues(fieldValue, value) <= 0;
+    case '>':
+      return typeOrder(fieldValue) === typeOrder(value) && compareValues(fieldValue, value) > 0;
+    case '>=':
+      return typeOrder(fieldValue) === typeOrder(value) && compareValues(fieldValue, value) >= 0;
+    case 'in':
+      return value.some((item) => compareValues(fieldValue, item) === 0);
+    case 'not-in':
+      return fieldValue !== null && !value.some((item) => compareValues(fieldValue, item) === 0);
+    case 'array-contains':
+      return Array.isArray(fieldValue) && fieldValue.some((element) => compareValues(element, value) === 0);
+    case 'array-contains-any':
+      return Array.isArray(fieldValue) &&
+        fieldValue.some((element) => value.some((item) => compareValues(element, item) === 0));
+    default:
+      return false;
+  }
+}
+
+class CollectionReference extends Query {
+  get id() {
+    return this._collectionPath.split('/').pop();
+  }
+
+  get path() {
+    return this._collectionPath;
+  }
+
+  doc(id) {
+    return new DocumentReference(this._firestore, this._collectionPath, id || generateDocumentId());
+  }
+
+  async add(data) {
+    const ref = this.doc();
+    await ref.create(data);
+    return ref;
+  }
+
+  async listDocuments() {
+    await this._firestore._roundTrip();
+    const collection = this._firestore._store.collection(this._collectionPath);
+    return [...collection.docs.keys()].map((id) => this.doc(id));
+  }
+}
+
+/**
+ * Firestore-style 20 character auto ID
+ */
+function generateDocumentId() {
+  const chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789';
+  let id = '';
+  for (let i = 0; i < 20; i++) {
+    id += chars.charAt(Math.floor(Math.random() * chars.length));
+  }
+  return id;
+}
+
+/**
+ * WriteBatch: writes are buffered and committed atomically, at most 500
+ */
+class WriteBatch {
+  constructor(firestore) {
+    this._firestore = firestore;
+    this._writes = [];
+    this._committed = false;
+  }
+
+  _push(write) {
+    if (this._committed) {
+      throw new Error('Cannot modify a WriteBatch that has been committed.');
+    }
+    if (this._writes.length >= MAX_BATCH_WRITES) {
+      throw new Error(`A write batch can contain at most ${MAX_BATCH_WRITES} operations`);
+    }
+    this._writes.push(write);
+    return this;
+  }
+
+  create(ref, data) {
+    assertDocumentData(data);
+    return this._push({ type: 'create', ref, data });
+  }
+
+  set(ref, data, options = {}) {
+    assertDocumentData(data);
+    return this._push({ type: 'set', ref, data, options });
+  }
+
+  update(ref, dataOrField, ...moreFieldsAndValues) {
+    const data = normalizeUpdateFields(dataOrField, moreFieldsAndValues);
+    assertDocumentData(data);
+    return this._push({ type: 'update', ref, data });
+  }
+
+  delete(ref) {
+    return this._push({ type: 'delete', ref });
+  }
+
+  async commit() {
+    this._committed = true;
+    return this._firestore._commit(this._writes);
+  }
+}
+
+/**
+ * Transaction: reads record the version they saw, writes are buffered and
+ * committed only if none of those documents changed in the meantime
+ */
+class Transaction {
+  constructor(firestore) {
+    this._firestore = firestore;
+    this._reads = new Map();
+    this._writes = [];
+  }
+
+  _assertNoWrites() {
+    if (this._writes.length > 0) {
+      throw new Error('Firestore transactions require all reads to be executed before all writes.');
+    }
+  }
+
+  _recordRead(ref, record) {
+    this._reads.set(ref.path, {
+      collectionPath: ref._collectionPath,
+      id: ref.id,
+      version: record ? record.version : 0
+    });
+  }
+
+  async get(refOrQuery) {
+    this._assertNoWrites();
+    await this._firestore._roundTrip();
+
+    if (refOrQuery instanceof DocumentReference) {
+      const snapshot = this._firestore._readDocument(refOrQuery);
+      this._recordRead(refOrQuery, snapshot._record);
+      return snapshot;
+    }
+
+    const snapshot = refOrQuery._run();
+    snapshot.docs.forEach((doc) => this._recordRead(doc.ref, doc._record));
+    return snapshot;
+  }
+
+  async getAll(...refsAndOptions) {
+    this._assertNoWrites();
+    const snapshots = await this._firestore.getAll(...refsAndOptions);
+    snapshots.forEach((snapshot) => this._recordRead(snapshot.ref, snapshot._record));
+    return snapshots;
+  }
+
+  create(ref, data) {
+    assertDocumentData(data);
+    this._writes.push({ type: 'create', ref, data });
+    return this;
+  }
+
+  set(ref, data, options = {}) {
+    assertDocumentData(data);
+    this._writes.push({ type: 'set', ref, data, options });
+    return this;
+  }
+
+  update(ref, dataOrField, ...moreFieldsAndValues) {
+    const data = normalizeUpdateFields(dataOrField, moreFieldsAndValues);
+    assertDocumentData(data);
+    this._writes.push({ type: 'update', ref, data });
+    return this;
+  }
+
+  delete(ref) {
+    this._writes.push({ type: 'delete', ref });
+    return this;
+  }
+}
+
+class Firestore {
+  /**
+   * @param {Object} options - { store, latency, perDocumentMs, seed, collectionAlias, ignoreUndefinedProperties }
+   */
+  constructor(options = {}) {
+    this._store = options.store || new DocumentStore(options);
+    this._random = createRandom(options.seed !== undefined ? options.seed : process.env.FIRESTORE_EMULATOR_SEED);
+    this.setLatency(
+      options.latency !== undefined ? options.latency : DEFAULT_LATENCY,
+      options.perDocumentMs !== undefined ? options.perDocumentMs : DEFAULT_PER_DOCUMENT_MS
+    );
+  }
+
+  /**
+   * Change the latency model, e.g. "fixed:0" for fast tests or
+   * "lognormal:8,0.6" to mimic a regional Firestore
+   */
+  setLatency(spec, perDocumentMs = 0) {
+    this._sampleLatency = parseLatencySpec(spec, this._random);
+    this._perDocumentMs = perDocumentMs;
+  }
+
+  _roundTrip() {
+    this._store.stats.roundTrips++;
+    return sleep(this._sampleLatency());
+  }
+
+  _transfer(documentCount) {
+    return sleep(this._perDocumentMs * documentCount);
+  }
+
+  _readDocument(ref) {
+    this._store.stats.reads++;
+    return new DocumentSnapshot(ref, this._store.getRecord(ref._collectionPath, ref.id), Timestamp.now());
+  }
+
+  async _commit(writes) {
+    await this._roundTrip();
+    return this._store.commit(writes);
+  }
+
+  collection(collectionPath) {
+    return new CollectionReference(this, collectionPath);
+  }
+
+  doc(documentPath) {
+    const separator = documentPath.lastIndexOf('/');
+    return new DocumentReference(this, documentPath.slice(0, separator), documentPath.slice(separator + 1));
+  }
+
+  /**
+   * Read several documents in one round trip. Like the SDK, a trailing
+   * { fieldMask: [...] } limits each snapshot to the listed fields
+   */
+  async getAll(...refsAndOptions) {
+    const last = refsAndOptions[refsAndOptions.length - 1];
+    const options = last && !(last instanceof DocumentReference) ? last : null;
+    const refs = options ? refsAndOptions.slice(0, -1) : refsAndOptions;
+
+    await this._roundTrip();
+    const readTime = Timestamp.now();
+    const fields = options && options.fieldMask ? options.fieldMask : null;
+    const snapshots = refs.map((ref) =>
+      new DocumentSnapshot(ref, this._store.getRecord(ref._collectionPath, ref.id), readTime, fields)
+    );
+    this._store.stats.reads += refs.length;
+    await this._transfer(snapshots.length);
+    return snapshots;
+  }
+
+  batch() {
+    return new WriteBatch(this);
+  }
+
+  /**
+   * Run `updateFunction` in an optimistic transaction, retrying with jittered
+   * backoff when a document it read was changed before commit
+   * @param {Function} updateFunction - async (transaction) => result
+   * @param {Object} options - { maxAttempts }
+   */
+  async runTransaction(updateFunction, options = {}) {
+    const maxAttempts = options.maxAttempts || MAX_TRANSACTION_ATTEMPTS;
+    this._store.stats.transactions++;
+
+    for (let attempt = 1; ; attempt++) {
+      const transaction = new Transaction(this);
+      const result = await updateFunction(transaction);
+      try {
+        await this._roundTrip();
+        this._store.commit(transaction._writes, transaction._reads);
+        return result;
+      } catch (error) {
+        if (error.code !== STATUS.ABORTED || attempt >= maxAttempts) {
+          throw error;
+        }
+        this._store.stats.transactionRetries++;
+        await sleep(this._random() * TRANSACTION_BACKOFF_MS * 2 ** attempt);
+      }
+    }
+  }
+
+  /**
+   * Bulk load documents without latency; see DocumentStore#importDocuments
+   */
+  importDocuments(collectionPath, documents) {
+    return this._store.importDocuments(collectionPath, documents);
+  }
+
+  getStats() {
+    const collections = {};
+    for (const [name, collection] of this._store.collections) {
+      collections[name] = { documents: collection.docs.size, indexes: [...collection.indexes.keys()] };
+    }
+    return { ...this._store.stats, collections };
+  }
+
+  resetStats() {
+    this._store.stats = createStats();
+  }
+}
+
+Firestore.Timestamp = Timestamp;
+Firestore.FieldValue = FieldValue;
+Firestore.FieldPath = FieldPath;
+
+module.exports = {
+  Firestore,
+  DocumentStore,
+  Timestamp,
+  FieldValue,
+  FieldPath,
+  DocumentReference,
+  DocumentSnapshot,
+  CollectionReference,
+  Query,
+  QuerySnapshot,
+  WriteBatch,
+  Transaction,
+  compareValues,
+  DOCUMENT_ID_FIELD
+};
@@ -0,0 +1,366 @@
+/**
+ * Firestore instrumentation for /metrics
+ * instrumentFirestore(db) returns a proxy of a Firestore instance (the real
+ * SDK's or the mock emulator's) that counts documents read and written per
+ * collection and per route, times each round trip, and flags queries that
+ * read a whole collection (no where(), limit() or cursor). References,
+ * queries, batches and transactions obtained through the proxy are
+ * instrumented too; everything else passes through untouched. Round trips,
+ * reads and writes are also added to the request's Firestore trace, if it has
+ * one (utils/firestoreTrace.js). Set METRICS_ENABLED=false and
+ * FIRESTORE_TRACE=off to use the bare instance
+ */
+
+const { Readable } = require('stream');
+const { metrics } = require('./metrics');
+const { currentRouteLabel } = require('./requestContext');
+const { currentTrace, isTracingAvailable } = require('./firestoreTrace');
+
+const operationDuration = metrics.histogram(
+  'firestore_operation_duration_seconds',
+  'Firestore round trip latency by collection and operation',
+  ['collection', 'operation']
+);
+const transactionDuration = metrics.histogram(
+  'firestore_transaction_duration_seconds',
+  'Firestore transaction latency (all attempts) by route',
+  ['route']
+);
+const documentsRead = metrics.counter(
+  'firestore_documents_read_total',
+  'Firestore documents read (as billed) by collection and route',
+  ['collection', 'route']
+);
+const documentsWritten = metrics.counter(
+  'firestore_documents_written_total',
+  'Firestore documents written by collection and route',
+  ['collection', 'route']
+);
+const fullScans = metrics.counter(
+  'firestore_full_scans_total',
+  'Queries without where(), limit() or a cursor, by collection and route',
+  ['collection', 'route']
+);
+
+// Query methods that bound which documents are read
+const BOUNDING_METHODS = ['where', 'limit', 'limitToLast', 'startAt', 'startAfter', 'endAt', 'endBefore'];
+const REFINING_METHODS = ['orderBy', 'offset', 'select', 'withConverter'];
+const WRITE_METHODS = ['set', 'update', 'delete', 'create'];
+
+// proxy -> { target, kind, collection, bounded }
+const instrumented = new WeakMap();
+
+function unwrap(value) {
+  const info = value && typeof value === 'object' ? instrumented.get(value) : undefined;
+  return info ? info.target : value;
+}
+
+/**
+ * Collection path without document IDs, e.g. "users/{id}/notes" -> "users/notes"
+ */
+function collectionLabel(path) {
+  return path.split('/').filter((_, index) => index % 2 === 0).join('/');
+}
+
+function documentCollectionLabel(path) {
+  return collectionLabel(path.split('/').slice(0, -1).join('/'));
+}
+
+function collectionOf(ref) {
+  const info = instrumented.get(ref);
+  if (info) {
+    return info.collection;
+  }
+  return ref && typeof ref.path === 'string' ? documentCollectionLabel(ref.path) : 'unknown';
+}
+
+function recordReads(collection, count, route = currentRouteLabel()) {
+  documentsRead.inc({ collection, route }, count);
+  // Listener snapshots arrive long after the request that attached the listener
+  const trace = route === 'listener' ? null : currentTrace();
+  if (trace) {
+    trace.read(collection, count);
+  }
+}
+
+function recordWrites(staged) {
+  const route = currentRouteLabel();
+  const trace = currentTrace();
+  for (const [collection, count] of staged) {
+    documentsWritten.inc({ collection, route }, count);
+    if (trace) {
+      trace.write(collection, count);
+    }
+  }
+}
+
+function recordRoundTrip(collections, operation, startedNs) {
+  const endNs = process.hrtime.bigint();
+  const names = [...collections];
+  const seconds = Number(endNs - startedNs) / 1e9;
+  for (const collection of names) {
+    operationDuration.observe({ collection, operation }, seconds);
+  }
+  const trace = currentTrace();
+  if (trace) {
+    trace.roundTrip(names, operation, startedNs, endNs);
+  }
+}
+
+function countByCollection(refs) {
+  const counts = new Map();
+  for (const ref of refs) {
+    const collection = collectionOf(ref);
+    counts.set(collection, (counts.get(collection) || 0) + 1);
+  }
+  return counts;
+}
+
+async function timed(collections, operation, run) {
+  // Batch commits pass a live Map iterator of the staged collections
+  const names = [...collections];
+  const started = process.hrtime.bigint();
+  try {
+    return await run();
+  } finally {
+    recordRoundTrip(names, operation, started);
+  }
+}
+
+/**
+ * Proxy `target`, routing the methods in `overrides` through
+ * (original, args) => result and unwrapping instrumented arguments for all others
+ */
+function wrap(target, info, overrides) {
+  const proxy = new Proxy(target, {
+    get(object, property) {
+      const value = Reflect.get(object, property, object);
+      if (typeof value !== 'function') {
+        return value;
+      }
+      const original = (...args) => value.apply(object, args);
+      if (Object.prototype.hasOwnProperty.call(overrides, property)) {
+        return (...args) => overrides[property](original, args);
+      }
+      return (...args) => original(...args.map(unwrap));
+    }
+  });
+  instrumented.set(proxy, { ...info, target });
+  return proxy;
+}
+
+function wrapDocument(ref, collection) {
+  const overrides = {
+    get: (original, args) => timed([collection], 'get', async () => {
+      const snapshot = await original(...args);
+      recordReads(collection, 1);
+      return snapshot;
+    }),
+    collection: (original, [path]) => wrapQuery(original(path), `${collection}/${collectionLabel(path)}`, false)
+  };
+  for (const method of WRITE_METHODS) {
+    overrides[method] = (original, args) => timed([collection], 'write', async () => {
+      const result = await original(...args.map(unwrap));
+      recordWrites(new Map([[collection, 1]]));
+      return result;
+    });
+  }
+  return wrap(ref, { kind: 'document', collection }, overrides);
+}
+
+function recordQueryReads(collection, bounded, count) {
+  // An empty result is still billed as one read
+  recordReads(collection, Math.max(count, 1));
+  if (!bounded) {
+    fullScans.inc({ collection, route: currentRouteLabel() });
+  }
+}
+
+function wrapQuery(query, collection, bounded) {
+  const overrides = {
+    doc: (original, args) => wrapDocument(original(...args), collection),
+    add: (original, args) => timed([collection], 'write', async () => {
+      const ref = await original(...args);
+      recordWrites(new Map([[collection, 1]]));
+      return wrapDocument(ref, collection);
+    }),
+    get: (original, args) => timed([collection], 'query', async () => {
+      const snapshot = await original(...args);
+      recordQueryReads(collection, bounded, snapshot.size);
+      return snapshot;
+    }),
+    stream: (original, args) => {
+      const source = original(...args);
+      const route = currentRouteLabel();
+      const started = process.hrtime.bigint();
+      // Count documents as the consumer pulls them; an early stop still records what was read
+      return Readable.from((async function* () {
+        let count = 0;
+        try {
+          for await (const snapshot of source) {
+            count++;
+            yield snapshot;
+          }
+        } finally {
+          recordReads(collection, Math.max(count, 1), route);
+          if (!bounded) {
+            fullScans.inc({ collection, route });
+          }
+          recordRoundTrip([collection], 'stream', started);
+        }
+      })());
+    },
+    count: (original, args) => {
+      const aggregate = original(...args);
+      return wrap(aggregate, { kind: 'aggregate', collection }, {
+        get: (getOriginal, getArgs) => timed([collection], 'aggregate', async () => {
+          const snapshot = await getOriginal(...getArgs);
+          // Aggregations are billed one read per 1000 index entries
+          recordReads(collection, Math.max(1, Math.ceil(snapshot.data().count / 1000)));
+          return snapshot;
+        })
+      });
+    },
+    onSnapshot: (original, [onNext, ...rest]) => {
+      if (typeof onNext !== 'function') {
+        return original(onNext, ...rest);
+      }
+      return original((snapshot) => {
+        // The first snapshot reads every match, later ones only the changes
+        const changes = typeof snapshot.docChanges === 'function' ? snapshot.docChanges().length : snapshot.size;
+        recordReads(collection, Math.max(changes, 1), 'listener');
+        return onNext(snapshot);
+      }, ...rest);
+    }
+  };
+  for (const method of BOUNDING_METHODS) {
+    overrides[method] = (original, args) => wrapQuery(original(...args.map(unwrap)), collection, true);
+  }
+  for (const method of REFINING_METHODS) {
+    overrides[method] = (original, args) => wrapQuery(original(...args.map(unwrap)), collection, bounded);
+  }
+  return wrap(query, { kind: 'query', collection, bounded }, overrides);
+}
+
+/**
+ * Batches and transactions: writes are staged per collection and counted
+ * once the commit succeeds
+ */
+function stagingOverrides(staged, proxyOf) {
+  const overrides = {};
+  for (const method of WRITE_METHODS) {
+    overrides[method] = (original, args) => {
+      const collection = collectionOf(args[0]);
+      staged.set(collection, (staged.get(collection) || 0) + 1);
+      original(...args.map(unwrap));
+      // Keep chained calls (batch.set(...).update(...)) on the proxy
+      return proxyOf();
+    };
+  }
+  return overrides;
+}
+
+function wrapBatch(batch) {
+  const staged = new Map();
+  let proxy = null;
+  proxy = wrap(batch, { kind: 'batch' }, {
+    ...stagingOverrides(staged, () => proxy),
+    commit: (original, args) => timed(staged.keys(), 'batch_commit', async () => {
+      const result = await original(...args);
+      recordWrites(staged);
+      return result;
+    })
+  });
+  return proxy;
+}
+
+function readAll(original, refs, options, operation) {
+  const counts = countByCollection(refs);
+  const args = options ? [...refs.map(unwrap), options] : refs.map(unwrap);
+  return timed(counts.keys(), operation, async () => {
+    const snapshots = await original(...args);
+    for (const [collection, count] of counts) {
+      recordReads(collection, count);
+    }
+    return snapshots;
+  });
+}
+
+function splitReadOptions(args) {
+  const last = args[args.length - 1];
+  const hasOptions = last && typeof last === 'object' && !instrumented.has(last) && typeof last.path !== 'string';
+  return hasOptions ? [args.slice(0, -1), last] : [args, null];
+}
+
+function wrapTransaction(transaction, staged) {
+  let proxy = null;
+  proxy = wrap(transaction, { kind: 'transaction' }, {
+    ...stagingOverrides(staged, () => proxy),
+    get: (original, [refOrQuery, ...rest]) => {
+      const info = instrumented.get(refOrQuery);
+      const collection = collectionOf(refOrQuery);
+      return timed([collection], 'transaction_get', async () => {
+        const result = await original(unwrap(refOrQuery), ...rest);
+        if (info && info.kind === 'query') {
+          recordQueryReads(collection, info.bounded, result.size);
+        } else {
+          recordReads(collection, 1);
+        }
+        return result;
+      });
+    },
+    getAll: (original, args) => {
+      const [refs, options] = splitReadOptions(args);
+      return readAll(original, refs, options, 'transaction_get');
+    }
+  });
+  return proxy;
+}
+
+/**
+ * @param {Object} db - Firestore instance
+ * @returns {Object} Instrumented proxy (or `db` itself when metrics are disabled)
+ */
+function instrumentFirestore(db) {
+  if (!db || (process.env.METRICS_ENABLED === 'false' && !isTracingAvailable()) || instrumented.has(db)) {
+    return db;
+  }
+
+  return wrap(db, { kind: 'firestore' }, {
+    collection: (original, [path]) => wrapQuery(original(path), collectionLabel(path), false),
+    collectionGroup: (original, [id]) => wrapQuery(original(id), id, false),
+    doc: (original, [path]) => wrapDocument(original(path), documentCollectionLabel(path)),
+    getAll: (original, args) => {
+      const [refs, options] = splitReadOptions(args);
+      return readAll(original, refs, options, 'get_all');
+    },
+    batch: (original, args) => wrapBatch(original(...args)),
+    runTransaction: async (original, [updateFunction, ...rest]) => {
+      const started = process.hrtime.bigint();
+      let staged = new Map();
+      let attemptDone = started;
+      try {
+        const result = await original(async (transaction) => {
+          // A retried attempt stages its writes again
+          staged = new Map();
+          try {
+            return await updateFunction(wrapTransaction(transaction, staged));
+          } finally {
+            attemptDone = process.hrtime.bigint();
+          }
+        }, ...rest);
+        // What is left after the last attempt's reads is the commit
+        recordRoundTrip(staged.size ? staged.keys() : ['transaction'], 'transaction_commit', attemptDone);
+        recordWrites(staged);
+        return result;
+      } finally {
+        transactionDuration.observe({ route: currentRouteLabel() }, Number(process.hrtime.bigint() - started) / 1e9);
+      }
+    }
+  });
+}
+
+module.exports = {
+  instrumentFirestore,
+  collectionLabel
+};
@@ -0,0 +1,227 @@
+/**
+ * Opt-in per-request Firestore tracing
+ * A traced request writes one JSON line when its response finishes: documents
+ * read vs returned (read amplification), Firestore round trips, how many of
+ * them ran one after another, and the wall time spent waiting on Firestore,
+ * broken down by collection. Aggregate the lines with
+ * `python -m tests.tracing <file>`.
+ *
+ * FIRESTORE_TRACE selects which requests are traced:
+ * - "all": every request
+ * - "header": requests sending `X-Firestore-Trace: 1`
+ * - unset: the header outside production, nothing in production
+ * - "off": nothing
+ * Lines go to FIRESTORE_TRACE_FILE (appended) or stdout
+ */
+
+const fs = require('fs');
+const { currentContext } = require('./requestContext');
+
+const TRACE_HEADER = 'x-firestore-trace';
+// Operations listed per trace; the totals always cover every operation
+const MAX_TRACE_OPERATIONS = parseInt(process.env.FIRESTORE_TRACE_MAX_OPERATIONS) || 200;
+
+function traceMode() {
+  const mode = (process.env.FIRESTORE_TRACE || '').toLowerCase();
+  if (mode === 'all' || mode === 'true') return 'all';
+  if (mode === 'header' || mode === 'off') return mode;
+  return process.env.NODE_ENV === 'production' ? 'off' : 'header';
+}
+
+function isTracingAvailable() {
+  return traceMode() !== 'off';
+}
+
+function shouldTrace(req) {
+  const mode = traceMode();
+  if (mode === 'all') return true;
+  if (mode === 'off') return false;
+  const value = req.headers[TRACE_HEADER];
+  return value === '1' || value === 'true';
+}
+
+const elapsedMs = (fromNs, toNs) => Number(toNs - fromNs) / 1e6;
+const round = (value) => Math.round(value * 1000) / 1000;
+
+class FirestoreTrace {
+  constructor() {
+    this.startedNs = process.hrtime.bigint();
+    this.spans = [];
+    this.collections = new Map();
+    this.documentsReturned = null;
+    this.closed = false;
+  }
+
+  collection(name) {
+    let stats = this.collections.get(name);
+    if (!stats) {
+      stats = { reads: 0, writes: 0, roundTrips: 0, ms: 0 };
+      this.collections.set(name, stats);
+    }
+    return stats;
+  }
+
+  /**
+   * One Firestore round trip between two process.hrtime.bigint() readings
+   */
+  roundTrip(collections, operation, startNs, endNs) {
+    if (this.closed) return;
+    const names = [...collections];
+    const ms = elapsedMs(startNs, endNs);
+    this.spans.push({ collections: names, operation, startNs, endNs });
+    for (const name of names) {
+      const stats = this.collection(name);
+      stats.roundTrips++;
+      stats.ms += ms;
+    }
+  }
+
+  read(collection, count) {
+    if (!this.closed) this.collection(collection).reads += count;
+  }
+
+  write(collection, count) {
+    if (!this.closed) this.collection(collection).writes += count;
+  }
+
+  returned(count) {
+    if (!this.closed) this.documentsReturned = count;
+  }
+
+  /**
+   * Overlapping round trips ran in parallel; each run of overlapping ones
+   * counts as one serial round trip, and the union of their intervals is the
+   * time the request spent waiting on Firestore
+   */
+  timeline() {
+    const spans = [...this.spans].sort((a, b) => (a.startNs < b.startNs ? -1 : a.startNs > b.startNs ? 1 : 0));
+    let serialRoundTrips = 0;
+    let awaitNs = 0n;
+    let groupStart = null;
+    let groupEnd = null;
+
+    for (const span of spans) {
+      if (groupEnd !== null && span.startNs < groupEnd) {
+        if (span.endNs > groupEnd) groupEnd = span.endNs;
+        continue;
+      }
+      if (groupEnd !== null) awaitNs += groupEnd - groupStart;
+      serialRoundTrips++;
+      groupStart = span.startNs;
+      groupEnd = span.endNs;
+    }
+    if (groupEnd !== null) awaitNs += groupEnd - groupStart;
+
+    return { serialRoundTrips, awaitMs: Number(awaitNs) / 1e6 };
+  }
+
+  /**
+   * Close the trace and build its JSON line record
+   */
+  finish(req, res, route) {
+    this.closed = true;
+    const endNs = process.hrtime.bigint();
+    const { serialRoundTrips, awaitMs } = this.timeline();
+
+    let documentsRead = 0;
+    let documentsWritten = 0;
+    const collections = {};
+    for (const [name, stats] of this.collections) {
+      documentsRead += stats.reads;
+      documentsWritten += stats.writes;
+      collections[name] = { ...stats, ms: round(stats.ms) };
+    }
+
+    const returned = this.documentsReturned;
+    return {
+      type: 'firestore_trace',
+      time: new Date().toISOString(),
+      method: req.method,
+      route,
+      path: (req.originalUrl || req.url || '').split('?')[0],
+      status: res.writableFinished ? res.statusCode : 'aborted',
+      durationMs: round(elapsedMs(this.startedNs, endNs)),
+      documentsRead,
+      documentsReturned: returned,
+      // Per document returned, counting an empty response as one
+      readAmplification: returned === null ? null : round(documentsRead / Math.max(returned, 1)),
+      documentsWritten,
+      roundTrips: this.spans.length,
+      serialRoundTrips,
+      firestoreMs: round(awaitMs),
+      collections,
+      operations: this.spans.slice(0, MAX_TRACE_OPERATIONS).map((span) => ({
+        collection: span.collections.join(','),
+        operation: span.operation,
+        startMs: round(elapsedMs(this.startedNs, span.startNs)),
+        ms: round(elapsedMs(span.startNs, span.endNs))
+      }))
+    };
+  }
+}
+
+/**
+ * The active trace of the current request, if it is being traced
+ */
+function currentTrace() {
+  const context = currentContext();
+  return context && context.trace && !context.trace.closed ? context.trace : null;
+}
+
+/**
+ * Number of documents in a JSON response body: the length of an array body,
+ * or of the longest array at the top level or under `data` (paginated
+ * listings), otherwise 1 for an object and 0 for anything else
+ */
+function countReturnedDocuments(body) {
+  if (Array.isArray(body)) return body.length;
+  if (!body || typeof body !== 'object') return 0;
+
+  const containers = body.data && typeof body.data === 'object' && !Array.isArray(body.data) ? [body, body.data] : [body];
+  let longest = null;
+  for (const container of containers) {
+    for (const value of Object.values(container)) {
+      if (Array.isArray(value) && (longest === null || value.length > longest)) {
+        longest = value.length;
+      }
+    }
+  }
+  return longest === null ? 1 : longest;
+}
+
+/**
+ * For responses not sent with res.json (streamed arrays, cached bodies)
+ */
+function noteDocumentsReturned(count) {
+  const trace = currentTrace();
+  if (trace) trace.returned(count);
+}
+
+let output = null;
+
+function writeTrace(record) {
+  const line = JSON.stringify(record) + '\n';
+  if (!process.env.FIRESTORE_TRACE_FILE) {
+    process.stdout.write(line);
+    return;
+  }
+  if (!output) {
+    output = fs.createWriteStream(process.env.FIRESTORE_TRACE_FILE, { flags: 'a' });
+    output.on('error', (error) => {
+      console.error('Cannot write Firestore traces:', error.message);
+    });
+  }
+  output.write(line);
+}
+
+module.exports = {
+  TRACE_HEADER,
+  FirestoreTrace,
+  traceMode,
+  isTracingAvailable,
+  shouldTrace,
+  currentTrace,
+  countReturnedDocuments,
+  noteDocumentsReturned,
+  writeTrace
+};
@@ -0,0 +1,129 @@
+/**
+ * Conditional GET helpers: strong ETags, If-None-Match and Cache-Control
+ * ETags come either from a document's version (Firestore updateTime, or its
+ * updatedAt/LastModified field) so a 304 can be answered before the body is
+ * built, or from a hash of the serialized body when no version is available.
+ * A strong ETag names exact bytes, so a compressed body carries its own
+ * ("<tag>-gz" or "<tag>-br"); If-None-Match accepts any coding of the tag
+ */
+
+const crypto = require("crypto");
+
+// Browsers always revalidate (a cheap 304); shared caches may hold public
+// responses for CATALOG_CACHE_S_MAXAGE seconds (default 60)
+const SHARED_MAX_AGE = parseInt(process.env.CATALOG_CACHE_S_MAXAGE) || 60;
+const PUBLIC_CACHE_CONTROL = `public, max-age=0, s-maxage=${SHARED_MAX_AGE}`;
+const PRIVATE_CACHE_CONTROL = "private, no-cache";
+
+const CODING_SUFFIXES = { gzip: "gz", br: "br" };
+const CODING_SUFFIX_PATTERN = /-(gz|br)"$/;
+
+/**
+ * Strong ETag for a string or Buffer body
+ */
+function createEtag(body) {
+  const hash = crypto.createHash("sha1").update(body).digest("base64url");
+  return `"${hash}"`;
+}
+
+/**
+ * ETag for the body compressed with `encoding` ("gzip" or "br")
+ */
+function encodeEtag(etag, encoding) {
+  const suffix = CODING_SUFFIXES[encoding];
+  if (!etag || !suffix) {
+    return etag;
+  }
+  return String(etag).replace(/"$/, `-${suffix}"`);
+}
+
+// The tag an ETag was derived from, without W/ or a coding suffix
+const baseEtag = (tag) => tag.trim().replace(/^W\//, "").replace(CODING_SUFFIX_PATTERN, '"');
+
+const toMillis = (value) => {
+  if (!value) return null;
+  if (typeof value.toMillis === "function") return value.toMillis();
+  if (value instanceof Date) return value.getTime();
+  const millis = Date.parse(value);
+  return Number.isNaN(millis) ? null : millis;
+};
+
+/**
+ * Version of a document snapshot, or null if it has none
+ * @param {Object} snapshot - Firestore DocumentSnapshot
+ */
+function getDocumentVersion(snapshot) {
+  const updateTime = toMillis(snapshot.updateTime);
+  if (updateTime !== null) {
+    return updateTime;
+  }
+  const data = snapshot.data() || {};
+  return toMillis(data.updatedAt || data.LastModified);
+}
+
+/**
+ * ETag for one document, derived from its version; null if it has no version
+ */
+function createDocumentEtag(kind, snapshot) {
+  const version = getDocumentVersion(snapshot);
+  return version === null ? null : `"${kind}-${snapshot.id}-${version}"`;
+}
+
+/**
+ * Whether If-None-Match matches the ETag (weak comparison, as RFC 9110
+ * requires), in any content coding
+ */
+function isNotModified(req, etag) {
+  const header = req.headers["if-none-match"];
+  if (!header || !etag) {
+    return false;
+  }
+  if (header.trim() === "*") {
+    return true;
+  }
+  const wanted = baseEtag(etag);
+  return header
+    .split(",")
+    .some((tag) => baseEtag(tag) === wanted);
+}
+
+/**
+ * Set the validators and answer 304 if the client's copy is current
+ * @returns {boolean} true if a 304 was sent and the caller should stop
+ */
+function sendNotModified(req, res, etag, cacheControl = PUBLIC_CACHE_CONTROL) {
+  res.setHeader("Cache-Control", cacheControl);
+  if (etag) {
+    res.setHeader("ETag", etag);
+  }
+  if (isNotModified(req, etag)) {
+    res.status(304).end();
+    return true;
+  }
+  return false;
+}
+
+/**
+ * Send a JSON value with an ETag (the given one, or a hash of the body),
+ * answering 304 when If-None-Match matches
+ */
+function sendJsonWithEtag(req, res, value, options = {}) {
+  const body = options.body || JSON.stringify(value);
+  const etag = options.etag || createEtag(body);
+  if (sendNotModified(req, res, etag, options.cacheControl)) {
+    return;
+  }
+  res.status(200).type("json").send(body);
+}
+
+module.exports = {
+  PUBLIC_CACHE_CONTROL,
+  PRIVATE_CACHE_CONTROL,
+  createEtag,
+  encodeEtag,
+  getDocumentVersion,
+  createDocumentEtag,
+  isNotModified,
+  sendNotModified,
+  sendJsonWithEtag,
+};
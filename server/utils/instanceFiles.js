@@ -0,0 +1,80 @@
+/**
+ * Per-process file names in os.tmpdir() for on-disk journals and spill files
+ * Each process gets its own file ("<prefix>.<pid>.ndjson"), so servers
+ * sharing a host (a PM2 cluster, test workers) never replay or trim each
+ * other's entries. Files left behind by a process that is no longer running
+ * are orphans: the next process to look claims them by renaming them into its
+ * own names, and since rename is atomic only one process gets each file.
+ * A pid reused by an unrelated live process only delays the claim until that
+ * process exits
+ */
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+function escapeRegExp(text) {
+  return text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+
+/**
+ * This process's file for `prefix`, e.g. /tmp/payment-log-journal.4242.ndjson
+ */
+function instanceFilePath(prefix) {
+  return path.join(os.tmpdir(), `${prefix}.${process.pid}.ndjson`);
+}
+
+function isProcessRunning(pid) {
+  try {
+    process.kill(pid, 0);
+    return true;
+  } catch (error) {
+    // EPERM: it exists but belongs to another user
+    return error.code === 'EPERM';
+  }
+}
+
+/**
+ * Files named by instanceFilePath(prefix), plus any suffix such as a segment
+ * number, whose process is no longer running
+ * @returns {Array<Object>} { path, pid, suffix }
+ */
+function findOrphanedFiles(prefix) {
+  const pattern = new RegExp(`^${escapeRegExp(prefix)}\\.(\\d+)\\.ndjson(.*)$`);
+  let names;
+  try {
+    names = fs.readdirSync(os.tmpdir());
+  } catch (error) {
+    console.error(`Failed to look for orphaned ${prefix} files:`, error.message);
+    return [];
+  }
+
+  return names
+    .map((name) => {
+      const match = pattern.exec(name);
+      return match && { path: path.join(os.tmpdir(), name), pid: Number(match[1]), suffix: match[2] };
+    })
+    .filter((file) => file && file.pid !== process.pid && !isProcessRunning(file.pid));
+}
+
+/**
+ * Take over an orphaned file by renaming it
+ * @returns {boolean} false if another process claimed it first
+ */
+function claimFile(from, to) {
+  try {
+    fs.renameSync(from, to);
+    return true;
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.error(`Failed to claim ${from}:`, error.message);
+    }
+    return false;
+  }
+}
+
+module.exports = {
+  instanceFilePath,
+  findOrphanedFiles,
+  claimFile
+};
@@ -0,0 +1,77 @@
+/**
+ * Streaming JSON array writer
+ * Serializes items into the response as they are iterated (e.g. from a
+ * Firestore Query.stream()), so memory use does not grow with the result set
+ * and the first bytes go out before the last document is read. Output is
+ * batched into chunks of about JSON_STREAM_CHUNK_BYTES and waits for 'drain'
+ * when the response is backed up, which in turn pauses the source stream
+ */
+
+const { noteDocumentsReturned } = require('./firestoreTrace');
+
+const CHUNK_SIZE = parseInt(process.env.JSON_STREAM_CHUNK_BYTES) || 16 * 1024;
+
+/**
+ * Resolve once the response has room again ('drain') or is gone ('close');
+ * both listeners are removed either way
+ */
+function waitForDrain(res) {
+  return new Promise((resolve) => {
+    const done = () => {
+      res.off('drain', done);
+      res.off('close', done);
+      resolve();
+    };
+    res.on('drain', done);
+    res.on('close', done);
+  });
+}
+
+/**
+ * Write an iterable of items to the response as a JSON array
+ * Sets status 200 and the JSON content type; if the source fails part way,
+ * the error is thrown after headers are sent, so the caller should destroy
+ * the response rather than send an error body
+ * @param {Object} res - Express response
+ * @param {Iterable|AsyncIterable} items - Items or document snapshots
+ * @param {Function} toJson - Maps each item to the value to serialize
+ * @returns {Promise<number>} Number of items written
+ */
+async function writeJsonArray(res, items, toJson = (item) => item) {
+  res.status(200).type('json');
+
+  let buffer = '[';
+  let count = 0;
+  for await (const item of items) {
+    if (res.destroyed) {
+      return count;
+    }
+    buffer += (count === 0 ? '' : ',') + JSON.stringify(toJson(item));
+    count++;
+
+    if (buffer.length >= CHUNK_SIZE) {
+      const chunk = buffer;
+      buffer = '';
+      if (!res.write(chunk) && !res.destroyed) {
+        await waitForDrain(res);
+      }
+    }
+  }
+
+  noteDocumentsReturned(count);
+  res.end(buffer + ']');
+  return count;
+}
+
+/**
+ * Document snapshot to the { id, ...data } shape the API returns
+ */
+function documentToJson(doc) {
+  return { id: doc.id, ...doc.data() };
+}
+
+module.exports = {
+  writeJsonArray,
+  documentToJson,
+  waitForDrain
+};
@@ -0,0 +1,76 @@
+/**
+ * Latency models for simulators (payment processor, Firestore emulator)
+ * A spec string picks the distribution a sampler draws milliseconds from:
+ * - "fixed:<ms>"
+ * - "uniform:<min>-<max>"
+ * - "normal:<mean>,<stddev>" (clamped at 0)
+ * - "lognormal:<median>,<sigma>" (long tail, like real network calls)
+ */
+
+/**
+ * Uniform [0, 1) source; seeded (mulberry32) when a seed is given so a
+ * simulated run can be repeated exactly
+ */
+function createRandom(seed) {
+  if (seed === undefined || seed === null || seed === "") {
+    return Math.random;
+  }
+  let state = Number(seed) >>> 0;
+  return () => {
+    state = (state + 0x6d2b79f5) >>> 0;
+    let t = state;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function standardNormal(random) {
+  // Box-Muller; 1 - random() keeps the log argument above zero
+  return Math.sqrt(-2 * Math.log(1 - random())) * Math.cos(2 * Math.PI * random());
+}
+
+/**
+ * Parse a latency spec into a sampler returning milliseconds
+ * @param {string} spec - e.g. "fixed:0", "uniform:50-200", "normal:120,30", "lognormal:150,0.5"
+ * @param {Function} random - Uniform [0, 1) source
+ * @throws {Error} For unknown or malformed specs
+ */
+function parseLatencySpec(spec, random = Math.random) {
+  const [kind, args = ""] = String(spec || "fixed:0").split(":");
+  const values = args.split(/[-,]/).map(Number);
+  const valid = values.every((value) => Number.isFinite(value) && value >= 0);
+
+  if (kind === "fixed" && valid && values.length === 1) {
+    return () => values[0];
+  }
+  if (kind === "uniform" && valid && values.length === 2) {
+    const [min, max] = values;
+    return () => min + random() * (max - min);
+  }
+  if (kind === "normal" && valid && values.length === 2) {
+    const [mean, stddev] = values;
+    return () => Math.max(0, mean + stddev * standardNormal(random));
+  }
+  if (kind === "lognormal" && valid && values.length === 2) {
+    const [median, sigma] = values;
+    return () => median * Math.exp(sigma * standardNormal(random));
+  }
+  throw new Error(`Invalid latency spec "${spec}"`);
+}
+
+/**
+ * Resolve after `ms`; settles on the next microtask when there is no delay
+ */
+function sleep(ms) {
+  if (!(ms > 0)) {
+    return Promise.resolve();
+  }
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+module.exports = {
+  createRandom,
+  parseLatencySpec,
+  sleep,
+};
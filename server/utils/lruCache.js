@@ -0,0 +1,110 @@
+/**
+ * Small in-process LRU cache with optional TTL and size bounds
+ * Relies on Map preserving insertion order: the first key is least recently used
+ */
+
+class LruCache {
+  /**
+   * @param {Object} options
+   * @param {number} options.maxEntries - Maximum number of entries (default 500)
+   * @param {number} options.maxSize - Maximum total size as measured by sizeOf (default Infinity)
+   * @param {number} options.ttlMs - Entry lifetime in milliseconds, 0 for no expiry (default 0)
+   * @param {Function} options.sizeOf - Returns the size of a value (default 1 per entry)
+   */
+  constructor(options = {}) {
+    this.maxEntries = options.maxEntries || 500;
+    this.maxSize = options.maxSize || Infinity;
+    this.ttlMs = options.ttlMs || 0;
+    this.sizeOf = options.sizeOf || (() => 1);
+
+    this.entries = new Map();
+    this.totalSize = 0;
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+  }
+
+  /**
+   * Get a value, refreshing its recency. Expired entries count as misses
+   */
+  get(key) {
+    const entry = this.entries.get(key);
+    if (!entry || (entry.expiresAt && entry.expiresAt <= Date.now())) {
+      if (entry) {
+        this.delete(key);
+      }
+      this.misses++;
+      return undefined;
+    }
+
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.hits++;
+    return entry.value;
+  }
+
+  /**
+   * Store a value. `ttlMs` overrides the cache-wide TTL for this entry
+   */
+  set(key, value, ttlMs = this.ttlMs) {
+    const size = this.sizeOf(value);
+    if (size > this.maxSize) {
+      return this;
+    }
+
+    this.delete(key);
+    this.entries.set(key, {
+      value,
+      size,
+      expiresAt: ttlMs ? Date.now() + ttlMs : 0
+    });
+    this.totalSize += size;
+
+    while (this.entries.size > this.maxEntries || this.totalSize > this.maxSize) {
+      const oldestKey = this.entries.keys().next().value;
+      this.delete(oldestKey);
+      this.evictions++;
+    }
+    return this;
+  }
+
+  has(key) {
+    const entry = this.entries.get(key);
+    return Boolean(entry) && (!entry.expiresAt || entry.expiresAt > Date.now());
+  }
+
+  delete(key) {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      return false;
+    }
+    this.totalSize -= entry.size;
+    return this.entries.delete(key);
+  }
+
+  clear() {
+    this.entries.clear();
+    this.totalSize = 0;
+  }
+
+  get size() {
+    return this.entries.size;
+  }
+
+  /**
+   * Hit/miss counters for monitoring
+   */
+  getStats() {
+    const lookups = this.hits + this.misses;
+    return {
+      entries: this.entries.size,
+      size: this.totalSize,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      hitRate: lookups ? this.hits / lookups : 0
+    };
+  }
+}
+
+module.exports = { LruCache };
@@ -0,0 +1,205 @@
+/**
+ * In-process metrics in the Prometheus text exposition format
+ * Counters and histograms are keyed by their label values; collectors add
+ * values that are only read at scrape time (cache sizes and hit rates).
+ * Label values must come from a bounded set (route patterns, collection
+ * names), never from raw URLs or IDs
+ */
+
+// Prometheus client defaults, in seconds
+const DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+function escapeLabelValue(value) {
+  return String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+}
+
+function formatLabels(labels) {
+  const pairs = Object.entries(labels).map(([name, value]) => `${name}="${escapeLabelValue(value)}"`);
+  return pairs.length ? `{${pairs.join(',')}}` : '';
+}
+
+function formatValue(value) {
+  if (value === Infinity) return '+Inf';
+  if (value === -Infinity) return '-Inf';
+  return String(value);
+}
+
+/**
+ * Base class: one series per distinct combination of label values
+ */
+class Metric {
+  constructor(name, help, labelNames = []) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.series = new Map();
+  }
+
+  labelsFor(values) {
+    const labels = {};
+    for (const name of this.labelNames) {
+      labels[name] = values[name] === undefined ? '' : values[name];
+    }
+    return labels;
+  }
+
+  getSeries(values, create) {
+    const labels = this.labelsFor(values);
+    const key = this.labelNames.map((name) => labels[name]).join('\u0000');
+    let series = this.series.get(key);
+    if (!series) {
+      series = create(labels);
+      this.series.set(key, series);
+    }
+    return series;
+  }
+
+  reset() {
+    this.series.clear();
+  }
+
+  header() {
+    return [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} ${this.type}`];
+  }
+}
+
+class Counter extends Metric {
+  get type() {
+    return 'counter';
+  }
+
+  inc(labels = {}, amount = 1) {
+    this.getSeries(labels, (seriesLabels) => ({ labels: seriesLabels, value: 0 })).value += amount;
+  }
+
+  get(labels = {}) {
+    return this.getSeries(labels, (seriesLabels) => ({ labels: seriesLabels, value: 0 })).value;
+  }
+
+  render() {
+    const lines = this.header();
+    for (const { labels, value } of this.series.values()) {
+      lines.push(`${this.name}${formatLabels(labels)} ${formatValue(value)}`);
+    }
+    return lines;
+  }
+}
+
+class Histogram extends Metric {
+  constructor(name, help, labelNames = [], buckets = DEFAULT_BUCKETS) {
+    super(name, help, labelNames);
+    this.buckets = [...buckets].sort((a, b) => a - b);
+  }
+
+  get type() {
+    return 'histogram';
+  }
+
+  observe(labels, value) {
+    const series = this.getSeries(labels, (seriesLabels) => ({
+      labels: seriesLabels,
+      counts: new Array(this.buckets.length).fill(0),
+      sum: 0,
+      count: 0
+    }));
+
+    // Per-bucket counts; render() accumulates them into Prometheus' cumulative form
+    const index = this.buckets.findIndex((bound) => value <= bound);
+    if (index !== -1) {
+      series.counts[index]++;
+    }
+    series.sum += value;
+    series.count++;
+  }
+
+  render() {
+    const lines = this.header();
+    for (const { labels, counts, sum, count } of this.series.values()) {
+      let cumulative = 0;
+      this.buckets.forEach((bound, index) => {
+        cumulative += counts[index];
+        lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: formatValue(bound) })} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${count}`);
+      lines.push(`${this.name}_sum${formatLabels(labels)} ${formatValue(sum)}`);
+      lines.push(`${this.name}_count${formatLabels(labels)} ${count}`);
+    }
+    return lines;
+  }
+}
+
+class MetricsRegistry {
+  constructor() {
+    this.metrics = new Map();
+    this.collectors = [];
+  }
+
+  register(metric) {
+    const existing = this.metrics.get(metric.name);
+    if (existing) {
+      return existing;
+    }
+    this.metrics.set(metric.name, metric);
+    return metric;
+  }
+
+  counter(name, help, labelNames) {
+    return this.register(new Counter(name, help, labelNames));
+  }
+
+  histogram(name, help, labelNames, buckets) {
+    return this.register(new Histogram(name, help, labelNames, buckets));
+  }
+
+  /**
+   * Add values computed at scrape time
+   * @param {Function} collect - () => Array<{ name, help, type, samples: Array<{ labels, value }> }>
+   */
+  addCollector(collect) {
+    this.collectors.push(collect);
+  }
+
+  /**
+   * Render every metric and collector in the text exposition format
+   */
+  render() {
+    const lines = [];
+    for (const metric of this.metrics.values()) {
+      lines.push(...metric.render());
+    }
+
+    for (const collect of this.collectors) {
+      let families;
+      try {
+        families = collect();
+      } catch (error) {
+        // One broken collector must not take the whole scrape down
+        console.error('Metrics collector failed:', error.message);
+        continue;
+      }
+      for (const { name, help, type = 'gauge', samples } of families) {
+        lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`);
+        for (const { labels = {}, value } of samples) {
+          lines.push(`${name}${formatLabels(labels)} ${formatValue(value)}`);
+        }
+      }
+    }
+    return lines.join('\n') + '\n';
+  }
+
+  reset() {
+    for (const metric of this.metrics.values()) {
+      metric.reset();
+    }
+  }
+}
+
+const metrics = new MetricsRegistry();
+
+module.exports = {
+  DEFAULT_BUCKETS,
+  Counter,
+  Histogram,
+  MetricsRegistry,
+  metrics
+};
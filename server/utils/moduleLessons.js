@@ -0,0 +1,32 @@
+/**
+ * Module documents reference their lessons in a few historical shapes:
+ * - module builder: { lessonPlans: { 0: "<lessonId>", 1: "<lessonId>" }, lessons: [...] }
+ * - API createModule: { lessonPlans: ["<lessonId>", ...] }
+ * - drafts: { lessons: ["<lessonId>", ...] }
+ */
+
+/**
+ * Get a module's lesson IDs in display order
+ * @param {Object} moduleData - Module document data
+ * @returns {Array<string>} Lesson IDs
+ */
+function getModuleLessonIds(moduleData = {}) {
+  const { lessonPlans, lessons } = moduleData;
+
+  let lessonIds = [];
+  if (Array.isArray(lessonPlans)) {
+    lessonIds = lessonPlans;
+  } else if (lessonPlans && typeof lessonPlans === "object") {
+    lessonIds = Object.keys(lessonPlans)
+      .sort((a, b) => Number(a) - Number(b))
+      .map((key) => lessonPlans[key]);
+  }
+
+  if (lessonIds.filter(Boolean).length === 0 && Array.isArray(lessons)) {
+    lessonIds = lessons;
+  }
+
+  return lessonIds.filter((lessonId) => typeof lessonId === "string" && lessonId);
+}
+
+module.exports = { getModuleLessonIds };
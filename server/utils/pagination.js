@@ -0,0 +1,209 @@
+/**
+ * Cursor pagination helpers for Firestore list endpoints
+ * Page tokens are opaque base64url strings wrapping the cursor values of the
+ * last document on a page, so clients never build cursors themselves
+ */
+
+// Firestore's reserved field path for ordering/filtering by document ID
+const DOCUMENT_ID_FIELD = '__name__';
+
+const DEFAULT_PAGE_SIZE = 20;
+const MAX_PAGE_SIZE = 100;
+
+/**
+ * Converts a cursor value into something JSON can carry without losing
+ * precision. Firestore Timestamps keep their nanoseconds; Dates become millis
+ */
+function toTokenValue(value) {
+  if (value && typeof value.toMillis === 'function' && value.nanoseconds !== undefined) {
+    return { __timestamp: [value.seconds, value.nanoseconds] };
+  }
+  if (value instanceof Date) {
+    return { __date: value.getTime() };
+  }
+  return value;
+}
+
+/**
+ * Inverse of toTokenValue. Timestamps are rebuilt with the given Timestamp
+ * class when one is available (real Firestore), otherwise as Dates
+ */
+function fromTokenValue(value, Timestamp) {
+  if (value && Array.isArray(value.__timestamp)) {
+    const [seconds, nanoseconds] = value.__timestamp;
+    return Timestamp
+      ? new Timestamp(seconds, nanoseconds)
+      : new Date(seconds * 1000 + Math.floor(nanoseconds / 1e6));
+  }
+  if (value && value.__date !== undefined) {
+    return new Date(value.__date);
+  }
+  return value;
+}
+
+/**
+ * Encodes cursor values into an opaque page token
+ * @param {Array} values - Cursor values matching the query's orderBy fields
+ * @returns {string} base64url encoded page token
+ */
+function encodePageToken(values) {
+  return Buffer.from(JSON.stringify(values.map(toTokenValue)), 'utf8').toString('base64url');
+}
+
+/**
+ * Decodes a page token back into cursor values
+ * @param {string} token - Page token previously issued by encodePageToken
+ * @returns {Array} Cursor values
+ * @throws {Error} Error with status 400 when the token is malformed
+ */
+function decodePageToken(token) {
+  try {
+    const values = JSON.parse(Buffer.from(String(token), 'base64url').toString('utf8'));
+    if (!Array.isArray(values) || values.length === 0) {
+      throw new Error('Page token must wrap a non-empty array');
+    }
+    return values;
+  } catch (error) {
+    const invalidToken = new Error('Invalid page token');
+    invalidToken.status = 400;
+    throw invalidToken;
+  }
+}
+
+/**
+ * Parses a requested page size, clamped to 1..maxLimit
+ * Missing or non-numeric values fall back to defaultLimit
+ * @param {*} limit - Raw `limit` query value
+ * @param {number} defaultLimit - Page size when none is given
+ * @param {number} maxLimit - Largest page size allowed
+ * @returns {number} Page size
+ */
+function parsePageLimit(limit, defaultLimit = DEFAULT_PAGE_SIZE, maxLimit = MAX_PAGE_SIZE) {
+  const parsed = parseInt(limit);
+  if (Number.isNaN(parsed)) {
+    return defaultLimit;
+  }
+  return Math.max(1, Math.min(parsed, maxLimit));
+}
+
+/**
+ * Reads `limit` and `pageToken` from a request query
+ * Pagination is opt-in: when neither parameter is present null is returned
+ * and callers should fall back to returning the full (filtered) result set
+ * @param {Object} query - Express req.query
+ * @param {Object} options - { defaultLimit, maxLimit }
+ * @returns {Object|null} { limit, cursor } or null when not paginating
+ */
+function parsePageParams(query = {}, options = {}) {
+  const { defaultLimit = DEFAULT_PAGE_SIZE, maxLimit = MAX_PAGE_SIZE } = options;
+  const { limit, pageToken } = query;
+
+  if (limit === undefined && pageToken === undefined) {
+    return null;
+  }
+
+  return {
+    limit: parsePageLimit(limit, defaultLimit, maxLimit),
+    cursor: pageToken ? decodePageToken(pageToken) : null
+  };
+}
+
+/**
+ * Extracts the cursor values of a document for the given order fields
+ * @param {Object} doc - Firestore DocumentSnapshot
+ * @param {Array} orderFields - Field names the query is ordered by
+ * @returns {Array} Cursor values
+ */
+function getCursorValues(doc, orderFields) {
+  return orderFields.map((field) =>
+    field === DOCUMENT_ID_FIELD ? doc.id : doc.data()[field]
+  );
+}
+
+/**
+ * Runs one page of a query ordered by `orderFields` (document ID by default)
+ * One extra document is requested so we know whether a next page exists
+ * without issuing an additional query. For keyset pagination on a non-unique
+ * field, end `orderFields` with DOCUMENT_ID_FIELD as a tiebreaker
+ * @param {Object} query - Firestore Query with filters already applied
+ * @param {Object} page - { limit, cursor } as returned by parsePageParams
+ * @param {Array} orderFields - Field names to order and paginate by
+ * @param {Object} options - { direction: 'asc' | 'desc', Timestamp: class used to rebuild cursor timestamps }
+ * @returns {Promise<Object>} { docs, nextPageToken }
+ */
+async function fetchPage(query, page, orderFields = [DOCUMENT_ID_FIELD], options = {}) {
+  const { direction = 'asc', Timestamp = null } = options;
+
+  let pageQuery = query;
+  orderFields.forEach((field) => {
+    pageQuery = pageQuery.orderBy(field, direction);
+  });
+
+  if (page.cursor) {
+    pageQuery = pageQuery.startAfter(...page.cursor.map((value) => fromTokenValue(value, Timestamp)));
+  }
+
+  const snapshot = await pageQuery.limit(page.limit + 1).get();
+  const docs = snapshot.docs.slice(0, page.limit);
+  const hasMore = snapshot.docs.length > page.limit;
+
+  return {
+    docs,
+    nextPageToken: hasMore
+      ? encodePageToken(getCursorValues(docs[docs.length - 1], orderFields))
+      : null
+  };
+}
+
+/**
+ * Runs one page over the union of several queries, deduplicated by document ID
+ * Every query is ordered by document ID, so the first `limit` distinct IDs of the
+ * union are always among the first `limit + 1` documents of each query
+ * @param {Array} queries - Firestore Queries with filters already applied
+ * @param {Object|null} page - { limit, cursor } or null to read every match
+ * @returns {Promise<Object>} { docs, nextPageToken }
+ */
+async function fetchMergedPage(queries, page) {
+  const snapshots = await Promise.all(queries.map((query) => {
+    let pageQuery = query.orderBy(DOCUMENT_ID_FIELD);
+    if (page && page.cursor) {
+      pageQuery = pageQuery.startAfter(...page.cursor);
+    }
+    return page ? pageQuery.limit(page.limit + 1).get() : pageQuery.get();
+  }));
+
+  const docsById = new Map();
+  snapshots.forEach((snapshot) => {
+    snapshot.docs.forEach((doc) => {
+      if (!docsById.has(doc.id)) {
+        docsById.set(doc.id, doc);
+      }
+    });
+  });
+
+  const merged = [...docsById.values()].sort((a, b) => (a.id < b.id ? -1 : a.id > b.id ? 1 : 0));
+  if (!page) {
+    return { docs: merged, nextPageToken: null };
+  }
+
+  const docs = merged.slice(0, page.limit);
+  return {
+    docs,
+    nextPageToken: merged.length > page.limit
+      ? encodePageToken([docs[docs.length - 1].id])
+      : null
+  };
+}
+
+module.exports = {
+  DOCUMENT_ID_FIELD,
+  DEFAULT_PAGE_SIZE,
+  MAX_PAGE_SIZE,
+  encodePageToken,
+  decodePageToken,
+  parsePageLimit,
+  parsePageParams,
+  getCursorValues,
+  fetchPage,
+  fetchMergedPage
+};
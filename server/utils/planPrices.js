@@ -0,0 +1,27 @@
+/**
+ * Subscription plan prices, in cents
+ * The one price table for every charge (Stripe PaymentIntents, Checkout
+ * Sessions and /subscription/process-payment). Amounts sent by the client are
+ * never charged. Enterprise has no list price: it is arranged through
+ * /subscription/enterprise-contact, so it cannot be paid for directly
+ */
+
+const PLAN_PRICES_CENTS = Object.freeze({
+  premium: 999,
+  premiumYearly: 10000
+});
+
+/**
+ * @param {string} planType - e.g. "premium"
+ * @returns {number|null} Price in cents, or null when the plan can't be bought directly
+ */
+function getPlanPriceCents(planType) {
+  return Object.prototype.hasOwnProperty.call(PLAN_PRICES_CENTS, planType)
+    ? PLAN_PRICES_CENTS[planType]
+    : null;
+}
+
+module.exports = {
+  PLAN_PRICES_CENTS,
+  getPlanPriceCents
+};
@@ -0,0 +1,90 @@
+/**
+ * Field projection helpers for ?fields= on list and detail endpoints
+ * List queries use Firestore select() so unrequested fields are never read;
+ * documents that are already in memory are trimmed with pickFields
+ */
+
+const MAX_FIELDS = 30;
+const FIELD_NAME_PATTERN = /^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$/;
+
+/**
+ * Parse a comma separated field list, falling back to the defaults
+ * @throws {Error} Error with status 400 for malformed field names
+ */
+function parseFieldList(value, defaults) {
+  if (value === undefined || value === "") {
+    return defaults;
+  }
+
+  const fields = [...new Set(String(value).split(",").map((field) => field.trim()).filter(Boolean))];
+  if (fields.length > MAX_FIELDS || fields.some((field) => !FIELD_NAME_PATTERN.test(field))) {
+    const error = new Error("Invalid field list");
+    error.status = 400;
+    throw error;
+  }
+  return fields;
+}
+
+/**
+ * Read ?fields= from a request query
+ * @returns {Array<string>|null} Field names, or null for whole documents
+ */
+function parseFieldsParam(query = {}) {
+  return parseFieldList(query.fields, null);
+}
+
+/**
+ * Apply select() to a query when fields were requested
+ * "id" is always returned (it is the document ID, not a field), and
+ * `requiredFields` (e.g. the orderBy field a page token is built from) are
+ * read even if not requested
+ * @param {Object} query - Firestore Query
+ * @param {Array<string>|null} fields - Requested fields
+ * @param {Array<string>} requiredFields - Fields the caller needs internally
+ */
+function selectFields(query, fields, requiredFields = []) {
+  if (!fields) {
+    return query;
+  }
+  const selected = [...new Set([...fields, ...requiredFields])].filter((field) => field !== "id");
+  return query.select(...selected);
+}
+
+/**
+ * Copy only the given (possibly dotted) fields of an object. Missing fields
+ * are omitted, as Firestore does for select()
+ * @param {Object} data - Document data
+ * @param {Array<string>|null} fields - Fields to keep, or null for all
+ */
+function pickFields(data, fields) {
+  if (!fields) {
+    return data;
+  }
+
+  const picked = {};
+  for (const field of fields) {
+    const path = field.split(".");
+    let value = data;
+    for (const key of path) {
+      value = value !== null && typeof value === "object" ? value[key] : undefined;
+    }
+    if (value === undefined) {
+      continue;
+    }
+
+    let target = picked;
+    path.slice(0, -1).forEach((key) => {
+      target[key] = target[key] !== null && typeof target[key] === "object" ? target[key] : {};
+      target = target[key];
+    });
+    target[path[path.length - 1]] = value;
+  }
+  return picked;
+}
+
+module.exports = {
+  parseFieldList,
+  parseFieldsParam,
+  selectFields,
+  pickFields,
+};
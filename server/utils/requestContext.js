@@ -0,0 +1,67 @@
+/**
+ * Per-request context carried across awaits with AsyncLocalStorage, so code
+ * far from the handler (e.g. Firestore instrumentation) can tell which route
+ * it is working for without threading `req` through every call
+ */
+
+const { AsyncLocalStorage } = require('async_hooks');
+
+const requestContext = new AsyncLocalStorage();
+
+/**
+ * The context object of the request being handled, or undefined outside one
+ */
+function currentContext() {
+  return requestContext.getStore();
+}
+
+/**
+ * Route pattern for metric labels, e.g. "/api/user/:userId"
+ * Raw paths would give every user ID its own series, so requests that matched
+ * no route share one label
+ */
+function routeLabel(req, route = req && req.route) {
+  if (!route) {
+    return 'unmatched';
+  }
+  const label = `${req.baseUrl || ''}${route.path}`;
+  return label.length > 1 && label.endsWith('/') ? label.slice(0, -1) : label;
+}
+
+/**
+ * Context for `req`, to be entered with requestContext.run(). The route label
+ * is taken when Express matches a route: req.baseUrl is reset once an error
+ * leaves a router, so by the time an error response finishes it no longer has
+ * the mount path
+ */
+function createRequestContext(req) {
+  const context = { req, route: 'unmatched' };
+  let matchedRoute;
+  Object.defineProperty(req, 'route', {
+    configurable: true,
+    enumerable: true,
+    get: () => matchedRoute,
+    set: (route) => {
+      matchedRoute = route;
+      context.route = routeLabel(req, route);
+    }
+  });
+  return context;
+}
+
+/**
+ * Route label for the request being handled ("background" outside a request,
+ * e.g. queued webhook processing or the payment log writer)
+ */
+function currentRouteLabel() {
+  const context = currentContext();
+  return context ? context.route : 'background';
+}
+
+module.exports = {
+  requestContext,
+  currentContext,
+  routeLabel,
+  createRequestContext,
+  currentRouteLabel
+};
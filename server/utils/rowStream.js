@@ -0,0 +1,146 @@
+/**
+ * Streaming row readers for bulk imports
+ * Rows are yielded one at a time as { line, row } or { line, error }, so a
+ * large upload is never held in memory. `line` is the 1-based line number
+ * where the record starts, for reporting back to the client
+ */
+
+const readline = require('readline');
+
+// Guards against an unterminated quote swallowing the rest of a CSV upload
+const MAX_RECORD_LENGTH = 1024 * 1024;
+
+function createLineReader(stream) {
+  return readline.createInterface({ input: stream, crlfDelay: Infinity });
+}
+
+/**
+ * Read newline-delimited JSON objects. Blank lines are skipped
+ * @param {Object} stream - Readable stream (e.g. an Express request)
+ */
+async function* readNdjsonRows(stream) {
+  let line = 0;
+  for await (const text of createLineReader(stream)) {
+    line++;
+    if (!text.trim()) {
+      continue;
+    }
+
+    let row;
+    try {
+      row = JSON.parse(text);
+    } catch (error) {
+      yield { line, error: 'Invalid JSON' };
+      continue;
+    }
+
+    if (!row || typeof row !== 'object' || Array.isArray(row)) {
+      yield { line, error: 'Each line must be a JSON object' };
+      continue;
+    }
+    yield { line, row };
+  }
+}
+
+/**
+ * Split one CSV record into fields (RFC 4180 quoting)
+ * @returns {Array<string>|null} Fields, or null if a quoted field is still open
+ */
+function parseCsvRecord(text) {
+  const fields = [];
+  let field = '';
+  let inQuotes = false;
+
+  for (let i = 0; i < text.length; i++) {
+    const char = text[i];
+    if (inQuotes) {
+      if (char === '"' && text[i + 1] === '"') {
+        field += '"';
+        i++;
+      } else if (char === '"') {
+        inQuotes = false;
+      } else {
+        field += char;
+      }
+    } else if (char === '"') {
+      inQuotes = true;
+    } else if (char === ',') {
+      fields.push(field);
+      field = '';
+    } else {
+      field += char;
+    }
+  }
+
+  if (inQuotes) {
+    return null;
+  }
+  fields.push(field);
+  return fields;
+}
+
+/**
+ * Read CSV records as objects keyed by the header row. Quoted fields may
+ * span lines; blank lines are skipped
+ * @param {Object} stream - Readable stream (e.g. an Express request)
+ */
+async function* readCsvRows(stream) {
+  let header = null;
+  let line = 0;
+  let record = '';
+  let recordLine = 0;
+
+  for await (const text of createLineReader(stream)) {
+    line++;
+    if (!record && !text.trim()) {
+      continue;
+    }
+
+    record = record ? `${record}\n${text}` : text;
+    recordLine = recordLine || line;
+
+    const fields = parseCsvRecord(record);
+    if (!fields) {
+      if (record.length > MAX_RECORD_LENGTH) {
+        yield { line: recordLine, error: 'Unterminated quoted field' };
+        return;
+      }
+      continue;
+    }
+
+    const startLine = recordLine;
+    record = '';
+    recordLine = 0;
+
+    if (!header) {
+      header = fields.map((name) => name.trim().replace(/^\uFEFF/, ''));
+      continue;
+    }
+
+    if (fields.length !== header.length) {
+      yield { line: startLine, error: `Expected ${header.length} columns, found ${fields.length}` };
+      continue;
+    }
+    yield { line: startLine, row: Object.fromEntries(header.map((name, index) => [name, fields[index]])) };
+  }
+
+  if (record) {
+    yield { line: recordLine, error: 'Unterminated quoted field' };
+  }
+}
+
+/**
+ * Read rows in the given format
+ * @param {Object} stream - Readable stream
+ * @param {string} format - 'ndjson' or 'csv'
+ */
+function readRows(stream, format) {
+  return format === 'csv' ? readCsvRows(stream) : readNdjsonRows(stream);
+}
+
+module.exports = {
+  readRows,
+  readNdjsonRows,
+  readCsvRows,
+  parseCsvRecord
+};
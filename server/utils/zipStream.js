@@ -0,0 +1,149 @@
+/**
+ * Minimal streaming ZIP writer (store method, no compression)
+ * Entries are written to the output stream as soon as they are added, and only
+ * the small central directory is kept in memory until finish(). Intended for
+ * already-compressed payloads such as PDFs, so storing avoids wasted CPU
+ */
+
+const zlib = require('zlib');
+
+const LOCAL_FILE_HEADER = 0x04034b50;
+const CENTRAL_DIRECTORY_HEADER = 0x02014b50;
+const END_OF_CENTRAL_DIRECTORY = 0x06054b50;
+const ZIP_VERSION = 20;
+const UTF8_NAMES_FLAG = 0x0800;
+const MAX_ENTRIES = 0xffff;
+
+let crcTable = null;
+
+/**
+ * CRC-32 of a buffer, using zlib.crc32 where the Node version provides it
+ */
+function crc32(buffer) {
+  if (typeof zlib.crc32 === 'function') {
+    return zlib.crc32(buffer);
+  }
+
+  if (!crcTable) {
+    crcTable = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+      let c = n;
+      for (let k = 0; k < 8; k++) {
+        c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+      }
+      crcTable[n] = c >>> 0;
+    }
+  }
+
+  let crc = 0xffffffff;
+  for (let i = 0; i < buffer.length; i++) {
+    crc = crcTable[(crc ^ buffer[i]) & 0xff] ^ (crc >>> 8);
+  }
+  return (crc ^ 0xffffffff) >>> 0;
+}
+
+/**
+ * Convert a Date to MS-DOS time/date fields
+ */
+function toDosDateTime(date) {
+  return {
+    time: (date.getHours() << 11) | (date.getMinutes() << 5) | Math.floor(date.getSeconds() / 2),
+    date: ((Math.max(date.getFullYear(), 1980) - 1980) << 9) | ((date.getMonth() + 1) << 5) | date.getDate()
+  };
+}
+
+class ZipStreamWriter {
+  /**
+   * @param {Object} output - Writable stream (e.g. an Express response)
+   */
+  constructor(output) {
+    this.output = output;
+    this.offset = 0;
+    this.entries = [];
+  }
+
+  /**
+   * Append a file. The header and data are written synchronously, so entries
+   * added from concurrent workers never interleave; the returned promise
+   * resolves once the output has drained (backpressure)
+   * @param {string} name - File name inside the archive
+   * @param {Buffer} data - File contents
+   * @param {Date} modified - Modification time (default now)
+   */
+  async addFile(name, data, modified = new Date()) {
+    if (this.entries.length >= MAX_ENTRIES) {
+      throw new Error('ZIP archive entry limit reached');
+    }
+
+    const nameBuffer = Buffer.from(name, 'utf8');
+    const checksum = crc32(data);
+    const { time, date } = toDosDateTime(modified);
+
+    const header = Buffer.alloc(30);
+    header.writeUInt32LE(LOCAL_FILE_HEADER, 0);
+    header.writeUInt16LE(ZIP_VERSION, 4);
+    header.writeUInt16LE(UTF8_NAMES_FLAG, 6);
+    header.writeUInt16LE(0, 8); // store
+    header.writeUInt16LE(time, 10);
+    header.writeUInt16LE(date, 12);
+    header.writeUInt32LE(checksum, 14);
+    header.writeUInt32LE(data.length, 18);
+    header.writeUInt32LE(data.length, 22);
+    header.writeUInt16LE(nameBuffer.length, 26);
+    header.writeUInt16LE(0, 28);
+
+    this.entries.push({ nameBuffer, checksum, size: data.length, offset: this.offset, time, date });
+    this.offset += header.length + nameBuffer.length + data.length;
+
+    this.output.write(header);
+    this.output.write(nameBuffer);
+    const flushed = this.output.write(data);
+    if (!flushed && !this.output.destroyed) {
+      await new Promise((resolve) => {
+        const done = () => {
+          this.output.removeListener('drain', done);
+          this.output.removeListener('close', done);
+          resolve();
+        };
+        this.output.once('drain', done);
+        this.output.once('close', done);
+      });
+    }
+  }
+
+  /**
+   * Write the central directory and end record. Does not end the output
+   */
+  finish() {
+    const directoryOffset = this.offset;
+    const records = this.entries.map((entry) => {
+      const record = Buffer.alloc(46);
+      record.writeUInt32LE(CENTRAL_DIRECTORY_HEADER, 0);
+      record.writeUInt16LE(ZIP_VERSION, 4);
+      record.writeUInt16LE(ZIP_VERSION, 6);
+      record.writeUInt16LE(UTF8_NAMES_FLAG, 8);
+      record.writeUInt16LE(0, 10); // store
+      record.writeUInt16LE(entry.time, 12);
+      record.writeUInt16LE(entry.date, 14);
+      record.writeUInt32LE(entry.checksum, 16);
+      record.writeUInt32LE(entry.size, 20);
+      record.writeUInt32LE(entry.size, 24);
+      record.writeUInt16LE(entry.nameBuffer.length, 28);
+      record.writeUInt32LE(entry.offset, 42);
+      return Buffer.concat([record, entry.nameBuffer]);
+    });
+    const directory = Buffer.concat(records);
+
+    const end = Buffer.alloc(22);
+    end.writeUInt32LE(END_OF_CENTRAL_DIRECTORY, 0);
+    end.writeUInt16LE(this.entries.length, 8);
+    end.writeUInt16LE(this.entries.length, 10);
+    end.writeUInt32LE(directory.length, 12);
+    end.writeUInt32LE(directoryOffset, 16);
+
+    this.output.write(directory);
+    this.output.write(end);
+  }
+}
+
+module.exports = { ZipStreamWriter, crc32 };
@@ -8,6 +8,7 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from unittest.mock import Mock, patch, MagicMock
+from tests.live_server import DEFAULT_START_TIMEOUT, LiveServer, ServerStartError
 # ANJ from test_data import (
 from tests.test_data import (
     SAMPLE_USER_DATA, SAMPLE_ADMIN_DATA, SAMPLE_TEACHER_PLUS_DATA,
@@ -17,10 +18,60 @@ from tests.test_data import (
 )
 
 
+DEFAULT_API_BASE_URL = "http://localhost:3001/api"
+# Connections kept open per host; enough for the threaded upload tests
+SESSION_POOL_SIZE = 32
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: Integration tests requiring server")
+
+
+@pytest.fixture(scope="session")
+def api_server(tmp_path_factory):
+    """
+    Base URL of a server the integration tests can use
+    With API_BASE_URL set, that server is used as is. Otherwise server/index.js
+    is started in mock mode on a free port for this session (one per
+    pytest-xdist worker) and stopped afterwards; tests are skipped when it
+    can't be started, e.g. without Node or the server's npm dependencies
+    """
+    external = os.getenv("API_BASE_URL")
+    if external:
+        try:
+            requests.get(external.rsplit("/api", 1)[0] + "/", timeout=5)
+        except requests.exceptions.RequestException:
+            pytest.skip(f"API_BASE_URL is set but {external} is not reachable")
+        yield external
+        return
+
+    worker = os.getenv("PYTEST_XDIST_WORKER", "main")
+    server = LiveServer(tmp_path_factory.mktemp("server") / f"{worker}.log")
+    try:
+        server.start(timeout=float(os.getenv("API_SERVER_START_TIMEOUT", DEFAULT_START_TIMEOUT)))
+    except ServerStartError as error:
+        pytest.skip(f"Could not start the API server: {error}")
+    yield server.base_url
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def api_session():
+    """Keep-alive requests.Session shared by the integration tests"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SESSION_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    yield session
+    session.close()
+
+
 @pytest.fixture
-def api_base_url():
-    """Base URL for the API server"""
-    return os.getenv("API_BASE_URL", "http://localhost:3001/api")
+def api_base_url(request):
+    """Base URL for the API server; tests marked integration get a running one"""
+    if request.node.get_closest_marker("integration"):
+        return request.getfixturevalue("api_server")
+    return os.getenv("API_BASE_URL", DEFAULT_API_BASE_URL)
 
 
 @pytest.fixture
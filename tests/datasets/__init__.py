@@ -0,0 +1,2 @@
+# Seeded synthetic datasets for scale testing the DIYA Curriculum Portal API
+# Run with: python -m tests.datasets --help
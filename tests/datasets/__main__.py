@@ -0,0 +1,62 @@
+"""
+Command line entry point for synthetic datasets
+
+Usage:
+    python -m tests.datasets generate --size 100000 --seed 7 --output /tmp/diya-100k
+    python -m tests.datasets load /tmp/diya-100k --emulator-host localhost:8080
+
+Serve a generated dataset from mock mode:
+    cd server && ENABLE_MOCK_FIREBASE=true MOCK_FIRESTORE_DATASET=/tmp/diya-100k npm start
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from tests.datasets.generator import MAX_SIZE, MIN_SIZE, generate_dataset
+from tests.datasets.loader import load_into_emulator
+from tests.datasets.ndjson import read_dataset, write_dataset
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and load synthetic curriculum portal data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a seeded dataset as NDJSON files")
+    generate.add_argument("--size", type=int, default=10_000,
+                          help=f"Total documents, {MIN_SIZE}-{MAX_SIZE} (default: 10000)")
+    generate.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    generate.add_argument("--output", required=True, help="Directory to write the dataset to")
+
+    load = commands.add_parser("load", help="Write a dataset into the Firestore emulator")
+    load.add_argument("directory", help="Dataset directory written by 'generate'")
+    load.add_argument("--emulator-host", default="localhost:8080",
+                      help="Firestore emulator host:port (default: localhost:8080)")
+    load.add_argument("--project", default="demo-diya", help="Emulator project ID (default: demo-diya)")
+    load.add_argument("--qualifier", default="", help="Collection name prefix, as DATABASE_SCHEMA_QUALIFIER")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    if args.command == "generate":
+        try:
+            dataset = generate_dataset(args.size, args.seed)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 2
+        result = write_dataset(args.output, dataset, size=args.size, seed=args.seed)
+    else:
+        result = load_into_emulator(read_dataset(args.directory), host=args.emulator_host,
+                                    project=args.project, qualifier=args.qualifier)
+
+    print(json.dumps(result, indent=2))
+    print(f"Done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
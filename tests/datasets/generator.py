@@ -0,0 +1,220 @@
+"""
+Seeded generators for synthetic users, content units, lessons, modules and
+payment logs, shaped like the documents the server writes
+
+The same (size, seed) always produces the same documents. Every collection
+draws from its own random stream and IDs are positional (unit-0000001, ...),
+so collections can be generated independently and one at a time: lessons
+reference units and modules reference lessons by ID without holding the
+other collection in memory.
+
+Values are JSON, except Firestore Timestamps, which are written as
+{"$timestamp": "<ISO 8601>"} and converted back by the loaders. Fields the
+server stores as ISO strings (lesson createdAt, unit LastModified) stay strings.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+MIN_SIZE = 1_000
+MAX_SIZE = 1_000_000
+
+# Share of the total document count per collection (unqualified names)
+COLLECTION_SHARES = {
+    "users": 0.10,
+    "content": 0.30,
+    "lesson": 0.30,
+    "module": 0.01,
+    "payment_logs": 0.29,
+}
+
+TIMESTAMP_KEY = "$timestamp"
+
+# Documents are dated within this window, so runs don't depend on today's date
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+WINDOW_SECONDS = 2 * 365 * 24 * 3600
+
+CATEGORIES = ["Data Science", "Physics", "Software Testing", "Software Engineering", "Mathematics", "Biology"]
+LEVELS = ["Basic", "Intermediate", "Advanced"]
+UNIT_TYPES = ["Reading", "Activity", "Video", "Worksheet"]
+SUBJECTS = ["Math", "Science", "Physics", "Chemistry", "Biology", "Computer Science", "English"]
+FIRST_NAMES = ["Ada", "Grace", "Alan", "Katherine", "Linus", "Margaret", "Tim", "Barbara", "Dennis", "Radia"]
+LAST_NAMES = ["Lovelace", "Hopper", "Turing", "Johnson", "Torvalds", "Hamilton", "Berners-Lee", "Liskov", "Ritchie", "Perlman"]
+WORDS = ["data", "motion", "energy", "testing", "graphs", "models", "signals", "patterns", "circuits", "cells",
+         "forces", "loops", "variables", "probability", "maps", "sensors", "systems", "waves", "design", "ethics"]
+# (role, subscriptionType, weight)
+ROLES = [("teacherDefault", "basic", 80), ("teacherPlus", "premium", 17), ("admin", "enterprise", 3)]
+PAYMENT_ACTIONS = [
+    ("upgrade_initiated", "initiated", 30),
+    ("payment_processed", "completed", 45),
+    ("payment_failed", "failed", 10),
+    ("subscription_cancelled", "cancelled", 10),
+    ("subscription_reactivated", "reactivated", 5),
+]
+
+
+def collection_sizes(size):
+    """Documents per collection for a dataset of `size` documents in total"""
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}, got {size}")
+
+    sizes = {name: max(1, int(size * share)) for name, share in COLLECTION_SHARES.items()}
+    # Rounding leftovers go to payment logs so the total is exactly `size`
+    sizes["payment_logs"] += size - sum(sizes.values())
+    return sizes
+
+
+def doc_id(collection, index):
+    prefix = {"users": "user", "content": "unit", "lesson": "lesson", "module": "module", "payment_logs": "log"}
+    return f"{prefix[collection]}-{index:07d}"
+
+
+def user_email(index):
+    return f"teacher{index}@example.edu"
+
+
+def timestamp(value):
+    """Marker for a Firestore Timestamp field"""
+    return {TIMESTAMP_KEY: iso(value)}
+
+
+def iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def _rng(seed, collection):
+    # Seeded from a string so each collection's stream is independent and stable
+    return random.Random(f"{seed}:{collection}")
+
+
+def _weighted(rng, choices):
+    return rng.choices(choices, weights=[choice[-1] for choice in choices])[0]
+
+
+def _moment(rng):
+    return EPOCH + timedelta(seconds=rng.randrange(WINDOW_SECONDS), milliseconds=rng.randrange(1000))
+
+
+def _title(rng, words=3):
+    return " ".join(rng.sample(WORDS, words)).capitalize()
+
+
+def generate_users(count, seed):
+    rng = _rng(seed, "users")
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        role, subscription, _ = _weighted(rng, ROLES)
+        created = _moment(rng)
+        yield doc_id("users", i), {
+            "email": user_email(i),
+            "fullName": f"{first} {last}",
+            "firstName": first,
+            "lastName": last,
+            "institution": f"{rng.choice(LAST_NAMES)} {rng.choice(['High School', 'Academy', 'University'])}",
+            "userType": "admin" if role == "admin" else "educator",
+            "jobTitle": rng.choice(["Teacher", "Senior Teacher", "Lecturer", "Administrator"]),
+            "subjects": rng.sample(SUBJECTS, rng.randint(0, 3)),
+            "role": role,
+            "subscriptionType": subscription,
+            "subscriptionStatus": "active",
+            "createdAt": timestamp(created),
+            "updatedAt": timestamp(created + timedelta(days=rng.randint(0, 90))),
+        }
+
+
+def generate_units(count, seed, user_count):
+    rng = _rng(seed, "content")
+    for i in range(1, count + 1):
+        category = rng.choice(CATEGORIES)
+        yield doc_id("content", i), {
+            "UnitID": f"diya{i}",
+            "Title": _title(rng),
+            "Category": category,
+            "Type": rng.choice(UNIT_TYPES),
+            "Level": rng.choice(LEVELS),
+            "Duration": rng.choice([5, 10, 15, 20, 30, 45]),
+            "isPublic": rng.random() < 0.8,
+            "Abstract": f"A {category.lower()} unit about {' and '.join(rng.sample(WORDS, 2))}.",
+            "fileUrl": f"https://example.com/units/unit-{i:07d}.pdf",
+            "Author": doc_id("users", rng.randint(1, user_count)),
+            "LastModified": iso(_moment(rng)),
+        }
+
+
+def generate_lessons(count, seed, user_count, unit_count):
+    rng = _rng(seed, "lesson")
+    for i in range(1, count + 1):
+        sections = [
+            {
+                "intro": f"Section {n + 1}: {_title(rng, 2).lower()}.",
+                "contentIds": [doc_id("content", rng.randint(1, unit_count)) for _ in range(rng.randint(0, 3))],
+            }
+            for n in range(rng.randint(0, 4))
+        ]
+        yield doc_id("lesson", i), {
+            "authorId": doc_id("users", rng.randint(1, user_count)),
+            "title": _title(rng),
+            "category": rng.choice(CATEGORIES),
+            "type": "Lesson Plan",
+            "level": rng.choice(LEVELS),
+            "objectives": [f"Explore {word}" for word in rng.sample(WORDS, rng.randint(1, 3))],
+            "duration": rng.choice([20, 30, 45, 60, 90]),
+            "sections": sections,
+            "description": f"A lesson on {' and '.join(rng.sample(WORDS, 2))}.",
+            "isPublic": rng.random() < 0.7,
+            "createdAt": iso(_moment(rng)),
+        }
+
+
+def generate_modules(count, seed, lesson_count):
+    rng = _rng(seed, "module")
+    for i in range(1, count + 1):
+        lessons = [doc_id("lesson", rng.randint(1, lesson_count)) for _ in range(rng.randint(1, 8))]
+        # Production has both shapes: an array and an index-keyed map
+        lesson_plans = lessons if rng.random() < 0.5 else {str(n): lesson for n, lesson in enumerate(lessons)}
+        yield doc_id("module", i), {
+            "title": _title(rng),
+            "description": f"A module covering {' and '.join(rng.sample(WORDS, 2))}.",
+            "tags": rng.sample(CATEGORIES, rng.randint(1, 2)),
+            "lessonPlans": lesson_plans,
+            "image": f"module{rng.randint(1, 6)}",
+        }
+
+
+def generate_payment_logs(count, seed, user_count):
+    rng = _rng(seed, "payment_logs")
+    for i in range(1, count + 1):
+        action, status, _ = _weighted(rng, PAYMENT_ACTIONS)
+        user = rng.randint(1, user_count)
+        entry = {
+            "userId": doc_id("users", user),
+            "action": action,
+            "fromPlan": "basic",
+            "toPlan": "premium",
+            "status": status,
+            "userEmail": user_email(user),
+            "timestamp": timestamp(_moment(rng)),
+        }
+        if action == "payment_processed":
+            entry.update({
+                "amount": rng.choice([9.99, 100]),
+                "paymentMethod": "simulated_card",
+                "paymentReference": f"sim_{rng.getrandbits(96):024x}",
+            })
+        yield doc_id("payment_logs", i), entry
+
+
+def generate_dataset(size, seed=0):
+    """
+    Lazily generate a dataset of `size` documents in total
+    Returns {collection: iterator of (id, data)}; nothing is generated until
+    an iterator is consumed
+    """
+    sizes = collection_sizes(size)
+    return {
+        "users": generate_users(sizes["users"], seed),
+        "content": generate_units(sizes["content"], seed, sizes["users"]),
+        "lesson": generate_lessons(sizes["lesson"], seed, sizes["users"], sizes["content"]),
+        "module": generate_modules(sizes["module"], seed, sizes["lesson"]),
+        "payment_logs": generate_payment_logs(sizes["payment_logs"], seed, sizes["users"]),
+    }
@@ -0,0 +1,120 @@
+"""
+Bulk loader for the Firestore emulator (gcloud emulators firestore start)
+
+Documents are written through the emulator's REST commit endpoint in
+batches of 500, the Firestore limit, with the "Bearer owner" token that
+bypasses security rules. The mock backend (ENABLE_MOCK_FIREBASE=true) is
+seeded by the server itself instead: point MOCK_FIRESTORE_DATASET at the
+dataset directory and server/utils/datasetLoader.js imports it on startup.
+
+Like datasetLoader.js, the loader keeps derived data consistent: the
+contentUsage index is rebuilt from the lessons as they are written, and the
+UnitID counter (counters/unitIdCounter) is moved past the highest imported
+UnitID with a "maximum" transform, so a higher existing counter is kept.
+"""
+
+import re
+
+import requests
+
+from tests.datasets.generator import TIMESTAMP_KEY
+
+BATCH_SIZE = 500
+UNIT_ID_PATTERN = re.compile(r"^diya(\d+)$")
+
+
+def to_firestore_value(value):
+    """Encode a dataset value as a Firestore REST API Value"""
+    if value is None:
+        return {"nullValue": None}
+    if isinstance(value, bool):
+        return {"booleanValue": value}
+    if isinstance(value, int):
+        return {"integerValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [to_firestore_value(item) for item in value]}}
+    if isinstance(value, dict):
+        if set(value) == {TIMESTAMP_KEY}:
+            return {"timestampValue": value[TIMESTAMP_KEY]}
+        return {"mapValue": {"fields": {key: to_firestore_value(item) for key, item in value.items()}}}
+    raise TypeError(f"Cannot encode {type(value).__name__} as a Firestore value")
+
+
+def _batches(documents, size):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _document_write(database, path, data):
+    return {
+        "update": {
+            "name": f"{database}/documents/{path}",
+            "fields": {key: to_firestore_value(value) for key, value in data.items()},
+        }
+    }
+
+
+def load_into_emulator(dataset, host="localhost:8080", project="demo-diya", qualifier="", timeout=60):
+    """
+    Write a dataset ({collection: iterator of (id, data)}) into the emulator,
+    then the contentUsage documents and UnitID counter derived from it
+    `qualifier` is prepended to collection names, like DATABASE_SCHEMA_QUALIFIER
+    Returns {collection: documents written}, dataset collections only
+    """
+    database = f"projects/{project}/databases/(default)"
+    url = f"http://{host}/v1/{database}/documents:commit"
+    counts = {}
+    content_usage = {}
+    highest_unit_number = 0
+
+    def observe(collection, doc_id, data):
+        nonlocal highest_unit_number
+        if collection == "lesson":
+            for section in data.get("sections") or []:
+                for content_id in section.get("contentIds") or []:
+                    content_usage.setdefault(content_id, {"lessons": {}})["lessons"][doc_id] = data.get("title") or ""
+        elif collection == "content":
+            match = UNIT_ID_PATTERN.match(data.get("UnitID") or "")
+            if match:
+                highest_unit_number = max(highest_unit_number, int(match.group(1)))
+
+    with requests.Session() as session:
+        session.headers["Authorization"] = "Bearer owner"
+
+        def commit(writes):
+            response = session.post(url, json={"writes": writes}, timeout=timeout)
+            response.raise_for_status()
+
+        for collection, documents in dataset.items():
+            counts[collection] = 0
+            for batch in _batches(documents, BATCH_SIZE):
+                writes = []
+                for doc_id, data in batch:
+                    observe(collection, doc_id, data)
+                    writes.append(_document_write(database, f"{qualifier}{collection}/{doc_id}", data))
+                commit(writes)
+                counts[collection] += len(writes)
+
+        for batch in _batches(content_usage.items(), BATCH_SIZE):
+            commit([_document_write(database, f"{qualifier}contentUsage/{content_id}", usage)
+                    for content_id, usage in batch])
+
+        if highest_unit_number > 0:
+            commit([{
+                "update": {"name": f"{database}/documents/{qualifier}counters/unitIdCounter", "fields": {}},
+                "updateMask": {"fieldPaths": []},
+                "updateTransforms": [
+                    {"fieldPath": "lastNumber", "maximum": {"integerValue": str(highest_unit_number)}},
+                ],
+            }])
+    return counts
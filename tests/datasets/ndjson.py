@@ -0,0 +1,64 @@
+"""
+Streaming NDJSON files for generated datasets
+
+A dataset is a directory with one <collection>.ndjson file per collection,
+one {"id": ..., "data": {...}} document per line, plus a manifest.json with
+the size, seed and per-collection counts. Files are written and read one
+line at a time, so a million-document dataset never has to fit in memory.
+"""
+
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+
+def write_ndjson(path, documents):
+    """Write (id, data) pairs to `path`; returns the number written"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as handle:
+        for doc_id, data in documents:
+            handle.write(json.dumps({"id": doc_id, "data": data}, separators=(",", ":")))
+            handle.write("\n")
+            count += 1
+    return count
+
+
+def read_ndjson(path):
+    """Yield (id, data) pairs from an NDJSON file written by write_ndjson"""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                document = json.loads(line)
+                yield document["id"], document["data"]
+
+
+def write_dataset(directory, dataset, **manifest):
+    """
+    Write every collection of a dataset (see generator.generate_dataset)
+    Extra keyword arguments, such as size and seed, are recorded in the manifest
+    Returns the manifest
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {
+        collection: write_ndjson(os.path.join(directory, f"{collection}.ndjson"), documents)
+        for collection, documents in dataset.items()
+    }
+
+    manifest = {**manifest, "collections": counts}
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def read_dataset(directory):
+    """{collection: iterator of (id, data)} for a dataset directory, in manifest order"""
+    return {
+        collection: read_ndjson(os.path.join(directory, f"{collection}.ndjson"))
+        for collection in read_manifest(directory)["collections"]
+    }
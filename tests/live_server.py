@@ -0,0 +1,125 @@
+"""
+Runs server/index.js in mock mode for the integration tests
+
+Each pytest process (each pytest-xdist worker) starts its own server on a
+free port, so workers never share state or fight over port 3001. Server
+output goes to a log file whose tail is shown when startup fails.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+import requests
+
+from tests.test_data import STRIPE_TEST_WEBHOOK_SECRET
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server"))
+READY_PATH = "/"
+DEFAULT_START_TIMEOUT = 30
+STOP_TIMEOUT = 10
+
+
+class ServerStartError(RuntimeError):
+    """The server could not be started or never became ready"""
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Always applied on top of os.environ: a shell holding real credentials must
+# never point the suite (which bulk-inserts and charges) at real Firestore or Stripe
+MOCK_SERVER_SETTINGS = {
+    "ENABLE_MOCK_FIREBASE": "true",
+    "DATABASE_SCHEMA_QUALIFIER": "test.",
+    "PAYMENT_PROCESSOR": "simulator",
+    # Placeholder key and the fixture secret, so the Stripe webhook tests run offline
+    "STRIPE_SECRET_KEY": "sk_test_offline",
+    "STRIPE_WEBHOOK_SECRET": STRIPE_TEST_WEBHOOK_SECRET,
+}
+
+
+def mock_server_env(port, overrides=None):
+    """
+    Environment for a mock mode server
+    os.environ can change other settings, but never MOCK_SERVER_SETTINGS;
+    `overrides` (set by the tests themselves) win over both
+    """
+    defaults = {
+        "NODE_ENV": "development",
+        "SERVER_ALLOW_ORIGIN": "http://localhost:3000",
+    }
+    return {**defaults, **os.environ, **MOCK_SERVER_SETTINGS, "PORT": str(port), **(overrides or {})}
+
+
+class LiveServer:
+    """A server/index.js child process"""
+
+    def __init__(self, log_path, port=None, env=None, command=None):
+        self.port = port or free_port()
+        self.log_path = str(log_path)
+        self.env = mock_server_env(self.port, env)
+        self.command = command or ["node", "index.js"]
+        self.process = None
+        self._log = None
+
+    @property
+    def root_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def base_url(self):
+        return f"{self.root_url}/api"
+
+    def start(self, timeout=DEFAULT_START_TIMEOUT):
+        if shutil.which(self.command[0]) is None:
+            raise ServerStartError(f"{self.command[0]} is not installed")
+
+        self._log = open(self.log_path, "wb")
+        self.process = subprocess.Popen(self.command, cwd=SERVER_DIR, env=self.env,
+                                        stdout=self._log, stderr=subprocess.STDOUT)
+        try:
+            self.wait_until_ready(timeout)
+        except ServerStartError:
+            self.stop()
+            raise
+        return self
+
+    def wait_until_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise ServerStartError(
+                    f"Server exited with code {self.process.returncode}:\n{self.log_tail()}")
+            try:
+                if requests.get(self.root_url + READY_PATH, timeout=1).status_code == 200:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.1)
+        raise ServerStartError(f"Server was not ready after {timeout}s:\n{self.log_tail()}")
+
+    def stop(self):
+        """SIGTERM, so queued payment logs and webhook events are flushed, then SIGKILL"""
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def log_tail(self, lines=20):
+        try:
+            with open(self.log_path, encoding="utf-8", errors="replace") as handle:
+                return "".join(handle.readlines()[-lines:])
+        except OSError:
+            return ""
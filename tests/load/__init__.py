@@ -0,0 +1,2 @@
+# Load and latency benchmark harness for the DIYA Curriculum Portal API
+# Run with: python -m tests.load --help
@@ -0,0 +1,103 @@
+"""
+Command line entry point for the load harness
+
+Usage (server running with ENABLE_MOCK_FIREBASE=true):
+    python -m tests.load --concurrency 1,8,32 --requests 500 --output results.json
+    python -m tests.load --scenario lessons --scenario units --duration 10
+    python -m tests.load --baseline before.json --output after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import requests
+
+from tests.load.harness import compare_results, run_scenario
+from tests.load.scenarios import SCENARIOS, SCENARIOS_BY_NAME
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the curriculum portal API")
+    parser.add_argument("--base-url", default=os.getenv("API_BASE_URL", "http://localhost:3001/api"),
+                        help="API base URL (default: $API_BASE_URL or http://localhost:3001/api)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS_BY_NAME),
+                        help="Scenario to run; repeat for several (default: all)")
+    parser.add_argument("--concurrency", default="8",
+                        help="Worker count, or a comma separated sweep such as 1,8,32 (default: 8)")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Requests per scenario and concurrency level (default: 200)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Run each scenario for this many seconds instead of --requests")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed warmup requests (default: 5)")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare this run against")
+    return parser.parse_args(argv)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    scenarios = [SCENARIOS_BY_NAME[name] for name in args.scenario] if args.scenario else SCENARIOS
+
+    server_root = args.base_url.rsplit("/api", 1)[0] + "/"
+    try:
+        requests.get(server_root, timeout=5)
+    except requests.exceptions.RequestException:
+        print(f"Server is not reachable at {server_root} - start it with: "
+              "cd server && ENABLE_MOCK_FIREBASE=true npm start", file=sys.stderr)
+        return 2
+
+    report = {
+        "meta": {
+            "base_url": args.base_url,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "requests_per_run": None if args.duration else args.requests,
+            "duration_s": args.duration,
+            "warmup": args.warmup,
+        },
+        "results": [],
+    }
+
+    for scenario in scenarios:
+        for concurrency in levels:
+            result = run_scenario(args.base_url, scenario, concurrency=concurrency,
+                                  total_requests=args.requests, duration=args.duration,
+                                  warmup=args.warmup, timeout=args.timeout)
+            report["results"].append(result)
+            latency = result["latency_ms"]
+            print(f"{scenario.name:<22} c={concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                  f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+                  f"errors={result['errors']}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["comparison"] = compare_results(json.load(baseline_file), report)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    return 1 if any(result["errors"] for result in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
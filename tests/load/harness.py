@@ -0,0 +1,184 @@
+"""
+Core of the load/benchmark harness: drives one scenario at a fixed concurrency
+and summarises latency percentiles and throughput
+"""
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Linearly interpolated percentile of an already sorted list (pct in 0-100)"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * weight
+
+
+def summarize_latencies(latencies_ms):
+    """min/mean/p50/p95/p99/max of a list of latencies in milliseconds"""
+    values = sorted(latencies_ms)
+    if not values:
+        return {key: None for key in ("min", "mean", "p50", "p95", "p99", "max")}
+
+    return {
+        "min": round(values[0], 3),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class _ThreadLocalSessions:
+    """One pooled requests.Session per worker thread (Sessions are not thread-safe)"""
+
+    def __init__(self, pool_size):
+        self._local = threading.local()
+        self._pool_size = pool_size
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+
+
+def run_scenario(base_url, scenario, concurrency=8, total_requests=200, duration=None,
+                 warmup=5, timeout=30):
+    """
+    Run a scenario and return its summary
+
+    Args:
+        base_url: API base URL, e.g. http://localhost:3001/api
+        scenario: Scenario (see scenarios.py)
+        concurrency: Number of worker threads issuing requests
+        total_requests: Requests to issue (ignored when duration is set)
+        duration: Run for this many seconds instead of a fixed request count
+        warmup: Untimed requests issued first (fills caches and connection pools)
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        dict with request counts, status codes, latency percentiles and throughput
+    """
+    sessions = _ThreadLocalSessions(concurrency)
+    url = base_url.rstrip("/") + scenario.path
+    lock = threading.Lock()
+    latencies_ms = []
+    status_codes = Counter()
+    errors = Counter()
+    bytes_received = [0]
+    issued = [0]
+
+    def send():
+        return sessions.get().request(
+            scenario.method, url, headers=scenario.headers, json=scenario.body, timeout=timeout
+        )
+
+    for _ in range(warmup):
+        try:
+            send()
+        except requests.exceptions.RequestException:
+            pass
+
+    deadline = time.perf_counter() + duration if duration else None
+
+    def claim():
+        # Hand out request slots until the count or the deadline is reached
+        with lock:
+            if deadline is None and issued[0] >= total_requests:
+                return False
+            issued[0] += 1
+        return deadline is None or time.perf_counter() < deadline
+
+    def worker():
+        while claim():
+            started = time.perf_counter()
+            try:
+                response = send()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies_ms.append(elapsed_ms)
+                    status_codes[str(response.status_code)] += 1
+                    bytes_received[0] += len(response.content)
+                    if response.status_code not in scenario.expected_status:
+                        errors["unexpected_status"] += 1
+            except requests.exceptions.RequestException as error:
+                with lock:
+                    errors[type(error).__name__] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    sessions.close()
+
+    completed = len(latencies_ms)
+    return {
+        "scenario": scenario.name,
+        "method": scenario.method,
+        "path": scenario.path,
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+        "status_codes": dict(status_codes),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(completed / elapsed, 3) if elapsed > 0 else None,
+        "bytes_received": bytes_received[0],
+        "latency_ms": summarize_latencies(latencies_ms),
+    }
+
+
+def compare_results(baseline, current):
+    """
+    Compare two harness reports scenario by scenario
+
+    Returns:
+        list of dicts with p50/p95/p99 and throughput changes in percent
+        (negative latency change and positive throughput change are improvements)
+    """
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return None
+        return round((new - old) * 100.0 / old, 1)
+
+    baseline_by_key = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    comparison = []
+    for result in current["results"]:
+        previous = baseline_by_key.get((result["scenario"], result["concurrency"]))
+        if previous is None:
+            continue
+        comparison.append({
+            "scenario": result["scenario"],
+            "concurrency": result["concurrency"],
+            "p50_change_pct": change(previous["latency_ms"]["p50"], result["latency_ms"]["p50"]),
+            "p95_change_pct": change(previous["latency_ms"]["p95"], result["latency_ms"]["p95"]),
+            "p99_change_pct": change(previous["latency_ms"]["p99"], result["latency_ms"]["p99"]),
+            "throughput_change_pct": change(previous["throughput_rps"], result["throughput_rps"]),
+        })
+    return comparison
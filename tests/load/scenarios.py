@@ -0,0 +1,46 @@
+"""
+Endpoint scenarios for the load harness
+IDs and tokens match the seed data in server/utils/firebaseMock.js, so every
+scenario works offline against the server in ENABLE_MOCK_FIREBASE=true mode
+"""
+
+from collections import namedtuple
+
+Scenario = namedtuple("Scenario", ["name", "method", "path", "headers", "body", "expected_status"])
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+ADMIN_HEADERS = {"Authorization": "Bearer valid-admin-token"}
+PREMIUM_HEADERS = {"Authorization": "Bearer valid-premium-token"}
+
+
+def scenario(name, path, method="GET", headers=None, body=None, expected_status=(200,)):
+    return Scenario(name, method, path, headers or {}, body, tuple(expected_status))
+
+
+SCENARIOS = [
+    scenario("lessons", "/lessons"),
+    scenario("lessons_page", "/lessons?limit=2"),
+    scenario("lesson_detail", "/lesson/lesson-001"),
+    scenario("my_lessons", "/lesson/myLessons", headers=USER_HEADERS),
+    scenario("lesson_pdf", "/lessons/lesson-001/download"),
+    scenario("units", "/units"),
+    scenario("units_page", "/units?limit=2"),
+    scenario("unit_detail", "/unit/unit-001"),
+    scenario("user_units", "/units/user", headers=USER_HEADERS),
+    scenario("modules", "/modules"),
+    scenario("module_detail", "/module/module-001"),
+    scenario("user_me", "/user/me", headers=USER_HEADERS),
+    scenario("admin_users", "/user/users?limit=20", headers=ADMIN_HEADERS),
+    scenario("subscription_status", "/subscription/status", headers=USER_HEADERS),
+    # Upgrade flow; latency and failures come from the server's PAYMENT_SIMULATOR_* settings
+    scenario(
+        "upgrade",
+        "/subscription/process-payment",
+        method="POST",
+        headers=PREMIUM_HEADERS,
+        body={"planType": "premium", "amount": 9.99, "cardInfo": {"paymentMethodId": "pm_card_visa"}, "billingCycle": "monthly"},
+        expected_status=(200, 402, 502),
+    ),
+]
+
+SCENARIOS_BY_NAME = {s.name: s for s in SCENARIOS}
@@ -0,0 +1,45 @@
+"""
+Runs short Node.js scripts against server modules
+
+For server code without an HTTP surface of its own (the Firestore emulator,
+the ZIP writer). Scripts run with server/ as the working directory, so they
+require modules as "./utils/...". Tests are skipped when Node is missing.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from tests.live_server import SERVER_DIR
+
+DEFAULT_TIMEOUT = 60
+
+SCRIPT_TEMPLATE = """
+{prelude}
+(async () => {{
+{body}
+}})().then(
+  (result) => {{ process.stdout.write('\\n' + JSON.stringify(result === undefined ? null : result) + '\\n'); }},
+  (error) => {{ console.error(error && error.stack || error); process.exit(1); }}
+);
+"""
+
+
+def run_node(body, prelude="", timeout=DEFAULT_TIMEOUT, env=None):
+    """
+    Run `body` as the body of an async function and return what it returns,
+    passed through JSON. `prelude` runs first at the top level (requires);
+    `env` adds environment variables
+    """
+    if shutil.which("node") is None:
+        pytest.skip("node is not installed")
+
+    script = SCRIPT_TEMPLATE.format(prelude=prelude, body=body)
+    result = subprocess.run(["node", "-e", script], cwd=SERVER_DIR, capture_output=True, text=True,
+                            timeout=timeout, env={**os.environ, **(env or {})})
+    if result.returncode != 0:
+        raise AssertionError(f"node exited with code {result.returncode}:\n{result.stderr}")
+    return json.loads(result.stdout.rstrip().splitlines()[-1])
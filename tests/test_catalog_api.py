@@ -0,0 +1,328 @@
+"""
+Integration tests for the catalog endpoints (lessons, units, modules)
+The api_server fixture starts the server in mock mode (see tests/live_server.py)
+"""
+
+import pytest
+
+pytestmark = pytest.mark.integration
+
+
+def collect_pages(api_session, url, headers=None, limit=2):
+    """Follow nextPageToken until exhausted, returning every page body"""
+    pages = []
+    params = {"limit": limit}
+    while True:
+        response = api_session.get(url, params=params, headers=headers, timeout=10)
+        assert response.status_code == 200
+        body = response.json()
+        pages.append(body)
+        if not body["nextPageToken"]:
+            return pages
+        params = {"limit": limit, "pageToken": body["nextPageToken"]}
+
+
+class TestLessonPagination:
+    """Tests for cursor pagination on GET /api/lessons and GET /api/lesson/myLessons"""
+
+    def test_unpaginated_lessons_are_public_array(self, api_session, api_base_url):
+        """Without limit/pageToken the endpoint keeps returning a plain array"""
+        response = api_session.get(f"{api_base_url}/lessons", timeout=10)
+
+        assert response.status_code == 200
+        lessons = response.json()
+        assert isinstance(lessons, list)
+        assert all(lesson["isPublic"] is True for lesson in lessons)
+
+    def test_pages_respect_limit_and_cover_all_lessons(self, api_session, api_base_url):
+        """Pages hold at most `limit` items and together match the full listing"""
+        full = [lesson["id"] for lesson in api_session.get(f"{api_base_url}/lessons", timeout=10).json()]
+        pages = collect_pages(api_session, f"{api_base_url}/lessons", limit=2)
+
+        paged = [item["id"] for page in pages for item in page["items"]]
+        assert all(len(page["items"]) <= 2 for page in pages)
+        assert paged == full
+        assert len(paged) == len(set(paged)), "page boundaries must not repeat documents"
+
+    def test_last_page_has_no_token(self, api_session, api_base_url):
+        """A page size larger than the collection yields a single page without a token"""
+        response = api_session.get(f"{api_base_url}/lessons", params={"limit": 100}, timeout=10)
+
+        assert response.status_code == 200
+        assert response.json()["nextPageToken"] is None
+
+    @pytest.mark.parametrize("limit", [-3, 0])
+    def test_non_positive_limit_is_clamped(self, api_session, api_base_url, limit):
+        """A limit below 1 returns one-item pages instead of failing"""
+        response = api_session.get(f"{api_base_url}/lessons", params={"limit": limit}, timeout=10)
+
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == 1
+
+    def test_invalid_page_token(self, api_session, api_base_url):
+        """Malformed tokens are rejected with 400"""
+        response = api_session.get(f"{api_base_url}/lessons", params={"pageToken": "not-a-token"}, timeout=10)
+
+        assert response.status_code == 400
+
+    def test_user_lessons_only_return_own_lessons(self, api_session, api_base_url):
+        """Paged /lesson/myLessons only contains lessons authored by the caller"""
+        headers = {"Authorization": "Bearer valid-user-token"}
+        pages = collect_pages(api_session, f"{api_base_url}/lesson/myLessons", headers=headers, limit=1)
+
+        items = [item for page in pages for item in page["items"]]
+        assert items
+        assert all(item["authorId"] == "test-user-123" for item in items)
+
+
+class TestUnitPagination:
+    """Tests for cursor pagination on GET /api/units and GET /api/units/user"""
+
+    def test_public_units_pages_cover_all_units(self, api_session, api_base_url):
+        """Paged /units matches the unpaginated public listing"""
+        full = [unit["id"] for unit in api_session.get(f"{api_base_url}/units", timeout=10).json()]
+        pages = collect_pages(api_session, f"{api_base_url}/units", limit=3)
+
+        paged = [item["id"] for page in pages for item in page["items"]]
+        assert paged == full
+        assert all(item["isPublic"] is True for page in pages for item in page["items"])
+
+    @pytest.mark.parametrize("limit", [1, 2, 5])
+    def test_user_units_merge_public_and_owned_without_duplicates(self, api_session, api_base_url, limit):
+        """/units/user returns public units plus the caller's private units, each once"""
+        headers = {"Authorization": "Bearer valid-user-token"}
+        full = api_session.get(f"{api_base_url}/units/user", headers=headers, timeout=10).json()
+        pages = collect_pages(api_session, f"{api_base_url}/units/user", headers=headers, limit=limit)
+
+        paged = [item["id"] for page in pages for item in page["items"]]
+        assert paged == [unit["id"] for unit in full]
+        assert len(paged) == len(set(paged))
+        assert all(unit["isPublic"] or unit["Author"] == "test-user-123" for unit in full)
+
+
+class TestExpandedReads:
+    """Tests for ?expand= on lesson and module detail reads"""
+
+    def test_lesson_expands_content_with_projection(self, api_session, api_base_url):
+        response = api_session.get(
+            f"{api_base_url}/lesson/lesson-001",
+            params={"expand": "content", "contentFields": "Title,fileUrl"},
+            timeout=10,
+        )
+
+        assert response.status_code == 200
+        lesson = response.json()
+        referenced = {cid for section in lesson["sections"] for cid in section.get("contentIds", [])}
+        assert set(lesson["contentById"]) | set(lesson["missingContentIds"]) == referenced
+        for content in lesson["contentById"].values():
+            assert set(content) <= {"id", "Title", "fileUrl"}
+
+    def test_lesson_without_expand_is_unchanged(self, api_session, api_base_url):
+        lesson = api_session.get(f"{api_base_url}/lesson/lesson-001", timeout=10).json()
+        assert "contentById" not in lesson
+
+    def test_module_expands_lessons_in_order(self, api_session, api_base_url):
+        module = api_session.get(f"{api_base_url}/module/module-002",
+                                 params={"expand": "lessons,content"}, timeout=10).json()
+
+        assert [lesson["id"] for lesson in module["lessonDetails"]] == ["lesson-003", "lesson-004", "lesson-002"]
+        assert all("sections" not in lesson for lesson in module["lessonDetails"])
+        assert "unit-002" in module["contentById"]
+
+    def test_invalid_field_list_is_rejected(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lesson/lesson-001",
+                                   params={"expand": "content", "contentFields": "a b"}, timeout=10)
+        assert response.status_code == 400
+
+
+class TestCatalogCache:
+    """Tests for the in-process catalog cache behind the list endpoints"""
+
+    @pytest.mark.parametrize("path", ["/lessons", "/units", "/modules"])
+    def test_repeat_reads_hit_the_cache(self, api_session, api_base_url, path):
+        first = api_session.get(f"{api_base_url}{path}", timeout=10)
+        second = api_session.get(f"{api_base_url}{path}", timeout=10)
+
+        assert first.headers["X-Cache"] in ("HIT", "MISS")
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+
+    def test_paginated_reads_bypass_the_cache(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lessons", params={"limit": 2}, timeout=10)
+        assert "X-Cache" not in response.headers
+
+    def test_module_writes_invalidate_the_cache(self, api_session, api_base_url):
+        api_session.get(f"{api_base_url}/modules", timeout=10)
+        created = api_session.post(f"{api_base_url}/module", json={"title": "Cache test module"}, timeout=10).json()
+
+        try:
+            response = api_session.get(f"{api_base_url}/modules", timeout=10)
+            assert response.headers["X-Cache"] == "MISS"
+            assert created["id"] in {module["id"] for module in response.json()}
+        finally:
+            api_session.delete(f"{api_base_url}/module/{created['id']}", timeout=10)
+
+        response = api_session.get(f"{api_base_url}/modules", timeout=10)
+        assert created["id"] not in {module["id"] for module in response.json()}
+
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+
+
+@pytest.fixture
+def large_lesson(api_session, api_base_url):
+    """A lesson whose detail JSON is over the compression threshold"""
+    lesson = {
+        "title": "Lesson with a long description",
+        "category": "Testing",
+        "type": "Lesson Plan",
+        "level": "Basic",
+        "objectives": ["Compress the response"],
+        "duration": 20,
+        "sections": [{"intro": "Read on.", "contentIds": []}],
+        "description": "Long enough to be compressed. " * 100,
+        "isPublic": True,
+    }
+    response = api_session.post(f"{api_base_url}/lesson", json=lesson, headers=USER_HEADERS, timeout=10)
+    assert response.status_code == 201, response.text
+    created = response.json()["id"]
+    yield f"/lesson/{created}"
+    api_session.delete(f"{api_base_url}/lesson/{created}", headers=USER_HEADERS, timeout=10)
+
+
+class TestConditionalGet:
+    """Tests for ETag / If-None-Match on catalog and detail reads"""
+
+    PATHS = ["/lessons", "/units", "/modules", "/lesson/lesson-001", "/module/module-002",
+             "/module/module-002?expand=lessons"]
+
+    @pytest.mark.parametrize("path", PATHS)
+    def test_matching_etag_returns_304(self, api_session, api_base_url, path):
+        first = api_session.get(f"{api_base_url}{path}", timeout=10)
+        etag = first.headers["ETag"]
+        assert not etag.startswith("W/")
+        assert "max-age" in first.headers["Cache-Control"]
+
+        second = api_session.get(f"{api_base_url}{path}", headers={"If-None-Match": etag}, timeout=10)
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+
+    @pytest.mark.parametrize("path", PATHS)
+    def test_stale_etag_returns_full_body(self, api_session, api_base_url, path):
+        response = api_session.get(f"{api_base_url}{path}", headers={"If-None-Match": '"stale"'}, timeout=10)
+        assert response.status_code == 200
+        assert response.json()
+
+    def test_weak_and_listed_etags_match(self, api_session, api_base_url):
+        etag = api_session.get(f"{api_base_url}/lessons", timeout=10).headers["ETag"]
+        response = api_session.get(f"{api_base_url}/lessons",
+                                   headers={"If-None-Match": f'"other", W/{etag}'}, timeout=10)
+        assert response.status_code == 304
+
+    # /lessons is precompressed by the catalog cache, lesson details by the compression middleware
+    @pytest.mark.parametrize("catalog", [True, False])
+    def test_each_content_coding_has_its_own_etag(self, api_session, api_base_url, large_lesson, catalog):
+        path = "/lessons" if catalog else large_lesson
+
+        def etag(encoding):
+            response = api_session.get(f"{api_base_url}{path}", headers={"Accept-Encoding": encoding}, timeout=10)
+            assert response.headers.get("Content-Encoding", "identity") == encoding
+            return response.headers["ETag"]
+
+        identity, gzip, brotli = etag("identity"), etag("gzip"), etag("br")
+
+        assert gzip == identity[:-1] + '-gz"'
+        assert brotli == identity[:-1] + '-br"'
+
+    @pytest.mark.parametrize("catalog", [True, False])
+    def test_any_coding_of_the_etag_revalidates(self, api_session, api_base_url, large_lesson, catalog):
+        path = "/lessons" if catalog else large_lesson
+        gzip_etag = api_session.get(f"{api_base_url}{path}", headers={"Accept-Encoding": "gzip"},
+                                    timeout=10).headers["ETag"]
+
+        # The cached gzip copy is still current
+        cached = api_session.get(f"{api_base_url}{path}",
+                                 headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}, timeout=10)
+        # The client now only takes identity, but the representation hasn't changed
+        identity = api_session.get(f"{api_base_url}{path}",
+                                   headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag}, timeout=10)
+
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == gzip_etag
+        assert identity.status_code == 304
+        assert identity.headers["ETag"] == gzip_etag[:-4] + '"'
+
+    def test_write_changes_catalog_etag(self, api_session, api_base_url):
+        etag = api_session.get(f"{api_base_url}/modules", timeout=10).headers["ETag"]
+        created = api_session.post(f"{api_base_url}/module", json={"title": "ETag test module"}, timeout=10).json()
+
+        try:
+            response = api_session.get(f"{api_base_url}/modules", headers={"If-None-Match": etag}, timeout=10)
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+        finally:
+            api_session.delete(f"{api_base_url}/module/{created['id']}", timeout=10)
+
+
+class TestCompression:
+    """Tests for negotiated response compression"""
+
+    @pytest.mark.parametrize("path", ["/lessons", "/lessons/admin"])
+    def test_gzip_is_negotiated(self, api_session, api_base_url, path):
+        response = api_session.get(f"{api_base_url}{path}", headers={"Accept-Encoding": "gzip"}, timeout=10)
+
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert isinstance(response.json(), list)
+
+    @pytest.mark.parametrize("path", ["/lessons", "/lessons/admin"])
+    def test_identity_when_not_accepted(self, api_session, api_base_url, path):
+        response = api_session.get(f"{api_base_url}{path}", headers={"Accept-Encoding": "identity"}, timeout=10)
+
+        assert "Content-Encoding" not in response.headers
+        assert isinstance(response.json(), list)
+
+    def test_streamed_admin_listing_matches_public_lessons(self, api_session, api_base_url):
+        admin_ids = {lesson["id"] for lesson in api_session.get(f"{api_base_url}/lessons/admin", timeout=10).json()}
+        public_ids = {lesson["id"] for lesson in api_session.get(f"{api_base_url}/lessons", timeout=10).json()}
+        assert public_ids <= admin_ids
+
+
+class TestFieldProjection:
+    """Tests for ?fields= on catalog list and detail reads"""
+
+    LISTING_FIELDS = "title,category,level,duration"
+
+    @pytest.mark.parametrize("path", ["/lessons", "/lessons/admin", "/modules"])
+    def test_lists_return_only_requested_fields(self, api_session, api_base_url, path):
+        response = api_session.get(f"{api_base_url}{path}", params={"fields": self.LISTING_FIELDS}, timeout=10)
+
+        assert response.status_code == 200
+        assert all(set(item) <= {"id", "title", "category", "level", "duration"} for item in response.json())
+
+    def test_projection_shrinks_the_payload(self, api_session, api_base_url):
+        full = api_session.get(f"{api_base_url}/lessons", headers={"Accept-Encoding": "identity"}, timeout=10)
+        projected = api_session.get(f"{api_base_url}/lessons", params={"fields": self.LISTING_FIELDS},
+                                    headers={"Accept-Encoding": "identity"}, timeout=10)
+
+        assert len(projected.content) < len(full.content) / 2
+        assert [item["id"] for item in projected.json()] == [item["id"] for item in full.json()]
+
+    def test_units_list_and_pages_are_projected(self, api_session, api_base_url):
+        units = api_session.get(f"{api_base_url}/units", params={"fields": "Title,Level"}, timeout=10).json()
+        page = api_session.get(f"{api_base_url}/units", params={"fields": "Title", "limit": 2}, timeout=10).json()
+
+        assert all(set(unit) <= {"id", "Title", "Level"} for unit in units)
+        assert all(set(unit) <= {"id", "Title"} for unit in page["items"])
+
+    def test_detail_reads_are_projected(self, api_session, api_base_url):
+        lesson = api_session.get(f"{api_base_url}/lesson/lesson-001", params={"fields": "title"}, timeout=10).json()
+        unit = api_session.get(f"{api_base_url}/unit/unit-001", params={"fields": "Title"}, timeout=10).json()
+
+        assert lesson == {"id": "lesson-001", "title": lesson["title"]}
+        assert unit == {"id": "unit-001", "Title": unit["Title"]}
+
+    def test_invalid_fields_are_rejected(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lessons", params={"fields": "title,$bad"}, timeout=10)
+        assert response.status_code == 400
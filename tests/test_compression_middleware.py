@@ -0,0 +1,110 @@
+"""
+Tests for write backpressure through the compression middleware
+(server/middleware/compression.js). A fake response stands in for the
+socket so the tests control when it is full; no API server is needed
+"""
+
+from tests.node_script import run_node
+
+PRELUDE = """
+const { EventEmitter } = require('events');
+const zlib = require('zlib');
+const { compression } = require('./middleware/compression');
+
+// Response whose write() reports a full socket while `full` is set
+class FakeResponse extends EventEmitter {
+  constructor() {
+    super();
+    this.headers = {};
+    this.statusCode = 200;
+    this.headersSent = false;
+    this.chunks = [];
+    this.full = false;
+  }
+  setHeader(name, value) { this.headers[name.toLowerCase()] = value; }
+  getHeader(name) { return this.headers[name.toLowerCase()]; }
+  removeHeader(name) { delete this.headers[name.toLowerCase()]; }
+  write(chunk) {
+    this.headersSent = true;
+    this.chunks.push(chunk);
+    return !this.full;
+  }
+  end() {
+    this.headersSent = true;
+    this.emit('finish');
+  }
+  destroy(error) { this.emit('error', error); }
+}
+
+const settle = () => new Promise((resolve) => setTimeout(resolve, 20));
+
+function compressedResponse() {
+  const res = new FakeResponse();
+  res.setHeader('Content-Type', 'application/json');
+  compression({ threshold: 0 })({ method: 'GET', headers: { 'accept-encoding': 'gzip' } }, res, () => {});
+  res.drains = 0;
+  res.on('drain', () => res.drains++);
+  return res;
+}
+
+// End the response with a socket that has room, and decode what it received
+async function body(res) {
+  if (res.full) {
+    res.full = false;
+    res.emit('drain');
+  }
+  res.end();
+  await settle();
+  return zlib.gunzipSync(Buffer.concat(res.chunks)).toString();
+}
+"""
+
+# Larger than the compressor's 16KB buffer, so write() returns false
+LARGE = 64 * 1024
+
+
+class TestCompressionBackpressure:
+    """res.write() and 'drain' follow both the compressor and the socket"""
+
+    def test_drain_waits_for_a_full_socket(self):
+        result = run_node(f"""
+        const res = compressedResponse();
+        res.full = true;
+        res.write('x'.repeat(100));
+        res.flush();
+        await settle();
+
+        const accepted = res.write('a'.repeat({LARGE}));
+        await settle();
+        const drainsWhileFull = res.drains;
+
+        res.full = false;
+        res.emit('drain');
+        await settle();
+        return {{ accepted, drainsWhileFull, drainsAfterSocket: res.drains, length: (await body(res)).length }};
+        """, PRELUDE)
+
+        # The compressor has emptied, but the socket is still full
+        assert result == {"accepted": False, "drainsWhileFull": 0, "drainsAfterSocket": 1, "length": 100 + LARGE}
+
+    def test_full_compressor_drains_when_socket_has_room(self):
+        result = run_node(f"""
+        const res = compressedResponse();
+        const accepted = res.write('b'.repeat({LARGE}));
+        await settle();
+        return {{ accepted, drains: res.drains, length: (await body(res)).length }};
+        """, PRELUDE)
+
+        assert result == {"accepted": False, "drains": 1, "length": LARGE}
+
+    def test_writes_report_a_full_socket(self):
+        result = run_node("""
+        const res = compressedResponse();
+        res.full = true;
+        res.write('x');
+        res.flush();
+        await settle();
+        return { accepted: res.write('y'), streamed: await body(res) };
+        """, PRELUDE)
+
+        assert result == {"accepted": False, "streamed": "xy"}
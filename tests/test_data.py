@@ -70,4 +70,38 @@ INVALID_JWT_TOKEN = "Bearer invalid.token.here"
 # Test user IDs
 TEST_USER_ID = "test-user-id"
 ADMIN_USER_ID = "admin-user-id"
-NON_EXISTENT_USER_ID = "non-existent-user-id"
\ No newline at end of file
+NON_EXISTENT_USER_ID = "non-existent-user-id"
+# Stripe webhook fixtures. Tests sign these with STRIPE_WEBHOOK_SECRET the way
+# Stripe does, so the webhook can be exercised without reaching Stripe
+STRIPE_TEST_WEBHOOK_SECRET = "whsec_test_fixture_secret"
+
+STRIPE_PAYMENT_SUCCEEDED_EVENT = {
+    "id": "evt_test_payment_succeeded",
+    "object": "event",
+    "type": "payment_intent.succeeded",
+    "data": {
+        "object": {
+            "id": "pi_test_succeeded",
+            "object": "payment_intent",
+            "amount": 999,
+            "currency": "usd",
+            "metadata": {"userId": "test-user-123"}
+        }
+    }
+}
+
+STRIPE_PAYMENT_FAILED_EVENT = {
+    "id": "evt_test_payment_failed",
+    "object": "event",
+    "type": "payment_intent.payment_failed",
+    "data": {
+        "object": {
+            "id": "pi_test_failed",
+            "object": "payment_intent",
+            "amount": 999,
+            "currency": "usd",
+            "metadata": {"userId": "test-user-123"},
+            "last_payment_error": {"message": "Your card was declined."}
+        }
+    }
+}
@@ -0,0 +1,181 @@
+"""
+Offline tests for the synthetic dataset generator in tests/datasets
+No API server is needed
+"""
+
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tests.datasets.generator import COLLECTION_SHARES, collection_sizes, generate_dataset
+from tests.datasets.loader import load_into_emulator, to_firestore_value
+from tests.datasets.ndjson import read_dataset, read_manifest, write_dataset
+
+
+def materialize(dataset):
+    return {collection: list(documents) for collection, documents in dataset.items()}
+
+
+class TestGenerator:
+    """Tests for dataset sizes, reproducibility and references"""
+
+    def test_sizes_add_up(self):
+        for size in (1_000, 12_345, 1_000_000):
+            sizes = collection_sizes(size)
+            assert set(sizes) == set(COLLECTION_SHARES)
+            assert sum(sizes.values()) == size
+
+    def test_size_out_of_range(self):
+        with pytest.raises(ValueError):
+            collection_sizes(999)
+        with pytest.raises(ValueError):
+            collection_sizes(1_000_001)
+
+    def test_same_seed_same_documents(self):
+        assert materialize(generate_dataset(1_000, seed=3)) == materialize(generate_dataset(1_000, seed=3))
+
+    def test_different_seed_different_documents(self):
+        first = materialize(generate_dataset(1_000, seed=3))
+        second = materialize(generate_dataset(1_000, seed=4))
+        assert first["lesson"] != second["lesson"]
+        # IDs are positional, so only the contents differ
+        assert [doc_id for doc_id, _ in first["lesson"]] == [doc_id for doc_id, _ in second["lesson"]]
+
+    def test_collections_generate_independently(self):
+        # Reading one collection doesn't shift another's random stream
+        full = materialize(generate_dataset(1_000, seed=5))
+        lessons_only = list(generate_dataset(1_000, seed=5)["lesson"])
+        assert lessons_only == full["lesson"]
+
+    def test_references_resolve(self):
+        dataset = materialize(generate_dataset(2_000, seed=1))
+        ids = {collection: {doc_id for doc_id, _ in documents} for collection, documents in dataset.items()}
+
+        for _, lesson in dataset["lesson"]:
+            assert lesson["authorId"] in ids["users"]
+            for section in lesson["sections"]:
+                assert set(section["contentIds"]) <= ids["content"]
+        for _, module in dataset["module"]:
+            plans = module["lessonPlans"]
+            assert set(plans.values() if isinstance(plans, dict) else plans) <= ids["lesson"]
+        for _, entry in dataset["payment_logs"]:
+            assert entry["userId"] in ids["users"]
+
+    def test_generation_is_lazy(self):
+        # A million-document dataset costs nothing until it is consumed
+        dataset = generate_dataset(1_000_000, seed=0)
+        assert len(list(itertools.islice(dataset["payment_logs"], 10))) == 10
+
+
+class TestNdjson:
+    """Tests for writing and reading dataset directories"""
+
+    def test_round_trip(self, tmp_path):
+        manifest = write_dataset(tmp_path, generate_dataset(1_000, seed=2), size=1_000, seed=2)
+
+        assert read_manifest(tmp_path) == manifest
+        assert manifest["collections"] == collection_sizes(1_000)
+        assert materialize(read_dataset(tmp_path)) == materialize(generate_dataset(1_000, seed=2))
+
+    def test_one_document_per_line(self, tmp_path):
+        write_dataset(tmp_path, generate_dataset(1_000, seed=2))
+        lines = (tmp_path / "users.ndjson").read_text().splitlines()
+        assert len(lines) == collection_sizes(1_000)["users"]
+        assert lines[0].startswith('{"id":"user-0000001","data":{')
+
+
+class TestEmulatorEncoding:
+    """Tests for Firestore REST value encoding"""
+
+    def test_scalars(self):
+        assert to_firestore_value(None) == {"nullValue": None}
+        assert to_firestore_value(True) == {"booleanValue": True}
+        assert to_firestore_value(3) == {"integerValue": "3"}
+        assert to_firestore_value(9.99) == {"doubleValue": 9.99}
+        assert to_firestore_value("a") == {"stringValue": "a"}
+
+    def test_timestamp_marker(self):
+        value = {"$timestamp": "2024-01-01T00:00:00.000Z"}
+        assert to_firestore_value(value) == {"timestampValue": "2024-01-01T00:00:00.000Z"}
+
+    def test_nested(self):
+        value = {"lessonPlans": ["lesson-0000001"], "meta": {"n": 1}}
+        assert to_firestore_value(value) == {
+            "mapValue": {
+                "fields": {
+                    "lessonPlans": {"arrayValue": {"values": [{"stringValue": "lesson-0000001"}]}},
+                    "meta": {"mapValue": {"fields": {"n": {"integerValue": "1"}}}},
+                }
+            }
+        }
+
+
+class _CommitHandler(BaseHTTPRequestHandler):
+    """Records the writes of each documents:commit request"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.writes.extend(body["writes"])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def commit_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CommitHandler)
+    server.writes = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def document_path(write):
+    return write["update"]["name"].split("/documents/", 1)[1]
+
+
+class TestEmulatorLoad:
+    """Tests for the derived data load_into_emulator writes after the documents"""
+
+    DATASET = {
+        "content": [("c1", {"UnitID": "diya41"}), ("c2", {"UnitID": "diya7"}), ("c3", {"UnitID": "custom"})],
+        "lesson": [
+            ("l1", {"title": "Forces", "sections": [{"contentIds": ["c1", "c2"]}, {"contentIds": ["c1"]}]}),
+            ("l2", {"title": "Motion", "sections": [{"contentIds": ["c1"]}]}),
+            ("l3", {"title": "Empty", "sections": []}),
+        ],
+    }
+
+    def load(self, commit_server):
+        host = f"127.0.0.1:{commit_server.server_address[1]}"
+        dataset = {collection: iter(documents) for collection, documents in self.DATASET.items()}
+        counts = load_into_emulator(dataset, host=host, qualifier="test.")
+        return counts, {document_path(write): write for write in commit_server.writes}
+
+    def test_content_usage_is_rebuilt_from_lessons(self, commit_server):
+        counts, writes = self.load(commit_server)
+
+        assert counts == {"content": 3, "lesson": 3}
+        assert writes["test.contentUsage/c1"]["update"]["fields"] == to_firestore_value(
+            {"lessons": {"l1": "Forces", "l2": "Motion"}})["mapValue"]["fields"]
+        assert writes["test.contentUsage/c2"]["update"]["fields"] == to_firestore_value(
+            {"lessons": {"l1": "Forces"}})["mapValue"]["fields"]
+        assert "test.contentUsage/c3" not in writes
+
+    def test_unit_id_counter_moves_past_the_highest_unit_id(self, commit_server):
+        _, writes = self.load(commit_server)
+
+        counter = writes["test.counters/unitIdCounter"]
+        # A maximum transform keeps a counter that is already higher
+        assert counter["updateTransforms"] == [{"fieldPath": "lastNumber", "maximum": {"integerValue": "41"}}]
+        assert counter["updateMask"] == {"fieldPaths": []}
@@ -0,0 +1,407 @@
+"""
+Tests for the in-memory Firestore emulator behind mock mode
+(server/utils/firestoreEmulator.js), checking the production semantics it
+claims: cross-type ordering, cursors, filters, projections, transactions,
+batches and FieldValue transforms. No API server is needed
+"""
+
+import pytest
+
+from tests.node_script import run_node
+
+PRELUDE = """
+const { Firestore, FieldValue, Timestamp } = require('./utils/firestoreEmulator');
+const db = new Firestore({ latency: 'fixed:0', seed: 7 });
+const ids = (snapshot) => snapshot.docs.map((doc) => doc.id);
+async function errorCode(run) {
+  try {
+    await run();
+    return null;
+  } catch (error) {
+    return error.code !== undefined ? error.code : error.message;
+  }
+}
+async function load(collection, documents) {
+  const batch = db.batch();
+  Object.entries(documents).forEach(([id, data]) => batch.set(db.collection(collection).doc(id), data));
+  await batch.commit();
+}
+"""
+
+# gRPC status codes set on emulator errors, as on the SDK's
+INVALID_ARGUMENT = 3
+NOT_FOUND = 5
+ABORTED = 10
+
+SCORES = "await load('scores', { a: { score: 1 }, b: { score: 2 }, c: { score: 2 }, d: { score: 2 }, e: { score: 3 }, f: { score: 3 } });"
+
+
+def emulator(body):
+    return run_node(body, PRELUDE)
+
+
+class TestOrdering:
+    """Values of different types sort in Firestore's type order"""
+
+    MIXED = """
+    await load('mixed', {
+      map: { v: { a: 1 } }, arr: { v: [1] }, ref: { v: db.doc('other/x') }, bytes: { v: Buffer.from('a') },
+      str: { v: 'a' }, time: { v: new Date(0) }, float: { v: 2.5 }, int: { v: 2 }, neg: { v: -1 },
+      nan: { v: NaN }, true: { v: true }, false: { v: false }, null: { v: null }, missing: { other: 1 }
+    });
+    """
+
+    def test_cross_type_order(self):
+        result = emulator(self.MIXED + """
+        return {
+          asc: ids(await db.collection('mixed').orderBy('v').get()),
+          desc: ids(await db.collection('mixed').orderBy('v', 'desc').get())
+        };
+        """)
+
+        expected = ["null", "false", "true", "nan", "neg", "int", "float", "time", "str", "bytes", "ref", "arr", "map"]
+        assert result["asc"] == expected
+        assert result["desc"] == expected[::-1]
+
+    def test_range_filters_only_match_their_type(self):
+        result = emulator(self.MIXED + """
+        const query = (operator, value) => db.collection('mixed').where('v', operator, value).orderBy('v').get();
+        return {
+          numbers: ids(await query('>=', 0)),
+          strings: ids(await query('<', 'z')),
+          notEqual: (await db.collection('mixed').where('v', '!=', 2).get()).size
+        };
+        """)
+
+        assert result["numbers"] == ["int", "float"]
+        assert result["strings"] == ["str"]
+        # != skips null and documents without the field
+        assert result["notEqual"] == 11
+
+    def test_dates_are_stored_as_timestamps(self):
+        result = emulator("""
+        await db.collection('dates').doc('d').set({ at: new Date(1500), nested: { at: new Date(2500) } });
+        const snapshot = await db.collection('dates').doc('d').get();
+        return [snapshot.get('at') instanceof Timestamp, snapshot.get('at').toMillis(), snapshot.get('nested.at').toMillis()];
+        """)
+
+        assert result == [True, 1500, 2500]
+
+
+class TestCursors:
+    """startAt/startAfter/endBefore with the implicit document ID tiebreaker"""
+
+    def test_start_after_breaks_ties_on_document_id(self):
+        result = emulator(SCORES + """
+        const scores = db.collection('scores');
+        const snapshotC = await scores.doc('c').get();
+        return {
+          values: ids(await scores.orderBy('score').startAfter(2, 'c').get()),
+          explicitName: ids(await scores.orderBy('score').orderBy('__name__').startAfter(2, 'c').limit(2).get()),
+          snapshot: ids(await scores.orderBy('score').startAfter(snapshotC).get()),
+          valueOnly: ids(await scores.orderBy('score').startAfter(2).get())
+        };
+        """)
+
+        assert result["values"] == ["d", "e", "f"]
+        assert result["explicitName"] == ["d", "e"]
+        assert result["snapshot"] == ["d", "e", "f"]
+        assert result["valueOnly"] == ["e", "f"]
+
+    def test_descending_order_breaks_ties_descending(self):
+        result = emulator(SCORES + """
+        const scores = db.collection('scores');
+        return {
+          all: ids(await scores.orderBy('score', 'desc').get()),
+          after: ids(await scores.orderBy('score', 'desc').startAfter(2, 'c').get())
+        };
+        """)
+
+        assert result["all"] == ["f", "e", "d", "c", "b", "a"]
+        assert result["after"] == ["b", "a"]
+
+    @pytest.mark.parametrize("direction", ["asc", "desc"])
+    def test_keyset_pages_visit_every_document_once(self, direction):
+        result = emulator(SCORES + f"""
+        const pages = [];
+        let query = db.collection('scores').orderBy('score', '{direction}').orderBy('__name__', '{direction}').limit(2);
+        let page = await query.get();
+        while (page.size > 0) {{
+          pages.push(ids(page));
+          const last = page.docs[page.size - 1];
+          page = await query.startAfter(last.get('score'), last.id).get();
+        }}
+        return pages;
+        """)
+
+        visited = [doc_id for page in result for doc_id in page]
+        expected = ["a", "b", "c", "d", "e", "f"]
+        assert visited == (expected if direction == "asc" else expected[::-1])
+        assert all(len(page) <= 2 for page in result)
+
+    def test_start_at_and_end_before(self):
+        result = emulator(SCORES + """
+        return ids(await db.collection('scores').orderBy('score').startAt(2).endBefore(3).get());
+        """)
+
+        assert result == ["b", "c", "d"]
+
+
+class TestFilters:
+    """Disjunctions and array membership"""
+
+    DOCS = """
+    await load('posts', {
+      p1: { status: 'draft', tags: ['x', 'y'] },
+      p2: { status: 'review', tags: ['y'] },
+      p3: { status: 'published', tags: ['x'] },
+      p4: { status: null, tags: 'x' },
+      p5: { tags: [] }
+    });
+    const posts = db.collection('posts');
+    """
+
+    def test_in_and_not_in(self):
+        result = emulator(self.DOCS + """
+        return {
+          in: ids(await posts.where('status', 'in', ['draft', 'review']).get()),
+          byId: ids(await posts.where('__name__', 'in', ['p3', 'p1', 'missing']).get()),
+          notIn: ids(await posts.where('status', 'not-in', ['draft']).get()),
+          tooMany: await errorCode(() => posts.where('status', 'in', Array.from({ length: 31 }, (_, i) => i))),
+          empty: await errorCode(() => posts.where('status', 'in', []))
+        };
+        """)
+
+        assert result["in"] == ["p1", "p2"]
+        assert result["byId"] == ["p1", "p3"]
+        # not-in skips null and documents without the field
+        assert result["notIn"] == ["p2", "p3"]
+        assert result["tooMany"] == INVALID_ARGUMENT
+        assert result["empty"] == INVALID_ARGUMENT
+
+    def test_array_contains(self):
+        result = emulator(self.DOCS + """
+        return {
+          contains: ids(await posts.where('tags', 'array-contains', 'x').get()),
+          containsAny: ids(await posts.where('tags', 'array-contains-any', ['y', 'z']).get()),
+          combined: ids(await posts.where('tags', 'array-contains', 'x').where('status', 'in', ['published', 'review']).get())
+        };
+        """)
+
+        # A plain string field is not an array
+        assert result["contains"] == ["p1", "p3"]
+        assert result["containsAny"] == ["p1", "p2"]
+        assert result["combined"] == ["p3"]
+
+
+class TestFieldMasks:
+    """select() on queries and fieldMask on getAll()"""
+
+    DOCS = """
+    await load('units', { u1: { title: 'One', meta: { level: 1, author: 'a' }, body: 'long' }, u2: { title: 'Two', body: 'long' } });
+    const units = db.collection('units');
+    """
+
+    def test_select_returns_only_listed_fields(self):
+        result = emulator(self.DOCS + """
+        return {
+          fields: (await units.select('title', 'meta.level').orderBy('title').get()).docs.map((doc) => doc.data()),
+          idsOnly: (await units.select().get()).docs.map((doc) => [doc.id, doc.data()]),
+          filteredOnUnselected: ids(await units.where('body', '==', 'long').select('title').get())
+        };
+        """)
+
+        assert result["fields"] == [{"title": "One", "meta": {"level": 1}}, {"title": "Two"}]
+        assert result["idsOnly"] == [["u1", {}], ["u2", {}]]
+        assert result["filteredOnUnselected"] == ["u1", "u2"]
+
+    def test_get_all_keeps_order_and_applies_field_mask(self):
+        result = emulator(self.DOCS + """
+        const snapshots = await db.getAll(units.doc('u2'), units.doc('missing'), units.doc('u1'), { fieldMask: ['title'] });
+        return snapshots.map((snapshot) => [snapshot.id, snapshot.exists, snapshot.exists ? snapshot.data() : null]);
+        """)
+
+        assert result == [["u2", True, {"title": "Two"}], ["missing", False, None], ["u1", True, {"title": "One"}]]
+
+
+class TestTransactions:
+    """Optimistic transactions: conflicting writes abort and retry"""
+
+    def test_conflicting_write_retries_without_losing_updates(self):
+        result = emulator("""
+        const ref = db.collection('counters').doc('c');
+        await ref.set({ n: 0 });
+        let attempts = 0;
+        await db.runTransaction(async (transaction) => {
+          attempts++;
+          const snapshot = await transaction.get(ref);
+          if (attempts === 1) {
+            // Another client writes between this transaction's read and commit
+            await ref.update({ n: 100 });
+          }
+          transaction.update(ref, { n: snapshot.get('n') + 1 });
+        });
+        return { attempts, n: (await ref.get()).get('n'), retries: db.getStats().transactionRetries };
+        """)
+
+        assert result == {"attempts": 2, "n": 101, "retries": 1}
+
+    def test_persistent_conflict_fails_with_aborted(self):
+        result = emulator("""
+        const ref = db.collection('counters').doc('c');
+        await ref.set({ n: 0 });
+        let attempts = 0;
+        const code = await errorCode(() => db.runTransaction(async (transaction) => {
+          attempts++;
+          await transaction.get(ref);
+          await ref.update({ n: FieldValue.increment(1) });
+          transaction.update(ref, { n: -1 });
+        }, { maxAttempts: 3 }));
+        return { code, attempts, n: (await ref.get()).get('n') };
+        """)
+
+        assert result == {"code": ABORTED, "attempts": 3, "n": 3}
+
+    def test_missing_document_read_conflicts_with_its_creation(self):
+        result = emulator("""
+        const ref = db.collection('claims').doc('e1');
+        return await errorCode(() => db.runTransaction(async (transaction) => {
+          const snapshot = await transaction.get(ref);
+          await ref.set({ owner: 'other' });
+          if (!snapshot.exists) transaction.set(ref, { owner: 'me' });
+        }, { maxAttempts: 1 }));
+        """)
+
+        assert result == ABORTED
+
+    def test_concurrent_increments_are_serialized(self):
+        result = emulator("""
+        db.setLatency('uniform:0-3');
+        const ref = db.collection('counters').doc('c');
+        await ref.set({ n: 0 });
+        await Promise.all(Array.from({ length: 5 }, () => db.runTransaction(async (transaction) => {
+          const snapshot = await transaction.get(ref);
+          transaction.update(ref, { n: snapshot.get('n') + 1 });
+        }, { maxAttempts: 20 })));
+        return (await ref.get()).get('n');
+        """)
+
+        assert result == 5
+
+    def test_reads_after_writes_are_rejected(self):
+        result = emulator("""
+        const ref = db.collection('counters').doc('c');
+        return await errorCode(() => db.runTransaction(async (transaction) => {
+          transaction.set(ref, { n: 1 });
+          await transaction.get(ref);
+        }));
+        """)
+
+        assert "reads to be executed before all writes" in result
+
+
+class TestBatches:
+    """Atomic WriteBatch commits of at most 500 writes"""
+
+    def test_batch_holds_at_most_500_writes(self):
+        result = emulator("""
+        const batch = db.batch();
+        for (let i = 0; i < 500; i++) batch.set(db.collection('bulk').doc(`d${i}`), { i });
+        const overflow = await errorCode(() => batch.set(db.collection('bulk').doc('d500'), { i: 500 }));
+        await batch.commit();
+        return { overflow, count: (await db.collection('bulk').count().get()).data().count };
+        """)
+
+        assert "at most 500" in result["overflow"]
+        assert result["count"] == 500
+
+    def test_failed_commit_writes_nothing(self):
+        result = emulator("""
+        const batch = db.batch();
+        batch.set(db.collection('atomic').doc('a'), { ok: true });
+        batch.update(db.collection('atomic').doc('missing'), { ok: true });
+        const code = await errorCode(() => batch.commit());
+        return { code, written: (await db.collection('atomic').doc('a').get()).exists };
+        """)
+
+        assert result == {"code": NOT_FOUND, "written": False}
+
+    def test_committed_batch_cannot_be_reused(self):
+        result = emulator("""
+        const batch = db.batch();
+        batch.set(db.collection('once').doc('a'), { n: 1 });
+        await batch.commit();
+        return await errorCode(() => batch.set(db.collection('once').doc('b'), { n: 2 }));
+        """)
+
+        assert "committed" in result
+
+
+class TestFieldValues:
+    """FieldValue sentinels are resolved against the stored document at commit time"""
+
+    def test_transforms_apply_at_commit(self):
+        result = emulator("""
+        const ref = db.collection('docs').doc('d');
+        await ref.set({ n: 1, tags: ['a', 'b'], drop: true, keep: 1 });
+
+        const batch = db.batch();
+        batch.update(ref, {
+          n: FieldValue.increment(2),
+          tags: FieldValue.arrayUnion('b', 'c'),
+          drop: FieldValue.delete(),
+          at: FieldValue.serverTimestamp()
+        });
+        const staged = Date.now();
+        await new Promise((resolve) => setTimeout(resolve, 25));
+        // A write between staging and commit is what the transforms apply to
+        await ref.update({ n: 10, tags: ['z'] });
+        await batch.commit();
+
+        const snapshot = await ref.get();
+        const data = snapshot.data();
+        return {
+          n: data.n,
+          tags: data.tags,
+          hasDrop: 'drop' in data,
+          keep: data.keep,
+          atIsCommitTime: data.at.isEqual(snapshot.updateTime),
+          atAfterStaging: data.at.toMillis() - staged >= 20
+        };
+        """)
+
+        assert result == {"n": 12, "tags": ["z", "b", "c"], "hasDrop": False, "keep": 1,
+                          "atIsCommitTime": True, "atAfterStaging": True}
+
+    def test_array_remove_and_increment_on_missing_fields(self):
+        result = emulator("""
+        const ref = db.collection('docs').doc('d');
+        await ref.set({ tags: ['a', 'b', 'a'] });
+        await ref.update({ tags: FieldValue.arrayRemove('a'), count: FieldValue.increment(3), 'nested.total': FieldValue.increment(1.5) });
+        await db.collection('docs').doc('new').set({ n: FieldValue.increment(1) }, { merge: true });
+        return [(await ref.get()).data(), (await db.collection('docs').doc('new').get()).data()];
+        """)
+
+        assert result == [{"tags": ["b"], "count": 3, "nested": {"total": 1.5}}, {"n": 1}]
+
+    def test_concurrent_increments_are_not_lost(self):
+        result = emulator("""
+        db.setLatency('uniform:0-3');
+        const ref = db.collection('docs').doc('counter');
+        await ref.set({ n: 0 });
+        await Promise.all(Array.from({ length: 10 }, () => {
+          const batch = db.batch();
+          batch.update(ref, { n: FieldValue.increment(1) });
+          return batch.commit();
+        }));
+        return (await ref.get()).get('n');
+        """)
+
+        assert result == 10
+
+    def test_undefined_values_are_rejected(self):
+        result = emulator("""
+        return await errorCode(() => db.collection('docs').doc('u').set({ a: undefined }));
+        """)
+
+        assert result is not None
@@ -0,0 +1,198 @@
+"""
+Tests for lesson PDF downloads: GET /api/lessons/<id>/download, bundles from
+GET /api/lessons/bundle, and the ZIP writer behind them
+(server/utils/zipStream.js)
+The integration tests use the mock-mode catalog (module-002 holds lesson-003,
+lesson-004 and lesson-002, in that order)
+"""
+
+import io
+import zipfile
+
+import pytest
+
+from tests.node_script import run_node
+
+MODULE_002_ENTRIES = [
+    "1-Testing-Your-First-Program.pdf",
+    "2-Version-Control-Basics.pdf",
+    "3-Forces-and-Motion.pdf",
+]
+
+
+def download_bundle(api_session, api_base_url, **params):
+    response = api_session.get(f"{api_base_url}/lessons/bundle", params=params, timeout=30)
+    assert response.status_code == 200, response.text
+    assert response.headers["Content-Type"].startswith("application/zip")
+    return zipfile.ZipFile(io.BytesIO(response.content))
+
+
+def assert_valid_pdf(data):
+    assert data.startswith(b"%PDF-")
+    assert data.rstrip().endswith(b"%%EOF")
+
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+
+
+@pytest.fixture
+def new_lesson(api_session, api_base_url):
+    """A lesson created for the test, so no other test has cached its PDF"""
+    response = api_session.post(
+        f"{api_base_url}/lesson",
+        json={
+            "title": "PDF cache lesson",
+            "category": "Science",
+            "type": "Lesson Plan",
+            "level": "Basic",
+            "objectives": ["Read a PDF"],
+            "duration": 15,
+            "sections": [],
+            "description": "Used by the PDF cache tests.",
+            "isPublic": True,
+        },
+        headers=USER_HEADERS,
+        timeout=10,
+    )
+    assert response.status_code == 201, response.text
+    lesson_id = response.json()["id"]
+    yield lesson_id
+    api_session.delete(f"{api_base_url}/lesson/{lesson_id}", headers=USER_HEADERS, timeout=10)
+
+
+@pytest.mark.integration
+class TestLessonDownload:
+    """Tests for GET /api/lessons/<id>/download and its PDF cache"""
+
+    def download(self, api_session, api_base_url, lesson_id):
+        response = api_session.get(f"{api_base_url}/lessons/{lesson_id}/download", timeout=30)
+        assert response.status_code == 200, response.text
+        assert response.headers["Content-Type"].startswith("application/pdf")
+        assert int(response.headers["Content-Length"]) == len(response.content)
+        assert_valid_pdf(response.content)
+        return response
+
+    def test_second_download_is_served_from_cache(self, api_session, api_base_url, new_lesson):
+        first = self.download(api_session, api_base_url, new_lesson)
+        second = self.download(api_session, api_base_url, new_lesson)
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.content == first.content
+
+    def test_update_invalidates_cached_pdf(self, api_session, api_base_url, new_lesson):
+        before = self.download(api_session, api_base_url, new_lesson)
+        self.download(api_session, api_base_url, new_lesson)
+
+        response = api_session.put(f"{api_base_url}/lesson/{new_lesson}", json={"title": "Renamed PDF lesson"},
+                                   headers=USER_HEADERS, timeout=10)
+        assert response.status_code == 200
+
+        after = self.download(api_session, api_base_url, new_lesson)
+        assert after.headers["X-Cache"] == "MISS"
+        assert after.content != before.content
+        assert self.download(api_session, api_base_url, new_lesson).headers["X-Cache"] == "HIT"
+
+    def test_bundle_reuses_cached_pdfs(self, api_session, api_base_url, new_lesson):
+        single = self.download(api_session, api_base_url, new_lesson)
+        archive = download_bundle(api_session, api_base_url, lessonIds=new_lesson)
+
+        assert archive.read("1-PDF-cache-lesson.pdf") == single.content
+        assert self.download(api_session, api_base_url, new_lesson).headers["X-Cache"] == "HIT"
+
+    def test_unknown_lesson_is_not_found(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lessons/no-such-lesson/download", timeout=10)
+        assert response.status_code == 404
+
+
+@pytest.mark.integration
+class TestLessonBundle:
+    """Tests for GET /api/lessons/bundle"""
+
+    def test_module_bundle_holds_its_lessons_in_order(self, api_session, api_base_url):
+        archive = download_bundle(api_session, api_base_url, moduleId="module-002")
+
+        assert archive.testzip() is None
+        assert archive.namelist() == MODULE_002_ENTRIES
+        for name in archive.namelist():
+            assert_valid_pdf(archive.read(name))
+
+    def test_bundle_matches_single_lesson_downloads(self, api_session, api_base_url):
+        archive = download_bundle(api_session, api_base_url, lessonIds="lesson-004,lesson-003")
+
+        assert archive.namelist() == ["1-Version-Control-Basics.pdf", "2-Testing-Your-First-Program.pdf"]
+        single = api_session.get(f"{api_base_url}/lessons/lesson-004/download", timeout=30)
+        assert archive.read("1-Version-Control-Basics.pdf") == single.content
+
+    def test_missing_lessons_are_listed(self, api_session, api_base_url):
+        created = api_session.post(
+            f"{api_base_url}/module",
+            json={"title": "Bundle test module", "lessonPlans": ["lesson-003", "no-such-lesson", "lesson-002"]},
+            timeout=10,
+        ).json()
+
+        try:
+            archive = download_bundle(api_session, api_base_url, moduleId=created["id"])
+        finally:
+            api_session.delete(f"{api_base_url}/module/{created['id']}", timeout=10)
+
+        assert archive.namelist() == ["1-Testing-Your-First-Program.pdf", "3-Forces-and-Motion.pdf",
+                                      "missing-lessons.txt"]
+        assert "no-such-lesson" in archive.read("missing-lessons.txt").decode()
+
+    @pytest.mark.parametrize("params", [{}, {"lessonIds": " , "}])
+    def test_no_lessons_is_rejected(self, api_session, api_base_url, params):
+        response = api_session.get(f"{api_base_url}/lessons/bundle", params=params, timeout=10)
+        assert response.status_code == 400
+
+    def test_too_many_lessons_is_rejected(self, api_session, api_base_url):
+        lesson_ids = ",".join(f"lesson-{n}" for n in range(201))
+        response = api_session.get(f"{api_base_url}/lessons/bundle", params={"lessonIds": lesson_ids}, timeout=10)
+
+        assert response.status_code == 400
+        assert "200" in response.json()["message"]
+
+    def test_unknown_module_is_not_found(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lessons/bundle", params={"moduleId": "no-such-module"},
+                                   timeout=10)
+        assert response.status_code == 404
+
+    def test_unknown_lessons_are_not_found(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/lessons/bundle", params={"lessonIds": "nope-1,nope-2"},
+                                   timeout=10)
+        assert response.status_code == 404
+
+
+class TestZipStreamWriter:
+    """Archives from ZipStreamWriter open with a standard unzip"""
+
+    WRITE_ARCHIVE = """
+    const fs = require('fs');
+    const output = fs.createWriteStream(%(path)r, { highWaterMark: 1024 });
+    const zip = new ZipStreamWriter(output);
+    const large = Buffer.alloc(256 * 1024);
+    for (let i = 0; i < large.length; i++) large[i] = (i * 31) %% 251;
+    await zip.addFile('empty.txt', Buffer.alloc(0));
+    await zip.addFile('notes/ünïcode – name.txt', Buffer.from('héllo\\n'));
+    await zip.addFile('large.bin', large, new Date(2024, 4, 17, 13, 45, 30));
+    zip.finish();
+    await new Promise((resolve) => output.end(resolve));
+    """
+
+    @pytest.mark.parametrize("native_crc", [True, False])
+    def test_round_trip(self, tmp_path, native_crc):
+        path = tmp_path / "bundle.zip"
+        # Without zlib.crc32 (Node < 20.15) the writer falls back to its own table
+        prelude = "" if native_crc else "delete require('zlib').crc32;"
+        prelude += "const { ZipStreamWriter } = require('./utils/zipStream');"
+        run_node(self.WRITE_ARCHIVE % {"path": str(path)}, prelude)
+
+        with zipfile.ZipFile(path) as archive:
+            assert archive.testzip() is None
+            assert archive.namelist() == ["empty.txt", "notes/ünïcode – name.txt", "large.bin"]
+            assert archive.read("empty.txt") == b""
+            assert archive.read("notes/ünïcode – name.txt") == "héllo\n".encode()
+            assert archive.read("large.bin") == bytes((i * 31) % 251 for i in range(256 * 1024))
+            info = archive.getinfo("large.bin")
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.date_time == (2024, 5, 17, 13, 45, 30)
@@ -0,0 +1,36 @@
+"""
+Offline tests for the environment tests/live_server.py starts the API server with
+"""
+
+from tests.live_server import MOCK_SERVER_SETTINGS, mock_server_env
+
+
+class TestMockServerEnv:
+    """The shell's environment must not turn the test server into a real one"""
+
+    def test_shell_cannot_override_mock_settings(self, monkeypatch):
+        monkeypatch.setenv("ENABLE_MOCK_FIREBASE", "false")
+        monkeypatch.setenv("DATABASE_SCHEMA_QUALIFIER", "")
+        monkeypatch.setenv("PAYMENT_PROCESSOR", "stripe")
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_live_real")
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", "whsec_real")
+
+        env = mock_server_env(4000)
+
+        for name, value in MOCK_SERVER_SETTINGS.items():
+            assert env[name] == value
+
+    def test_other_settings_come_from_the_shell(self, monkeypatch):
+        monkeypatch.setenv("NODE_ENV", "test")
+        monkeypatch.setenv("PAYMENT_SIMULATOR_LATENCY", "fixed:5")
+
+        env = mock_server_env(4000)
+
+        assert env["NODE_ENV"] == "test"
+        assert env["PAYMENT_SIMULATOR_LATENCY"] == "fixed:5"
+        assert env["PORT"] == "4000"
+
+    def test_explicit_overrides_win(self):
+        env = mock_server_env(4000, {"WEBHOOK_SPILL_FILE": "/tmp/spill.ndjson", "ENABLE_MOCK_FIREBASE": "true"})
+
+        assert env["WEBHOOK_SPILL_FILE"] == "/tmp/spill.ndjson"
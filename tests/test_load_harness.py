@@ -0,0 +1,86 @@
+"""
+Offline tests for the load harness in tests/load
+Runs against a throwaway local HTTP server, so no API server is needed
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tests.load.harness import compare_results, percentile, run_scenario, summarize_latencies
+from tests.load.scenarios import scenario
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 500 if self.path.endswith("/fail") else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api"
+    server.shutdown()
+    server.server_close()
+
+
+class TestLatencyStatistics:
+    """Tests for percentile and summary calculations"""
+
+    def test_percentile_interpolates(self):
+        values = [10, 20, 30, 40]
+        assert percentile(values, 0) == 10
+        assert percentile(values, 50) == 25
+        assert percentile(values, 100) == 40
+
+    def test_summary_of_empty_run(self):
+        assert summarize_latencies([])["p99"] is None
+
+    def test_summary_orders_input(self):
+        summary = summarize_latencies([5, 1, 3])
+        assert (summary["min"], summary["p50"], summary["max"]) == (1, 3, 5)
+
+
+class TestRunScenario:
+    """Tests for the request driver"""
+
+    @pytest.mark.parametrize("concurrency", [1, 4])
+    def test_issues_exact_request_count(self, stub_server, concurrency):
+        result = run_scenario(stub_server, scenario("ok", "/ok"), concurrency=concurrency,
+                              total_requests=25, warmup=0)
+
+        assert result["requests"] == 25
+        assert result["errors"] == 0
+        assert result["status_codes"] == {"200": 25}
+        assert result["throughput_rps"] > 0
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+
+    def test_counts_unexpected_status_as_error(self, stub_server):
+        result = run_scenario(stub_server, scenario("fail", "/fail"), concurrency=2,
+                              total_requests=6, warmup=0)
+
+        assert result["errors"] == 6
+        assert result["status_codes"] == {"500": 6}
+
+    def test_compare_reports_percent_change(self):
+        def report(p95, rps):
+            latency = {"p50": 1, "p95": p95, "p99": p95}
+            return {"results": [{"scenario": "ok", "concurrency": 1,
+                                 "latency_ms": latency, "throughput_rps": rps}]}
+
+        comparison = compare_results(report(10, 100), report(5, 150))
+
+        assert comparison[0]["p95_change_pct"] == -50.0
+        assert comparison[0]["throughput_change_pct"] == 50.0
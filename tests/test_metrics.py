@@ -0,0 +1,105 @@
+"""
+Integration tests for the Prometheus-style /metrics endpoint
+The api_server fixture starts the server in mock mode (see tests/live_server.py)
+"""
+
+import re
+
+import pytest
+
+from tests.live_server import LiveServer, ServerStartError
+
+pytestmark = pytest.mark.integration
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+SAMPLE_LINE = re.compile(r'^([a-z_]+)(\{[^}]*\})? (\S+)$')
+
+
+def scrape(api_session, api_base_url):
+    response = api_session.get(api_base_url.rsplit("/api", 1)[0] + "/metrics", timeout=10)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return response.text
+
+
+def sample_value(text, name, **labels):
+    """Value of the sample with exactly these labels, or None"""
+    wanted = "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else None
+    for line in text.splitlines():
+        match = SAMPLE_LINE.match(line)
+        if match and match.group(1) == name and match.group(2) == wanted:
+            return float(match.group(3))
+    return None
+
+
+class TestMetricsEndpoint:
+    """Tests for request latency, Firestore and cache metrics"""
+
+    def test_every_line_is_a_comment_or_sample(self, api_session, api_base_url):
+        text = scrape(api_session, api_base_url)
+        for line in text.strip().splitlines():
+            assert line.startswith("# HELP ") or line.startswith("# TYPE ") or SAMPLE_LINE.match(line), line
+
+    def test_requests_are_labelled_by_route_pattern(self, api_session, api_base_url):
+        api_session.get(f"{api_base_url}/user/some-user-that-does-not-exist", timeout=10)
+        before = sample_value(scrape(api_session, api_base_url), "http_request_duration_seconds_count",
+                              method="GET", route="/api/user/:userId", status="404") or 0
+
+        api_session.get(f"{api_base_url}/user/another-missing-user", timeout=10)
+        text = scrape(api_session, api_base_url)
+
+        after = sample_value(text, "http_request_duration_seconds_count",
+                             method="GET", route="/api/user/:userId", status="404")
+        assert after == before + 1
+        # User IDs never become label values
+        assert "another-missing-user" not in text
+
+    def test_firestore_reads_are_counted_per_collection_and_route(self, api_session, api_base_url):
+        api_session.get(f"{api_base_url}/lesson/myLessons", headers=USER_HEADERS, timeout=10)
+        text = scrape(api_session, api_base_url)
+
+        reads = [line for line in text.splitlines() if line.startswith("firestore_documents_read_total{")]
+        assert any('route="/api/lesson/myLessons"' in line for line in reads)
+        assert "# TYPE firestore_full_scans_total counter" in text
+
+    def test_cache_hit_rates_are_reported(self, api_session, api_base_url):
+        for _ in range(2):
+            api_session.get(f"{api_base_url}/user/me", headers=USER_HEADERS, timeout=10)
+        text = scrape(api_session, api_base_url)
+
+        assert sample_value(text, "cache_hits_total", cache="id_tokens") >= 1
+        assert 0 < sample_value(text, "cache_hit_ratio", cache="id_tokens") <= 1
+
+
+class TestMetricsAuthentication:
+    """In production /metrics needs METRICS_TOKEN, and stays closed without one"""
+
+    def start_server(self, tmp_path, **env):
+        server = LiveServer(tmp_path / "server.log", env={"NODE_ENV": "production", **env})
+        try:
+            return server.start()
+        except ServerStartError as error:
+            pytest.skip(f"Could not start a second API server: {error}")
+
+    def test_production_without_a_token_refuses_scrapes(self, api_session, tmp_path):
+        server = self.start_server(tmp_path)
+        try:
+            response = api_session.get(f"{server.root_url}/metrics", timeout=10)
+            assert response.status_code == 401
+        finally:
+            server.stop()
+
+    def test_production_with_a_token_requires_it(self, api_session, tmp_path):
+        server = self.start_server(tmp_path, METRICS_TOKEN="scrape-secret")
+        try:
+            anonymous = api_session.get(f"{server.root_url}/metrics", timeout=10)
+            wrong = api_session.get(f"{server.root_url}/metrics", headers={"Authorization": "Bearer nope"},
+                                    timeout=10)
+            scraper = api_session.get(f"{server.root_url}/metrics",
+                                      headers={"Authorization": "Bearer scrape-secret"}, timeout=10)
+
+            assert anonymous.status_code == 401
+            assert wrong.status_code == 401
+            assert scraper.status_code == 200
+        finally:
+            server.stop()
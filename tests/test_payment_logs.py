@@ -0,0 +1,233 @@
+"""
+Tests for the batched payment audit log writer and its on-disk journal
+The api_server fixture starts the server in mock mode (see tests/live_server.py);
+the journal tests without a server run PaymentLogWriter against the emulator
+"""
+
+import json
+import time
+
+import pytest
+
+from tests.live_server import LiveServer, ServerStartError
+from tests.node_script import run_node
+
+ADMIN_HEADERS = {"Authorization": "Bearer valid-admin-token"}
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+
+
+@pytest.mark.integration
+class TestPaymentLogWriter:
+    """Tests for queued payment_logs writes"""
+
+    def test_logged_action_is_visible_in_history_immediately(self, api_session, api_base_url):
+        response = api_session.post(
+            f"{api_base_url}/subscription/enterprise-contact",
+            json={"message": "Audit log test"},
+            headers=USER_HEADERS,
+            timeout=10,
+        )
+        assert response.status_code == 200
+
+        history = api_session.get(f"{api_base_url}/payment/history", headers=USER_HEADERS, timeout=10).json()
+        assert history[0]["action"] == "enterprise_contact_requested"
+
+    def test_writer_stats_are_admin_only(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/subscription/admin/log-writer", headers=USER_HEADERS, timeout=10)
+        assert response.status_code == 403
+
+    def test_writer_stats_report_queue_and_flush_latency(self, api_session, api_base_url):
+        response = api_session.get(f"{api_base_url}/subscription/admin/log-writer", headers=ADMIN_HEADERS, timeout=10)
+
+        assert response.status_code == 200
+        stats = response.json()
+        for key in ("queueDepth", "written", "flushes", "failedFlushes", "spilled", "lastFlushMs", "avgFlushMs"):
+            assert key in stats
+
+
+def journal_segments(journal):
+    return sorted(journal.parent.glob(journal.name + ".*"))
+
+
+def wait_for_no_segments(journal, timeout=5):
+    deadline = time.time() + timeout
+    while journal_segments(journal) and time.time() < deadline:
+        time.sleep(0.05)
+    return journal_segments(journal)
+
+
+@pytest.mark.integration
+class TestPaymentLogJournal:
+    """Entries are journaled to disk until committed, and replayed by the next server"""
+
+    def start_server(self, tmp_path, journal, **env):
+        server = LiveServer(tmp_path / "server.log", env={"PAYMENT_LOG_SPILL_FILE": str(journal), **env})
+        try:
+            return server.start()
+        except ServerStartError as error:
+            pytest.skip(f"Could not start a second API server: {error}")
+
+    def test_journal_is_trimmed_once_entries_commit(self, api_session, tmp_path):
+        journal = tmp_path / "payment-logs.ndjson"
+        server = self.start_server(tmp_path, journal, PAYMENT_LOG_FLUSH_INTERVAL_MS="100")
+        try:
+            response = api_session.post(
+                f"{server.base_url}/subscription/enterprise-contact",
+                json={"message": "Journal test"},
+                headers=USER_HEADERS,
+                timeout=10,
+            )
+            assert response.status_code == 200
+
+            assert wait_for_no_segments(journal) == []
+        finally:
+            server.stop()
+
+    def test_journal_left_by_a_crash_is_replayed(self, api_session, tmp_path):
+        journal = tmp_path / "payment-logs.ndjson"
+        entry = {
+            "id": "journaledEntry000001",
+            "collection": "test.payment_logs",
+            "data": {"userId": "test-user-123", "action": "journal_replay_test",
+                     "timestamp": "2030-01-01T00:00:00.000Z"},
+        }
+        committed = dict(entry, id="committedEntry000001")
+        (tmp_path / "payment-logs.ndjson.0").write_text("\n".join([
+            json.dumps(entry, separators=(",", ":")),
+            json.dumps(committed, separators=(",", ":")),
+            json.dumps({"committed": [committed["id"]]}),
+        ]) + "\n")
+
+        server = self.start_server(tmp_path, journal)
+        try:
+            remaining = wait_for_no_segments(journal)
+            history = api_session.get(f"{server.base_url}/payment/history", headers=USER_HEADERS, timeout=10).json()
+
+            assert remaining == []
+            assert history[0]["id"] == entry["id"]
+            assert history[0]["action"] == "journal_replay_test"
+            # Entries with a commit marker are already in Firestore
+            assert committed["id"] not in [item["id"] for item in history]
+        finally:
+            server.stop()
+
+
+# PaymentLogWriter against a bare emulator; tests set TMPDIR to their tmp_path,
+# where the writer keeps its per-process journal
+WRITER_PRELUDE = """
+const fs = require('fs');
+const os = require('os');
+const { PaymentLogWriter } = require('./services/paymentLogWriter');
+const { Firestore } = require('./utils/firestoreEmulator');
+const db = new Firestore({ latency: 'fixed:0' });
+let failing = false;
+
+function createWriter(options = {}) {
+  return new PaymentLogWriter({
+    flushIntervalMs: 50,
+    getDb: async () => {
+      if (failing) throw new Error('Firestore unavailable');
+      return db;
+    },
+    ...options
+  });
+}
+
+const settle = (ms = 100) => new Promise((resolve) => setTimeout(resolve, ms));
+const journalFiles = () => fs.readdirSync(os.tmpdir()).filter((name) => name.startsWith('payment-log-journal.')).sort();
+const written = async () => (await db.collection('payment_logs').get()).size;
+"""
+
+
+class TestPaymentLogJournalFiles:
+    """The journal is append-only, per process, and deleted segment by segment"""
+
+    def test_default_journal_is_per_process(self, tmp_path):
+        result = run_node("""
+        failing = true;
+        const writer = createWriter();
+        writer.log('payment_logs', { action: 'a' });
+        await settle();
+        return { files: journalFiles(), pid: process.pid };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result["files"] == [f"payment-log-journal.{result['pid']}.ndjson.0"]
+
+    def test_committed_segments_are_deleted_without_rewrites(self, tmp_path):
+        result = run_node("""
+        failing = true;
+        const writer = createWriter({ segmentBytes: 1000 });
+        for (let i = 0; i < 20; i++) writer.log('payment_logs', { action: 'a', index: i });
+        await settle();
+        const whileFailing = journalFiles().length;
+        failing = false;
+        await writer.flush();
+        await settle();
+        return { whileFailing, after: journalFiles(), written: await written() };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result["whileFailing"] > 1
+        assert result["after"] == []
+        assert result["written"] == 20
+
+    def test_close_leaves_no_journal_once_everything_committed(self, tmp_path):
+        result = run_node("""
+        const writer = createWriter();
+        writer.log('payment_logs', { action: 'a' });
+        await writer.close();
+        // No settling: the process could exit right here
+        return { files: journalFiles(), written: await written() };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result == {"files": [], "written": 1}
+
+    def test_overflow_is_read_back_from_the_journal(self, tmp_path):
+        result = run_node("""
+        failing = true;
+        const writer = createWriter({ maxQueue: 5, batchSize: 5 });
+        for (let i = 0; i < 12; i++) writer.log('payment_logs', { action: 'a', index: i });
+        await writer.flush();
+        const queued = writer.getStats().queueDepth;
+        failing = false;
+        await writer.flush();
+        await settle();
+        return { queued, written: await written(), files: journalFiles() };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result == {"queued": 5, "written": 12, "files": []}
+
+    def test_journal_of_a_dead_process_is_claimed_and_replayed(self, tmp_path):
+        # A pid that is no longer running: a child that has already exited
+        dead_pid = run_node("return process.pid;")
+        entry = {
+            "id": "orphanedEntry0000001",
+            "collection": "payment_logs",
+            "data": {"action": "orphan", "timestamp": "2030-01-01T00:00:00.000Z"},
+        }
+        (tmp_path / f"payment-log-journal.{dead_pid}.ndjson.3").write_text(json.dumps(entry) + "\n")
+
+        result = run_node("""
+        const writer = createWriter().start();
+        await writer.flush();
+        await settle();
+        const doc = await db.collection('payment_logs').doc('orphanedEntry0000001').get();
+        return { replayed: doc.exists && doc.data().action, files: journalFiles() };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result == {"replayed": "orphan", "files": []}
+
+    def test_journal_of_a_running_process_is_left_alone(self, tmp_path):
+        result = run_node("""
+        const { spawn } = require('child_process');
+        const other = spawn(process.execPath, ['-e', 'setTimeout(() => {}, 10000)']);
+        const name = `payment-log-journal.${other.pid}.ndjson.0`;
+        fs.writeFileSync(`${os.tmpdir()}/${name}`, '{"id":"otherProcessEntry001","collection":"payment_logs","data":{"timestamp":"2030-01-01T00:00:00.000Z"}}\\n');
+        const writer = createWriter().start();
+        await writer.flush();
+        await settle();
+        other.kill();
+        return { files: journalFiles(), name, written: await written() };
+        """, WRITER_PRELUDE, env={"TMPDIR": str(tmp_path)})
+
+        assert result["files"] == [result["name"]]
+        assert result["written"] == 0
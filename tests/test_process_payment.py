@@ -0,0 +1,76 @@
+"""
+Integration tests for /api/subscription/process-payment with the payment simulator
+The api_server fixture starts the server in mock mode with the default simulator settings
+"""
+
+import time
+
+import pytest
+
+pytestmark = pytest.mark.integration
+
+PREMIUM_HEADERS = {"Authorization": "Bearer valid-premium-token"}
+PAYMENT_BODY = {
+    "planType": "premium",
+    "amount": 9.99,
+    "cardInfo": {"paymentMethodId": "pm_card_visa"},
+    "billingCycle": "monthly",
+}
+
+
+class TestProcessPayment:
+    """Tests for the upgrade flow through the payment processor"""
+
+    def test_upgrade_has_no_artificial_delay(self, api_session, api_base_url):
+        started = time.perf_counter()
+        response = api_session.post(
+            f"{api_base_url}/subscription/process-payment", json=PAYMENT_BODY, headers=PREMIUM_HEADERS, timeout=10
+        )
+        elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        assert response.json()["subscriptionType"] == "premium"
+        assert elapsed < 1.0
+
+    def test_upgrade_is_logged_with_processor_reference(self, api_session, api_base_url):
+        api_session.post(
+            f"{api_base_url}/subscription/process-payment", json=PAYMENT_BODY, headers=PREMIUM_HEADERS, timeout=10
+        )
+
+        history = api_session.get(f"{api_base_url}/payment/history", headers=PREMIUM_HEADERS, timeout=10).json()
+        latest = history[0]
+        assert latest["action"] == "payment_processed"
+        assert latest["paymentMethod"] == "simulated_card"
+        assert latest["paymentReference"].startswith("sim_")
+
+    def test_rejects_unknown_plan(self, api_session, api_base_url):
+        response = api_session.post(
+            f"{api_base_url}/subscription/process-payment",
+            json={**PAYMENT_BODY, "planType": "platinum"},
+            headers=PREMIUM_HEADERS,
+            timeout=10,
+        )
+        assert response.status_code == 400
+
+    def test_rejects_plans_without_a_server_price(self, api_session, api_base_url):
+        """Enterprise is arranged through enterprise-contact, never charged at a client price"""
+        response = api_session.post(
+            f"{api_base_url}/subscription/process-payment",
+            json={**PAYMENT_BODY, "planType": "enterprise", "amount": 0.01},
+            headers=PREMIUM_HEADERS,
+            timeout=10,
+        )
+        assert response.status_code == 400
+
+    def test_client_amount_is_ignored(self, api_session, api_base_url):
+        response = api_session.post(
+            f"{api_base_url}/subscription/process-payment",
+            json={**PAYMENT_BODY, "planType": "premiumYearly", "amount": 0.01},
+            headers=PREMIUM_HEADERS,
+            timeout=10,
+        )
+
+        assert response.status_code == 200
+        assert response.json()["amount"] == 100
+        history = api_session.get(f"{api_base_url}/payment/history", headers=PREMIUM_HEADERS, timeout=10).json()
+        assert history[0]["amount"] == 100
@@ -0,0 +1,150 @@
+"""
+Integration tests for queued, idempotent Stripe webhook processing
+Events are signed locally, so no Stripe account or network access is needed.
+The api_server fixture starts the server with a placeholder Stripe key and the
+fixture secret (see tests/live_server.py)
+"""
+
+import copy
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+
+import pytest
+
+from tests.live_server import LiveServer, ServerStartError
+from tests.node_script import run_node
+from tests.test_data import (
+    STRIPE_TEST_WEBHOOK_SECRET,
+    STRIPE_PAYMENT_SUCCEEDED_EVENT,
+    STRIPE_PAYMENT_FAILED_EVENT
+)
+
+pytestmark = pytest.mark.integration
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+# The server started by api_server always uses the fixture secret; one given through API_BASE_URL may not
+WEBHOOK_SECRET = (os.getenv("STRIPE_WEBHOOK_SECRET", STRIPE_TEST_WEBHOOK_SECRET) if os.getenv("API_BASE_URL")
+                  else STRIPE_TEST_WEBHOOK_SECRET)
+
+
+def sign_payload(payload, secret=WEBHOOK_SECRET, timestamp=None):
+    """Build a Stripe-Signature header: HMAC-SHA256 of "<timestamp>.<payload>" """
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def fixture_event(event):
+    """Copy of a fixture event with a fresh ID, so reruns against one server are not duplicates"""
+    event = copy.deepcopy(event)
+    suffix = uuid.uuid4().hex[:12]
+    event["id"] = f"{event['id']}_{suffix}"
+    event["data"]["object"]["id"] = f"{event['data']['object']['id']}_{suffix}"
+    return event
+
+
+def post_event(api_session, api_base_url, event, secret=WEBHOOK_SECRET):
+    payload = json.dumps(event)
+    return api_session.post(
+        f"{api_base_url}/payment/webhook",
+        data=payload,
+        headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(payload, secret)},
+        timeout=10,
+    )
+
+
+def wait_for_history_entry(api_session, api_base_url, payment_intent_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        history = api_session.get(f"{api_base_url}/payment/history", headers=USER_HEADERS, timeout=10).json()
+        entries = [entry for entry in history if entry.get("paymentIntentId") == payment_intent_id]
+        if entries:
+            return entries
+        time.sleep(0.1)
+    return []
+
+
+@pytest.fixture(autouse=True)
+def require_webhook(api_session, api_base_url):
+    """Skip unless the server has Stripe configured with the fixture secret (API_BASE_URL servers may not)"""
+    response = post_event(api_session, api_base_url, fixture_event(STRIPE_PAYMENT_FAILED_EVENT))
+    if response.status_code in (500, 503):
+        pytest.skip("Stripe is not configured - set STRIPE_SECRET_KEY and STRIPE_WEBHOOK_SECRET for the server")
+    if response.status_code == 400:
+        pytest.skip("Server STRIPE_WEBHOOK_SECRET does not match the one these tests sign with")
+
+
+class TestStripeWebhook:
+    """Tests for /api/payment/webhook"""
+
+    def test_rejects_bad_signature(self, api_session, api_base_url):
+        response = post_event(api_session, api_base_url, fixture_event(STRIPE_PAYMENT_SUCCEEDED_EVENT), secret="whsec_wrong")
+        assert response.status_code == 400
+
+    def test_acknowledges_and_processes_in_background(self, api_session, api_base_url):
+        event = fixture_event(STRIPE_PAYMENT_SUCCEEDED_EVENT)
+
+        response = post_event(api_session, api_base_url, event)
+
+        assert response.status_code == 200
+        assert response.json() == {"received": True, "duplicate": False}
+        entries = wait_for_history_entry(api_session, api_base_url, event["data"]["object"]["id"])
+        assert [entry["action"] for entry in entries] == ["webhook_payment_succeeded"]
+
+    def test_redelivered_event_is_processed_once(self, api_session, api_base_url):
+        event = fixture_event(STRIPE_PAYMENT_FAILED_EVENT)
+
+        first = post_event(api_session, api_base_url, event)
+        wait_for_history_entry(api_session, api_base_url, event["data"]["object"]["id"])
+        second = post_event(api_session, api_base_url, event)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json()["duplicate"] is True
+        time.sleep(0.5)
+        entries = wait_for_history_entry(api_session, api_base_url, event["data"]["object"]["id"])
+        assert len(entries) == 1
+
+
+class TestWebhookRecovery:
+    """Events spilled to disk by an earlier run are processed when the server starts"""
+
+    def test_spilled_events_are_replayed_on_startup(self, api_session, tmp_path):
+        event = fixture_event(STRIPE_PAYMENT_SUCCEEDED_EVENT)
+        spill_file = tmp_path / "webhook-spill.ndjson"
+        spill_file.write_text(json.dumps(event) + "\n")
+
+        server = LiveServer(tmp_path / "server.log", env={"WEBHOOK_SPILL_FILE": str(spill_file)})
+        try:
+            server.start()
+        except ServerStartError as error:
+            pytest.skip(f"Could not start a second API server: {error}")
+        try:
+            entries = wait_for_history_entry(api_session, server.base_url, event["data"]["object"]["id"])
+            assert [entry["action"] for entry in entries] == ["webhook_payment_succeeded"]
+            assert not spill_file.exists()
+        finally:
+            server.stop()
+
+    def test_spill_file_of_a_dead_server_is_replayed(self, api_session, tmp_path):
+        event = fixture_event(STRIPE_PAYMENT_SUCCEEDED_EVENT)
+        # A pid that is no longer running: a child that has already exited
+        dead_pid = run_node("return process.pid;")
+        orphan = tmp_path / f"webhook-event-spill.{dead_pid}.ndjson"
+        orphan.write_text(json.dumps(event) + "\n")
+
+        server = LiveServer(tmp_path / "server.log", env={"TMPDIR": str(tmp_path)})
+        try:
+            server.start()
+        except ServerStartError as error:
+            pytest.skip(f"Could not start a second API server: {error}")
+        try:
+            entries = wait_for_history_entry(api_session, server.base_url, event["data"]["object"]["id"])
+            assert [entry["action"] for entry in entries] == ["webhook_payment_succeeded"]
+            assert list(tmp_path.glob("webhook-event-spill.*")) == []
+        finally:
+            server.stop()
@@ -0,0 +1,128 @@
+"""
+Offline tests for the Firestore trace analyzer in tests/tracing
+No API server is needed
+"""
+
+import json
+
+import pytest
+
+from tests.tracing.__main__ import main
+from tests.tracing.analyzer import aggregate, format_report, rank, read_traces
+
+
+def trace(route, read, returned, serial=1, firestore_ms=5.0, duration_ms=10.0, status=200, method="GET",
+          collections=None):
+    return {
+        "type": "firestore_trace",
+        "method": method,
+        "route": route,
+        "status": status,
+        "durationMs": duration_ms,
+        "documentsRead": read,
+        "documentsReturned": returned,
+        "documentsWritten": 0,
+        "roundTrips": serial,
+        "serialRoundTrips": serial,
+        "firestoreMs": firestore_ms,
+        "collections": collections or {"content": {"reads": read, "writes": 0, "roundTrips": serial, "ms": firestore_ms}},
+    }
+
+
+class TestReadTraces:
+    """Tests for picking trace lines out of server output"""
+
+    def test_skips_other_output(self):
+        lines = [
+            "Server is running on port 3001",
+            json.dumps(trace("/api/lessons", 3, 3)),
+            '{"not": "a trace"}',
+            "{broken json",
+            json.dumps(trace("/api/modules", 1, 1)) + "\n",
+        ]
+        assert [record["route"] for record in read_traces(lines)] == ["/api/lessons", "/api/modules"]
+
+
+class TestAggregate:
+    """Tests for per-route totals, amplification and findings"""
+
+    def test_amplification_over_requests_with_known_returns(self):
+        traces = [trace("/api/units/user", 8000, 12), trace("/api/units/user", 8000, 12),
+                  trace("/api/units/user", 500, None)]
+        hotspot = aggregate(traces)[0]
+
+        assert hotspot["requests"] == 3
+        assert hotspot["documentsRead"] == 16500
+        assert hotspot["documentsReturned"] == 24
+        assert hotspot["readAmplification"] == pytest.approx(16000 / 24, abs=0.001)
+        assert hotspot["readsPerRequest"]["max"] == 8000
+        assert any("per document returned" in note for note in hotspot["findings"])
+
+    def test_unknown_returns_give_no_amplification(self):
+        hotspot = aggregate([trace("/api/lessons", 10, None)])[0]
+        assert hotspot["documentsReturned"] is None
+        assert hotspot["readAmplification"] is None
+
+    def test_empty_responses_still_show_amplification(self):
+        hotspot = aggregate([trace("/api/units/user", 200, 0)])[0]
+        assert hotspot["readAmplification"] == 200
+        assert hotspot["findings"]
+
+    def test_serial_round_trips_and_firestore_share(self):
+        hotspot = aggregate([trace("/api/lesson/:id/bundle", 20, 1, serial=9, firestore_ms=95, duration_ms=100)])[0]
+        notes = " ".join(hotspot["findings"])
+        assert "9 serial round trips" in notes
+        assert "95% of request time" in notes
+
+    def test_collections_sorted_by_reads(self):
+        collections = {
+            "users": {"reads": 3, "writes": 0, "roundTrips": 1, "ms": 1.0},
+            "lesson": {"reads": 40, "writes": 1, "roundTrips": 2, "ms": 4.0},
+        }
+        hotspot = aggregate([trace("/api/lessons", 43, 40, collections=collections)] * 2)[0]
+        assert [entry["collection"] for entry in hotspot["collections"]] == ["lesson", "users"]
+        assert hotspot["collections"][0]["reads"] == 80
+
+    def test_errors_counted(self):
+        hotspot = aggregate([trace("/api/x", 1, 0, status=500), trace("/api/x", 1, 0, status="aborted"),
+                             trace("/api/x", 1, 0, status=404)])[0]
+        assert hotspot["errors"] == 2
+
+
+class TestRank:
+    """Tests for hotspot ordering and the text report"""
+
+    def test_sort_keys(self):
+        hotspots = aggregate([
+            trace("/api/units/user", 8000, 12),
+            trace("/api/lessons", 9000, 9000),
+            trace("/api/lesson/:id", 5, 1, serial=6, firestore_ms=60),
+        ])
+        assert [h["route"] for h in rank(hotspots, "reads")][0] == "/api/lessons"
+        assert [h["route"] for h in rank(hotspots, "amplification")][0] == "/api/units/user"
+        assert [h["route"] for h in rank(hotspots, "serial")][0] == "/api/lesson/:id"
+        assert [h["route"] for h in rank(hotspots, "firestore-ms")][0] == "/api/lesson/:id"
+        with pytest.raises(ValueError):
+            rank(hotspots, "latency")
+
+    def test_report_lists_routes_in_rank_order(self):
+        hotspots = rank(aggregate([trace("/api/a", 1, 1), trace("/api/b", 50, 1), trace("/api/c", 10, 10)]))
+        report = format_report(hotspots, top=2)
+
+        assert report.index("/api/b") < report.index("/api/c")
+        assert "/api/a" not in report
+        assert "1 more routes" in report
+
+    def test_command_line(self, tmp_path, capsys):
+        log = tmp_path / "server.log"
+        log.write_text("Server is running\n" + "\n".join(json.dumps(trace(route, read, 1))
+                                                        for route, read in [("/api/a", 5), ("/api/b", 500)]))
+
+        assert main([str(log), "--json"]) == 0
+        output = json.loads(capsys.readouterr().out)
+        assert output["traces"] == 2
+        assert [hotspot["route"] for hotspot in output["hotspots"]] == ["/api/b", "/api/a"]
+
+        empty = tmp_path / "empty.log"
+        empty.write_text("no traces here\n")
+        assert main([str(empty)]) == 1
@@ -0,0 +1,165 @@
+"""
+Tests for DELETE /api/unit/<id>, which refuses to delete units that lessons
+still use (checked through the contentUsage index) or that lesson drafts use
+The api_server fixture starts the server in mock mode (see tests/live_server.py)
+"""
+
+import pytest
+
+from tests.node_script import run_node
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+
+
+@pytest.fixture
+def unit_id(api_session, api_base_url):
+    unit = {
+        "Title": "Unit in use",
+        "Category": "Testing",
+        "Type": "Activity",
+        "Level": "Beginner",
+        "Duration": "30 minutes",
+        "Abstract": "Created by the unit delete tests",
+        "fileUrl": "https://example.com/unit.pdf",
+        "isPublic": False,
+    }
+    response = api_session.post(f"{api_base_url}/unit", json=unit, headers=USER_HEADERS, timeout=10)
+    assert response.status_code == 201, response.text
+    created = response.json()["id"]
+    yield created
+    api_session.delete(f"{api_base_url}/unit/{created}", headers=USER_HEADERS, timeout=10)
+
+
+@pytest.fixture
+def lesson_using_unit(api_session, api_base_url, unit_id):
+    lesson = {
+        "title": "Lesson using the unit",
+        "category": "Testing",
+        "type": "Lesson Plan",
+        "level": "Basic",
+        "objectives": ["Use a unit"],
+        "duration": 20,
+        "sections": [{"intro": "Read the unit.", "contentIds": [unit_id]}],
+        "description": "Created by the unit delete tests",
+        "isPublic": False,
+    }
+    response = api_session.post(f"{api_base_url}/lesson", json=lesson, headers=USER_HEADERS, timeout=10)
+    assert response.status_code == 201, response.text
+    created = response.json()["id"]
+    yield created
+    api_session.delete(f"{api_base_url}/lesson/{created}", headers=USER_HEADERS, timeout=10)
+
+
+def delete_unit(api_session, api_base_url, unit_id):
+    return api_session.delete(f"{api_base_url}/unit/{unit_id}", headers=USER_HEADERS, timeout=10)
+
+
+@pytest.mark.integration
+class TestUnitDelete:
+    """Units referenced by a lesson can't be deleted until no lesson uses them"""
+
+    def test_seeded_unit_in_use_is_refused(self, api_session, api_base_url):
+        response = delete_unit(api_session, api_base_url, "unit-002")
+
+        assert response.status_code == 400
+        assert "Forces and Motion" in response.text
+
+    def test_used_unit_is_refused_with_lesson_title(self, api_session, api_base_url, unit_id, lesson_using_unit):
+        response = delete_unit(api_session, api_base_url, unit_id)
+
+        assert response.status_code == 400
+        assert "Lesson using the unit" in response.text
+        assert api_session.get(f"{api_base_url}/unit/{unit_id}", timeout=10).status_code == 200
+
+    def test_message_follows_lesson_renames(self, api_session, api_base_url, unit_id, lesson_using_unit):
+        api_session.put(f"{api_base_url}/lesson/{lesson_using_unit}", json={"title": "Renamed lesson"},
+                        headers=USER_HEADERS, timeout=10)
+
+        response = delete_unit(api_session, api_base_url, unit_id)
+
+        assert response.status_code == 400
+        assert "Renamed lesson" in response.text
+        assert "Lesson using the unit" not in response.text
+
+    def test_delete_succeeds_once_lesson_drops_the_unit(self, api_session, api_base_url, unit_id,
+                                                         lesson_using_unit):
+        response = api_session.put(f"{api_base_url}/lesson/{lesson_using_unit}",
+                                   json={"sections": [{"intro": "No units any more.", "contentIds": []}]},
+                                   headers=USER_HEADERS, timeout=10)
+        assert response.status_code == 200
+
+        assert delete_unit(api_session, api_base_url, unit_id).status_code == 200
+        assert api_session.get(f"{api_base_url}/unit/{unit_id}", timeout=10).status_code == 404
+
+    def test_delete_succeeds_once_lesson_is_deleted(self, api_session, api_base_url, unit_id, lesson_using_unit):
+        response = api_session.delete(f"{api_base_url}/lesson/{lesson_using_unit}", headers=USER_HEADERS,
+                                      timeout=10)
+        assert response.status_code == 200
+
+        assert delete_unit(api_session, api_base_url, unit_id).status_code == 200
+
+    def test_unknown_unit_is_not_found(self, api_session, api_base_url):
+        assert delete_unit(api_session, api_base_url, "no-such-unit").status_code == 404
+
+
+# deleteUnit against a bare emulator, with drafts written the way the portal's
+# lesson builder writes them (straight to Firestore, no usage index entry)
+DRAFT_PRELUDE = """
+process.env.DATABASE_SCHEMA_QUALIFIER = 'test.';
+const { databaseService } = require('./services/databaseService');
+const { Firestore } = require('./utils/firestoreEmulator');
+const { deleteUnit } = require('./controllers/unitsController');
+const db = new Firestore({ latency: 'fixed:0' });
+databaseService.db = db;
+databaseService.isInitialized = true;
+
+async function remove(unitId) {
+  const res = {
+    status(code) { this.code = code; return this; },
+    send(body) { this.body = body; return this; }
+  };
+  await deleteUnit({ params: { id: unitId } }, res);
+  return { status: res.code, body: res.body, exists: (await db.collection('test.content').doc(unitId).get()).exists };
+}
+
+async function seed() {
+  await db.collection('test.content').doc('u1').set({ Title: 'Unit' });
+  await db.collection('test.lesson').doc('d1').set({
+    title: 'Half-built lesson', author: 'test-user-123', isDraft: true,
+    sections: [{ intro: '', contentIds: [] }, { intro: '', contentIds: ['u1'] }]
+  });
+}
+"""
+
+
+class TestUnitDeleteWithDrafts:
+    """Drafts aren't in the usage index, so the delete checks them itself"""
+
+    def test_unit_used_by_a_draft_is_refused(self):
+        result = run_node("""
+        await seed();
+        return await remove('u1');
+        """, DRAFT_PRELUDE)
+
+        assert result["status"] == 400
+        assert "Half-built lesson (draft)" in result["body"]
+        assert result["exists"] is True
+
+    def test_delete_succeeds_once_the_draft_is_deleted(self):
+        result = run_node("""
+        await seed();
+        await db.collection('test.lesson').doc('d1').delete();
+        return await remove('u1');
+        """, DRAFT_PRELUDE)
+
+        assert result["status"] == 200
+        assert result["exists"] is False
+
+    def test_drafts_using_other_units_do_not_block(self):
+        result = run_node("""
+        await seed();
+        await db.collection('test.lesson').doc('d1').update({ sections: [{ intro: '', contentIds: ['u2'] }] });
+        return await remove('u1');
+        """, DRAFT_PRELUDE)
+
+        assert result["status"] == 200
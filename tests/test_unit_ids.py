@@ -0,0 +1,132 @@
+"""
+Tests for unit ID allocation on POST /api/unit and bulk uploads on POST /api/units/bulk
+The api_server fixture starts the server in mock mode (see tests/live_server.py)
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tests.node_script import run_node
+
+USER_HEADERS = {"Authorization": "Bearer valid-user-token"}
+
+
+def create_unit(api_session, api_base_url, index):
+    unit = {
+        "Title": f"Concurrent Unit {index}",
+        "Category": "Testing",
+        "Type": "Activity",
+        "Level": "Beginner",
+        "Duration": "30 minutes",
+        "Abstract": "Created by the unit ID concurrency test",
+        "fileUrl": "https://example.com/unit.pdf",
+        "isPublic": False,
+    }
+    return api_session.post(f"{api_base_url}/unit", json=unit, headers=USER_HEADERS, timeout=30)
+
+
+@pytest.mark.integration
+class TestUnitIdAllocation:
+    """Parallel uploads must never share a UnitID"""
+
+    def test_parallel_uploads_get_unique_unit_ids(self, api_session, api_base_url):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            responses = list(executor.map(lambda i: create_unit(api_session, api_base_url, i), range(64)))
+
+        assert all(response.status_code == 201 for response in responses)
+        unit_ids = [response.json()["UnitID"] for response in responses]
+
+        assert all(re.fullmatch(r"diya\d+", unit_id) for unit_id in unit_ids)
+        assert len(set(unit_ids)) == len(unit_ids)
+
+
+@pytest.mark.integration
+class TestBulkUnitUpload:
+    """Tests for POST /api/units/bulk (NDJSON/CSV in, streamed NDJSON results out)"""
+
+    def post_bulk(self, api_session, api_base_url, body, content_type):
+        response = api_session.post(
+            f"{api_base_url}/units/bulk",
+            data=body.encode("utf-8"),
+            headers={**USER_HEADERS, "Content-Type": content_type},
+            timeout=60,
+        )
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    def test_ndjson_rows_report_in_order(self, api_session, api_base_url):
+        rows = []
+        for index in range(1200):
+            unit = {
+                "Title": f"Bulk Unit {index}", "Category": "Testing", "Type": "Activity",
+                "Level": "Beginner", "Duration": "30 minutes", "Abstract": "Bulk import",
+                "fileUrl": "https://example.com/unit.pdf", "isPublic": False,
+            }
+            if index == 7:
+                del unit["Abstract"]
+            rows.append(json.dumps(unit))
+        results = self.post_bulk(api_session, api_base_url, "\n".join(rows) + "\n", "application/x-ndjson")
+
+        summary = results[-1]["summary"]
+        assert summary == {"total": 1200, "created": 1199, "failed": 1}
+        assert [result["line"] for result in results[:-1]] == list(range(1, 1201))
+        assert results[7]["error"] == "Missing required fields: Abstract"
+
+        unit_ids = [result["UnitID"] for result in results[:-1] if result["status"] == "created"]
+        assert len(set(unit_ids)) == 1199
+
+    def test_csv_rows_with_quoted_fields(self, api_session, api_base_url):
+        body = (
+            "Title,Category,Type,Level,Duration,Abstract,fileUrl,isPublic\n"
+            '"Commas, in title",Testing,Activity,Beginner,30 minutes,"Line one\nline two",https://example.com/a.pdf,false\n'
+            "Too,few,columns\n"
+        )
+        results = self.post_bulk(api_session, api_base_url, body, "text/csv")
+
+        assert results[0]["status"] == "created"
+        assert results[1] == {"line": 4, "status": "error", "error": "Expected 8 columns, found 3"}
+        assert results[-1]["summary"]["created"] == 1
+
+    def test_unknown_format_is_rejected(self, api_session, api_base_url):
+        response = api_session.post(f"{api_base_url}/units/bulk", data="x",
+                                    headers={**USER_HEADERS, "Content-Type": "text/plain"}, timeout=10)
+        assert response.status_code == 415
+
+
+class TestBulkUploadBackpressure:
+    """bulkCreateUnits against a response that is always backed up"""
+
+    def test_waiting_for_drain_leaves_no_listeners(self):
+        result = run_node("""
+        const { EventEmitter } = require('events');
+        const { Readable } = require('stream');
+        process.env.DATABASE_SCHEMA_QUALIFIER = 'test.';
+        const { databaseService } = require('./services/databaseService');
+        const { Firestore } = require('./utils/firestoreEmulator');
+        const { bulkCreateUnits } = require('./controllers/content_submission');
+        databaseService.db = new Firestore({ latency: 'fixed:0' });
+        databaseService.isInitialized = true;
+
+        // Every write reports a full socket, which drains on the next tick
+        const res = new EventEmitter();
+        Object.assign(res, {
+          lines: 0,
+          headersSent: false,
+          status() { return this; },
+          setHeader() {},
+          write() { this.lines++; process.nextTick(() => this.emit('drain')); return false; },
+          end() { this.ended = true; }
+        });
+        const unit = { Title: 'T', Category: 'C', Type: 'Activity', Level: 'Beginner', Duration: '1',
+                       Abstract: 'A', fileUrl: 'https://example.com/u.pdf' };
+        const req = Readable.from([Array.from({ length: 50 }, () => JSON.stringify(unit)).join('\\n')]);
+        Object.assign(req, { user: { uid: 'test-user-123' }, query: {}, headers: { 'content-type': 'application/x-ndjson' } });
+
+        await bulkCreateUnits(req, res);
+        return { lines: res.lines, ended: res.ended, drain: res.listenerCount('drain'), close: res.listenerCount('close') };
+        """)
+
+        assert result == {"lines": 51, "ended": True, "drain": 0, "close": 0}
@@ -0,0 +1,84 @@
+"""
+Tests for DatabaseService.getUserDocument (server/services/databaseService.js):
+the teachers -> students -> users lookup and the remembered collection per uid
+Runs the service against a bare Firestore emulator, whose collections are
+separate (mock mode aliases them to one), so no API server is needed
+"""
+
+from tests.node_script import run_node
+
+PRELUDE = """
+const { DatabaseService } = require('./services/databaseService');
+const { Firestore } = require('./utils/firestoreEmulator');
+const USERS = 'test.users';
+const service = new DatabaseService();
+const db = new Firestore({ latency: 'fixed:0' });
+service.db = db;
+service.isInitialized = true;
+
+// Look a user up and report where it was found and what the lookup cost
+async function lookup(uid) {
+  db.resetStats();
+  const { ref, snap, collection } = await service.getUserDocument(uid, USERS);
+  const { reads, roundTrips } = db.getStats();
+  return { collection, path: ref.path, exists: snap.exists, reads, roundTrips };
+}
+"""
+
+
+class TestUserDocumentLookup:
+    """Lookups pick by precedence and remember the collection for next time"""
+
+    def test_collection_precedence_and_remembered_lookup(self):
+        result = run_node("""
+        await db.collection('students').doc('u1').set({ role: 'teacherDefault' });
+        await db.collection(USERS).doc('u1').set({ role: 'teacherPlus' });
+        return { first: await lookup('u1'), second: await lookup('u1'), locations: service.getCacheStats().userLocations };
+        """, PRELUDE)
+
+        assert result["first"] == {"collection": "students", "path": "students/u1", "exists": True, "reads": 3,
+                                   "roundTrips": 1}
+        # The remembered collection is read on its own
+        assert result["second"] == {"collection": "students", "path": "students/u1", "exists": True, "reads": 1,
+                                    "roundTrips": 1}
+        assert result["locations"]["hits"] == 1
+
+    def test_moved_document_falls_back_to_full_lookup(self):
+        result = run_node("""
+        await db.collection('teachers').doc('u1').set({ role: 'teacherDefault' });
+        await lookup('u1');
+        await db.collection('teachers').doc('u1').delete();
+        await db.collection(USERS).doc('u1').set({ role: 'teacherDefault' });
+        return { moved: await lookup('u1'), next: await lookup('u1') };
+        """, PRELUDE)
+
+        # One read of the old collection, then all three in one round trip
+        assert result["moved"] == {"collection": "users", "path": "test.users/u1", "exists": True, "reads": 4,
+                                   "roundTrips": 2}
+        assert result["next"]["reads"] == 1
+
+    def test_deleted_document_is_forgotten(self):
+        result = run_node("""
+        await db.collection('teachers').doc('u1').set({ role: 'teacherDefault' });
+        await lookup('u1');
+        await db.collection('teachers').doc('u1').delete();
+        const deleted = await lookup('u1');
+        return { deleted, remembered: service.getCacheStats().userLocations.entries, again: await lookup('u1') };
+        """, PRELUDE)
+
+        # Not found: the unified users ref is handed back so callers can create it
+        assert result["deleted"] == {"collection": "users", "path": "test.users/u1", "exists": False, "reads": 4,
+                                     "roundTrips": 2}
+        assert result["remembered"] == 0
+        assert result["again"]["reads"] == 3
+
+    def test_forget_user_location(self):
+        result = run_node("""
+        await db.collection('teachers').doc('u1').set({ role: 'admin' });
+        await lookup('u1');
+        service.forgetUserLocation('u1');
+        return await lookup('u1');
+        """, PRELUDE)
+
+        assert result["reads"] == 3
+        assert result["collection"] == "teachers"
@@ -0,0 +1,90 @@
+"""
+Integration tests for keyset pagination on GET /api/user/users
+The api_server fixture starts the server in mock mode (see tests/live_server.py)
+"""
+
+import pytest
+
+pytestmark = pytest.mark.integration
+
+ADMIN_HEADERS = {"Authorization": "Bearer valid-admin-token"}
+
+
+def list_users(api_session, api_base_url, **params):
+    response = api_session.get(f"{api_base_url}/user/users", params=params, headers=ADMIN_HEADERS, timeout=10)
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+class TestUserListPagination:
+    """Tests for pageToken-based paging of the admin user listing"""
+
+    @pytest.mark.parametrize("limit", [1, 2])
+    def test_pages_cover_every_user_once(self, api_session, api_base_url, limit):
+        """Following nextPageToken visits each user exactly once"""
+        first = list_users(api_session, api_base_url, limit=limit)
+        total = first["pagination"]["totalUsers"]
+
+        ids = [user["id"] for user in first["users"]]
+        token = first["pagination"]["nextPageToken"]
+        while token:
+            page = list_users(api_session, api_base_url, limit=limit, pageToken=token)
+            assert page["pagination"]["hasPreviousPage"] is True
+            ids.extend(user["id"] for user in page["users"])
+            token = page["pagination"]["nextPageToken"]
+
+        assert len(ids) == len(set(ids)) == total
+
+    def test_users_are_newest_first(self, api_session, api_base_url):
+        """Users are ordered by createdAt descending"""
+        users = list_users(api_session, api_base_url, limit=100)["users"]
+        created = [user["createdAt"] for user in users if user.get("createdAt")]
+
+        assert created == sorted(created, reverse=True)
+
+    @pytest.mark.parametrize("limit", [-3, 0])
+    def test_non_positive_limit_is_clamped(self, api_session, api_base_url, limit):
+        """A limit below 1 is raised to 1"""
+        page = list_users(api_session, api_base_url, limit=limit)
+
+        assert len(page["users"]) == 1
+        assert page["pagination"]["usersPerPage"] == 1
+
+    def test_invalid_page_token_is_rejected(self, api_session, api_base_url):
+        """A malformed pageToken is a validation error, not a server error"""
+        response = api_session.get(
+            f"{api_base_url}/user/users",
+            params={"pageToken": "not-a-token"},
+            headers=ADMIN_HEADERS,
+            timeout=10,
+        )
+
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VALIDATION_ERROR"
+
+
+class TestUserListProjection:
+    """Tests for ?fields= on the admin user listing"""
+
+    def test_only_requested_fields_are_returned(self, api_session, api_base_url):
+        users = list_users(api_session, api_base_url, limit=100, fields="email,role")["users"]
+
+        assert users
+        assert all(set(user) <= {"id", "email", "role"} for user in users)
+
+    def test_projected_pages_still_chain(self, api_session, api_base_url):
+        first = list_users(api_session, api_base_url, limit=1, fields="email")
+        token = first["pagination"]["nextPageToken"]
+        assert token
+
+        second = list_users(api_session, api_base_url, limit=1, fields="email", pageToken=token)
+        assert second["users"][0]["id"] != first["users"][0]["id"]
+
+    def test_invalid_fields_are_rejected(self, api_session, api_base_url):
+        response = api_session.get(
+            f"{api_base_url}/user/users",
+            params={"fields": "email;drop"},
+            headers=ADMIN_HEADERS,
+            timeout=10,
+        )
+        assert response.status_code == 400
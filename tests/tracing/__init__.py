@@ -0,0 +1,2 @@
+# Firestore trace analysis for the DIYA Curriculum Portal API
+# Run with: python -m tests.tracing --help
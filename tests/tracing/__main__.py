@@ -0,0 +1,60 @@
+"""
+Command line entry point for the Firestore trace analyzer
+
+Usage:
+    cd server && FIRESTORE_TRACE=all FIRESTORE_TRACE_FILE=/tmp/traces.jsonl npm start
+    python -m tests.load --duration 30        # or any traffic
+    python -m tests.tracing /tmp/traces.jsonl --sort amplification --top 10
+
+Server logs work too: lines that are not traces are skipped
+"""
+
+import argparse
+import json
+import sys
+
+from tests.tracing.analyzer import SORT_KEYS, aggregate, format_report, rank, read_traces
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rank routes by Firestore cost from trace lines")
+    parser.add_argument("files", nargs="*", default=["-"],
+                        help="Trace files or server logs; '-' for stdin (default: stdin)")
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="reads",
+                        help="Ranking: total documents read (default), read amplification, "
+                             "mean serial round trips or total Firestore time")
+    parser.add_argument("--top", type=int, default=20, help="Routes to show (default: 20, 0 for all)")
+    parser.add_argument("--json", action="store_true", help="Print the ranked hotspots as JSON")
+    return parser.parse_args(argv)
+
+
+def load(files):
+    traces = []
+    for name in files:
+        if name == "-":
+            traces.extend(read_traces(sys.stdin))
+            continue
+        with open(name, encoding="utf-8", errors="replace") as handle:
+            traces.extend(read_traces(handle))
+    return traces
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    traces = load(args.files)
+    if not traces:
+        print("No Firestore traces found - start the server with FIRESTORE_TRACE=all "
+              "or send X-Firestore-Trace: 1", file=sys.stderr)
+        return 1
+
+    hotspots = rank(aggregate(traces), args.sort)
+    if args.json:
+        print(json.dumps({"traces": len(traces), "hotspots": hotspots[:args.top or None]}, indent=2))
+    else:
+        print(f"{len(traces)} traced requests, {len(hotspots)} routes, ranked by {args.sort}\n")
+        print(format_report(hotspots, args.top or None))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
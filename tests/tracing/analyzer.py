@@ -0,0 +1,150 @@
+"""
+Aggregates Firestore trace lines (written by the server with FIRESTORE_TRACE
+or the X-Firestore-Trace header) into per-route hotspots, ranked by cost
+"""
+
+import json
+from collections import defaultdict
+
+from tests.load.harness import percentile
+
+TRACE_TYPE = "firestore_trace"
+SORT_KEYS = {
+    "reads": lambda hotspot: hotspot["documentsRead"],
+    "amplification": lambda hotspot: hotspot["readAmplification"] or 0,
+    "serial": lambda hotspot: hotspot["serialRoundTrips"]["mean"],
+    "firestore-ms": lambda hotspot: hotspot["firestoreMs"]["total"],
+}
+# Thresholds for the findings attached to each hotspot
+AMPLIFICATION_THRESHOLD = 10
+SERIAL_ROUND_TRIP_THRESHOLD = 4
+FIRESTORE_SHARE_THRESHOLD = 0.8
+
+
+def read_traces(lines):
+    """
+    Trace records from an iterable of lines; other output mixed into a server
+    log (startup messages, console.log lines) is skipped
+    """
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("type") == TRACE_TYPE:
+            yield record
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"mean": None, "p50": None, "p95": None, "max": None, "total": 0}
+    return {
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(values[-1], 3),
+        "total": round(sum(values), 3),
+    }
+
+
+def findings(hotspot):
+    notes = []
+    amplification = hotspot["readAmplification"]
+    if amplification is not None and amplification >= AMPLIFICATION_THRESHOLD:
+        notes.append(f"reads {amplification:g} documents per document returned; filter or limit in the query")
+    if hotspot["serialRoundTrips"]["mean"] >= SERIAL_ROUND_TRIP_THRESHOLD:
+        notes.append(f"{hotspot['serialRoundTrips']['mean']:g} serial round trips per request; "
+                     "batch with getAll() or run reads in parallel")
+    if hotspot["firestoreShare"] is not None and hotspot["firestoreShare"] >= FIRESTORE_SHARE_THRESHOLD:
+        notes.append(f"{hotspot['firestoreShare']:.0%} of request time is spent waiting on Firestore")
+    return notes
+
+
+def aggregate(traces):
+    """One hotspot per method and route pattern"""
+    groups = defaultdict(list)
+    for trace in traces:
+        groups[(trace.get("method"), trace.get("route"))].append(trace)
+
+    hotspots = []
+    for (method, route), group in groups.items():
+        read = sum(trace["documentsRead"] for trace in group)
+        # Amplification only over requests whose returned count is known
+        known = [trace for trace in group if trace.get("documentsReturned") is not None]
+        known_read = sum(trace["documentsRead"] for trace in known)
+        returned = sum(trace["documentsReturned"] for trace in known)
+        duration_total = sum(trace["durationMs"] for trace in group)
+        firestore_total = sum(trace["firestoreMs"] for trace in group)
+
+        collections = defaultdict(lambda: {"reads": 0, "writes": 0, "roundTrips": 0, "ms": 0.0})
+        for trace in group:
+            for name, stats in trace.get("collections", {}).items():
+                totals = collections[name]
+                for key in totals:
+                    totals[key] += stats.get(key, 0)
+
+        hotspot = {
+            "method": method,
+            "route": route,
+            "requests": len(group),
+            "errors": sum(1 for trace in group if trace["status"] == "aborted" or trace["status"] >= 500),
+            "documentsRead": read,
+            "documentsReturned": returned if known else None,
+            "documentsWritten": sum(trace.get("documentsWritten", 0) for trace in group),
+            # An empty response counts as one document, so reading without returning still ranks
+            "readAmplification": round(known_read / max(returned, 1), 3) if known else None,
+            "readsPerRequest": summarize([trace["documentsRead"] for trace in group]),
+            "serialRoundTrips": summarize([trace["serialRoundTrips"] for trace in group]),
+            "roundTrips": summarize([trace["roundTrips"] for trace in group]),
+            "firestoreMs": summarize([trace["firestoreMs"] for trace in group]),
+            "durationMs": summarize([trace["durationMs"] for trace in group]),
+            "firestoreShare": round(firestore_total / duration_total, 3) if duration_total else None,
+            "collections": [
+                {"collection": name, **{key: round(value, 3) for key, value in totals.items()}}
+                for name, totals in sorted(collections.items(), key=lambda item: -item[1]["reads"])
+            ],
+        }
+        hotspot["findings"] = findings(hotspot)
+        hotspots.append(hotspot)
+    return hotspots
+
+
+def rank(hotspots, sort_by="reads"):
+    """Hotspots, most expensive first by one of SORT_KEYS"""
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key {sort_by!r}; choose from {', '.join(SORT_KEYS)}")
+    return sorted(hotspots, key=lambda hotspot: (-SORT_KEYS[sort_by](hotspot), hotspot["route"] or ""))
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:g}"
+
+
+def format_report(hotspots, top=None):
+    """Plain text table of ranked hotspots, each followed by its findings"""
+    shown = hotspots[:top] if top else hotspots
+    header = f"{'#':>3}  {'route':<40} {'reqs':>6} {'reads':>9} {'returned':>9} {'ampl':>7} " \
+             f"{'serial':>6} {'fs p95 ms':>9} {'fs share':>8}"
+    lines = [header, "-" * len(header)]
+    for position, hotspot in enumerate(shown, 1):
+        share = hotspot["firestoreShare"]
+        lines.append(
+            f"{position:>3}  {(hotspot['method'] or '') + ' ' + (hotspot['route'] or ''):<40} "
+            f"{hotspot['requests']:>6} {hotspot['documentsRead']:>9} "
+            f"{format_value(hotspot['documentsReturned']):>9} {format_value(hotspot['readAmplification']):>7} "
+            f"{format_value(hotspot['serialRoundTrips']['mean']):>6} {format_value(hotspot['firestoreMs']['p95']):>9} "
+            f"{'-' if share is None else f'{share:.0%}':>8}"
+        )
+        if hotspot["collections"]:
+            top_collections = ", ".join(f"{entry['collection']} ({entry['reads']:g} reads)"
+                                        for entry in hotspot["collections"][:3])
+            lines.append(f"       collections: {top_collections}")
+        for note in hotspot["findings"]:
+            lines.append(f"       ! {note}")
+    if top and len(hotspots) > top:
+        lines.append(f"... {len(hotspots) - top} more routes")
+    return "\n".join(lines)